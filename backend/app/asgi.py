@@ -11,6 +11,15 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from app.plagiarism_checker.fingerprint_pool import warm_up
+from utils import start_change_feed
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_asgi_application()
+
+# Loads the fingerprint index of the worker and starts the change feed which keeps it up to date
+start_change_feed()
+
+# Starts the fingerprinting pool of the worker, so that the first long article does not wait for it
+warm_up()
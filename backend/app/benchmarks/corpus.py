@@ -0,0 +1,77 @@
+"""Deterministic news-like texts used by the benchmarks.
+The paragraphs were written for this purpose, so the benchmarks run offline and always see the same input.
+"""
+
+PARAGRAPHS = [
+    "The city council approved on Tuesday a plan to rebuild the main bridge over the river, ending months of "
+    "debate about how the 40-year-old structure should be replaced. The new bridge will have two lanes for cars, "
+    "a separate lane for buses and a wide path for cyclists and pedestrians.",
+
+    "“We have listened to the residents and to the engineers,” said the mayor, Zoë Hartmann, after the vote. "
+    "“This is not the cheapest option, but it is the one that will still serve the city in fifty years.” "
+    "Construction is expected to start next spring and to last about three years.",
+
+    "The project will cost an estimated €240 million, of which roughly a third is covered by a grant from the "
+    "national government. Opposition members argued that the remaining amount could force the council to raise "
+    "local taxes or postpone the renovation of several schools.",
+
+    "Traffic across the old bridge has been restricted since last summer, when inspectors found cracks in two of "
+    "its supporting columns. Heavy vehicles have been diverted through the industrial district, and shop owners "
+    "on the eastern bank say they have lost up to 30% of their customers.",
+
+    "In São Paulo, Lisbon and Rotterdam, similar projects were delayed by legal disputes with contractors — a risk "
+    "the council says it has addressed by splitting the work into smaller contracts. Independent experts welcomed "
+    "the approach but warned that coordination between several companies is rarely straightforward.",
+
+    "Environmental groups asked for the construction site to be moved further from the nature reserve on the "
+    "northern shore, where several protected bird species nest between April and July. The council agreed to "
+    "pause noisy work during the breeding season and to monitor water quality every week.",
+
+    "Local businesses reacted with cautious optimism. “Three years is a long time for a small café,” said one owner "
+    "whose terrace overlooks the river. “But if the new bridge brings people back to this side of town, it will "
+    "have been worth the wait.”",
+
+    "A public consultation on the final design will open next month. Residents will be able to comment on the "
+    "lighting, the colour of the railings and the placement of benches, and the council has promised to publish "
+    "a summary of all responses before the construction contracts are signed.",
+]
+
+# Excerpts in the style of foreign-language and wire news, with the characters that make sanitizing tricky:
+# letters whose lower-case form has several characters, combining marks, digits, underscores and symbols
+MULTILINGUAL_PARAGRAPHS = [
+    "İstanbul Büyükşehir Belediyesi, Boğaz'daki yeni köprünün inşaatına önümüzdeki ay başlanacağını açıkladı. "
+    "Projenin maliyeti 4,2 milyar TL olarak hesaplanıyor.",
+
+    "Die Straßenbahn fährt ab Montag wieder über die Brücke. Der Bürgermeister sagte: „Wir haben die Sanierung "
+    "früher abgeschlossen als geplant.“ GROẞE Umleitungen entfallen damit.",
+
+    "Η ΚΥΒΕΡΝΗΣΗ ανακοίνωσε νέα μέτρα για την ΟΔΙΚΗ ΑΣΦΑΛΕΙΑ. Ο υπουργός δήλωσε ότι ο στόχος είναι σαφής: "
+    "λιγότερα ατυχήματα έως το 2030.",
+
+    "東京都は新しい橋の建設計画を発表した。総工費は約３００億円で、２０２７年の完成を目指している。"
+    "Ｔｏｋｙｏ市民の反応はおおむね好意的だ。",
+
+    "قال رئيس البلدية إن الجسر الجديد سيفتتح في الربيع المقبل، وإن العمل سيستمر ليلاً ونهاراً.",
+
+    "Cafe\u0301 owners on the ﬁrst floor said the ﬂood of visitors was “unprecedented” ― ticket_sales rose by "
+    "½ in a week \U0001F4C8, while the city's Ⅻ district saw no change\u200b at all.",
+]
+
+
+def article_of_size(size):
+    """Builds a deterministic article with (at least) the given number of characters by cycling through the
+    paragraphs, with a running number in every paragraph so the article does not just repeat itself.
+
+    :param size: the number of characters of the article.
+    :return: the text of the article
+    """
+    paragraphs = []
+    length = 0
+    index = 0
+    while length < size:
+        paragraph = f"{index + 1}. {PARAGRAPHS[index % len(PARAGRAPHS)]}"
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+        index += 1
+
+    return "\n\n".join(paragraphs)[:size]
@@ -0,0 +1,89 @@
+import logging
+import time
+
+from winnowing import sanitize
+
+from app.benchmarks.corpus import article_of_size
+from app.plagiarism_checker.fingerprinting import modified_winnow
+from app.plagiarism_checker.normalization import sanitize_text, normalize_text
+from app.plagiarism_checker.schemes import RABIN_KARP_SCHEME
+from app.plagiarism_checker.winnowing_engine import vectorized_winnow
+
+# create a logger for the root level: INFO:root
+logger = logging.getLogger()
+logger.setLevel(level=logging.INFO)
+
+# Article sizes (in characters) we see in practice: a short news item, a typical article and the largest article
+# that still fits in the 2000 fingerprints limit
+ARTICLE_SIZES = {'short': 1500, 'typical': 5000, 'maximum': 8500}
+
+
+def measure(function, text, repetitions):
+    """Measures the average time a fingerprinting function needs for the given text.
+
+    :param function: the function computing the fingerprints of a text.
+    :param text: the text to be fingerprinted.
+    :param repetitions: how many times the function is called.
+    :return: the average duration of a call, in seconds
+    """
+    start_time = time.perf_counter()
+    for _ in range(repetitions):
+        function(text)
+    return (time.perf_counter() - start_time) / repetitions
+
+
+def run_benchmark(repetitions=20):
+    """Compares the throughput of the reference winnowing implementation with the vectorized one, for every
+    article size. It also checks that both implementations produce the same fingerprints.
+    The vectorized engine is measured with the Rabin-Karp scheme as well, and the normalization step on its own
+    (with and without the positions of the kept characters) against the per-character `winnowing.sanitize`.
+
+    :param repetitions: how many times every article is fingerprinted.
+    :return: a list of dictionaries, one for every article size, containing the measured durations and speedup
+    """
+    results = []
+    for name, size in ARTICLE_SIZES.items():
+        text = article_of_size(size)
+        if modified_winnow(text) != vectorized_winnow(text):
+            raise AssertionError(f'The vectorized fingerprints differ from the reference ones for the {name} article')
+
+        reference = measure(modified_winnow, text, repetitions)
+        vectorized = measure(vectorized_winnow, text, repetitions)
+        rabin_karp = measure(lambda article: vectorized_winnow(article, scheme=RABIN_KARP_SCHEME), text, repetitions)
+        reference_sanitize = measure(lambda article: list(sanitize(enumerate(article))), text, repetitions)
+        normalize = measure(sanitize_text, text, repetitions)
+        normalize_text_only = measure(normalize_text, text, repetitions)
+        results.append({
+            'article': name,
+            'characters': len(text),
+            'fingerprints': len(vectorized_winnow(text)),
+            'reference_ms': reference * 1000,
+            'vectorized_ms': vectorized * 1000,
+            'rabin_karp_ms': rabin_karp * 1000,
+            'reference_sanitize_ms': reference_sanitize * 1000,
+            'normalize_ms': normalize * 1000,
+            'normalize_text_only_ms': normalize_text_only * 1000,
+            'reference_mb_per_s': len(text.encode('utf-8')) / reference / 1e6,
+            'vectorized_mb_per_s': len(text.encode('utf-8')) / vectorized / 1e6,
+            'speedup': reference / vectorized,
+        })
+    return results
+
+
+def main():
+    """Runs the fingerprinting benchmark and logs the results for every article size.
+    """
+    for result in run_benchmark():
+        logging.info(f"{result['article']} article ({result['characters']} characters, "
+                     f"{result['fingerprints']} fingerprints): "
+                     f"reference {result['reference_ms']:.2f} ms ({result['reference_mb_per_s']:.2f} MB/s), "
+                     f"vectorized {result['vectorized_ms']:.2f} ms ({result['vectorized_mb_per_s']:.2f} MB/s), "
+                     f"speedup {result['speedup']:.1f}x, rabin-karp scheme {result['rabin_karp_ms']:.2f} ms")
+        logging.info(f"{result['article']} article normalization: "
+                     f"reference sanitize {result['reference_sanitize_ms']:.3f} ms, "
+                     f"with positions {result['normalize_ms']:.3f} ms, "
+                     f"text only {result['normalize_text_only_ms']:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Benchmark of the compressed posting lists of the in-memory fingerprint index: memory per posting and latency of
+counting the overlaps of a query with every document, for corpora of 100k and 1M synthetic documents.
+
+Run it with `python3 -m app.benchmarks.index_benchmark` from the backend folder. The bytes per posting depend on
+the gaps between document numbers, i.e. on the fraction of documents having a fingerprint, which does not depend on
+the number of fingerprints per document as long as it is far below the 2^20 possible hashes. The default of 200
+fingerprints per document keeps the 1M documents run within a few GB of memory.
+"""
+import argparse
+import logging
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from app.plagiarism_checker.postings import BITMAP, PostingStore
+from app.plagiarism_checker.schemes import HASH_MASK
+
+DOCUMENT_COUNTS = (100000, 1000000)
+DEFAULT_FINGERPRINTS = 200
+DEFAULT_QUERY_FINGERPRINTS = 1000
+DEFAULT_QUERIES = 20
+
+# Every document also has some of the most common fingerprints (boilerplate like "said on Tuesday"), which makes
+# their posting lists dense enough to be stored as bitmaps
+COMMON_FINGERPRINTS = 50
+COMMON_FRACTION = 0.05
+
+# Memory of a posting in a Python list of ints: the 8-byte reference and the 28-byte int object
+PYTHON_LIST_BYTES_PER_POSTING = 36
+
+BATCH_DOCUMENTS = 10000
+
+
+def synthetic_hashes(rng, shape):
+    """Draws the fingerprints of synthetic documents: uniformly distributed, except for a fraction of common ones.
+
+    :param rng: the numpy RandomState.
+    :param shape: the shape of the returned array.
+    :return: an int64 array of hashes
+    """
+    hashes = rng.randint(0, HASH_MASK + 1, size=shape).astype(np.int64)
+    common = rng.rand(*hashes.shape) < COMMON_FRACTION
+    hashes[common] = rng.randint(0, COMMON_FINGERPRINTS, size=int(common.sum()))
+    return hashes
+
+
+def synthetic_postings(documents, fingerprints, rng):
+    """Generates the postings of a synthetic corpus, a batch of documents at a time.
+
+    :param documents: the number of documents.
+    :param fingerprints: the (approximate) number of distinct fingerprints of every document.
+    :param rng: the numpy RandomState.
+    :return: a generator of (document numbers, hashes) pairs, ordered by document number
+    """
+    for start in range(0, documents, BATCH_DOCUMENTS):
+        batch = min(BATCH_DOCUMENTS, documents - start)
+        hashes = synthetic_hashes(rng, (batch, fingerprints))
+        keys = np.unique((np.arange(start, start + batch, dtype=np.int64)[:, None] << 20) + hashes)
+        yield keys >> 20, keys & HASH_MASK
+
+
+def build_store(documents, fingerprints, seed=0):
+    """Builds the posting store of a synthetic corpus.
+
+    :param documents: the number of documents.
+    :param fingerprints: the number of fingerprints of every document.
+    :param seed: the seed of the corpus.
+    :return: a tuple with the PostingStore and the build duration in seconds
+    """
+    rng = np.random.RandomState(seed)
+    store = PostingStore()
+    start_time = time.perf_counter()
+    for numbers, hashes in synthetic_postings(documents, fingerprints, rng):
+        store.extend(numbers, hashes)
+    store.compact()
+    return store, time.perf_counter() - start_time
+
+
+def query_overlaps(store, documents, hashes):
+    """Counts the fingerprints every document has in common with a query, as InvertedIndex.overlaps does.
+
+    :param store: the PostingStore.
+    :param documents: the number of documents.
+    :param hashes: the sorted distinct hashes of the query.
+    :return: the number of common fingerprints of every document
+    """
+    return store.count(hashes, documents)
+
+
+def run_benchmark(document_counts=DOCUMENT_COUNTS, fingerprints=DEFAULT_FINGERPRINTS,
+                  query_fingerprints=DEFAULT_QUERY_FINGERPRINTS, queries=DEFAULT_QUERIES):
+    """Builds a store for every corpus size and measures its memory and the latency of queries.
+
+    :param document_counts: the numbers of documents of the corpora.
+    :param fingerprints: the number of fingerprints of every document.
+    :param query_fingerprints: the number of fingerprints of every query.
+    :param queries: the number of measured queries.
+    :return: a list of dictionaries, one for every corpus size, containing the measurements
+    """
+    results = []
+    for documents in document_counts:
+        store, build_seconds = build_store(documents, fingerprints)
+        rng = np.random.RandomState(documents)
+        durations = []
+        for _ in range(queries):
+            hashes = np.unique(synthetic_hashes(rng, query_fingerprints))
+            start_time = time.perf_counter()
+            query_overlaps(store, documents, hashes)
+            durations.append(time.perf_counter() - start_time)
+
+        postings = len(store)
+        results.append({
+            'documents': documents,
+            'postings': postings,
+            'bitmap_lists': int(np.count_nonzero(store.kinds == BITMAP)),
+            'megabytes': store.memory_bytes() / 1e6,
+            'bytes_per_posting': store.memory_bytes() / postings,
+            'python_list_bytes_per_posting': PYTHON_LIST_BYTES_PER_POSTING,
+            'build_seconds': build_seconds,
+            'query_ms': statistics.median(durations) * 1000,
+        })
+        del store
+    return results
+
+
+def main(argv=None):
+    """Runs the posting list benchmark and logs the results for every corpus size.
+
+    :param argv: the command line arguments.
+    """
+    logging.getLogger().setLevel(logging.INFO)
+    parser = argparse.ArgumentParser(description='Posting list benchmark.')
+    parser.add_argument('--documents', type=int, nargs='+', default=list(DOCUMENT_COUNTS),
+                        help='The numbers of documents of the benchmarked corpora.')
+    parser.add_argument('--fingerprints', type=int, default=DEFAULT_FINGERPRINTS,
+                        help='The number of fingerprints of every document.')
+    parser.add_argument('--query-fingerprints', type=int, default=DEFAULT_QUERY_FINGERPRINTS,
+                        help='The number of fingerprints of every query.')
+    parser.add_argument('--queries', type=int, default=DEFAULT_QUERIES,
+                        help='The number of measured queries.')
+    options = parser.parse_args(argv)
+
+    for result in run_benchmark(options.documents, options.fingerprints, options.query_fingerprints,
+                                options.queries):
+        logging.info(f"{result['documents']} documents, {result['postings']} postings "
+                     f"({result['bitmap_lists']} bitmap lists): {result['megabytes']:.1f} MB, "
+                     f"{result['bytes_per_posting']:.2f} bytes/posting "
+                     f"(Python lists: {result['python_list_bytes_per_posting']}), "
+                     f"built in {result['build_seconds']:.1f} s, query {result['query_ms']:.2f} ms")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
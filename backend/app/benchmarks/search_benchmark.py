@@ -0,0 +1,497 @@
+"""Benchmark of the SQL similarity search: the single ranking query (views.get_ranked_documents) against the former
+pipeline of three queries (rank_documents_with_three_queries, which only this module keeps) and against the ranking
+of the "arrays" and "postings" fingerprint storages (views.get_ranked_documents_from_arrays and
+get_ranked_documents_from_postings), on a corpus of synthetic documents seeded in a schema of its own. The size of
+the storage layouts is reported as well, with the distribution of the posting lengths (the number of documents
+having a fingerprint), which the wide scheme (31-bit fingerprints) keeps short as the corpus grows.
+
+Run it with `python3 manage.py benchmark_search --schema search_benchmark` against a local database (see
+docs/scripts.md). The corpus is made of documents with uniformly distributed fingerprints and every query is a near
+duplicate of one of them, with a fraction of its fingerprints replaced, so both pipelines must rank it first.
+"""
+import statistics
+import time
+
+import numpy as np
+from psycopg2 import extras
+
+from app.plagiarism_checker.fingerprint_arrays import ARRAY_INDEX, create_array_index
+from app.plagiarism_checker.fingerprint_set import FingerprintSet
+from app.plagiarism_checker.minhash import band_keys, lsh_candidates_enabled, minhash_signature
+from app.plagiarism_checker.posting_table import append_postings, compact_postings
+from app.plagiarism_checker.schemes import HASH_MASK, default_scheme, hash_mask
+from app.sql_migrations import apply_migrations
+
+DEFAULT_DOCUMENTS = 10000
+DEFAULT_FINGERPRINTS = 500
+DEFAULT_QUERIES = 20
+CAPACITY = 10
+
+# Fraction of the fingerprints of a document replaced in the query derived from it
+QUERY_NOISE = 0.2
+
+BATCH_DOCUMENTS = 1000
+POSTING_PERCENTILES = (50, 90, 99)
+BENCHMARK_URL = 'https://benchmark.invalid/{}'
+
+# The tables the migrations of app/sql_migrations expect to exist
+BASE_TABLES = """
+CREATE TABLE IF NOT EXISTS {schema}.urls (
+    id serial PRIMARY KEY,
+    url text NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS {schema}.fingerprints (
+    fingerprint integer PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS {schema}.url_fingerprints (
+    url_id integer NOT NULL REFERENCES {schema}.urls (id) ON DELETE CASCADE,
+    fingerprint_id integer NOT NULL REFERENCES {schema}.fingerprints (fingerprint),
+    PRIMARY KEY (url_id, fingerprint_id)
+);
+
+CREATE INDEX IF NOT EXISTS url_fingerprints_fingerprint_idx ON {schema}.url_fingerprints (fingerprint_id);
+"""
+
+
+def synthetic_document(rng, fingerprints, mask=HASH_MASK):
+    """Draws the fingerprints of a synthetic document.
+
+    :param rng: the numpy RandomState.
+    :param fingerprints: the (approximate) number of distinct fingerprints of the document.
+    :param mask: the largest fingerprint, hash_mask of the scheme of the corpus.
+    :return: the FingerprintSet of the document
+    """
+    return FingerprintSet(rng.randint(0, mask + 1, size=fingerprints, dtype=np.int64))
+
+
+def near_duplicate(rng, document, noise=QUERY_NOISE, mask=HASH_MASK):
+    """Derives a query from a document by replacing a fraction of its fingerprints with random ones.
+
+    :param rng: the numpy RandomState.
+    :param document: the FingerprintSet of the document.
+    :param noise: the fraction of replaced fingerprints.
+    :param mask: the largest fingerprint, hash_mask of the scheme of the corpus.
+    :return: the FingerprintSet of the query
+    """
+    hashes = document.hashes.copy()
+    replaced = rng.rand(len(hashes)) < noise
+    hashes[replaced] = rng.randint(0, mask + 1, size=int(replaced.sum()), dtype=np.int64)
+    return FingerprintSet(hashes)
+
+
+def create_schema(conn, schema):
+    """Creates the benchmark schema with the base news tables, then applies the SQL migrations on it.
+
+    :param conn: the connection to the database.
+    :param schema: the name of the benchmark schema.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        cur.execute(BASE_TABLES.format(schema=schema))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    apply_migrations(conn, schema)
+
+
+def drop_schema(conn, schema):
+    """Drops the benchmark schema and everything it contains.
+
+    :param conn: the connection to the database.
+    :param schema: the name of the benchmark schema.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def seed_documents(conn, schema, documents, fingerprints, seed=0, log=None, scheme=None):
+    """Stores synthetic documents in the benchmark schema, a batch at a time, as models.Document.save would, in
+    every fingerprint storage layout (the arrays with their GIN index, and the compacted postings).
+
+    :param conn: the connection to the database.
+    :param schema: the name of the benchmark schema.
+    :param documents: the number of documents.
+    :param fingerprints: the number of fingerprints of every document.
+    :param seed: the seed of the corpus.
+    :param log: a function called with progress messages, if any.
+    :param scheme: the scheme of the documents, FINGERPRINT_SCHEME from the settings if not given.
+    :return: the list of the FingerprintSets of the documents, in the order of their URLs
+    """
+    rng = np.random.RandomState(seed)
+    scheme = scheme or default_scheme()
+    corpus = []
+    cur = conn.cursor()
+    try:
+        for start in range(0, documents, BATCH_DOCUMENTS):
+            batch = [synthetic_document(rng, fingerprints, hash_mask(scheme))
+                     for _ in range(min(BATCH_DOCUMENTS, documents - start))]
+            ids = extras.execute_values(
+                cur,
+                f"""INSERT INTO {schema}.urls (url, scheme, sampling_modulus, fingerprint_count, fingerprint_array)
+                VALUES %s RETURNING id""",
+                [(BENCHMARK_URL.format(start + i), scheme, 1, len(document), document.tolist())
+                 for i, document in enumerate(batch)],
+                fetch=True
+            )
+            distinct = np.unique(np.concatenate([document.hashes for document in batch]))
+            extras.execute_values(cur, f"INSERT INTO {schema}.fingerprints (fingerprint) VALUES %s "
+                                       f"ON CONFLICT DO NOTHING", [(h,) for h in distinct.tolist()])
+            extras.execute_values(cur, f"INSERT INTO {schema}.url_fingerprints (url_id, fingerprint_id) VALUES %s",
+                                  [(doc_id, h) for (doc_id,), document in zip(ids, batch)
+                                   for h in document.tolist()], page_size=10000)
+            conn.commit()
+            corpus.extend(batch)
+            if log is not None:
+                log(f'Seeded {len(corpus)} document(s)')
+        cur.execute(f"ANALYZE {schema}.urls")
+        cur.execute(f"ANALYZE {schema}.url_fingerprints")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    create_array_index(conn, schema)
+    while append_postings(conn, schema, BATCH_DOCUMENTS):
+        pass
+    compact_postings(conn, schema)
+    return corpus
+
+
+def time_single_query(conn, schema, query, capacity=CAPACITY, scheme=None):
+    """Ranks the documents with the single ranking query.
+
+    :param conn: the connection to the database.
+    :param schema: the name of the benchmark schema.
+    :param query: the FingerprintSet of the query.
+    :param capacity: the number of ranked documents.
+    :param scheme: the scheme of the corpus, FINGERPRINT_SCHEME from the settings if not given.
+    :return: a tuple with the duration in seconds and the ranked URLs
+    """
+    from app.views import get_ranked_documents, query_overlap_cutoffs
+
+    start_time = time.perf_counter()
+    cur = conn.cursor()
+    try:
+        ranked = get_ranked_documents(cur, query, scheme=scheme, limit=capacity,
+                                      minimum_overlap=query_overlap_cutoffs(query), db_schema=schema)
+        conn.commit()
+    finally:
+        cur.close()
+    return time.perf_counter() - start_time, [url for (_, url, _, _) in ranked]
+
+
+def time_arrays_query(conn, schema, query, capacity=CAPACITY, scheme=None):
+    """Ranks the documents with the ranking query of the "arrays" fingerprint storage.
+
+    :param conn: the connection to the database.
+    :param schema: the name of the benchmark schema.
+    :param query: the FingerprintSet of the query.
+    :param capacity: the number of ranked documents.
+    :param scheme: the scheme of the corpus, FINGERPRINT_SCHEME from the settings if not given.
+    :return: a tuple with the duration in seconds and the ranked URLs
+    """
+    from app.views import get_ranked_documents_from_arrays, query_overlap_cutoffs
+
+    start_time = time.perf_counter()
+    cur = conn.cursor()
+    try:
+        ranked = get_ranked_documents_from_arrays(cur, query, scheme=scheme, limit=capacity,
+                                                  minimum_overlap=query_overlap_cutoffs(query), db_schema=schema)
+        conn.commit()
+    finally:
+        cur.close()
+    return time.perf_counter() - start_time, [url for (_, url, _, _) in ranked]
+
+
+def time_postings_query(conn, schema, query, capacity=CAPACITY, scheme=None):
+    """Ranks the documents from the fingerprint_postings table.
+
+    :param conn: the connection to the database.
+    :param schema: the name of the benchmark schema.
+    :param query: the FingerprintSet of the query.
+    :param capacity: the number of ranked documents.
+    :param scheme: the scheme of the corpus, FINGERPRINT_SCHEME from the settings if not given.
+    :return: a tuple with the duration in seconds and the ranked URLs
+    """
+    from app.views import get_ranked_documents_from_postings, query_overlap_cutoffs
+
+    start_time = time.perf_counter()
+    cur = conn.cursor()
+    try:
+        ranked = get_ranked_documents_from_postings(cur, query, scheme=scheme, limit=capacity,
+                                                    minimum_overlap=query_overlap_cutoffs(query), db_schema=schema)
+        conn.commit()
+    finally:
+        cur.close()
+    return time.perf_counter() - start_time, [url for (_, url, _, _) in ranked]
+
+
+def storage_sizes(conn, schema):
+    """Measures the size on disk of the fingerprint storage layouts, indexes included.
+
+    :param conn: the connection to the database.
+    :param schema: the name of the benchmark schema.
+    :return: a tuple with the sizes in bytes of the url_fingerprints table, of the fingerprint arrays and of the
+    fingerprint_postings table
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            SELECT pg_total_relation_size('{schema}.url_fingerprints'),
+                   (SELECT COALESCE(sum(pg_column_size(fingerprint_array)), 0) FROM {schema}.urls)
+                       + pg_relation_size('{schema}.{ARRAY_INDEX}'),
+                   pg_total_relation_size('{schema}.fingerprint_postings')
+            """
+        )
+        sizes = cur.fetchone()
+        conn.commit()
+    finally:
+        cur.close()
+    return tuple(int(size) for size in sizes)
+
+
+def posting_length_distribution(conn, schema):
+    """Measures the distribution of the posting lengths, i.e. of the number of documents having every stored
+    fingerprint. Long postings make every query count many unrelated documents.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :return: a dictionary with the percentiles of POSTING_PERCENTILES (as 'p50', ...), the 'max' and 'mean' lengths
+    and the number of distinct 'fingerprints'
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            SELECT count(*), COALESCE(avg(documents), 0), COALESCE(max(documents), 0),
+                   percentile_disc(%s::float8[]) WITHIN GROUP (ORDER BY documents)
+            FROM (
+                SELECT count(*) AS documents
+                FROM {schema}.url_fingerprints
+                GROUP BY fingerprint_id
+            ) postings
+            """, ([percentile / 100 for percentile in POSTING_PERCENTILES],)
+        )
+        fingerprints, mean, longest, percentiles = cur.fetchone()
+        conn.commit()
+    finally:
+        cur.close()
+    percentiles = percentiles or [0] * len(POSTING_PERCENTILES)
+    distribution = {f'p{percentile}': int(length) for percentile, length in zip(POSTING_PERCENTILES, percentiles)}
+    distribution.update({'max': int(longest), 'mean': float(mean), 'fingerprints': int(fingerprints)})
+    return distribution
+
+
+def get_fingerprint_candidates(cur, schema, fingerprints):
+    """Retrieves the fingerprint candidates, the given fingerprints some stored document has.
+
+    :param cur: the database cursor.
+    :param schema: the name of the benchmark schema.
+    :param fingerprints: the FingerprintSet of the query.
+    :return: a list of fingerprint candidates
+    """
+    cur.execute(
+        f"""
+        SELECT f.fingerprint
+        FROM {schema}.fingerprints as f
+        JOIN {schema}.url_fingerprints as uf ON f.fingerprint = uf.fingerprint_id
+        WHERE f.fingerprint = ANY(%s)
+        GROUP BY f.fingerprint
+        """, (fingerprints.tolist(),)
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def get_url_candidates(cur, schema, fingerprint_candidates, scheme, modulus, cutoffs):
+    """Retrieves the documents of the same scheme having enough fingerprint candidates, with their number of common
+    fingerprints. If the query or a document is sampled, only the fingerprints divisible by the larger sampling
+    modulus are counted.
+
+    :param cur: the database cursor.
+    :param schema: the name of the benchmark schema.
+    :param fingerprint_candidates: a list of fingerprint candidates.
+    :param scheme: the scheme of the query.
+    :param modulus: the sampling modulus of the query.
+    :param cutoffs: the minimum number of common fingerprints at every sampling level.
+    :return: a dictionary with the number of common fingerprints of every candidate URL
+    """
+    cur.execute(
+        f"""
+        SELECT u.url, count(*) as cnt
+        FROM {schema}.urls as u
+        JOIN {schema}.url_fingerprints as uf ON u.id = uf.url_id
+        WHERE uf.fingerprint_id = ANY(%(candidates)s) AND u.scheme = %(scheme)s
+          AND uf.fingerprint_id %% GREATEST(u.sampling_modulus, %(modulus)s) = 0
+        GROUP BY u.url, u.sampling_modulus
+        HAVING COUNT(*) >= (%(minimum_overlaps)s::integer[])[
+            round(log(2, GREATEST(u.sampling_modulus, %(modulus)s)))::integer + 1]
+        """,
+        {'candidates': list(fingerprint_candidates), 'scheme': scheme, 'modulus': modulus,
+         'minimum_overlaps': [int(cutoff) for cutoff in cutoffs]}
+    )
+    return {url: count for (url, count) in cur.fetchall()}
+
+
+def get_lsh_url_candidates(cur, schema, fingerprints, scheme, cutoffs):
+    """Retrieves the candidate URLs like get_url_candidates, but only among the documents sharing at least one LSH
+    band with the query.
+
+    :param cur: the database cursor.
+    :param schema: the name of the benchmark schema.
+    :param fingerprints: the FingerprintSet of the query.
+    :param scheme: the scheme of the query.
+    :param cutoffs: the minimum number of common fingerprints at every sampling level.
+    :return: a dictionary with the number of common fingerprints of every candidate URL
+    """
+    cur.execute(
+        f"""
+        SELECT u.url, count(*) as cnt
+        FROM {schema}.urls as u
+        JOIN {schema}.url_fingerprints as uf ON u.id = uf.url_id
+        WHERE u.id IN (SELECT lb.url_id FROM {schema}.lsh_bands as lb WHERE lb.band_key = ANY(%(band_keys)s))
+          AND uf.fingerprint_id = ANY(%(fingerprints)s) AND u.scheme = %(scheme)s
+          AND uf.fingerprint_id %% GREATEST(u.sampling_modulus, %(modulus)s) = 0
+        GROUP BY u.url, u.sampling_modulus
+        HAVING COUNT(*) >= (%(minimum_overlaps)s::integer[])[
+            round(log(2, GREATEST(u.sampling_modulus, %(modulus)s)))::integer + 1]
+        """,
+        {'band_keys': [int(key) for key in band_keys(minhash_signature(fingerprints))],
+         'fingerprints': fingerprints.tolist(), 'scheme': scheme, 'modulus': fingerprints.modulus,
+         'minimum_overlaps': [int(cutoff) for cutoff in cutoffs]}
+    )
+    return {url: count for (url, count) in cur.fetchall()}
+
+
+def rank_documents_with_three_queries(conn, schema, heap, capacity, fingerprints, scheme):
+    """Ranks the documents by their Jaccard similarity with the query with the former pipeline of three queries
+    (fingerprint candidates, URL candidates and document sizes), which the search replaced with a single ranking
+    query. The candidates come from the LSH band table if MINHASH_CANDIDATES is enabled.
+
+    :param conn: the connection to the database.
+    :param schema: the name of the benchmark schema.
+    :param heap: the heap (priority queue) the most similar documents are kept in.
+    :param capacity: the maximum capacity of the heap.
+    :param fingerprints: the FingerprintSet of the query.
+    :param scheme: the scheme the fingerprints were computed with.
+    """
+    from app.views import get_document, log_candidates, query_overlap_cutoffs, rank_candidates
+
+    cutoffs = query_overlap_cutoffs(fingerprints)
+    cur = conn.cursor()
+    try:
+        counts = {}
+        if lsh_candidates_enabled():
+            if len(fingerprints):
+                counts = get_lsh_url_candidates(cur, schema, fingerprints, scheme, cutoffs)
+        else:
+            fingerprint_candidates = get_fingerprint_candidates(cur, schema, fingerprints)
+            if fingerprint_candidates:
+                counts = get_url_candidates(cur, schema, fingerprint_candidates, scheme, fingerprints.modulus,
+                                            cutoffs)
+        log_candidates(fingerprints, cutoffs, len(counts))
+
+        if counts:
+            document = get_document(cur, list(counts), fingerprints.modulus, schema)
+            urls = [url for (url, _, _) in document]
+            intersections = [counts[url] for url in urls]
+            # Sampled documents are compared on the fingerprints both sides kept
+            lengths = [len(fingerprints) if modulus == fingerprints.modulus else fingerprints.sampled_size(modulus)
+                       for (_, _, modulus) in document]
+            sizes = [size for (_, size, _) in document]
+            rank_candidates(heap, capacity, urls, intersections, lengths, sizes)
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def time_three_queries(conn, schema, query, capacity=CAPACITY, scheme=None):
+    """Ranks the documents with the former pipeline of three queries.
+
+    :param conn: the connection to the database.
+    :param schema: the name of the benchmark schema.
+    :param query: the FingerprintSet of the query.
+    :param capacity: the number of ranked documents.
+    :param scheme: the scheme of the corpus, FINGERPRINT_SCHEME from the settings if not given.
+    :return: a tuple with the duration in seconds and the ranked URLs
+    """
+    heap = []
+    start_time = time.perf_counter()
+    rank_documents_with_three_queries(conn, schema, heap, capacity, query, scheme or default_scheme())
+    duration = time.perf_counter() - start_time
+    return duration, [url for (_, url) in sorted(heap, reverse=True)]
+
+
+def run_benchmark(conn, schema, documents=DEFAULT_DOCUMENTS, fingerprints=DEFAULT_FINGERPRINTS,
+                  queries=DEFAULT_QUERIES, keep=False, log=None, scheme=None):
+    """Seeds a corpus in the benchmark schema and measures the latency of the search pipelines on the same queries.
+
+    :param conn: the connection to the database.
+    :param schema: the name of the benchmark schema, which is dropped before and (unless keep is set) after the run.
+    :param documents: the number of documents of the corpus.
+    :param fingerprints: the number of fingerprints of every document.
+    :param queries: the number of measured queries.
+    :param keep: whether the seeded schema is kept after the run.
+    :param log: a function called with progress messages, if any.
+    :param scheme: the scheme of the corpus, FINGERPRINT_SCHEME from the settings if not given.
+    :return: a dictionary containing the measurements
+    """
+    scheme = scheme or default_scheme()
+    drop_schema(conn, schema)
+    create_schema(conn, schema)
+    try:
+        corpus = seed_documents(conn, schema, documents, fingerprints, log=log, scheme=scheme)
+        rng = np.random.RandomState(documents)
+        single_durations = []
+        three_durations = []
+        arrays_durations = []
+        postings_durations = []
+        found = 0
+        agreeing = 0
+        for source in rng.choice(len(corpus), size=queries, replace=queries > len(corpus)).tolist():
+            query = near_duplicate(rng, corpus[source], mask=hash_mask(scheme))
+            single_duration, single_urls = time_single_query(conn, schema, query, scheme=scheme)
+            three_duration, three_urls = time_three_queries(conn, schema, query, scheme=scheme)
+            arrays_duration, arrays_urls = time_arrays_query(conn, schema, query, scheme=scheme)
+            postings_duration, postings_urls = time_postings_query(conn, schema, query, scheme=scheme)
+            single_durations.append(single_duration)
+            three_durations.append(three_duration)
+            arrays_durations.append(arrays_duration)
+            postings_durations.append(postings_duration)
+            found += bool(single_urls) and single_urls[0] == BENCHMARK_URL.format(source)
+            agreeing += single_urls == three_urls == arrays_urls == postings_urls
+
+        single_ms = statistics.median(single_durations) * 1000
+        three_ms = statistics.median(three_durations) * 1000
+        rows_bytes, arrays_bytes, postings_bytes = storage_sizes(conn, schema)
+        return {
+            'documents': documents,
+            'scheme': scheme,
+            'queries': queries,
+            'single_query_ms': single_ms,
+            'three_queries_ms': three_ms,
+            'speedup': three_ms / single_ms if single_ms else float('inf'),
+            'arrays_query_ms': statistics.median(arrays_durations) * 1000,
+            'rows_megabytes': rows_bytes / 1e6,
+            'arrays_megabytes': arrays_bytes / 1e6,
+            'postings_query_ms': statistics.median(postings_durations) * 1000,
+            'postings_megabytes': postings_bytes / 1e6,
+            'found': found,
+            'agreeing': agreeing,
+            'postings': posting_length_distribution(conn, schema),
+        }
+    finally:
+        if not keep:
+            drop_schema(conn, schema)
@@ -0,0 +1,245 @@
+"""Benchmark suite for the fingerprinting code, used to notice when a change or a dependency bump slows ingestion down.
+It fingerprints the deterministic articles of app.benchmarks.corpus, so it runs offline, and compares the results
+with the baseline checked in next to this file.
+
+Run it with `python3 manage.py benchmark_fingerprinting` or, without a database connection,
+with `python3 -m app.benchmarks.suite` from the backend folder.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.benchmarks.corpus import article_of_size
+from app.benchmarks.fingerprinting_benchmark import ARTICLE_SIZES
+from app.plagiarism_checker.fingerprint_cache import fingerprint_cache
+from app.plagiarism_checker.fingerprinting import compute_fingerprint, compute_fingerprint_set, modified_winnow
+from app.plagiarism_checker.similarity import compute_similarity
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# A result is a regression if its throughput drops (or its peak memory grows) by more than this fraction
+DEFAULT_TOLERANCE = 0.3
+
+DEFAULT_REPETITIONS = 30
+
+# The measured functions, all taking the article text. compute_similarity compares the article with a slightly
+# longer version of itself, whose fingerprints are computed up front.
+BENCHMARKS = ('compute_fingerprint', 'compute_fingerprint_set', 'modified_winnow', 'compute_similarity')
+
+
+@contextmanager
+def cache_disabled():
+    """Disables the fingerprint cache, so every call really computes the fingerprints.
+    """
+    max_entries = fingerprint_cache.max_entries
+    fingerprint_cache.max_entries = 0
+    fingerprint_cache.clear()
+    try:
+        yield
+    finally:
+        fingerprint_cache.max_entries = max_entries
+        fingerprint_cache.clear()
+
+
+def benchmark_function(name, text):
+    """Builds the function measured by a benchmark, doing the preparation (if any) outside of the measurement.
+
+    :param name: the name of the benchmark, one of BENCHMARKS.
+    :param text: the article used by the benchmark.
+    :return: a tuple with the function without arguments and the number of fingerprints it processes per call
+    """
+    if name == 'compute_fingerprint':
+        return lambda: compute_fingerprint(text), len(compute_fingerprint(text))
+    if name == 'compute_fingerprint_set':
+        return lambda: compute_fingerprint_set(text), compute_fingerprint_set(text).count
+    if name == 'modified_winnow':
+        return lambda: modified_winnow(text), len(modified_winnow(text))
+    if name == 'compute_similarity':
+        first = compute_fingerprint_set(text)
+        second = compute_fingerprint_set(article_of_size(len(text) + 500))
+        return lambda: compute_similarity(first, second), len(first) + len(second)
+    raise ValueError(f'Unknown benchmark: {name}')
+
+
+def measure(function, repetitions):
+    """Measures a function: the median duration of a call and the peak memory allocated during a call.
+
+    :param function: the function to be measured.
+    :param repetitions: how many times the function is called for the duration.
+    :return: a tuple with the median duration in seconds and the peak memory in bytes
+    """
+    durations = []
+    for _ in range(repetitions):
+        start_time = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start_time)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return statistics.median(durations), peak_memory
+
+
+def run_suite(repetitions=DEFAULT_REPETITIONS, benchmarks=BENCHMARKS):
+    """Runs every benchmark on the short, typical and maximum-size article.
+
+    :param repetitions: how many times every function is called on every article.
+    :param benchmarks: the names of the benchmarks to run.
+    :return: a dictionary with the environment and, for every "benchmark/article" key, the measured duration,
+    throughput in MB/s and fingerprints/s, and peak memory
+    """
+    results = {}
+    with cache_disabled():
+        for name in benchmarks:
+            for article, size in ARTICLE_SIZES.items():
+                text = article_of_size(size)
+                function, fingerprints = benchmark_function(name, text)
+                duration, peak_memory = measure(function, repetitions)
+                results[f'{name}/{article}'] = {
+                    'characters': len(text),
+                    'fingerprints': fingerprints,
+                    'milliseconds': duration * 1000,
+                    'mb_per_s': len(text.encode('utf-8')) / duration / 1e6,
+                    'fingerprints_per_s': fingerprints / duration,
+                    'peak_memory_kb': peak_memory / 1024,
+                }
+
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'repetitions': repetitions,
+        'results': results,
+    }
+
+
+def compare_with_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Finds the benchmarks that got slower or use more memory than in the baseline.
+    Benchmarks missing from either side are ignored.
+
+    :param results: the output of run_suite.
+    :param baseline: the output of run_suite the results are compared with.
+    :param tolerance: the accepted relative change.
+    :return: a list of messages describing the regressions, empty if there is none
+    """
+    regressions = []
+    for key, current in results['results'].items():
+        previous = baseline.get('results', {}).get(key)
+        if previous is None:
+            continue
+
+        if current['fingerprints_per_s'] < previous['fingerprints_per_s'] * (1 - tolerance):
+            regressions.append(f"{key}: {current['fingerprints_per_s']:.0f} fingerprints/s, "
+                               f"baseline {previous['fingerprints_per_s']:.0f} fingerprints/s")
+        if current['peak_memory_kb'] > previous['peak_memory_kb'] * (1 + tolerance):
+            regressions.append(f"{key}: peak memory {current['peak_memory_kb']:.0f} KB, "
+                               f"baseline {previous['peak_memory_kb']:.0f} KB")
+    return regressions
+
+
+def save_results(results, path):
+    """Stores the results of the suite as JSON.
+
+    :param results: the output of run_suite.
+    :param path: the path of the JSON file.
+    """
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def load_results(path):
+    """Reads results of the suite stored as JSON.
+
+    :param path: the path of the JSON file.
+    :return: the stored results, or None if the file does not exist
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def add_arguments(parser):
+    """Adds the options of the suite to an argparse parser, shared by the management command and this module.
+
+    :param parser: the argparse parser.
+    """
+    parser.add_argument('--repetitions', type=int, default=DEFAULT_REPETITIONS,
+                        help='How many times every function is called on every article.')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='Where the results are stored as JSON.')
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help='The results to compare with.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='The accepted relative drop in throughput (or growth in peak memory).')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Stores the results as the new baseline instead of comparing with it.')
+
+
+def run(repetitions, output, baseline, tolerance, update_baseline, log=logging.info):
+    """Runs the suite, stores its results and compares them with the baseline.
+
+    :param repetitions: how many times every function is called on every article.
+    :param output: the path the results are stored at.
+    :param baseline: the path of the baseline.
+    :param tolerance: the accepted relative change.
+    :param update_baseline: whether the results replace the baseline.
+    :param log: the function the report is written with.
+    :return: the list of regressions
+    """
+    results = run_suite(repetitions)
+    for key, result in results['results'].items():
+        log(f"{key}: {result['milliseconds']:.3f} ms, {result['mb_per_s']:.2f} MB/s, "
+            f"{result['fingerprints_per_s']:.0f} fingerprints/s, peak memory {result['peak_memory_kb']:.0f} KB")
+
+    save_results(results, output)
+    log(f'Results stored in {output}')
+
+    if update_baseline:
+        save_results(results, baseline)
+        log(f'Baseline updated in {baseline}')
+        return []
+
+    previous = load_results(baseline)
+    if previous is None:
+        log(f'No baseline found at {baseline}')
+        return []
+
+    regressions = compare_with_baseline(results, previous, tolerance)
+    for regression in regressions:
+        log(f'Regression: {regression}')
+    return regressions
+
+
+def main(argv=None):
+    """Entry point of `python3 -m app.benchmarks.suite`.
+
+    :param argv: the command line arguments.
+    :return: the exit status, 1 if there are regressions
+    """
+    logging.getLogger().setLevel(logging.INFO)
+    parser = argparse.ArgumentParser(description='Fingerprinting benchmark suite.')
+    add_arguments(parser)
+    options = parser.parse_args(argv)
+
+    regressions = run(options.repetitions, options.output, options.baseline, options.tolerance,
+                      options.update_baseline)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
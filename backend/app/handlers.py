@@ -4,7 +4,9 @@ from abc import ABC, abstractmethod
 
 from app.models import NewsDocument
 from .plagiarism_checker.sanitizing import sanitizing_url
-from .plagiarism_checker.fingerprinting import compute_fingerprint
+from .plagiarism_checker.fingerprint_pool import compute_fingerprint_set_offloaded
+from .plagiarism_checker.budget import fingerprint_budget, sample_long_articles
+from .plagiarism_checker.schemes import default_scheme
 from .plagiarism_checker.crawling import crawl_url
 
 from django.http import HttpResponse, HttpResponseBadRequest
@@ -119,7 +121,8 @@ class ContentHandler(AbstractHandler):
     """
 
     def handle(self, content: str) -> HttpResponse:
-        """Handle method that checks if the content has at least one shingle and at most 2000 shingles.
+        """Handle method that checks if the content has at least one shingle and at most FINGERPRINT_BUDGET
+        (2000) shingles. Longer articles are sampled instead if FINGERPRINT_SAMPLE_LONG_ARTICLES is set.
 
         :param: the content to be checked at this step.
         :return: a HttpResponse with status 200 if this and next steps are successful,
@@ -130,18 +133,20 @@ class ContentHandler(AbstractHandler):
         # Do crawling on the given url
         article_text, _ = crawl_url(content)
 
-        fingerprints = compute_fingerprint(article_text)
-        only_shingle_values = [fp['shingle_hash'] for fp in fingerprints]
+        scheme = default_scheme()
+        budget = fingerprint_budget()
+        fingerprints = compute_fingerprint_set_offloaded(article_text, scheme, budget, sample_long_articles())
 
         # Verify if it has more than 2000 hashes
-        if len(only_shingle_values) > 2000:
+        if fingerprints.count > budget:
             return HttpResponseBadRequest("The article given has exceeded the maximum size supported.")
 
         # Verify if it has any fingerprints
-        if len(only_shingle_values) == 0:
+        if fingerprints.count == 0:
             return HttpResponseBadRequest("The article provided has no text.")
 
-        newsdoc = NewsDocument(url=content, fingerprints=only_shingle_values)
+        newsdoc = NewsDocument(url=content, fingerprints=fingerprints, scheme=scheme,
+                               sampling_modulus=fingerprints.modulus, text=article_text)
         newsdoc.save()
 
         return super().handle(content)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from app.sql_migrations import apply_migrations
+from utils import conn, schema
+
+
+class Command(BaseCommand):
+    help = 'Applies the SQL migrations of the news tables (urls, fingerprints, url_fingerprints) ' \
+           'which were not applied yet.'
+
+    def handle(self, *args, **options):
+        """Applies the pending SQL migrations on the schema used by the application.
+        """
+        applied = apply_migrations(conn, schema)
+        for name in applied:
+            self.stdout.write(f'Applied {name}')
+        self.stdout.write(self.style.SUCCESS(f'{len(applied)} migration(s) applied on {schema}'))
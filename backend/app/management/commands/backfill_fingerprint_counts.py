@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from utils import conn, schema
+
+
+class Command(BaseCommand):
+    help = 'Stores the number of distinct fingerprints (urls.fingerprint_count) of the documents saved before it ' \
+           'was recorded.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of documents updated in one transaction.')
+
+    def handle(self, *args, **options):
+        """Counts the fingerprints of the documents without a fingerprint_count, a batch of documents at a time,
+        so that the command can be stopped and run again at any point.
+        """
+        cur = conn.cursor()
+        updated = 0
+        try:
+            while True:
+                cur.execute(
+                    f"""
+                    UPDATE {schema}.urls u SET fingerprint_count = counts.fingerprint_count
+                    FROM (
+                        SELECT pending.id, count(DISTINCT uf.fingerprint_id) AS fingerprint_count
+                        FROM (
+                            SELECT id FROM {schema}.urls WHERE fingerprint_count IS NULL ORDER BY id LIMIT %s
+                        ) pending
+                        LEFT JOIN {schema}.url_fingerprints uf ON uf.url_id = pending.id
+                        GROUP BY pending.id
+                    ) counts
+                    WHERE u.id = counts.id
+                    """, (options['batch_size'],)
+                )
+                conn.commit()
+                if cur.rowcount == 0:
+                    break
+                updated += cur.rowcount
+                self.stdout.write(f'Updated {updated} document(s)')
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+        self.stdout.write(self.style.SUCCESS(f'Stored the fingerprint count of {updated} document(s)'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmarks.suite import add_arguments, run
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the fingerprinting code on a fixed corpus and compares the results with the checked-in ' \
+           'baseline (app/benchmarks/baseline.json).'
+
+    def add_arguments(self, parser):
+        add_arguments(parser)
+
+    def handle(self, *args, **options):
+        """Runs the benchmark suite and fails if any benchmark regressed.
+        """
+        regressions = run(options['repetitions'], options['output'], options['baseline'], options['tolerance'],
+                          options['update_baseline'], log=self.stdout.write)
+        if regressions:
+            raise CommandError(f'{len(regressions)} benchmark regression(s) found')
+        self.stdout.write(self.style.SUCCESS('No benchmark regressions'))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmarks.search_benchmark import DEFAULT_DOCUMENTS, DEFAULT_FINGERPRINTS, DEFAULT_QUERIES, \
+    POSTING_PERCENTILES, run_benchmark
+from app.plagiarism_checker.schemes import SCHEMES
+from utils import conn, schema
+
+
+class Command(BaseCommand):
+    help = 'Seeds synthetic documents in a schema of their own and compares the latency of the single ranking ' \
+           'query with the former pipeline of three queries and with the search on fingerprint arrays and ' \
+           'postings, as well as the size of the fingerprint storage layouts and the distribution of the posting ' \
+           'lengths.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', required=True,
+                            help='The schema the corpus is seeded in. It is dropped and recreated.')
+        parser.add_argument('--documents', type=int, default=DEFAULT_DOCUMENTS,
+                            help='The number of seeded documents.')
+        parser.add_argument('--fingerprints', type=int, default=DEFAULT_FINGERPRINTS,
+                            help='The number of fingerprints of every document.')
+        parser.add_argument('--queries', type=int, default=DEFAULT_QUERIES,
+                            help='The number of measured queries.')
+        parser.add_argument('--scheme', choices=SCHEMES, default=None,
+                            help='The fingerprint scheme of the corpus, FINGERPRINT_SCHEME if not given. The wide '
+                                 'scheme draws 31-bit fingerprints.')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keeps the seeded schema after the benchmark.')
+
+    def handle(self, *args, **options):
+        """Runs the search benchmark and reports the median latency of both pipelines.
+        """
+        if options['schema'] == schema:
+            raise CommandError(f'The benchmark drops its schema, it cannot run on "{schema}"')
+
+        result = run_benchmark(conn, options['schema'], options['documents'], options['fingerprints'],
+                               options['queries'], options['keep'], log=self.stdout.write, scheme=options['scheme'])
+        self.stdout.write(f"{result['documents']} documents ({result['scheme']}), {result['queries']} queries: "
+                          f"single query {result['single_query_ms']:.1f} ms, "
+                          f"three queries {result['three_queries_ms']:.1f} ms ({result['speedup']:.1f}x), "
+                          f"fingerprint arrays {result['arrays_query_ms']:.1f} ms, "
+                          f"fingerprint postings {result['postings_query_ms']:.1f} ms")
+        self.stdout.write(f"Storage: url_fingerprints {result['rows_megabytes']:.1f} MB, "
+                          f"fingerprint arrays {result['arrays_megabytes']:.1f} MB, "
+                          f"fingerprint postings {result['postings_megabytes']:.1f} MB")
+        postings = result['postings']
+        percentiles = ', '.join(f"p{percentile} {postings[f'p{percentile}']}" for percentile in POSTING_PERCENTILES)
+        self.stdout.write(f"Documents per fingerprint ({postings['fingerprints']} fingerprints): {percentiles}, "
+                          f"max {postings['max']}, mean {postings['mean']:.1f}")
+        self.stdout.write(f"Source document ranked first: {result['found']}/{result['queries']}, "
+                          f"same ranking: {result['agreeing']}/{result['queries']}")
+        if result['agreeing'] != result['queries']:
+            raise CommandError('The pipelines ranked the documents differently')
+        self.stdout.write(self.style.SUCCESS('All pipelines ranked the documents the same way'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from app.plagiarism_checker.fingerprint_arrays import DEFAULT_FILL_BATCH, create_array_index, \
+    fill_fingerprint_arrays
+from utils import conn, schema
+
+
+class Command(BaseCommand):
+    help = 'Stores the fingerprints of the documents saved without them in urls.fingerprint_array and creates the ' \
+           'GIN index of the arrays. Run it after setting FINGERPRINT_STORAGE to "arrays".'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_FILL_BATCH,
+                            help='Number of documents updated in one transaction.')
+
+    def handle(self, *args, **options):
+        """Fills the arrays a batch of documents at a time, so that the command can be stopped and run again at any
+        point, then creates the index.
+        """
+        filled = 0
+        while True:
+            batch = fill_fingerprint_arrays(conn, schema, options['batch_size'])
+            if batch == 0:
+                break
+            filled += batch
+            self.stdout.write(f'Filled {filled} document(s)')
+
+        create_array_index(conn, schema)
+        self.stdout.write(self.style.SUCCESS(f'Stored the fingerprint array of {filled} document(s)'))
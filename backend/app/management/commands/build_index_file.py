@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.plagiarism_checker.change_feed import latest_change
+from app.plagiarism_checker.index_file import index_file_path, write_index_file
+from app.plagiarism_checker.inverted_index import load_fingerprint_index
+from app.plagiarism_checker.storage import ARRAYS, fingerprint_storage
+from utils import conn, schema
+
+
+class Command(BaseCommand):
+    help = 'Writes the fingerprint index of all the stored documents to an index file, which the workers map at ' \
+           'start instead of loading the index from the database (see FINGERPRINT_INDEX_FILE).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help='Path of the index file, FINGERPRINT_INDEX_FILE by default.')
+
+    def handle(self, *args, **options):
+        """Loads the documents stored up to now and writes them to the index file. The file replaces the previous
+        one at once: workers started afterwards, and the change feed of the running ones, map it and apply the
+        documents stored or deleted meanwhile.
+        """
+        path = options['output'] or index_file_path()
+        if path is None:
+            raise CommandError('Give the path of the index file with --output or FINGERPRINT_INDEX_FILE')
+
+        # Read first, the changes made while the documents are loaded are applied again when the file is mapped
+        last_change = latest_change(conn, schema) or 0
+        cur = conn.cursor()
+        try:
+            cur.execute(f"SELECT coalesce(max(id), 0) FROM {schema}.urls")
+            last_url_id = cur.fetchone()[0]
+            conn.commit()
+        finally:
+            cur.close()
+
+        index = load_fingerprint_index(conn, schema, fingerprint_storage() == ARRAYS, until_id=last_url_id)
+        size = write_index_file(index, path, last_url_id, last_change)
+        self.stdout.write(self.style.SUCCESS(f'{len(index)} document(s) written to {path} '
+                                             f'({size / 2 ** 20:.1f} MB)'))
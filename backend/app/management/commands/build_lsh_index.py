@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from psycopg2 import extras
+
+from app.plagiarism_checker.minhash import band_keys, lsh_configuration, minhash_signature
+from utils import conn, schema
+
+
+class Command(BaseCommand):
+    help = 'Computes the MinHash signatures and LSH band keys (url_minhash and lsh_bands tables) of the stored ' \
+           'documents which do not have them yet, or of all documents with --rebuild.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recomputes every document, e.g. after changing MINHASH_BANDS or MINHASH_ROWS.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of documents committed at once.')
+
+    def handle(self, *args, **options):
+        """Fills in the LSH tables from the fingerprints stored in url_fingerprints, a batch of documents at a time.
+        """
+        bands, rows = lsh_configuration()
+        cur = conn.cursor()
+        try:
+            if options['rebuild']:
+                cur.execute(f"TRUNCATE {schema}.lsh_bands, {schema}.url_minhash")
+                conn.commit()
+
+            indexed = 0
+            while True:
+                cur.execute(
+                    f"""
+                    SELECT u.id, array_agg(uf.fingerprint_id)
+                    FROM {schema}.urls u
+                    JOIN {schema}.url_fingerprints uf ON u.id = uf.url_id
+                    WHERE NOT EXISTS (SELECT 1 FROM {schema}.url_minhash m WHERE m.url_id = u.id)
+                    GROUP BY u.id
+                    ORDER BY u.id
+                    LIMIT %s
+                    """, (options['batch_size'],)
+                )
+                documents = cur.fetchall()
+                if not documents:
+                    break
+
+                signatures = []
+                keys = []
+                for doc_id, fingerprints in documents:
+                    signature = minhash_signature(fingerprints, bands * rows)
+                    signatures.append((doc_id, signature.tolist()))
+                    keys.extend((key, doc_id) for key in band_keys(signature, bands, rows))
+
+                extras.execute_batch(cur, f"INSERT INTO {schema}.url_minhash (url_id, signature) VALUES (%s, %s)",
+                                     signatures)
+                extras.execute_batch(cur, f"""INSERT INTO {schema}.lsh_bands (band_key, url_id)
+                VALUES (%s, %s) ON CONFLICT DO NOTHING""", keys)
+                conn.commit()
+
+                indexed += len(documents)
+                self.stdout.write(f'Indexed {indexed} document(s)')
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+        self.stdout.write(self.style.SUCCESS(f'{indexed} document(s) indexed with {bands} bands of {rows} rows'))
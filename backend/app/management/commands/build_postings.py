@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from app.plagiarism_checker.posting_table import append_postings, compact_postings
+from utils import conn, schema
+
+
+class Command(BaseCommand):
+    help = 'Appends the stored documents which are not in the fingerprint_postings table yet, then merges the ' \
+           'segments of every fingerprint. Run it periodically when FINGERPRINT_STORAGE is "postings".'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Empties the table and appends every document again.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of documents appended in one transaction.')
+        parser.add_argument('--no-compact', action='store_true',
+                            help='Only appends the waiting documents, without merging the segments.')
+
+    def handle(self, *args, **options):
+        """Appends the waiting documents a batch at a time, so that the command can be stopped and run again at any
+        point, then compacts the table.
+        """
+        if options['rebuild']:
+            cur = conn.cursor()
+            try:
+                cur.execute(f"TRUNCATE {schema}.fingerprint_postings")
+                cur.execute(f"UPDATE {schema}.urls SET postings_appended = false WHERE postings_appended")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+
+        appended = 0
+        while True:
+            batch = append_postings(conn, schema, options['batch_size'])
+            if batch == 0:
+                break
+            appended += batch
+            self.stdout.write(f'Appended {appended} document(s)')
+
+        compacted = 0 if options['no_compact'] else compact_postings(conn, schema)
+        self.stdout.write(self.style.SUCCESS(f'{appended} document(s) appended, the segments of {compacted} '
+                                             f'fingerprint(s) merged'))
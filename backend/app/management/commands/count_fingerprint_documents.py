@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from utils import conn, schema
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the number of documents having every fingerprint (fingerprints.document_count), which the ' \
+           'threshold search uses to pick the rarest fingerprints of a query. Run it after setting ' \
+           'SIMILARITY_THRESHOLD, as the counts are not kept while it is not set.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=65536,
+                            help='Number of consecutive fingerprint values updated in one transaction.')
+
+    def handle(self, *args, **options):
+        """Counts the documents of every fingerprint from url_fingerprints, a range of fingerprint values at a time,
+        so that the command can be stopped and run again at any point.
+        """
+        cur = conn.cursor()
+        updated = 0
+        try:
+            start = 0
+            while True:
+                # Ranges without fingerprints are skipped, fingerprints of the wide scheme are sparse over 31 bits
+                cur.execute(f"SELECT min(fingerprint) FROM {schema}.fingerprints WHERE fingerprint >= %s", (start,))
+                start = cur.fetchone()[0]
+                conn.commit()
+                if start is None:
+                    break
+                cur.execute(
+                    f"""
+                    UPDATE {schema}.fingerprints f SET document_count = counts.document_count
+                    FROM (
+                        SELECT f.fingerprint, count(uf.url_id) AS document_count
+                        FROM {schema}.fingerprints f
+                        LEFT JOIN {schema}.url_fingerprints uf ON uf.fingerprint_id = f.fingerprint
+                        WHERE f.fingerprint >= %(start)s AND f.fingerprint < %(end)s
+                        GROUP BY f.fingerprint
+                    ) counts
+                    WHERE f.fingerprint = counts.fingerprint AND f.document_count <> counts.document_count
+                    """, {'start': start, 'end': start + options['batch_size']}
+                )
+                conn.commit()
+                updated += cur.rowcount
+                start += options['batch_size']
+                self.stdout.write(f'Counted the fingerprints up to {start}')
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+        self.stdout.write(self.style.SUCCESS(f'Updated the document count of {updated} fingerprint(s)'))
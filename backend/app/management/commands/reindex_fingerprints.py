@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.plagiarism_checker.reindex import DEFAULT_BATCH_SIZE, discard_reindex, reindex, reindex_state, \
+    retired_schema
+from app.plagiarism_checker.schemes import SCHEMES
+from utils import conn, schema
+
+
+class Command(BaseCommand):
+    help = 'Fingerprints every stored document again from its kept text into a shadow copy of the fingerprint ' \
+           'tables, while the search keeps using the current ones, then switches to the new tables at once. Run ' \
+           'it after changing the fingerprinting (k-gram length, window or hash). Stopped runs are resumed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scheme', choices=SCHEMES, default=None,
+                            help='The scheme the documents are fingerprinted with, FINGERPRINT_SCHEME if not given.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Number of documents fingerprinted and written in one transaction.')
+        parser.add_argument('--crawl-missing', action='store_true',
+                            help='Crawls again the articles whose text was not kept (stored before article_texts).')
+        parser.add_argument('--no-cutover', action='store_true',
+                            help='Only fills the shadow tables, a later run switches to them.')
+        parser.add_argument('--status', action='store_true',
+                            help='Shows the progress of the reindex in progress, without reindexing.')
+        parser.add_argument('--discard', action='store_true',
+                            help='Drops the reindex in progress and everything it wrote.')
+
+    def handle(self, *args, **options):
+        """Reindexes the stored documents a batch at a time, reporting the progress and throughput after every
+        batch, so that the command can be stopped and run again at any point.
+        """
+        state = reindex_state(conn, schema)
+        if options['discard']:
+            discard_reindex(conn, schema)
+            self.stdout.write(self.style.SUCCESS('Discarded the reindex in progress' if state else
+                                                 'No reindex in progress'))
+            return
+        if options['status']:
+            if state is None:
+                self.stdout.write('No reindex in progress')
+            else:
+                self.stdout.write(f"Reindex to \"{state['scheme']}\" started at {state['started_at']}: "
+                                  f"{state['reindexed']} document(s) reindexed, {state['failed']} failed, up to "
+                                  f"document {state['last_url_id']}")
+            return
+
+        try:
+            result = reindex(conn, schema, options['scheme'], options['batch_size'], options['crawl_missing'],
+                             not options['no_cutover'], log=self.stdout.write)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if not result['swapped']:
+            self.stdout.write(self.style.SUCCESS(f"{result['reindexed']} document(s) reindexed with "
+                                                 f"\"{result['scheme']}\" ({result['failed']} failed), run the "
+                                                 f"command again to switch to them"))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Switched to {result['reindexed']} document(s) reindexed with "
+                                             f"\"{result['scheme']}\" ({result['failed']} failed, listed in "
+                                             f"{retired_schema(schema)}.reindex_failures)"))
+        self.stdout.write('Set FINGERPRINT_SCHEME to this scheme if needed, restart the workers, rebuild the index '
+                          'file and run build_postings, since their fingerprints are the replaced ones.')
@@ -1,19 +1,52 @@
 import psycopg2
 from utils import conn
 from utils import existing_fps
+from utils import loaded_fingerprint_index
 from utils import schema
 from django.db import models
-from psycopg2 import extras
+from psycopg2 import extras, extensions
+from app.plagiarism_checker.fingerprint_set import FingerprintSet, as_fingerprint_set
+from app.plagiarism_checker.minhash import band_keys, lsh_candidates_enabled, lsh_configuration, minhash_signature
+from app.plagiarism_checker.posting_table import append_batch_size, append_postings
+from app.plagiarism_checker.reindex import article_texts_enabled
+from app.plagiarism_checker.schemes import default_scheme, validate_scheme
+from app.plagiarism_checker.storage import ARRAYS, POSTINGS, fingerprint_storage
+from app.plagiarism_checker.threshold import similarity_threshold
+
+
+def adapt_fingerprint_set(fingerprints):
+    """Binds a FingerprintSet as a SQL parameter, in the same way as a tuple (e.g. for "IN %s").
+
+    :param fingerprints: the FingerprintSet to be bound
+    :return: the psycopg2 adapter of the distinct hashes
+    """
+    return extensions.adapt(tuple(fingerprints.tolist()))
+
+
+extensions.register_adapter(FingerprintSet, adapt_fingerprint_set)
 
 class NewsDocument(models.Model):
-    def __init__(self, url, fingerprints):
+    def __init__(self, url, fingerprints, scheme=None, sampling_modulus=1, text=None):
         """The constructor for the NewsDocument model.
 
         :param url: the URL of the news article
-        :param fingerprints: the article's fingerprints
+        :param fingerprints: the article's fingerprints, a FingerprintSet or a list of hashes
+        :param scheme: the scheme the fingerprints were computed with, FINGERPRINT_SCHEME from the settings if not given
+        :param sampling_modulus: only the fingerprints divisible by it are stored (1 if the article is not sampled)
+        :param text: the text of the article, kept so that it can be fingerprinted again (None if not known)
         """
         self.url = url
         self.fingerprints = fingerprints
+        self.scheme = validate_scheme(scheme if scheme is not None else default_scheme())
+        self.sampling_modulus = sampling_modulus
+        self.text = text
+
+    def fingerprint_count(self):
+        """Counts the distinct fingerprints of the document, i.e. the size of its fingerprint set.
+
+        :return: the number of distinct fingerprints
+        """
+        return len(as_fingerprint_set(self.fingerprints))
 
     def save(self):
         """This method saves a NewsDocument in the database.
@@ -22,11 +55,23 @@ class NewsDocument(models.Model):
         """
         cur = conn.cursor(cursor_factory=extras.DictCursor)
         try:
+            new_fingerprints = []
             doc_id = self.insert_url(cur)
             if doc_id:
-                self.insert_fingerprints(cur)
+                new_fingerprints = self.insert_fingerprints(cur)
                 self.insert_url_fingerprints(cur, doc_id)
+                self.increment_document_counts(cur)
+                self.insert_minhash(cur, doc_id)
+                self.insert_article_text(cur, doc_id)
             conn.commit()
+            # Only committed fingerprints are marked as stored, as the next documents skip inserting them
+            existing_fps.update(new_fingerprints)
+            index = loaded_fingerprint_index()
+            if doc_id and index is not None:
+                index.add(self.url, self.fingerprints, self.scheme, self.sampling_modulus)
+            if doc_id and fingerprint_storage() == POSTINGS:
+                # The documents waiting to be appended are searched on url_fingerprints until a batch is full
+                append_postings(conn, schema, minimum=append_batch_size())
         except psycopg2.Error as e:
             print(f"Could not insert data: {e}")
             conn.rollback()
@@ -34,17 +79,21 @@ class NewsDocument(models.Model):
             cur.close()
 
     def insert_url(self, cur):
-        """Inserts the URL into the "urls" table and retrieves its ID.
+        """Inserts the URL, tagged with its fingerprint scheme, sampling modulus and number of distinct
+        fingerprints, into the "urls" table and retrieves its ID. With the "arrays" fingerprint storage, the sorted
+        fingerprints are stored in the same row.
 
         :param cur: the database cursor
         :return: the ID of the inserted URL if successful, None otherwise
         """
         cur.execute(
             f"""
-            INSERT INTO {schema}.urls (url) VALUES (%s) 
+            INSERT INTO {schema}.urls (url, scheme, sampling_modulus, fingerprint_count, fingerprint_array)
+            VALUES (%s, %s, %s, %s, %s)
             ON CONFLICT (url) DO NOTHING
             RETURNING id
-            """, (self.url,)
+            """, (self.url, self.scheme, self.sampling_modulus, self.fingerprint_count(),
+                  as_fingerprint_set(self.fingerprints).tolist() if fingerprint_storage() == ARRAYS else None)
         )
         doc = cur.fetchone()
         if doc:
@@ -52,11 +101,13 @@ class NewsDocument(models.Model):
         return None
 
     def insert_fingerprints(self, cur):
-        """Inserts new fingerprints into the "fingerprints" table if they don't already exist.
+        """Inserts new fingerprints into the "fingerprints" table if they don't already exist, according to the
+        fingerprint presence bitmap. They are added to the bitmap once the document is committed, see save.
 
         :param cur: the database cursor
+        :return: the list of the inserted fingerprints
         """
-        new_fingerprints = [(fp,) for fp in self.fingerprints if fp not in existing_fps]
+        new_fingerprints = [(fp,) for fp in existing_fps.missing(as_fingerprint_set(self.fingerprints).hashes).tolist()]
         if new_fingerprints:
             chunk_size = 1000
             chunks = [new_fingerprints[i:i + chunk_size] for i in range(0, len(new_fingerprints), chunk_size)]
@@ -64,7 +115,7 @@ class NewsDocument(models.Model):
             insert_query = f"""INSERT INTO {schema}.fingerprints (fingerprint) 
             VALUES (%s) ON CONFLICT (fingerprint) DO NOTHING"""
             extras.execute_batch(cur, insert_query, [(f,) for chunk in chunks for f in chunk])
-            existing_fps.update(fp for fp, in new_fingerprints)
+        return [fp for fp, in new_fingerprints]
 
     def insert_url_fingerprints(self, cur, doc_id):
         """Inserts the document's URL-fingerprint pairs into the "url_fingerprints" table.
@@ -80,3 +131,59 @@ class NewsDocument(models.Model):
         VALUES (%s, %s) ON CONFLICT DO NOTHING"""
         extras.execute_batch(cur, insert_query, [(doc_id, fingerprint_id) for chunk in chunks
                                                  for (doc_id, fingerprint_id) in chunk])
+
+    def increment_document_counts(self, cur):
+        """Counts the new document in the "document_count" of its fingerprints, which the threshold search uses to
+        find the rarest fingerprints of a query. Nothing is counted if SIMILARITY_THRESHOLD is not set, as the counts
+        are not read then: `count_fingerprint_documents` counts the documents stored meanwhile when it is set.
+
+        :param cur: the database cursor
+        """
+        if similarity_threshold() is None:
+            return
+        cur.execute(
+            f"""
+            UPDATE {schema}.fingerprints SET document_count = document_count + 1
+            WHERE fingerprint = ANY(%s)
+            """, (as_fingerprint_set(self.fingerprints).tolist(),)
+        )
+
+    def insert_minhash(self, cur, doc_id):
+        """Inserts the document's MinHash signature into the "url_minhash" table and its LSH band keys into the
+        "lsh_bands" table, which are used for finding candidate documents without looking at every fingerprint.
+        Nothing is stored if MINHASH_CANDIDATES is disabled: `build_lsh_index` indexes the documents stored
+        meanwhile when it is enabled.
+
+        :param cur: the database cursor
+        :param doc_id: the ID of the document
+        """
+        if not lsh_candidates_enabled():
+            return
+        bands, rows = lsh_configuration()
+        signature = minhash_signature(as_fingerprint_set(self.fingerprints), bands * rows)
+        cur.execute(
+            f"""
+            INSERT INTO {schema}.url_minhash (url_id, signature) VALUES (%s, %s)
+            ON CONFLICT (url_id) DO UPDATE SET signature = EXCLUDED.signature
+            """, (doc_id, signature.tolist())
+        )
+        insert_query = f"""INSERT INTO {schema}.lsh_bands (band_key, url_id)
+        VALUES (%s, %s) ON CONFLICT DO NOTHING"""
+        extras.execute_batch(cur, insert_query, [(key, doc_id) for key in band_keys(signature, bands, rows)])
+
+    def insert_article_text(self, cur, doc_id):
+        """Inserts the text of the article into the "article_texts" table, which `reindex_fingerprints` derives the
+        fingerprints from again when the fingerprinting changes. Nothing is stored if the text is not known or
+        ARTICLE_TEXTS is disabled.
+
+        :param cur: the database cursor
+        :param doc_id: the ID of the document
+        """
+        if self.text is None or not article_texts_enabled():
+            return
+        cur.execute(
+            f"""
+            INSERT INTO {schema}.article_texts (url_id, text) VALUES (%s, %s)
+            ON CONFLICT (url_id) DO UPDATE SET text = EXCLUDED.text
+            """, (doc_id, self.text)
+        )
@@ -18,7 +18,10 @@ import time
 from newsplease import NewsPlease as NewsPlease
 from app.models import NewsDocument
 from app.plagiarism_checker.crawling import crawl_url
-from app.plagiarism_checker.fingerprinting import compute_fingerprint
+from app.plagiarism_checker.fingerprinting import compute_fingerprint_set
+from app.plagiarism_checker.fingerprint_pool import compute_fingerprint_sets_batch, batch_statistics
+from app.plagiarism_checker.budget import fingerprint_budget, sample_long_articles
+from app.plagiarism_checker.schemes import default_scheme
 import signal
 
 
@@ -28,6 +31,10 @@ class TimeoutException(Exception):
     pass
 
 
+# Number of crawled articles that are fingerprinted together in the process pool
+BATCH_SIZE = 64
+
+
 def timeout_handler(signum, frame):
     raise TimeoutException()
 
@@ -50,6 +57,50 @@ def read_urls_from_file(filepath):
     return urls
 
 
+def crawl_article(url):
+    """Crawls the news article from the given URL, if it is written in English.
+
+    :param url: The URL of the news article to crawl.
+    :return: The text of the article, or None if the article is not in English or has no text.
+    """
+
+    article = NewsPlease.from_url(url)
+    if hasattr(article, 'language') and article.language == 'en':
+        article_text, _ = crawl_url(url)
+        return article_text
+
+    elif hasattr(article, 'language'):
+        logging.info('Article found, but it is not written in EN')
+    return None
+
+
+def persist_article(url, fps, scheme, text=None):
+    """Saves a fingerprinted news article to the database, if it has at least one and at most FINGERPRINT_BUDGET
+    (2000) fingerprints.
+
+    :param url: The URL of the news article.
+    :param fps: The FingerprintSet of the article, as computed by compute_fingerprint_set.
+    :param scheme: The scheme the fingerprints were computed with.
+    :param text: The text of the news article, kept for fingerprinting it again later.
+    :return: A tuple containing the URL and a boolean
+    indicating whether the article was successfully persisted to the database.
+    """
+
+    # verify if it has more than 2000 hashes
+    if fps.count > fingerprint_budget():
+        return url, False
+
+    # verify if it has any fingerprints
+    if fps.count == 0:
+        return url, False
+    # try:
+    newsdoc = NewsDocument(url=url, fingerprints=fps, scheme=scheme, sampling_modulus=fps.modulus, text=text)
+    newsdoc.save()
+    # except:
+    #     logging.warning("encountered another error")
+    return url, True
+
+
 def process_article(url):
     """Processes a single news article from the given URL.
     Crawls the article to retrieve its text and published date, computes its fingerprint, and saves it to the database.
@@ -59,40 +110,58 @@ def process_article(url):
     indicating whether the article was successfully persisted to the database.
     """
 
-    article = NewsPlease.from_url(url)
-    if hasattr(article, 'language') and article.language == 'en':
-        article_text, _ = crawl_url(url)
-        fps = compute_fingerprint(article_text)
-        only_shingle_values = [i['shingle_hash'] for i in fps]
-
-        # verify if it has more than 2000 hashes
-        if len(only_shingle_values) > 2000:
-            return url, False
-
-        # verify if it has any fingerprints
-        if len(only_shingle_values) == 0:
-            return url, False
-        # try:
-        newsdoc = NewsDocument(url=url, fingerprints=only_shingle_values)
-        newsdoc.save()
-        # except:
-        #     logging.warning("encountered another error")
-        return url, True
+    article_text = crawl_article(url)
+    if article_text is None:
+        return url, False
 
-    elif hasattr(article, 'language'):
-        logging.info('Article found, but it is not written in EN')
-    return url, False
+    scheme = default_scheme()
+    fps = compute_fingerprint_set(article_text, scheme, fingerprint_budget(), sample_long_articles())
+    return persist_article(url, fps, scheme, article_text)
+
+
+def persist_batch(batch):
+    """Fingerprints a batch of crawled articles at once, using all the cores, and saves them to the database.
+    If the batch cannot be fingerprinted in the process pool, the articles are fingerprinted one by one instead.
+
+    :param batch: A list of (URL, article text) pairs.
+    :return: The list of URLs that were successfully persisted to the database.
+    """
+
+    scheme = default_scheme()
+    budget = fingerprint_budget()
+    sample = sample_long_articles()
+    try:
+        fingerprints = compute_fingerprint_sets_batch([text for _, text in batch], scheme, budget, sample)
+    except Exception as e:
+        logging.warning('Could not fingerprint the batch in the process pool, the error is %s', str(e))
+        fingerprints = [None] * len(batch)
+
+    articles = []
+    for (url, text), fps in zip(batch, fingerprints):
+        try:
+            if fps is None:
+                fps = compute_fingerprint_set(text, scheme, budget, sample)
+            url, persisted = persist_article(url, fps, scheme, text)
+            if persisted:
+                articles.append(url)
+                logging.info(f'Article w/ URL: {url} appended')
+        except Exception as e:
+            logging.warning(f'Another error occured for: {url}, the error is %s', str(e))
+    return articles
 
 
-def process_urls(urls):
+def process_urls(urls, batch_size=BATCH_SIZE):
     """Processes a list of news article URLs.
-    Calls process_article on each URL, and appends successfully persisted URLs to the articles list.
+    The articles are crawled one by one, but fingerprinted and persisted in batches of batch_size articles.
+    The successfully persisted URLs are appended to the articles list.
 
     :param urls: A list of news article URLs to process.
+    :param batch_size: The number of crawled articles that are fingerprinted together.
     :return: A tuple containing the number of URLs processed and the list of successfully persisted articles.
     """
 
     articles = []
+    batch = []
     urls_seen = 0
     for url_id, url in enumerate(urls):
         logging.info(f'You are currently seeing URL_ID {url_id} being crawled.')
@@ -100,16 +169,23 @@ def process_urls(urls):
         signal.signal(signal.SIGALRM, timeout_handler)
         signal.alarm(10)  # 10 seconds timeout
         try:
-            url, persisted = process_article(url)
+            article_text = crawl_article(url)
             signal.alarm(0)  # cancel the timeout
-            if persisted:
-                articles.append(url)
-                logging.info(f'Article w/ URL: {url} appended')
+            if article_text is not None:
+                batch.append((url, article_text))
         except TimeoutException:
             logging.warning(f'Timeout occurred while processing article: {url}')
         except Exception as e:
+            signal.alarm(0)  # cancel the timeout
             logging.warning(f'Another error occured for: {url}, the error is %s', str(e))
 
+        if len(batch) >= batch_size:
+            articles.extend(persist_batch(batch))
+            batch = []
+
+    if batch:
+        articles.extend(persist_batch(batch))
+
     return urls_seen, articles
 
 
@@ -124,6 +200,8 @@ def main():
     end_time = time.time()
     duration = end_time - start_time
     logging.info(f'It took me {duration} seconds to process {urls_seen} articles')
+    logging.info(f'Fingerprinting ran at {batch_statistics.texts_per_second():.1f} articles/s '
+                 f'({batch_statistics.megabytes_per_second():.2f} MB/s)')
     logging.info(f'There were {len(articles)} articles that were persisted in the DB')
 
 
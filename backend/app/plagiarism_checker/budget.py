@@ -0,0 +1,94 @@
+import numpy as np
+
+from .config import get_setting
+from .schemes import HASH_MASK
+from .streaming import StreamingWinnower
+
+# Default of FINGERPRINT_BUDGET: documents with more fingerprints are not stored and queries are rejected
+DEFAULT_BUDGET = 2000
+
+# Number of characters winnowed at once when a text is fingerprinted within a budget
+BUDGET_CHUNK_SIZE = 4096
+
+
+def fingerprint_budget():
+    """Returns the maximum number of fingerprints of a document or query, set by FINGERPRINT_BUDGET.
+
+    :return: the budget in fingerprints
+    """
+    return get_setting('FINGERPRINT_BUDGET', DEFAULT_BUDGET)
+
+
+def sample_long_articles():
+    """Returns whether articles over the budget are sampled instead of rejected, set by
+    FINGERPRINT_SAMPLE_LONG_ARTICLES.
+
+    :return: True if long articles are sampled
+    """
+    return get_setting('FINGERPRINT_SAMPLE_LONG_ARTICLES', False)
+
+
+def reduce_to_budget(hashes, modulus, budget, sample):
+    """Doubles the sampling modulus until the fingerprints divisible by it fit in the budget (if sampling).
+
+    :param hashes: the hashes of the fingerprints kept so far, all divisible by the modulus.
+    :param modulus: the current sampling modulus.
+    :param budget: the maximum number of fingerprints.
+    :param sample: whether the fingerprints are sampled.
+    :return: a tuple with the kept hashes and the new sampling modulus
+    """
+    while sample and len(hashes) > budget and modulus <= HASH_MASK:
+        modulus *= 2
+        hashes = [shingle_hash for shingle_hash in hashes if shingle_hash % modulus == 0]
+    return hashes, modulus
+
+
+def apply_budget(hashes, budget, sample=False):
+    """Applies a budget to fingerprints that are already computed (e.g. found in the cache).
+    If there are more fingerprints than the budget, either the first budget + 1 are kept, which marks the text as
+    over the budget, or only the fingerprints divisible by the smallest power of two that brings them within
+    the budget.
+
+    :param hashes: the hashes of all the fingerprints of the text.
+    :param budget: the maximum number of fingerprints.
+    :param sample: whether the fingerprints are sampled instead of cut.
+    :return: a tuple with the kept hashes, the number of fingerprints (budget + 1 if the budget was exceeded)
+    and the sampling modulus
+    """
+    hashes, modulus = reduce_to_budget(np.asarray(hashes, dtype=np.int64).tolist(), 1, budget, sample)
+    if not sample and len(hashes) > budget:
+        return hashes[:budget + 1], budget + 1, 1
+    return hashes, len(hashes), modulus
+
+
+def winnow_within_budget(article_text, budget, scheme, sample=False, chunk_size=BUDGET_CHUNK_SIZE):
+    """Winnows a text chunk by chunk, so that the work is bounded by the budget rather than by the size of the text.
+    Without sampling, winnowing stops as soon as the text has more fingerprints than the budget.
+    With sampling, only the fingerprints divisible by the sampling modulus are kept, and the modulus is doubled
+    every time they exceed the budget. Since the modulus is a power of two, the result is the same as sampling
+    all the fingerprints of the text with the final modulus.
+
+    :param article_text: the text of the document to compute the fingerprint for.
+    :param budget: the maximum number of fingerprints.
+    :param scheme: the fingerprint scheme to be used.
+    :param sample: whether long texts are sampled instead of cut.
+    :param chunk_size: the number of characters winnowed at once.
+    :return: a tuple with the kept hashes, the number of fingerprints (budget + 1 if the budget was exceeded)
+    and the sampling modulus
+    """
+    winnower = StreamingWinnower(scheme=scheme)
+
+    def chunk_fingerprints():
+        for start in range(0, len(article_text), chunk_size):
+            yield winnower.feed(article_text[start:start + chunk_size])
+        yield winnower.finish()
+
+    hashes = []
+    modulus = 1
+    for fingerprints in chunk_fingerprints():
+        hashes.extend(shingle_hash for _, shingle_hash in fingerprints if shingle_hash % modulus == 0)
+        hashes, modulus = reduce_to_budget(hashes, modulus, budget, sample)
+        if not sample and len(hashes) > budget:
+            return hashes[:budget + 1], budget + 1, 1
+
+    return hashes, len(hashes), modulus
@@ -0,0 +1,367 @@
+import logging
+import os
+import select
+import threading
+import time
+
+from psycopg2 import errors
+
+from .config import get_setting
+from .index_file import MappedIndex, index_file_path
+from .inverted_index import load_fingerprint_index
+
+# Channel the index_changes trigger notifies on (see sql_migrations/0008_index_changes.sql)
+CHANGES_CHANNEL = 'index_changes'
+
+# Operations of the index_changes table
+ADDED = 'add'
+REMOVED = 'remove'
+# Recorded by a reindex when it switches to the rebuilt fingerprint tables (see sql_migrations/0011)
+REINDEXED = 'reindex'
+
+DEFAULT_POLL_INTERVAL = 5
+DEFAULT_COMPACTION_INTERVAL = 300
+DEFAULT_RETENTION_DAYS = 7
+
+# Change ids are taken when a document is inserted, but the changes become visible when it is committed, so a change
+# may appear after later ones. The last CHANGE_WINDOW ids are read again on every poll, skipping the applied ones.
+CHANGE_WINDOW = 1000
+
+# Number of changes read (with the fingerprints of the added documents) at once
+CHANGES_BATCH = 1000
+
+
+def change_feed_enabled():
+    """Returns whether every worker applies the documents stored or deleted by the other workers to its index, set
+    by INDEX_CHANGE_FEED.
+
+    :return: True if the change feed is started with the worker
+    """
+    return get_setting('INDEX_CHANGE_FEED', True)
+
+
+def poll_interval():
+    """Returns the longest time between two reads of the change feed, set by INDEX_CHANGES_POLL_INTERVAL. Changes are
+    usually applied as soon as they are notified, polling only catches the lost notifications.
+
+    :return: the interval in seconds
+    """
+    return get_setting('INDEX_CHANGES_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+
+
+def compaction_interval():
+    """Returns the time between two compactions of the index of a worker, set by INDEX_COMPACTION_INTERVAL.
+
+    :return: the interval in seconds
+    """
+    return get_setting('INDEX_COMPACTION_INTERVAL', DEFAULT_COMPACTION_INTERVAL)
+
+
+def retention_days():
+    """Returns how long the changes are kept in the index_changes table, set by INDEX_CHANGES_RETENTION_DAYS. An
+    index file has to be rebuilt more often, since the changes made after it was written are applied when it is
+    mapped.
+
+    :return: the number of days
+    """
+    return get_setting('INDEX_CHANGES_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+
+
+def latest_change(conn, schema):
+    """Returns the id of the last change of the index_changes table.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :return: the id, 0 if there is no change, None if the table does not exist (before migration 0008)
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT coalesce(max(id), 0) FROM {schema}.index_changes")
+        return cur.fetchone()[0]
+    except errors.UndefinedTable:
+        conn.rollback()
+        return None
+    finally:
+        conn.commit()
+        cur.close()
+
+
+def unseen_changes(conn, schema, after_change):
+    """Lists the ids of the changes made after the given one.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :param after_change: the id of the last change which is not listed.
+    :return: the ascending list of ids
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT id FROM {schema}.index_changes WHERE id > %s ORDER BY id", (after_change,))
+        return [change_id for change_id, in cur.fetchall()]
+    finally:
+        conn.commit()
+        cur.close()
+
+
+def read_changes(conn, schema, change_ids, arrays=False):
+    """Reads changes with the scheme, sampling modulus and fingerprints of the added documents, as they are now:
+    the document of an added change deleted since has none.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :param change_ids: the ids of the changes.
+    :param arrays: whether the fingerprints are read from the fingerprint arrays of the documents.
+    :return: a list of (id, operation, url, scheme, sampling modulus, fingerprints) tuples, in the order of the ids
+    """
+    fingerprints = "u.fingerprint_array" if arrays else \
+        f"(SELECT array_agg(uf.fingerprint_id) FROM {schema}.url_fingerprints uf WHERE uf.url_id = u.id)"
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            SELECT c.id, c.operation, c.url, u.scheme, u.sampling_modulus, {fingerprints}
+            FROM {schema}.index_changes c
+            LEFT JOIN {schema}.urls u ON u.id = c.url_id AND c.operation = '{ADDED}'
+            WHERE c.id = ANY(%s)
+            ORDER BY c.id
+            """, (list(change_ids),)
+        )
+        return cur.fetchall()
+    finally:
+        conn.commit()
+        cur.close()
+
+
+def prune_changes(conn, schema, days):
+    """Deletes the changes older than the given number of days.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :param days: the number of days the changes are kept.
+    :return: the number of deleted changes
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DELETE FROM {schema}.index_changes WHERE changed_at < now() - %s * interval '1 day'", (days,))
+        deleted = cur.rowcount
+        conn.commit()
+        return deleted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def record_reindex(cur, schema):
+    """Records the cutover of a reindex in the transaction which makes the rebuilt fingerprint tables live, so that
+    every worker loads its index and its bitmap of the stored fingerprints again once it is committed. Nothing is
+    recorded before migration 0008, as there is no change feed then.
+
+    :param cur: a cursor in the transaction of the cutover.
+    :param schema: the schema containing the news tables.
+    """
+    cur.execute("SELECT to_regclass(%s)", (f'{schema}.index_changes',))
+    if cur.fetchone()[0] is None:
+        return
+    cur.execute(f"INSERT INTO {schema}.index_changes (url_id, url, operation) VALUES (0, '', %s)", (REINDEXED,))
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANGES_CHANNEL, schema))
+
+
+def apply_change(index, operation, url, scheme, modulus, fingerprints):
+    """Applies a change to an index. Adding an indexed document or removing a missing one does nothing, so changes
+    can be applied more than once, as long as they are applied in order.
+
+    :param index: the InvertedIndex or MappedIndex.
+    :param operation: ADDED or REMOVED.
+    :param url: the URL of the document.
+    :param scheme: the scheme of an added document, None if it was deleted since.
+    :param modulus: the sampling modulus of an added document.
+    :param fingerprints: the fingerprints of an added document.
+    :return: True if the index changed
+    """
+    if operation == REMOVED:
+        return index.remove(url)
+    if scheme is None or not fingerprints:
+        return False
+    return index.add(url, fingerprints, scheme, modulus)
+
+
+class ChangeFeed:
+    """Keeps the index of a worker up to date with the documents stored or deleted by the other workers, from the
+    index_changes table. A background thread listens on CHANGES_CHANNEL and applies the changes as soon as they are
+    notified, or every poll_interval() seconds if a notification is lost. Every compaction_interval() seconds, it
+    also compresses the postings added to the index and, for a MappedIndex, maps the index file again once it was
+    rebuilt, which merges the documents added since into the mapped base. After a reindex, the index is loaded
+    again from the rebuilt tables.
+    """
+
+    def __init__(self, index, connect, schema, arrays=False, last_change=0, fingerprints=None, replace=None):
+        """The constructor for the ChangeFeed.
+
+        :param index: the InvertedIndex or MappedIndex of the worker.
+        :param connect: a function opening a new connection to the database, used by the thread only.
+        :param schema: the schema containing the news tables.
+        :param arrays: whether the fingerprints are read from the fingerprint arrays of the documents.
+        :param last_change: the last change the index contains, read before the index was loaded.
+        :param fingerprints: the FingerprintPresence of the stored fingerprints, updated with those of the added
+        documents, if any, and loaded again after a reindex.
+        :param replace: a function given the index loaded after a reindex, which takes the place of the index of
+        the worker, if any.
+        """
+        self.index = index
+        self.connect = connect
+        self.schema = schema
+        self.arrays = arrays
+        self.fingerprints = fingerprints
+        self.replace = replace
+        # A mapped index is brought up to date with the changes made since its file was written
+        self.last_change = min(last_change, index.last_change) if isinstance(index, MappedIndex) else last_change
+        self.applied = set()
+        self.conn = None
+        self.thread = None
+        self.stopped = threading.Event()
+        self.next_compaction = time.monotonic() + compaction_interval()
+
+    def start(self):
+        """Starts applying the changes in a background thread.
+        """
+        self.thread = threading.Thread(target=self.run, name='index-change-feed', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops the background thread.
+        """
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        """The loop of the background thread. Errors are logged and the connection opened again, so that the feed
+        survives a restart of the database.
+        """
+        while not self.stopped.is_set():
+            try:
+                if self.conn is None:
+                    self.listen()
+                self.poll()
+                if time.monotonic() >= self.next_compaction:
+                    self.next_compaction = time.monotonic() + compaction_interval()
+                    self.compact()
+                self.wait(poll_interval())
+            except Exception:
+                logging.exception('Could not apply the changes of the fingerprint index')
+                self.close()
+                self.stopped.wait(poll_interval())
+        self.close()
+
+    def listen(self):
+        """Opens the connection of the thread and listens on CHANGES_CHANNEL.
+        """
+        self.conn = self.connect()
+        self.conn.autocommit = True
+        cur = self.conn.cursor()
+        try:
+            cur.execute(f"LISTEN {CHANGES_CHANNEL}")
+        finally:
+            cur.close()
+
+    def close(self):
+        """Closes the connection of the thread, if it is open.
+        """
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            finally:
+                self.conn = None
+
+    def wait(self, timeout):
+        """Waits for a notification on CHANGES_CHANNEL.
+
+        :param timeout: the longest wait in seconds.
+        """
+        if select.select([self.conn], [], [], timeout)[0]:
+            self.conn.poll()
+            self.conn.notifies.clear()
+
+    def poll(self, index=None):
+        """Applies the changes which were not applied yet.
+
+        :param index: the index the changes are applied to, the one of the worker if not given.
+        :return: the number of applied changes
+        """
+        index = index if index is not None else self.index
+        unseen = unseen_changes(self.conn, self.schema, self.last_change - CHANGE_WINDOW)
+        change_ids = [change_id for change_id in unseen if change_id not in self.applied]
+        for start in range(0, len(change_ids), CHANGES_BATCH):
+            changes = read_changes(self.conn, self.schema, change_ids[start:start + CHANGES_BATCH], self.arrays)
+            for change_id, operation, url, scheme, modulus, fingerprints in changes:
+                if operation == REINDEXED:
+                    # The later changes are applied to the index loaded from the rebuilt tables
+                    return change_ids.index(change_id) + self.rebuild(change_id)
+                apply_change(index, operation, url, scheme, modulus, fingerprints)
+                if self.fingerprints is not None and operation == ADDED and fingerprints:
+                    self.fingerprints.update(fingerprints)
+                self.applied.add(change_id)
+                self.last_change = max(self.last_change, change_id)
+        self.applied = set(change_id for change_id in self.applied if change_id > self.last_change - CHANGE_WINDOW)
+        return len(change_ids)
+
+    def compact(self):
+        """Compresses the postings added to the index, maps the index file again if it was rebuilt, and deletes the
+        changes older than retention_days().
+        """
+        self.index.compact()
+        if isinstance(self.index, MappedIndex) and self.index.replaced():
+            self.reload()
+        prune_changes(self.conn, self.schema, retention_days())
+
+    def reload(self):
+        """Maps the rebuilt index file, loads the documents stored after it was written and applies the changes made
+        since, then swaps it with the index of the worker. The changes made meanwhile are applied by the next poll.
+        """
+        index = self.index
+        fresh = MappedIndex(index.path)
+        conn = self.connect()
+        try:
+            load_fingerprint_index(conn, self.schema, self.arrays, fresh.delta, fresh.last_url_id)
+        finally:
+            conn.close()
+        self.last_change = fresh.last_change
+        self.applied = set()
+        self.poll(fresh)
+        # Unless a reindex was applied meanwhile, which loaded the index again
+        if self.index is index:
+            index.swap(fresh)
+            logging.info(f'Mapped the fingerprint index file {index.path} again, {len(fresh)} document(s)')
+
+    def rebuild(self, change_id):
+        """Loads the bitmap of the stored fingerprints and the index again after a reindex switched to the rebuilt
+        fingerprint tables, then applies the changes made since. The index file is only mapped if it was written
+        after the reindex, otherwise it has the fingerprints of the retired tables.
+
+        :param change_id: the id of the change recorded by the reindex.
+        :return: the number of changes applied, including the one of the reindex
+        """
+        if self.fingerprints is not None:
+            self.fingerprints.reload()
+        path = index_file_path()
+        mapped = MappedIndex(path) if path is not None and os.path.exists(path) else None
+        conn = self.connect()
+        try:
+            if mapped is not None and mapped.last_change >= change_id:
+                load_fingerprint_index(conn, self.schema, self.arrays, mapped.delta, mapped.last_url_id)
+                fresh = mapped
+            else:
+                fresh = load_fingerprint_index(conn, self.schema, self.arrays)
+        finally:
+            conn.close()
+        # The urls table was locked by the cutover, so the changes before it were committed when the index was loaded,
+        # and those made after it are applied again, which does not change the documents loaded already
+        self.last_change = change_id
+        self.applied = set(range(change_id - CHANGE_WINDOW + 1, change_id + 1))
+        self.index = fresh
+        if self.replace is not None:
+            self.replace(fresh)
+        logging.info(f'Loaded the fingerprint index again after a reindex, {len(fresh)} document(s)')
+        return 1 + self.poll()
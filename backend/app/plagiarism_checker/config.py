@@ -0,0 +1,14 @@
+from django.conf import settings
+
+
+def get_setting(name, default):
+    """Reads a setting of the plagiarism checker. The checker can also be used outside of Django (e.g. by the
+    benchmarks), in which case the default value is used.
+
+    :param name: the name of the setting, e.g. FINGERPRINT_SCHEME.
+    :param default: the value used when the setting is missing.
+    :return: the value of the setting
+    """
+    if not settings.configured:
+        return default
+    return getattr(settings, name, default)
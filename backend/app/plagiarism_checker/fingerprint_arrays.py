@@ -0,0 +1,60 @@
+# GIN index of urls.fingerprint_array, which finds the documents sharing a fingerprint with a query (&&). It uses the
+# default operator class of integer arrays, so no extension is needed
+ARRAY_INDEX = 'urls_fingerprint_array_idx'
+
+DEFAULT_FILL_BATCH = 1000
+
+
+def fill_fingerprint_arrays(conn, schema, batch_size=DEFAULT_FILL_BATCH):
+    """Stores the sorted, distinct fingerprints of a batch of the documents without a fingerprint_array, read from
+    url_fingerprints. Documents are only stored with their array when FINGERPRINT_STORAGE is "arrays", so the
+    documents stored before it was set are filled by this function.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :param batch_size: the maximum number of filled documents.
+    :return: the number of filled documents
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            UPDATE {schema}.urls u SET fingerprint_array = arrays.fingerprint_array
+            FROM (
+                SELECT pending.id,
+                       COALESCE(array_agg(DISTINCT uf.fingerprint_id ORDER BY uf.fingerprint_id)
+                                    FILTER (WHERE uf.fingerprint_id IS NOT NULL), '{{}}') AS fingerprint_array
+                FROM (
+                    SELECT id FROM {schema}.urls WHERE fingerprint_array IS NULL ORDER BY id LIMIT %s
+                ) pending
+                LEFT JOIN {schema}.url_fingerprints uf ON uf.url_id = pending.id
+                GROUP BY pending.id
+            ) arrays
+            WHERE u.id = arrays.id
+            """, (batch_size,)
+        )
+        filled = cur.rowcount
+        conn.commit()
+        return filled
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def create_array_index(conn, schema):
+    """Creates the GIN index of the fingerprint arrays, if it does not exist yet.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {ARRAY_INDEX} ON {schema}.urls USING GIN (fingerprint_array)")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
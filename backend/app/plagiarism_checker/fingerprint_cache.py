@@ -0,0 +1,129 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .config import get_setting
+
+# Default size limits of the cache, see FINGERPRINT_CACHE_MAX_ENTRIES and FINGERPRINT_CACHE_MAX_FINGERPRINTS
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_FINGERPRINTS = 1000000
+
+
+def cache_key(text, scheme):
+    """Computes the content address of a text: a digest of the text together with the fingerprint scheme,
+    since the same text has different fingerprints under different schemes.
+
+    :param text: the text that is fingerprinted.
+    :param scheme: the fingerprint scheme.
+    :return: the key of the text in the cache
+    """
+    digest = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    return scheme, digest
+
+
+class FingerprintCache:
+    """Bounded cache of computed fingerprints with a least-recently-used eviction policy.
+    The cache is limited both in the number of texts and in the total number of fingerprints it holds.
+    """
+
+    def __init__(self, max_entries=None, max_fingerprints=None):
+        """The constructor for the FingerprintCache.
+
+        :param max_entries: the maximum number of texts, FINGERPRINT_CACHE_MAX_ENTRIES from the settings if not given.
+        :param max_fingerprints: the maximum number of fingerprints of all texts together,
+        FINGERPRINT_CACHE_MAX_FINGERPRINTS from the settings if not given.
+        """
+        self.max_entries = max_entries
+        self.max_fingerprints = max_fingerprints
+        self.entries = OrderedDict()
+        self.fingerprints = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def entries_limit(self):
+        """Returns the maximum number of texts the cache holds (0 disables the cache).
+
+        :return: the limit on the number of entries
+        """
+        if self.max_entries is not None:
+            return self.max_entries
+        return get_setting('FINGERPRINT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+
+    def fingerprints_limit(self):
+        """Returns the maximum number of fingerprints the cache holds.
+
+        :return: the limit on the number of fingerprints
+        """
+        if self.max_fingerprints is not None:
+            return self.max_fingerprints
+        return get_setting('FINGERPRINT_CACHE_MAX_FINGERPRINTS', DEFAULT_MAX_FINGERPRINTS)
+
+    def get(self, text, scheme):
+        """Looks up the fingerprints of a text, marking them as recently used.
+
+        :param text: the text that is fingerprinted.
+        :param scheme: the fingerprint scheme.
+        :return: the cached fingerprints, or None if the text is not in the cache
+        """
+        key = cache_key(text, scheme)
+        with self.lock:
+            hashes = self.entries.get(key)
+            if hashes is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return hashes
+
+    def put(self, text, scheme, hashes):
+        """Stores the fingerprints of a text, evicting the least recently used texts if the cache is full.
+
+        :param text: the text that is fingerprinted.
+        :param scheme: the fingerprint scheme.
+        :param hashes: the fingerprints of the text.
+        """
+        max_entries = self.entries_limit()
+        max_fingerprints = self.fingerprints_limit()
+        if max_entries <= 0 or len(hashes) > max_fingerprints:
+            return
+
+        key = cache_key(text, scheme)
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.fingerprints -= len(previous)
+            self.entries[key] = hashes
+            self.fingerprints += len(hashes)
+
+            while len(self.entries) > max_entries or self.fingerprints > max_fingerprints:
+                _, evicted = self.entries.popitem(last=False)
+                self.fingerprints -= len(evicted)
+
+    def clear(self):
+        """Removes all the texts from the cache and resets the counters.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.fingerprints = 0
+            self.hits = 0
+            self.misses = 0
+
+    def statistics(self):
+        """Returns the counters of the cache, used for sizing it.
+
+        :return: a dictionary with the hits, misses, hit ratio, number of texts and number of fingerprints
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups > 0 else 0.0,
+                'entries': len(self.entries),
+                'fingerprints': self.fingerprints,
+            }
+
+
+# The cache shared by all the fingerprinting paths of this process
+fingerprint_cache = FingerprintCache()
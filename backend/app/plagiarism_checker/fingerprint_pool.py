@@ -0,0 +1,326 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .budget import apply_budget, winnow_within_budget
+from .config import get_setting
+from .fingerprint_cache import fingerprint_cache
+from .fingerprint_set import FingerprintSet
+from .fingerprinting import compute_fingerprint, compute_fingerprint_set, compute_shingle_hashes, \
+    fingerprints_from_hashes, shingle_hashes_from_fingerprints
+from .schemes import default_scheme
+from .segments import segmented_winnow
+
+# Texts shorter than this (in characters) are fingerprinted on the calling thread, as sending them to another
+# process costs more than fingerprinting them
+DEFAULT_OFFLOAD_THRESHOLD = 10000
+
+# Texts of at least this many characters are split into overlapping segments winnowed by all the workers at once
+DEFAULT_PARALLEL_THRESHOLD = 100000
+
+
+class ThroughputStatistics:
+    """Keeps track of how many texts and characters were fingerprinted and how long it took.
+    """
+
+    def __init__(self):
+        """The constructor for the ThroughputStatistics.
+        """
+        self.texts = 0
+        self.characters = 0
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, texts, characters, seconds):
+        """Records a finished fingerprinting job.
+
+        :param texts: the number of texts fingerprinted.
+        :param characters: the total number of characters of the texts.
+        :param seconds: the wall-clock duration of the job.
+        """
+        with self.lock:
+            self.texts += texts
+            self.characters += characters
+            self.seconds += seconds
+
+    def texts_per_second(self):
+        """Returns the average number of texts fingerprinted per second.
+
+        :return: the throughput in texts per second, or 0 if nothing was fingerprinted yet
+        """
+        return self.texts / self.seconds if self.seconds > 0 else 0.0
+
+    def megabytes_per_second(self):
+        """Returns the average number of characters fingerprinted per second, in millions.
+
+        :return: the throughput in MB/s (of characters), or 0 if nothing was fingerprinted yet
+        """
+        return self.characters / self.seconds / 1e6 if self.seconds > 0 else 0.0
+
+
+# Throughput of the batch API (ingestion) and of the request-path helper (interactive traffic)
+batch_statistics = ThroughputStatistics()
+offload_statistics = ThroughputStatistics()
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def pool_workers():
+    """Returns the number of worker processes of the fingerprinting pool, set by FINGERPRINT_POOL_WORKERS.
+
+    :return: the number of worker processes, all the cores by default
+    """
+    return get_setting('FINGERPRINT_POOL_WORKERS', None) or os.cpu_count() or 1
+
+
+def offload_threshold():
+    """Returns the size from which a single text is fingerprinted in the pool, set by FINGERPRINT_OFFLOAD_THRESHOLD.
+
+    :return: the threshold in characters
+    """
+    return get_setting('FINGERPRINT_OFFLOAD_THRESHOLD', DEFAULT_OFFLOAD_THRESHOLD)
+
+
+def parallel_threshold():
+    """Returns the size from which a single text is winnowed in segments by all the workers of the pool,
+    set by FINGERPRINT_PARALLEL_THRESHOLD.
+
+    :return: the threshold in characters
+    """
+    return get_setting('FINGERPRINT_PARALLEL_THRESHOLD', DEFAULT_PARALLEL_THRESHOLD)
+
+
+def get_pool():
+    """Returns the process pool used for fingerprinting. The pool is created on first use and then reused, so its
+    workers stay warm. A new pool is created in forked processes (e.g. gunicorn workers), as pools cannot be shared.
+
+    :return: the ProcessPoolExecutor of the current process
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=pool_workers())
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def warm_up():
+    """Starts all the workers of the pool and makes them import the fingerprinting code, so the first request
+    does not pay for it. It is called by the server entrypoint (app/wsgi.py and app/asgi.py). Nothing is started
+    with a single worker, as texts are then fingerprinted on the calling thread.
+    """
+    if pool_workers() <= 1:
+        return
+    pool = get_pool()
+    list(pool.map(compute_shingle_hashes, [''] * pool_workers(), [default_scheme()] * pool_workers()))
+
+
+@atexit.register
+def shutdown_pool():
+    """Stops the workers of the pool, if the pool was created by this process.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False)
+        _pool = None
+
+
+def compute_fingerprints_batch(texts, scheme=None):
+    """Computes the fingerprints of many texts at once, spreading them over the worker processes of the pool.
+    Texts found in the fingerprint cache are not sent to the pool.
+    The throughput of every batch is recorded in batch_statistics and logged.
+
+    :param texts: the texts to compute the fingerprints for (None for texts that could not be crawled).
+    :param scheme: the fingerprint scheme to be used, FINGERPRINT_SCHEME from the settings if not given.
+    :return: a list with the result of compute_fingerprint for every text, in the same order
+    """
+    return [fingerprints_from_hashes(hashes) if hashes is not None else {}
+            for hashes in shingle_hashes_batch(texts, scheme)]
+
+
+def compute_fingerprint_sets_batch(texts, scheme=None, budget=None, sample=False):
+    """Same as compute_fingerprints_batch, but the fingerprints of every text are returned as a FingerprintSet.
+    With a budget, texts longer than the budget are winnowed within it in the worker processes,
+    see compute_fingerprint_set.
+
+    :param texts: the texts to compute the fingerprints for (None for texts that could not be crawled).
+    :param scheme: the fingerprint scheme to be used, FINGERPRINT_SCHEME from the settings if not given.
+    :param budget: the maximum number of fingerprints of a text, no limit if not given.
+    :param sample: whether texts over the budget are sampled instead of cut.
+    :return: a list with the result of compute_fingerprint_set for every text, in the same order
+    """
+    texts = list(texts)
+    if scheme is None:
+        scheme = default_scheme()
+
+    long_texts = [index for index, text in enumerate(texts)
+                  if budget is not None and text is not None and len(text) > budget]
+    other_texts = sorted(set(range(len(texts))) - set(long_texts))
+
+    fingerprint_sets = [None] * len(texts)
+    for index, hashes in zip(other_texts, shingle_hashes_batch([texts[index] for index in other_texts], scheme)):
+        fingerprint_sets[index] = FingerprintSet(hashes) if hashes is not None else FingerprintSet()
+    if long_texts:
+        results = winnow_batch_within_budget([texts[index] for index in long_texts], scheme, budget, sample)
+        for index, (hashes, count, modulus) in zip(long_texts, results):
+            fingerprint_sets[index] = FingerprintSet(hashes, count, modulus)
+
+    return fingerprint_sets
+
+
+def winnow_batch_within_budget(texts, scheme, budget, sample):
+    """Winnows many long texts within a budget, spreading them over the worker processes of the pool.
+    The throughput is recorded in batch_statistics.
+
+    :param texts: the texts to compute the fingerprints for.
+    :param scheme: the fingerprint scheme to be used.
+    :param budget: the maximum number of fingerprints of a text.
+    :param sample: whether texts over the budget are sampled instead of cut.
+    :return: a list with the result of winnow_within_budget for every text, in the same order
+    """
+    start_time = time.perf_counter()
+    workers = pool_workers()
+    if workers <= 1 or len(texts) <= 1:
+        results = [winnow_within_budget(text, budget, scheme, sample) for text in texts]
+    else:
+        chunksize = max(1, len(texts) // (workers * 4))
+        results = list(get_pool().map(winnow_within_budget, texts, [budget] * len(texts), [scheme] * len(texts),
+                                      [sample] * len(texts), chunksize=chunksize))
+    batch_statistics.record(len(texts), sum(len(text) for text in texts), time.perf_counter() - start_time)
+    return results
+
+
+def shingle_hashes_batch(texts, scheme=None):
+    """Computes the hashes of the fingerprints of many texts, see compute_fingerprints_batch.
+
+    :param texts: the texts to compute the fingerprints for (None for texts that could not be crawled).
+    :param scheme: the fingerprint scheme to be used, FINGERPRINT_SCHEME from the settings if not given.
+    :return: a list with the hashes of every text (None for the texts that are None), in the same order
+    """
+    texts = list(texts)
+    if scheme is None:
+        scheme = default_scheme()
+
+    start_time = time.perf_counter()
+    hashes = [fingerprint_cache.get(text, scheme) if text is not None else None for text in texts]
+    missing = [index for index, text in enumerate(texts) if text is not None and hashes[index] is None]
+
+    workers = pool_workers()
+    if workers <= 1 or len(missing) <= 1:
+        computed = [compute_shingle_hashes(texts[index], scheme) for index in missing]
+    else:
+        chunksize = max(1, len(missing) // (workers * 4))
+        computed = get_pool().map(compute_shingle_hashes, [texts[index] for index in missing],
+                                  [scheme] * len(missing), chunksize=chunksize)
+    for index, text_hashes in zip(missing, computed):
+        fingerprint_cache.put(texts[index], scheme, text_hashes)
+        hashes[index] = text_hashes
+    duration = time.perf_counter() - start_time
+
+    characters = sum(len(text) for text in texts if text is not None)
+    batch_statistics.record(len(texts), characters, duration)
+    logging.info(f'Fingerprinted {len(texts)} texts ({characters} characters) in {duration:.2f} seconds, '
+                 f'{batch_statistics.texts_per_second():.1f} texts/s on average')
+
+    return hashes
+
+
+def compute_fingerprint_offloaded(article_text, scheme=None):
+    """Request-path version of compute_fingerprint. Large texts are fingerprinted in the process pool, so the
+    web thread only waits for the result (without holding the GIL) and other requests of the worker can proceed.
+    Texts found in the fingerprint cache are not sent to the pool.
+    The throughput of offloaded texts is recorded in offload_statistics.
+
+    :param article_text: the text of the document to compute the fingerprint for
+    :param scheme: the fingerprint scheme to be used, FINGERPRINT_SCHEME from the settings if not given
+    :return: the same as compute_fingerprint
+    """
+    if not should_offload(article_text):
+        return compute_fingerprint(article_text, scheme)
+
+    return fingerprints_from_hashes(shingle_hashes_offloaded(article_text, scheme))
+
+
+def compute_fingerprint_set_offloaded(article_text, scheme=None, budget=None, sample=False):
+    """Request-path version of compute_fingerprint_set, see compute_fingerprint_offloaded.
+
+    :param article_text: the text of the document to compute the fingerprint for
+    :param scheme: the fingerprint scheme to be used, FINGERPRINT_SCHEME from the settings if not given
+    :param budget: the maximum number of fingerprints, no limit if not given
+    :param sample: whether texts over the budget are sampled instead of cut
+    :return: the same as compute_fingerprint_set
+    """
+    if not should_offload(article_text):
+        return compute_fingerprint_set(article_text, scheme, budget, sample)
+
+    if budget is not None and len(article_text) > budget:
+        return FingerprintSet(*shingle_hashes_offloaded_within_budget(article_text, scheme, budget, sample))
+
+    return FingerprintSet(shingle_hashes_offloaded(article_text, scheme))
+
+
+def should_offload(article_text):
+    """Decides whether a text is worth fingerprinting in the process pool.
+
+    :param article_text: the text of the document to compute the fingerprint for
+    :return: True if the text is large enough and the pool has more than one worker
+    """
+    return article_text is not None and len(article_text) >= offload_threshold() and pool_workers() > 1
+
+
+def shingle_hashes_offloaded(article_text, scheme=None):
+    """Computes the hashes of the fingerprints of a text in the process pool, unless they are in the cache.
+    Texts over the parallel threshold are split into overlapping segments winnowed by all the workers at once.
+
+    :param article_text: the text of the document to compute the fingerprint for
+    :param scheme: the fingerprint scheme to be used, FINGERPRINT_SCHEME from the settings if not given
+    :return: an array with the hashes of the fingerprints
+    """
+    if scheme is None:
+        scheme = default_scheme()
+
+    hashes = fingerprint_cache.get(article_text, scheme)
+    if hashes is None:
+        start_time = time.perf_counter()
+        if len(article_text) >= parallel_threshold():
+            fingerprints = segmented_winnow(article_text, pool_workers(), get_pool().map, scheme=scheme)
+            hashes = shingle_hashes_from_fingerprints(fingerprints)
+        else:
+            hashes = get_pool().submit(compute_shingle_hashes, article_text, scheme).result()
+        offload_statistics.record(1, len(article_text), time.perf_counter() - start_time)
+        fingerprint_cache.put(article_text, scheme, hashes)
+
+    return hashes
+
+
+def shingle_hashes_offloaded_within_budget(article_text, scheme, budget, sample):
+    """Computes the hashes of the fingerprints of a long text within a budget in the process pool,
+    unless the complete fingerprints are in the cache. A sampled text is winnowed to its end anyway, so from the
+    parallel threshold it is winnowed in segments by all the workers, then sampled. Otherwise the text is winnowed
+    by a single worker, which stops at the budget.
+
+    :param article_text: the text of the document to compute the fingerprint for
+    :param scheme: the fingerprint scheme to be used, FINGERPRINT_SCHEME from the settings if not given
+    :param budget: the maximum number of fingerprints
+    :param sample: whether texts over the budget are sampled instead of cut
+    :return: the same as winnow_within_budget
+    """
+    if scheme is None:
+        scheme = default_scheme()
+
+    hashes = fingerprint_cache.get(article_text, scheme)
+    if hashes is not None:
+        return apply_budget(hashes, budget, sample)
+    if sample and len(article_text) >= parallel_threshold():
+        return apply_budget(shingle_hashes_offloaded(article_text, scheme), budget, sample)
+
+    start_time = time.perf_counter()
+    result = get_pool().submit(winnow_within_budget, article_text, budget, scheme, sample).result()
+    offload_statistics.record(1, len(article_text), time.perf_counter() - start_time)
+    return result
@@ -0,0 +1,156 @@
+import numpy as np
+
+
+class FingerprintSet:
+    """Compact set of fingerprints, stored as a sorted array of distinct uint32 hashes.
+    This is what compute_fingerprint_set returns and what the similarity functions, NewsDocument and the
+    database queries work with, so no dictionary is allocated per fingerprint on the hot paths.
+    """
+
+    __slots__ = ('hashes', 'count', 'modulus')
+
+    def __init__(self, hashes=(), count=None, modulus=1):
+        """The constructor for the FingerprintSet.
+
+        :param hashes: the hashes of the fingerprints, in any order and possibly repeated.
+        :param count: the number of fingerprints selected by winnowing, including repeated hashes.
+        The length of hashes if not given.
+        :param modulus: the sampling modulus, only fingerprints divisible by it were kept (1 for all fingerprints).
+        """
+        self.modulus = modulus
+        if isinstance(hashes, FingerprintSet):
+            self.hashes = hashes.hashes
+            self.count = hashes.count if count is None else count
+            return
+
+        if not isinstance(hashes, (np.ndarray, list, tuple)):
+            hashes = list(hashes)
+        hashes = np.asarray(hashes, dtype=np.uint32)
+        self.hashes = np.unique(hashes)
+        self.hashes.flags.writeable = False
+        self.count = len(hashes) if count is None else count
+
+    @classmethod
+    def from_dicts(cls, shingles):
+        """Builds a fingerprint set out of the list of dictionaries returned by compute_fingerprint.
+
+        :param shingles: a list of dictionaries containing a shingle_hash.
+        :return: the FingerprintSet of the hashes
+        """
+        return cls([shingle["shingle_hash"] for shingle in shingles])
+
+    def to_dicts(self):
+        """Converts the fingerprint set to the list of dictionaries used by the older code.
+
+        :return: a list of dictionaries containing a shingle_hash, in increasing order of the hashes
+        """
+        return [{"shingle_hash": shingle_hash} for shingle_hash in self.tolist()]
+
+    def tolist(self):
+        """Returns the distinct hashes as Python integers, e.g. for binding them as SQL parameters.
+
+        :return: a sorted list of integers
+        """
+        return self.hashes.tolist()
+
+    def sample(self, modulus):
+        """Keeps only the fingerprints divisible by the modulus (mod-p sampling).
+
+        :param modulus: the sampling modulus, a power of two.
+        :return: a new FingerprintSet with the sampled fingerprints
+        """
+        hashes = self.hashes[self.hashes % modulus == 0]
+        return FingerprintSet(hashes, modulus=max(self.modulus, modulus))
+
+    def sampled_size(self, modulus):
+        """Counts the fingerprints divisible by the modulus, i.e. the size of the set sampled with it.
+
+        :param modulus: the sampling modulus.
+        :return: the number of fingerprints that would be kept
+        """
+        return int(np.count_nonzero(self.hashes % modulus == 0))
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __contains__(self, shingle_hash):
+        index = np.searchsorted(self.hashes, shingle_hash)
+        return bool(index < len(self.hashes) and self.hashes[index] == shingle_hash)
+
+    def __eq__(self, other):
+        if isinstance(other, FingerprintSet):
+            return np.array_equal(self.hashes, other.hashes)
+        if isinstance(other, (set, frozenset)):
+            return set(self.tolist()) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'FingerprintSet({self.tolist()})'
+
+    def intersection(self, other):
+        """Returns the fingerprints that are in both sets.
+
+        :param other: the other FingerprintSet.
+        :return: a new FingerprintSet
+        """
+        return FingerprintSet(np.intersect1d(self.hashes, other.hashes, assume_unique=True))
+
+    def union(self, other):
+        """Returns the fingerprints that are in any of the sets.
+
+        :param other: the other FingerprintSet.
+        :return: a new FingerprintSet
+        """
+        return FingerprintSet(np.union1d(self.hashes, other.hashes))
+
+    def intersection_size(self, other):
+        """Counts the common fingerprints of the two sets, without building the intersection.
+
+        :param other: the other FingerprintSet.
+        :return: the size of the intersection
+        """
+        smaller, larger = sorted((self.hashes, other.hashes), key=len)
+        if len(smaller) == 0:
+            return 0
+        indexes = np.searchsorted(larger, smaller)
+        indexes[indexes == len(larger)] = 0
+        return int(np.count_nonzero(larger[indexes] == smaller))
+
+    def union_size(self, other):
+        """Counts the fingerprints that are in any of the sets, without building the union.
+
+        :param other: the other FingerprintSet.
+        :return: the size of the union
+        """
+        return len(self) + len(other) - self.intersection_size(other)
+
+    def jaccard(self, other):
+        """Computes the Jaccard similarity of the two sets.
+
+        :param other: the other FingerprintSet.
+        :return: the similarity coefficient (between 0 and 1)
+        """
+        return self.intersection_size(other) / self.union_size(other)
+
+    __and__ = intersection
+    __or__ = union
+
+
+def as_fingerprint_set(fingerprints):
+    """Compatibility shim for the functions that used to take the list of dictionaries returned by
+    compute_fingerprint or a list of hashes: converts any of them to a FingerprintSet.
+
+    :param fingerprints: a FingerprintSet, a list of dictionaries containing a shingle_hash or a list of hashes.
+    :return: the FingerprintSet of the fingerprints
+    """
+    if isinstance(fingerprints, FingerprintSet):
+        return fingerprints
+    fingerprints = list(fingerprints)
+    if fingerprints and isinstance(fingerprints[0], dict):
+        return FingerprintSet.from_dicts(fingerprints)
+    return FingerprintSet(fingerprints)
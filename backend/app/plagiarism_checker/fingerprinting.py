@@ -1,35 +1,171 @@
+import numpy as np
 from winnowing import sanitize, kgrams, select_min
 
+from .budget import apply_budget, winnow_within_budget
+from .fingerprint_cache import fingerprint_cache
+from .fingerprint_set import FingerprintSet
+from .schemes import HASH_MASK, default_scheme
+from .streaming import stream_winnow
+from .winnowing_engine import vectorized_winnow
 
-def compute_fingerprint(article_text):
+
+def compute_fingerprint(article_text, scheme=None, budget=None, sample=False):
     """Function for computing the fingerprint of a given article using winnowing.
     See the algorithm encapsulated by the winnow function provided in pip package
     at https://pypi.org/project/winnowing/
+    The fingerprints are computed by the vectorized engine, which gives the same result as modified_winnow.
+    Texts that were fingerprinted recently are served from the fingerprint cache.
     The function also checks for possible empty text edge case.
+    This is the compatibility version of compute_fingerprint_set, new code should use the latter.
+    With a budget, fingerprinting stops as soon as the text has more fingerprints than the budget (and budget + 1
+    fingerprints are returned), unless sample is set, see compute_fingerprint_set.
 
     :param article_text: the text of the document to compute the fingerprint for
+    :param scheme: the fingerprint scheme to be used, FINGERPRINT_SCHEME from the settings if not given
+    :param budget: the maximum number of fingerprints, no limit if not given
+    :param sample: whether texts over the budget are sampled instead of cut
     :return: empty list if the text provided is empty or list of fingerprints otherwise
     """
     # verify if article text is empty => no text was crawled
     if article_text is None:
         return {}
 
-    return [{"shingle_hash": element[1]} for element in modified_winnow(article_text)]
+    if budget is not None:
+        hashes, _, _ = shingle_hashes_within_budget(article_text, scheme, budget, sample)
+        return fingerprints_from_hashes(hashes)
+
+    return fingerprints_from_hashes(cached_shingle_hashes(article_text, scheme))
+
+
+def compute_fingerprint_set(article_text, scheme=None, budget=None, sample=False):
+    """Function for computing the fingerprints of a given article as a compact FingerprintSet.
+    The fingerprints are the same as the ones of compute_fingerprint, without a dictionary for each of them.
+    With a budget, the work is bounded: fingerprinting stops as soon as the text has more fingerprints than the
+    budget, and the count of the returned set is budget + 1. If sample is set, long texts are not cut but
+    sampled instead: only the fingerprints divisible by the smallest power of two that brings them within the
+    budget are kept, and that power of two is the modulus of the returned set.
+
+    :param article_text: the text of the document to compute the fingerprint for
+    :param scheme: the fingerprint scheme to be used, FINGERPRINT_SCHEME from the settings if not given
+    :param budget: the maximum number of fingerprints, no limit if not given
+    :param sample: whether texts over the budget are sampled instead of cut
+    :return: an empty FingerprintSet if no text was crawled, the FingerprintSet of the text otherwise
+    """
+    if article_text is None:
+        return FingerprintSet()
+
+    if budget is not None:
+        hashes, count, modulus = shingle_hashes_within_budget(article_text, scheme, budget, sample)
+        return FingerprintSet(hashes, count, modulus)
+
+    return FingerprintSet(cached_shingle_hashes(article_text, scheme))
+
+
+def shingle_hashes_within_budget(article_text, scheme, budget, sample=False):
+    """Computes the hashes of the fingerprints of a text within a budget, see compute_fingerprint_set.
+    Only complete results are stored in the fingerprint cache.
+
+    :param article_text: the text of the document to compute the fingerprint for
+    :param scheme: the fingerprint scheme to be used, FINGERPRINT_SCHEME from the settings if not given
+    :param budget: the maximum number of fingerprints
+    :param sample: whether texts over the budget are sampled instead of cut
+    :return: a tuple with the kept hashes, the number of fingerprints (budget + 1 if the budget was exceeded)
+    and the sampling modulus
+    """
+    if scheme is None:
+        scheme = default_scheme()
+
+    # There are never more fingerprints than characters, so short texts are fingerprinted as usual
+    if len(article_text) <= budget:
+        hashes = cached_shingle_hashes(article_text, scheme)
+        return hashes, len(hashes), 1
+
+    hashes = fingerprint_cache.get(article_text, scheme)
+    if hashes is not None:
+        return apply_budget(hashes, budget, sample)
+
+    return winnow_within_budget(article_text, budget, scheme, sample)
+
+
+def cached_shingle_hashes(article_text, scheme=None):
+    """Computes the hashes of the fingerprints of a text, looking them up in the fingerprint cache first.
+
+    :param article_text: the text of the document to compute the fingerprint for
+    :param scheme: the fingerprint scheme to be used, FINGERPRINT_SCHEME from the settings if not given
+    :return: an array with the hashes of the fingerprints
+    """
+    if scheme is None:
+        scheme = default_scheme()
+
+    hashes = fingerprint_cache.get(article_text, scheme)
+    if hashes is None:
+        hashes = compute_shingle_hashes(article_text, scheme)
+        fingerprint_cache.put(article_text, scheme, hashes)
+
+    return hashes
+
+
+def compute_fingerprint_from_chunks(chunks, scheme=None):
+    """Function for computing the fingerprint of an article that arrives in chunks (e.g. a request body stream),
+    without holding the whole article in memory. The fingerprints are the same as the ones of compute_fingerprint
+    for the whole article, but they are ordered by their position in the article.
+
+    :param chunks: an iterator over the parts of the text of the document
+    :param scheme: the fingerprint scheme to be used, FINGERPRINT_SCHEME from the settings if not given
+    :return: list of fingerprints
+    """
+    if scheme is None:
+        scheme = default_scheme()
+
+    return fingerprints_from_hashes(element[1] for element in stream_winnow(chunks, scheme=scheme))
+
+
+def compute_shingle_hashes(article_text, scheme):
+    """Computes the fingerprints of a text without looking at the fingerprint cache. This is what the worker
+    processes run, the cache is kept by the process that hands out the work.
+
+    :param article_text: the text of the document to compute the fingerprint for
+    :param scheme: the fingerprint scheme to be used
+    :return: a read-only uint32 array with the hashes of the fingerprints
+    """
+    return shingle_hashes_from_fingerprints(vectorized_winnow(article_text, scheme=scheme))
+
+
+def shingle_hashes_from_fingerprints(fingerprints):
+    """Extracts the hashes out of the (position, hash) fingerprints computed by the winnowing engine.
+
+    :param fingerprints: the set of (position, hash) fingerprints.
+    :return: a read-only uint32 array with the hashes of the fingerprints, in the iteration order of the set
+    """
+    hashes = np.fromiter((element[1] for element in fingerprints), dtype=np.uint32, count=len(fingerprints))
+    hashes.flags.writeable = False
+    return hashes
 
 
-def modified_winnow(text, k=8):
+def fingerprints_from_hashes(hashes):
+    """Converts the hashes of the fingerprints to the list of fingerprints returned by compute_fingerprint.
+
+    :param hashes: the hashes of the fingerprints.
+    :return: a list of dictionaries containing a shingle_hash
+    """
+    if isinstance(hashes, np.ndarray):
+        hashes = hashes.tolist()
+    return [{"shingle_hash": shingle_hash} for shingle_hash in hashes]
+
+
+def modified_winnow(text, k=8, mask=HASH_MASK):
     """Modified winnowing with adjustable n-gram length.
+    This is the reference implementation on top of the winnowing package, see vectorized_winnow for the fast one.
 
     :param text: The text from which the shingles are computed.
     :param k: n-gram length.
+    :param mask: the mask the SHA-1 hashes are reduced with (HASH_MASK, or WIDE_HASH_MASK for the wide scheme).
     :return: The list of shingles.
     """
-    n = len(list(text))
-
-    text = zip(range(n), text)
+    text = enumerate(text)
     text = sanitize(text)
 
-    hashes = map(lambda x: winnowing_hash(x), kgrams(text, k))
+    hashes = map(lambda x: winnowing_hash(x, mask), kgrams(text, k))
 
     windows = kgrams(hashes, 6)
 
@@ -37,30 +173,33 @@ def modified_winnow(text, k=8):
 
 
 # modify the hash function used
-def modified_hash(text):
-    """Modified hash function which stores 20-bit values.
+def modified_hash(text, mask=HASH_MASK):
+    """Modified hash function which stores 20-bit values (the last five hex digits of the SHA-1 digest), or
+    31-bit values for the wide scheme.
 
     :param text: the text to be hashed.
+    :param mask: the mask the hash is reduced with, HASH_MASK or WIDE_HASH_MASK.
     :return: the hashed value of the text.
     """
     import hashlib
 
     hs = hashlib.sha1(text.encode("utf-8"))
-    hs = hs.hexdigest()[-5:]
-    hs = int(hs, 16)
+    hs = hs.hexdigest()[-8:]
+    hs = int(hs, 16) & mask
 
     return hs
 
 
-def winnowing_hash(kgram):
+def winnowing_hash(kgram, mask=HASH_MASK):
     """
     :param kgram: e.g., [(0, 'a'), (2, 'd'), (3, 'o'), (5, 'r'), (6, 'u')]
+    :param mask: the mask the hash is reduced with, HASH_MASK or WIDE_HASH_MASK.
     """
     kgram = zip(*kgram)
     kgram = list(kgram)
 
     text = "".join(kgram[1]) if len(kgram) > 1 else ""
 
-    hs = modified_hash(text)
+    hs = modified_hash(text, mask)
 
     return kgram[0][0] if len(kgram) > 1 else -1, hs
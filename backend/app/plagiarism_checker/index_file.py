@@ -0,0 +1,366 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from .config import get_setting
+from .fingerprint_set import as_fingerprint_set
+from .inverted_index import InvertedIndex, LEVELS, MINIMUM_OVERLAP, REMOVED_SCHEME, fingerprint_levels, \
+    load_fingerprint_index, modulus_level, select_candidates
+from .schemes import HASH_MASK
+
+# The index file starts with a header: the magic bytes, the format version, then the number of documents (and of
+# those which were not removed), of possible fingerprints and of postings, the sizes of the URL and scheme sections,
+# the id of the last document in the file and the last change of the index_changes table applied to it.
+# Files of another version are rejected, so a format change only needs VERSION to be increased.
+MAGIC = b'NCIX'
+VERSION = 2
+HEADER = struct.Struct('<4sIQQQQQQQQ')
+
+# Sections are aligned to this many bytes, so that every array can be used from the mapped file as it is
+ALIGNMENT = 8
+
+# Number of fingerprints whose posting lists are decoded at once when the file is written
+WRITE_CHUNK = 65536
+
+
+def index_file_path():
+    """Returns the path of the index file workers map at start instead of loading the index from the database,
+    set by FINGERPRINT_INDEX_FILE.
+
+    :return: the path, or None if the index is always loaded from the database
+    """
+    return get_setting('FINGERPRINT_INDEX_FILE', None)
+
+
+def url_key(url):
+    """Hashes a URL for the lookup table of an index file. Python's own hash of strings changes with every
+    process, so a stable one is used.
+
+    :param url: the URL.
+    :return: a 64-bit key
+    """
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def file_identity(status):
+    """Identifies a version of a file from its status, so that a file replaced by a newer one is noticed.
+
+    :param status: the os.stat_result of the file.
+    :return: a tuple of the inode, modification time and size of the file
+    """
+    return status.st_ino, status.st_mtime_ns, status.st_size
+
+
+def section_layout(documents, live, fingerprints, postings, url_bytes, scheme_bytes):
+    """Lays the sections of an index file out after its header:
+    - offsets: where the posting list of every fingerprint starts in postings (and where the last one ends)
+    - postings: the ascending document numbers of every fingerprint, one list after the other
+    - sizes, scheme_of, level_of: the sizes at every level, the scheme and the sampling level of every document
+    - url_offsets, urls: where the UTF-8 URL of every document starts in urls (and where the last one ends)
+    - url_keys, url_numbers: the sorted url_key of every document which was not removed, and its number
+    - schemes: the JSON list of the schemes, indexed by scheme_of
+
+    :param documents: the number of documents.
+    :param live: the number of documents which were not removed.
+    :param fingerprints: the number of possible fingerprints.
+    :param postings: the number of postings.
+    :param url_bytes: the size of all the URLs.
+    :param scheme_bytes: the size of the JSON list of schemes.
+    :return: a list of (name, dtype, length, offset) tuples, and the size of the file
+    """
+    sections = [('offsets', np.int64, fingerprints + 1), ('postings', np.uint32, postings),
+                ('sizes', np.int32, documents * LEVELS), ('scheme_of', np.int16, documents),
+                ('level_of', np.int8, documents), ('url_offsets', np.int64, documents + 1),
+                ('urls', np.uint8, url_bytes), ('url_keys', np.uint64, live), ('url_numbers', np.uint32, live),
+                ('schemes', np.uint8, scheme_bytes)]
+    layout = []
+    position = HEADER.size
+    for name, dtype, length in sections:
+        position += -position % ALIGNMENT
+        layout.append((name, dtype, length, position))
+        position += length * np.dtype(dtype).itemsize
+    return layout, position
+
+
+def write_index_file(index, path, last_url_id, last_change=0):
+    """Writes an InvertedIndex to an index file. The file is written next to the path and renamed over it at the
+    end, so workers starting meanwhile map either the previous file or the complete new one.
+
+    :param index: the InvertedIndex of the stored documents.
+    :param path: the path of the index file.
+    :param last_url_id: the largest id of the documents in the index, the documents stored after it are loaded from
+    the database when the file is mapped.
+    :param last_change: the last change of the index_changes table applied to the index, the changes after it are
+    applied when the file is mapped.
+    :return: the size of the file in bytes
+    """
+    index.compact()
+    documents = len(index.urls)
+    store = index.postings
+    fingerprints = len(store.counts)
+    offsets = np.concatenate(([0], np.cumsum(store.counts))).astype(np.int64)
+    encoded_urls = [url.encode('utf-8') for url in index.urls]
+    url_offsets = np.concatenate(([0], np.cumsum([len(url) for url in encoded_urls]))).astype(np.int64)
+    live = np.flatnonzero(index.scheme_of[:documents] != REMOVED_SCHEME)
+    url_keys = np.array([url_key(index.urls[number]) for number in live.tolist()], dtype=np.uint64)
+    order = np.argsort(url_keys, kind='stable')
+    schemes = json.dumps(index.schemes).encode('utf-8')
+
+    layout, size = section_layout(documents, len(live), fingerprints, int(offsets[-1]), int(url_offsets[-1]),
+                                  len(schemes))
+    header = HEADER.pack(MAGIC, VERSION, documents, len(live), fingerprints, int(offsets[-1]), int(url_offsets[-1]),
+                         len(schemes), last_url_id, last_change)
+
+    def postings():
+        for start in range(0, fingerprints, WRITE_CHUNK):
+            numbers, owners = store.postings(np.arange(start, min(start + WRITE_CHUNK, fingerprints)))
+            yield numbers[np.lexsort((numbers, owners))].astype(np.uint32).tobytes()
+
+    contents = {
+        'offsets': [offsets.tobytes()],
+        'postings': postings(),
+        'sizes': [index.sizes[:documents].astype(np.int32).tobytes()],
+        'scheme_of': [index.scheme_of[:documents].astype(np.int16).tobytes()],
+        'level_of': [index.level_of[:documents].astype(np.int8).tobytes()],
+        'url_offsets': [url_offsets.tobytes()],
+        'urls': encoded_urls,
+        'url_keys': [url_keys[order].tobytes()],
+        'url_numbers': [live[order].astype(np.uint32).tobytes()],
+        'schemes': [schemes],
+    }
+
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(header)
+        for name, _, _, offset in layout:
+            file.write(bytes(offset - file.tell()))
+            for chunk in contents[name]:
+                file.write(chunk)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    return size
+
+
+class MappedFile:
+    """The read-only part of a MappedIndex: the arrays of an index file, used from the mapping as they are.
+    """
+
+    def __init__(self, path):
+        """The constructor for the MappedFile.
+
+        :param path: the path of the index file.
+        """
+        with open(path, 'rb') as file:
+            self.identity = file_identity(os.fstat(file.fileno()))
+            self.mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mapping) < HEADER.size:
+            raise ValueError(f'{path} is not an index file')
+        magic, version, documents, live, fingerprints, postings, url_bytes, scheme_bytes, last_url_id, last_change = \
+            HEADER.unpack_from(self.mapping)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an index file')
+        if version != VERSION:
+            raise ValueError(f'{path} has version {version} of the index file format, expected {VERSION}')
+        if fingerprints != HASH_MASK + 1:
+            raise ValueError(f'{path} indexes {fingerprints} fingerprints, expected {HASH_MASK + 1}')
+        layout, size = section_layout(documents, live, fingerprints, postings, url_bytes, scheme_bytes)
+        if len(self.mapping) < size:
+            raise ValueError(f'{path} is truncated')
+
+        sections = {name: np.frombuffer(self.mapping, dtype=dtype, count=length, offset=offset)
+                    for name, dtype, length, offset in layout}
+        self.documents = documents
+        self.live = live
+        self.last_url_id = last_url_id
+        self.last_change = last_change
+        self.offsets = sections['offsets']
+        self.postings = sections['postings']
+        self.sizes = sections['sizes'].reshape(documents, LEVELS)
+        self.scheme_of = sections['scheme_of']
+        self.level_of = sections['level_of']
+        self.url_offsets = sections['url_offsets']
+        self.urls = sections['urls']
+        self.url_keys = sections['url_keys']
+        self.url_numbers = sections['url_numbers']
+        self.schemes = json.loads(sections['schemes'].tobytes().decode('utf-8'))
+
+    def url(self, number):
+        """Returns the URL of a mapped document.
+
+        :param number: the number of the document.
+        :return: the URL
+        """
+        return self.urls[self.url_offsets[number]:self.url_offsets[number + 1]].tobytes().decode('utf-8')
+
+    def number(self, url):
+        """Looks a URL up among the mapped documents, by binary search on the sorted keys of their URLs.
+
+        :param url: the URL.
+        :return: the number of the document, or None if it is not in the file
+        """
+        key = np.uint64(url_key(url))
+        first = np.searchsorted(self.url_keys, key, side='left')
+        last = np.searchsorted(self.url_keys, key, side='right')
+        for number in self.url_numbers[first:last].tolist():
+            if self.url(number) == url:
+                return number
+        return None
+
+    def overlaps(self, fingerprints):
+        """Counts the fingerprints every mapped document has in common with the query, see InvertedIndex.overlaps.
+
+        :param fingerprints: the FingerprintSet of the query.
+        :return: an array with the number of common fingerprints of every mapped document
+        """
+        query = as_fingerprint_set(fingerprints)
+        levels = fingerprint_levels(query.hashes)
+        compared = levels >= modulus_level(query.modulus)
+        hashes, levels = query.hashes[compared], levels[compared]
+        starts, ends = self.offsets[hashes], self.offsets[hashes + 1]
+        if not len(hashes):
+            return np.zeros(self.documents, dtype=np.int64)
+
+        numbers = np.concatenate([self.postings[start:end] for start, end in zip(starts, ends)])
+        numbers = numbers[np.repeat(levels, ends - starts) >= self.level_of[numbers]]
+        return np.bincount(numbers, minlength=self.documents)
+
+    def search(self, fingerprints, scheme, exclude_url='', minimum_overlap=MINIMUM_OVERLAP, threshold=None,
+               removed=()):
+        """Finds the mapped documents similar to the query, see InvertedIndex.search.
+
+        :param removed: the URLs of the mapped documents removed since the file was written.
+        :return: a list of (url, intersection size, query size, document size) tuples
+        """
+        if scheme not in self.schemes or not self.documents:
+            return []
+        query = as_fingerprint_set(fingerprints)
+        counts = self.overlaps(query)
+        candidates, query_sizes, sizes = select_candidates(counts, query, self.scheme_of == self.schemes.index(scheme),
+                                                           self.level_of, self.sizes, minimum_overlap, threshold)
+        results = []
+        for number, query_size, size in zip(candidates.tolist(), query_sizes.tolist(), sizes.tolist()):
+            url = self.url(number)
+            if url != exclude_url and url not in removed:
+                results.append((url, int(counts[number]), int(query_size), int(size)))
+        return results
+
+
+class MappedIndex:
+    """Inverted index mapped from an index file (see write_index_file), with the same search as InvertedIndex.
+    The file is mapped read-only and never copied, so all the workers share one copy of it in the page cache and
+    start without building the index. Documents stored after the file was written are kept in an in-memory
+    InvertedIndex, the delta, and the documents removed since in a set of URLs; both are searched with the file.
+    The file, the delta and the removed URLs are replaced together when a newer file is mapped (see swap).
+    """
+
+    def __init__(self, path):
+        """The constructor for the MappedIndex.
+
+        :param path: the path of the index file.
+        """
+        self.path = path
+        self.state = (MappedFile(path), InvertedIndex(), set())
+
+    @property
+    def file(self):
+        return self.state[0]
+
+    @property
+    def delta(self):
+        return self.state[1]
+
+    @property
+    def last_url_id(self):
+        return self.file.last_url_id
+
+    @property
+    def last_change(self):
+        return self.file.last_change
+
+    def __len__(self):
+        file, delta, removed = self.state
+        return file.live - len(removed) + len(delta)
+
+    def __contains__(self, url):
+        file, delta, removed = self.state
+        return url in delta or (url not in removed and file.number(url) is not None)
+
+    def add(self, url, fingerprints, scheme, modulus=1):
+        """Adds a document stored after the file was written to the delta, see InvertedIndex.add.
+
+        :return: True if the document was added
+        """
+        file, delta, removed = self.state
+        if url not in removed and file.number(url) is not None:
+            return False
+        return delta.add(url, fingerprints, scheme, modulus)
+
+    def remove(self, url):
+        """Removes a document, from the delta or by hiding it from the results of the file.
+
+        :param url: the URL of the document.
+        :return: True if the document was indexed
+        """
+        file, delta, removed = self.state
+        if delta.remove(url):
+            return True
+        if url in removed or file.number(url) is None:
+            return False
+        removed.add(url)
+        return True
+
+    def compact(self):
+        """Compresses the postings of the delta, see InvertedIndex.compact.
+        """
+        self.delta.compact()
+
+    def search(self, fingerprints, scheme, exclude_url='', minimum_overlap=MINIMUM_OVERLAP, threshold=None):
+        """Finds the mapped and the added documents similar to the query, see InvertedIndex.search.
+
+        :return: a list of (url, intersection size, query size, document size) tuples
+        """
+        file, delta, removed = self.state
+        query = as_fingerprint_set(fingerprints)
+        return delta.search(query, scheme, exclude_url, minimum_overlap, threshold) + \
+            file.search(query, scheme, exclude_url, minimum_overlap, threshold, removed)
+
+    def replaced(self):
+        """Returns whether the index file was replaced by a newer one since it was mapped.
+
+        :return: True if the file at the path of the index is not the mapped one
+        """
+        try:
+            return file_identity(os.stat(self.path)) != self.file.identity
+        except FileNotFoundError:
+            return False
+
+    def swap(self, other):
+        """Replaces the file, the delta and the removed documents of the index with those of another MappedIndex,
+        at once for the searches running meanwhile.
+
+        :param other: the MappedIndex of the newer file, brought up to date.
+        """
+        self.state = other.state
+
+
+def open_fingerprint_index(conn, schema, arrays=False):
+    """Opens the index used by the similarity search of a worker: the index file (FINGERPRINT_INDEX_FILE) if there
+    is one, with the documents stored after it was written loaded from the database, otherwise the InvertedIndex
+    of all the stored documents.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :param arrays: whether the fingerprints are read from the fingerprint arrays of the documents.
+    :return: a MappedIndex or an InvertedIndex
+    """
+    path = index_file_path()
+    if path is None or not os.path.exists(path):
+        return load_fingerprint_index(conn, schema, arrays)
+    index = MappedIndex(path)
+    load_fingerprint_index(conn, schema, arrays, index.delta, index.last_url_id)
+    return index
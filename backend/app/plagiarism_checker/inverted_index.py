@@ -0,0 +1,288 @@
+import threading
+
+import numpy as np
+
+from .config import get_setting
+from .fingerprint_set import as_fingerprint_set
+from .postings import PostingStore
+from .schemes import HASH_MASK, hash_mask
+from .threshold import required_overlap
+
+# Sampling moduli are powers of two up to 2^20 (see budget.reduce_to_budget). Their exponent is the "level", and a
+# fingerprint is kept by the moduli whose level is at most its number of trailing zero bits.
+LEVELS = HASH_MASK.bit_length() + 1
+
+# Scheme code of the removed documents, which no scheme has
+REMOVED_SCHEME = -1
+
+# Documents need at least this many fingerprints in common with the query to be ranked, as in the SQL search
+MINIMUM_OVERLAP = 100
+
+
+def fingerprint_index_enabled():
+    """Returns whether every worker keeps the in-memory fingerprint index used for the similarity search,
+    set by FINGERPRINT_INDEX_IN_MEMORY.
+
+    :return: True if the index is loaded at worker start
+    """
+    return get_setting('FINGERPRINT_INDEX_IN_MEMORY', True)
+
+
+def indexed_scheme(scheme):
+    """Returns whether documents of a scheme can be kept in the in-memory index, which has postings for 20-bit
+    fingerprints only. Documents of the wide scheme are searched in the database.
+
+    :param scheme: the tag of the fingerprint scheme.
+    :return: True if the fingerprints of the scheme are 20-bit values
+    """
+    return hash_mask(scheme) <= HASH_MASK
+
+
+def modulus_level(modulus):
+    """Returns the exponent of a sampling modulus.
+
+    :param modulus: the sampling modulus, a power of two.
+    :return: the level of the modulus, 0 for no sampling
+    """
+    return int(modulus).bit_length() - 1
+
+
+def fingerprint_levels(hashes):
+    """Returns the highest level of sampling which keeps every fingerprint, i.e. its number of trailing zero bits.
+
+    :param hashes: an array of hashes.
+    :return: an array with the level of every hash (LEVELS - 1 for 0, which is kept at every level)
+    """
+    hashes = np.asarray(hashes, dtype=np.int64)
+    lowest_bits = hashes & -hashes
+    levels = np.full(len(hashes), LEVELS - 1, dtype=np.int8)
+    nonzero = lowest_bits != 0
+    levels[nonzero] = np.minimum(np.log2(lowest_bits[nonzero]).astype(np.int8), LEVELS - 1)
+    return levels
+
+
+def sampled_sizes(hashes):
+    """Counts the fingerprints kept at every level of sampling.
+
+    :param hashes: the distinct hashes of a document.
+    :return: an array whose element i is the number of hashes divisible by 2^i
+    """
+    counts = np.bincount(fingerprint_levels(hashes), minlength=LEVELS)
+    return np.cumsum(counts[::-1])[::-1]
+
+
+class InvertedIndex:
+    """In-memory inverted index of the stored documents: every fingerprint maps to the (ascending) numbers of the
+    documents having it, kept compressed in a PostingStore, and every document number to its URL, scheme,
+    sampling level and sizes at every level.
+    Postgres stays the source of truth, the index is built from it at worker start and documents stored by the
+    worker are added to it, so the similarity search does not need a database round trip. The documents stored or
+    deleted by other workers are applied by the change feed (see change_feed.py).
+    """
+
+    def __init__(self):
+        """The constructor for the InvertedIndex.
+        """
+        self.postings = PostingStore()
+        self.urls = []
+        self.numbers = {}
+        self.schemes = []
+        self.scheme_codes = {}
+        self.scheme_of = np.zeros(0, dtype=np.int16)
+        self.level_of = np.zeros(0, dtype=np.int8)
+        self.sizes = np.zeros((0, LEVELS), dtype=np.int32)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __contains__(self, url):
+        return url in self.numbers
+
+    def reserve(self, documents):
+        """Grows the arrays with the document attributes so that they hold at least the given number of documents.
+
+        :param documents: the number of documents.
+        """
+        capacity = len(self.scheme_of)
+        if documents <= capacity:
+            return
+        capacity = max(documents, 2 * capacity, 1024)
+        self.scheme_of = np.resize(self.scheme_of, capacity)
+        self.level_of = np.resize(self.level_of, capacity)
+        self.sizes = np.resize(self.sizes, (capacity, LEVELS))
+
+    def add(self, url, fingerprints, scheme, modulus=1):
+        """Adds a stored document to the index. URLs are unique, as in the urls table, so a document that is
+        already indexed is not added again.
+
+        :param url: the URL of the document.
+        :param fingerprints: the stored fingerprints of the document (a FingerprintSet or a list of hashes).
+        :param scheme: the scheme the fingerprints were computed with.
+        :param modulus: the sampling modulus of the document.
+        :return: True if the document was added (False for documents of the wide scheme, see indexed_scheme)
+        """
+        if not indexed_scheme(scheme):
+            return False
+        hashes = as_fingerprint_set(fingerprints).hashes
+        with self.lock:
+            if url in self.numbers:
+                return False
+
+            number = len(self.urls)
+            self.reserve(number + 1)
+            self.urls.append(url)
+            self.numbers[url] = number
+            self.scheme_of[number] = self.scheme_codes.setdefault(scheme, len(self.scheme_codes))
+            if len(self.schemes) < len(self.scheme_codes):
+                self.schemes.append(scheme)
+            self.level_of[number] = modulus_level(modulus)
+            self.sizes[number] = sampled_sizes(hashes)
+            self.postings.add(number, hashes)
+            return True
+
+    def remove(self, url):
+        """Removes a document from the index. Its postings are kept, but it is given no scheme so that it is never
+        a candidate again, and its URL can be added again as a new document.
+
+        :param url: the URL of the document.
+        :return: True if the document was indexed
+        """
+        with self.lock:
+            number = self.numbers.pop(url, None)
+            if number is None:
+                return False
+            self.scheme_of[number] = REMOVED_SCHEME
+            return True
+
+    def compact(self):
+        """Compresses the postings added since the last compaction, see PostingStore.compact.
+        """
+        with self.lock:
+            self.postings.compact()
+
+    def overlaps(self, fingerprints):
+        """Counts the fingerprints every document has in common with the query. Like in the SQL search, a sampled
+        document or query is only compared on the fingerprints divisible by the larger of both sampling moduli.
+
+        :param fingerprints: the FingerprintSet of the query.
+        :return: an array with the number of common fingerprints of every document
+        """
+        query = as_fingerprint_set(fingerprints)
+        query_level = modulus_level(query.modulus)
+        # The fingerprints the sampling of the query dropped are never compared
+        levels = fingerprint_levels(query.hashes)
+        compared = levels >= query_level
+        with self.lock:
+            documents = len(self.urls)
+            return self.postings.count(query.hashes[compared], documents, levels[compared],
+                                       self.level_of[:documents])
+
+    def search(self, fingerprints, scheme, exclude_url='', minimum_overlap=MINIMUM_OVERLAP, threshold=None):
+        """Finds the documents of the same scheme having at least minimum_overlap fingerprints in common with the
+        query, with the sizes needed for their Jaccard similarity with it. With a threshold, the documents are
+        instead those which can reach it: their size is within the bounds of the threshold and they have enough
+        fingerprints in common with the query for their size (see threshold.py).
+
+        :param fingerprints: the FingerprintSet of the query.
+        :param scheme: the scheme the query was fingerprinted with.
+        :param exclude_url: the URL of the query, which is not a result.
+        :param minimum_overlap: the minimum number of common fingerprints when no threshold is given, or an array
+        with the minimum for every sampling level the documents are compared at (see threshold.minimum_overlaps).
+        :param threshold: the minimum Jaccard similarity of the found documents, if any.
+        :return: a list of (url, intersection size, query size, document size) tuples, sizes taken at the sampling
+        level both sides are compared on
+        """
+        query = as_fingerprint_set(fingerprints)
+        counts = self.overlaps(query)
+        scheme_code = self.scheme_codes.get(scheme)
+        if scheme_code is None:
+            return []
+
+        documents = len(counts)
+        candidates, query_sizes, sizes = select_candidates(counts, query, self.scheme_of[:documents] == scheme_code,
+                                                           self.level_of[:documents], self.sizes[:documents],
+                                                           minimum_overlap, threshold)
+        excluded = self.numbers.get(exclude_url)
+        return [(self.urls[number], int(counts[number]), int(query_size), int(size))
+                for number, query_size, size in zip(candidates.tolist(), query_sizes.tolist(), sizes.tolist())
+                if number != excluded]
+
+
+def select_candidates(counts, query, same_scheme, level_of, sizes, minimum_overlap=MINIMUM_OVERLAP, threshold=None):
+    """Selects the documents to rank from their overlaps with the query, see InvertedIndex.search.
+
+    :param counts: the number of fingerprints every document has in common with the query.
+    :param query: the FingerprintSet of the query.
+    :param same_scheme: whether every document was fingerprinted with the scheme of the query.
+    :param level_of: the sampling level of every document.
+    :param sizes: the sizes of every document at every level.
+    :param minimum_overlap: the minimum number of common fingerprints (or the minimum at every level).
+    :param threshold: the minimum Jaccard similarity of the documents, if any.
+    :return: a tuple with the arrays of the numbers of the selected documents, and of the sizes of the query and of
+    the documents at the level they are compared at
+    """
+    query_level = modulus_level(query.modulus)
+    if threshold is not None:
+        minimum = 1
+    elif np.ndim(minimum_overlap):
+        minimum = np.asarray(minimum_overlap)[np.maximum(level_of, query_level)]
+    else:
+        minimum = minimum_overlap
+    candidates = np.flatnonzero((counts >= minimum) & same_scheme)
+
+    levels = np.maximum(level_of[candidates], query_level)
+    query_sizes = sampled_sizes(query.hashes)[levels]
+    document_sizes = sizes[candidates, levels]
+    if threshold is not None:
+        # t * |A| <= |B| <= |A| / t is implied by the required overlap, since |A ∩ B| <= min(|A|, |B|)
+        kept = counts[candidates] >= required_overlap(query_sizes, document_sizes, threshold)
+        candidates, query_sizes, document_sizes = candidates[kept], query_sizes[kept], document_sizes[kept]
+    return candidates, query_sizes, document_sizes
+
+
+def load_fingerprint_index(conn, schema, arrays=False, index=None, after_id=0, until_id=None):
+    """Builds the in-memory index of all the documents stored in the database, streaming them with a server-side
+    cursor so that they are never all held as rows at once.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :param arrays: whether the fingerprints are read from the fingerprint_array column of the documents instead of
+    being aggregated from url_fingerprints.
+    :param index: the InvertedIndex the documents are added to, a new one if not given.
+    :param after_id: only the documents with a larger id are loaded.
+    :param until_id: if given, only the documents with this id or a smaller one are loaded.
+    :return: the InvertedIndex of the stored documents
+    """
+    index = index if index is not None else InvertedIndex()
+    cur = conn.cursor(name='fingerprint_index')
+    try:
+        cur.itersize = 1000
+        if arrays:
+            cur.execute(
+                f"""
+                SELECT url, scheme, sampling_modulus, fingerprint_array
+                FROM {schema}.urls
+                WHERE cardinality(fingerprint_array) > 0 AND id > %(after_id)s
+                    AND (%(until_id)s IS NULL OR id <= %(until_id)s)
+                ORDER BY id
+                """, {'after_id': after_id, 'until_id': until_id}
+            )
+        else:
+            cur.execute(
+                f"""
+                SELECT u.url, u.scheme, u.sampling_modulus, array_agg(uf.fingerprint_id)
+                FROM {schema}.urls u
+                JOIN {schema}.url_fingerprints uf ON u.id = uf.url_id
+                WHERE u.id > %(after_id)s AND (%(until_id)s IS NULL OR u.id <= %(until_id)s)
+                GROUP BY u.id
+                ORDER BY u.id
+                """, {'after_id': after_id, 'until_id': until_id}
+            )
+        for url, scheme, modulus, fingerprints in cur:
+            index.add(url, fingerprints, scheme, modulus)
+        index.compact()
+    finally:
+        cur.close()
+        conn.commit()
+    return index
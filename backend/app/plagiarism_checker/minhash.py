@@ -0,0 +1,152 @@
+import hashlib
+from collections import defaultdict
+
+import numpy as np
+
+from .config import get_setting
+
+# Default LSH configuration: a signature of MINHASH_BANDS * MINHASH_ROWS values, cut into MINHASH_BANDS bands.
+# Two documents become candidates if all the rows of at least one band are equal, which happens with probability
+# 1 - (1 - s^rows)^bands for documents with Jaccard similarity s: about 98% at s = 0.5 and 81% at s = 0.4.
+DEFAULT_BANDS = 64
+DEFAULT_ROWS = 4
+
+# The MinHash permutations are h(x) = (a * x + b) mod p with a Mersenne prime p and fixed random a and b,
+# so signatures stored in the database stay comparable
+MINHASH_PRIME = 2 ** 31 - 1
+MINHASH_SEED = 20230601
+
+
+def lsh_configuration():
+    """Returns the number of bands and of rows per band of the LSH index, set by MINHASH_BANDS and MINHASH_ROWS.
+
+    :return: a tuple with the number of bands and the number of rows
+    """
+    return get_setting('MINHASH_BANDS', DEFAULT_BANDS), get_setting('MINHASH_ROWS', DEFAULT_ROWS)
+
+
+def lsh_candidates_enabled():
+    """Returns whether similar documents are searched among the documents sharing an LSH band with the query,
+    instead of among all the documents sharing a fingerprint with it, set by MINHASH_CANDIDATES.
+
+    :return: True if the candidates come from the LSH band table
+    """
+    return get_setting('MINHASH_CANDIDATES', False)
+
+
+def permutation_coefficients(permutations):
+    """Returns the coefficients of the MinHash permutations. They only depend on the seed, so the first
+    permutations are the same whatever the total number of permutations is.
+
+    :param permutations: the number of permutations.
+    :return: a tuple with the arrays of multipliers and increments
+    """
+    random = np.random.RandomState(MINHASH_SEED)
+    coefficients = random.randint(1, MINHASH_PRIME, size=(max(permutations, 1), 2), dtype=np.int64)
+    return coefficients[:permutations, 0].astype(np.uint64), coefficients[:permutations, 1].astype(np.uint64)
+
+
+def minhash_signature(hashes, permutations=None):
+    """Computes the MinHash signature of a set of fingerprints: the minimum of every permutation over the set.
+    The fraction of equal values in the signatures of two sets estimates their Jaccard similarity.
+
+    :param hashes: the hashes of the fingerprints (e.g. a FingerprintSet or an array).
+    :param permutations: the length of the signature, bands * rows of the LSH configuration if not given.
+    :return: an array of uint32 values (all equal to the prime for an empty set)
+    """
+    if permutations is None:
+        bands, rows = lsh_configuration()
+        permutations = bands * rows
+
+    values = np.asarray(getattr(hashes, 'hashes', hashes), dtype=np.uint64)
+    if len(values) == 0:
+        return np.full(permutations, MINHASH_PRIME, dtype=np.uint32)
+
+    multipliers, increments = permutation_coefficients(permutations)
+    permuted = (multipliers[:, None] * values[None, :] + increments[:, None]) % np.uint64(MINHASH_PRIME)
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_keys(signature, bands=None, rows=None):
+    """Computes the LSH keys of a signature: one 64-bit key for every band, derived from the band number and the
+    values of its rows, so that equal keys mean equal bands.
+
+    :param signature: the MinHash signature.
+    :param bands: the number of bands, MINHASH_BANDS if not given.
+    :param rows: the number of rows per band, MINHASH_ROWS if not given.
+    :return: a list with the signed 64-bit key of every band (signed so they fit a bigint column)
+    """
+    if bands is None or rows is None:
+        bands, rows = lsh_configuration()
+
+    signature = np.ascontiguousarray(signature, dtype='<u4')
+    keys = []
+    for band in range(bands):
+        digest = hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8,
+                                 person=f'lsh{rows}-{band}'.encode('utf-8')[:16])
+        keys.append(int.from_bytes(digest.digest(), 'big', signed=True))
+    return keys
+
+
+def estimate_jaccard(first, second):
+    """Estimates the Jaccard similarity of two sets from their MinHash signatures.
+
+    :param first: the signature of the first set.
+    :param second: the signature of the second set.
+    :return: the fraction of equal signature values
+    """
+    return float(np.mean(np.asarray(first) == np.asarray(second)))
+
+
+def candidate_probability(similarity, bands=None, rows=None):
+    """Computes the probability that two documents with the given Jaccard similarity share an LSH band,
+    useful for picking the configuration.
+
+    :param similarity: the Jaccard similarity of the documents.
+    :param bands: the number of bands, MINHASH_BANDS if not given.
+    :param rows: the number of rows per band, MINHASH_ROWS if not given.
+    :return: the probability of the documents being candidates of each other
+    """
+    if bands is None or rows is None:
+        bands, rows = lsh_configuration()
+    return 1 - (1 - similarity ** rows) ** bands
+
+
+class LSHIndex:
+    """In-memory LSH band table, mapping every band key to the documents having it.
+    The database keeps the same table (lsh_bands); this one is used where no database is involved.
+    """
+
+    def __init__(self, bands=None, rows=None):
+        """The constructor for the LSHIndex.
+
+        :param bands: the number of bands, MINHASH_BANDS if not given.
+        :param rows: the number of rows per band, MINHASH_ROWS if not given.
+        """
+        if bands is None or rows is None:
+            bands, rows = lsh_configuration()
+        self.bands = bands
+        self.rows = rows
+        self.buckets = defaultdict(set)
+
+    def add(self, document, hashes):
+        """Adds a document to the index.
+
+        :param document: the identifier of the document.
+        :param hashes: the hashes of the fingerprints of the document.
+        """
+        signature = minhash_signature(hashes, self.bands * self.rows)
+        for key in band_keys(signature, self.bands, self.rows):
+            self.buckets[key].add(document)
+
+    def candidates(self, hashes):
+        """Finds the documents sharing at least one band with the given fingerprints.
+
+        :param hashes: the hashes of the fingerprints of the query.
+        :return: the set of candidate documents
+        """
+        signature = minhash_signature(hashes, self.bands * self.rows)
+        found = set()
+        for key in band_keys(signature, self.bands, self.rows):
+            found.update(self.buckets.get(key, ()))
+        return found
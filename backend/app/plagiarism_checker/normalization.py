@@ -0,0 +1,79 @@
+import re
+
+import numpy as np
+
+# Same character class the `winnowing` package uses in its sanitize step
+WORD_PATTERN = re.compile(r"\w", re.UNICODE)
+
+
+class SanitizeTable(dict):
+    """Translation table for str.translate implementing the sanitize step of the `winnowing` package:
+    every character is lower-cased on its own and dropped unless the lower-cased value starts with a word character.
+    The table is filled lazily, so every distinct character is looked at only once per process.
+    """
+
+    def __missing__(self, code):
+        lowered = chr(code).lower()
+        value = lowered if WORD_PATTERN.match(lowered) is not None else None
+        self[code] = value
+        return value
+
+    def byte_length(self, code):
+        """Returns the length of the sanitized character in UTF-8.
+
+        :param code: the code point of the original character.
+        :return: the number of bytes, 0 if the character is dropped
+        """
+        value = self[code]
+        return len(value.encode("utf-8")) if value is not None else 0
+
+
+# The table shared by all the fingerprint schemes of this process
+sanitize_table = SanitizeTable()
+
+
+def normalize_text(text):
+    """Sanitizes a whole text at once, without keeping track of where the characters came from.
+    The result is the same as joining the characters returned by `winnowing.sanitize` on the enumerated text.
+
+    :param text: the text to be sanitized.
+    :return: the sanitized text
+    """
+    return text.translate(sanitize_table)
+
+
+def kept_positions(text):
+    """Finds the characters of a text that are kept by the sanitize step, without sanitizing the text.
+
+    :param text: the text to be sanitized.
+    :return: an array with the positions of the kept characters in the text
+    """
+    codes = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype="<u4")
+    unique_codes, inverse = np.unique(codes, return_inverse=True)
+    keep_table = np.array([sanitize_table[code] is not None for code in unique_codes.tolist()], dtype=bool)
+    return np.flatnonzero(keep_table[inverse])
+
+
+def sanitize_text(text, positions=True):
+    """Vectorized equivalent of `winnowing.sanitize` applied on the enumerated text.
+    The decision of keeping a character is taken once per distinct character and then broadcast over the whole
+    text with NumPy. The mapping from the kept characters back to the original text is only built if requested.
+
+    :param text: the text to be sanitized.
+    :param positions: whether the original positions of the kept characters are needed.
+    :return: a tuple containing the sanitized text encoded as UTF-8, the original positions of the kept characters
+    (None if not requested), the UTF-8 byte offsets of every kept character inside the sanitized text
+    (one extra offset for the end) and the code points of the kept characters
+    """
+    codes = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype="<u4")
+    unique_codes, inverse = np.unique(codes, return_inverse=True)
+    length_table = np.array([sanitize_table.byte_length(code) for code in unique_codes.tolist()], dtype=np.int64)
+
+    lengths = length_table[inverse]
+    kept = lengths > 0
+    lengths = lengths[kept]
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    sanitized = normalize_text(text).encode("utf-8")
+    return sanitized, np.flatnonzero(kept) if positions else None, offsets, codes[kept]
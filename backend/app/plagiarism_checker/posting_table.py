@@ -0,0 +1,179 @@
+import numpy as np
+
+from .config import get_setting
+from .postings import decode_ids, encode_ids
+
+# Default of POSTINGS_APPEND_BATCH: documents are appended to the fingerprint_postings table once this many of them
+# are waiting, so that a fingerprint gets one segment per batch instead of one row per document
+DEFAULT_APPEND_BATCH = 100
+
+# The segment all the segments of a fingerprint are merged into (appended segments are numbered by the
+# fingerprint_postings_segments sequence, see sql_migrations/0010_posting_segments.sql)
+COMPACTED_SEGMENT = 0
+
+
+def append_batch_size():
+    """Returns the number of documents appended to the fingerprint_postings table at once, set by
+    POSTINGS_APPEND_BATCH.
+
+    :return: the number of documents
+    """
+    return get_setting('POSTINGS_APPEND_BATCH', DEFAULT_APPEND_BATCH)
+
+
+def group_postings(ids, hashes):
+    """Groups postings by fingerprint, encoding the ids of every fingerprint as one blob.
+
+    :param ids: the document id of every posting.
+    :param hashes: the fingerprint of every posting.
+    :return: a tuple with the arrays of the fingerprints and of their numbers of ids, and the list of the encoded
+    blobs
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    hashes = np.asarray(hashes, dtype=np.int64)
+    order = np.lexsort((ids, hashes))
+    ids, hashes = ids[order], hashes[order]
+    starts = np.flatnonzero(np.concatenate(([True], hashes[1:] != hashes[:-1]))) if len(hashes) else \
+        np.zeros(0, dtype=np.int64)
+    ends = np.append(starts[1:], len(hashes))
+    groups = [np.unique(ids[start:end]) for start, end in zip(starts.tolist(), ends.tolist())]
+    counts = np.array([len(group) for group in groups], dtype=np.int64)
+    return hashes[starts], counts, [encode_ids(group) for group in groups]
+
+
+def append_postings(conn, schema, batch_size=None, minimum=1):
+    """Appends a batch of the documents which are not in the fingerprint_postings table yet: one new segment for
+    every fingerprint of the batch, all numbered with the next value of the fingerprint_postings_segments sequence.
+    Documents being appended by another worker are skipped.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :param batch_size: the maximum number of appended documents, POSTINGS_APPEND_BATCH if not given.
+    :param minimum: nothing is appended if fewer documents are waiting.
+    :return: the number of appended documents
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            SELECT u.id, array_remove(array_agg(uf.fingerprint_id), NULL)
+            FROM (
+                SELECT id FROM {schema}.urls WHERE NOT postings_appended ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED
+            ) u
+            LEFT JOIN {schema}.url_fingerprints uf ON uf.url_id = u.id
+            GROUP BY u.id
+            """, (batch_size if batch_size is not None else append_batch_size(),)
+        )
+        documents = cur.fetchall()
+        if not documents or len(documents) < minimum:
+            conn.rollback()
+            return 0
+
+        ids = np.concatenate([np.full(len(fingerprints), doc_id, dtype=np.int64)
+                              for doc_id, fingerprints in documents])
+        hashes = np.concatenate([np.asarray(fingerprints, dtype=np.int64) for _, fingerprints in documents])
+        fingerprints, counts, blobs = group_postings(ids, hashes)
+        cur.execute(f"SELECT nextval('{schema}.fingerprint_postings_segments')")
+        segment = cur.fetchone()[0]
+        cur.execute(
+            f"""
+            INSERT INTO {schema}.fingerprint_postings (fingerprint, segment, document_count, postings)
+            SELECT fingerprint, %s, document_count, postings
+            FROM unnest(%s::integer[], %s::integer[], %s::bytea[]) AS a(fingerprint, document_count, postings)
+            """, (segment, fingerprints.tolist(), counts.tolist(), blobs)
+        )
+        cur.execute(f"UPDATE {schema}.urls SET postings_appended = true WHERE id = ANY(%s)",
+                    ([doc_id for doc_id, _ in documents],))
+        conn.commit()
+        return len(documents)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def compact_postings(conn, schema, batch_size=65536):
+    """Merges the segments of every fingerprint into a single one, a range of fingerprint values at a time. Only
+    the segments read by the compaction are replaced, so documents can be appended meanwhile; compactions must not
+    run concurrently.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :param batch_size: the number of consecutive fingerprint values compacted in one transaction.
+    :return: the number of fingerprints whose segments were merged
+    """
+    compacted = 0
+    cur = conn.cursor()
+    try:
+        start = 0
+        while True:
+            # Fingerprints of the wide scheme are sparse over 31 bits: ranges without postings are skipped
+            cur.execute(f"SELECT min(fingerprint) FROM {schema}.fingerprint_postings WHERE fingerprint >= %s",
+                        (start,))
+            start = cur.fetchone()[0]
+            if start is None:
+                conn.commit()
+                break
+            cur.execute(
+                f"""
+                SELECT fingerprint, array_agg(segment), array_agg(postings)
+                FROM {schema}.fingerprint_postings
+                WHERE fingerprint >= %s AND fingerprint < %s
+                GROUP BY fingerprint
+                HAVING count(*) > 1
+                """, (start, start + batch_size)
+            )
+            rows = cur.fetchall()
+            start += batch_size
+            if not rows:
+                conn.commit()
+                continue
+
+            merged = [np.unique(np.concatenate([decode_ids(blob) for blob in blobs])) for _, _, blobs in rows]
+            cur.execute(
+                f"""
+                DELETE FROM {schema}.fingerprint_postings p
+                USING unnest(%s::integer[], %s::integer[]) AS d(fingerprint, segment)
+                WHERE p.fingerprint = d.fingerprint AND p.segment = d.segment
+                """, ([fingerprint for fingerprint, segments, _ in rows for _ in segments],
+                      [segment for _, segments, _ in rows for segment in segments])
+            )
+            cur.execute(
+                f"""
+                INSERT INTO {schema}.fingerprint_postings (fingerprint, segment, document_count, postings)
+                SELECT fingerprint, {COMPACTED_SEGMENT}, document_count, postings
+                FROM unnest(%s::integer[], %s::integer[], %s::bytea[]) AS m(fingerprint, document_count, postings)
+                """, ([fingerprint for fingerprint, _, _ in rows], [len(ids) for ids in merged],
+                      [encode_ids(ids) for ids in merged])
+            )
+            conn.commit()
+            compacted += len(rows)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return compacted
+
+
+def read_postings(cur, schema, hashes):
+    """Reads the postings of the given fingerprints: a single row per fingerprint once compacted.
+
+    :param cur: the database cursor.
+    :param schema: the schema containing the news tables.
+    :param hashes: the hashes of the fingerprints.
+    :return: a tuple with the arrays of the document ids of the postings and of the hash they belong to
+    """
+    cur.execute(
+        f"""
+        SELECT fingerprint, postings FROM {schema}.fingerprint_postings
+        WHERE fingerprint = ANY(%s)
+        """, ([int(shingle_hash) for shingle_hash in hashes],)
+    )
+    decoded = [(fingerprint, decode_ids(blob)) for fingerprint, blob in cur.fetchall()]
+    if not decoded:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    ids = np.concatenate([ids for _, ids in decoded])
+    owners = np.concatenate([np.full(len(ids), fingerprint, dtype=np.int64) for fingerprint, ids in decoded])
+    return ids, owners
@@ -0,0 +1,334 @@
+import numpy as np
+
+from .config import get_setting
+from .schemes import HASH_MASK
+
+# Encodings of a posting list: the gaps between consecutive document numbers as varints, or a bitmap with a bit
+# for every document number up to the last one
+DELTA = 0
+BITMAP = 1
+
+# Default of POSTINGS_COMPACTION_THRESHOLD: postings added since the last compaction are kept uncompressed until
+# there are more than this many of them (or more than an eighth of the compressed ones)
+DEFAULT_COMPACTION_THRESHOLD = 100000
+
+
+def compaction_threshold():
+    """Returns the minimum number of uncompressed postings that triggers a compaction, set by
+    POSTINGS_COMPACTION_THRESHOLD.
+
+    :return: the number of postings
+    """
+    return get_setting('POSTINGS_COMPACTION_THRESHOLD', DEFAULT_COMPACTION_THRESHOLD)
+
+
+def varint_sizes(values):
+    """Counts the bytes needed to encode every value as a varint (7 bits per byte).
+
+    :param values: an array of non-negative integers.
+    :return: an array with the number of bytes of every value
+    """
+    values = np.asarray(values, dtype=np.int64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 63, 7):
+        sizes += values >= (1 << shift)
+    return sizes
+
+
+def encode_varints(values):
+    """Encodes non-negative integers as varints: 7 bits per byte, least significant first, with the high bit set
+    on every byte but the last one of a value.
+
+    :param values: an array of non-negative integers.
+    :return: a uint8 array with the encoded values
+    """
+    values = np.asarray(values, dtype=np.int64)
+    sizes = varint_sizes(values)
+    starts = np.cumsum(sizes) - sizes
+    encoded = np.empty(int(sizes.sum()), dtype=np.uint8)
+    for byte in range(int(sizes.max(initial=0))):
+        present = sizes > byte
+        continued = sizes[present] > byte + 1
+        encoded[starts[present] + byte] = ((values[present] >> (7 * byte)) & 0x7F) | (continued << 7)
+    return encoded
+
+
+def decode_varints(encoded):
+    """Decodes the varints written by encode_varints.
+
+    :param encoded: a uint8 array with the encoded values.
+    :return: an int64 array with the values
+    """
+    encoded = np.asarray(encoded, dtype=np.uint8)
+    if len(encoded) == 0:
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(encoded < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    shifts = 7 * (np.arange(len(encoded)) - np.repeat(starts, ends - starts + 1))
+    return np.add.reduceat((encoded & 0x7F).astype(np.int64) << shifts, starts)
+
+
+def segment_offsets(lengths):
+    """Returns where every segment starts in the concatenation of segments of the given lengths.
+
+    :param lengths: an array with the length of every segment.
+    :return: an array with the start of every segment
+    """
+    return np.cumsum(lengths) - lengths
+
+
+def encode_bitmap(numbers):
+    """Encodes ascending document numbers as a bitmap.
+
+    :param numbers: the document numbers.
+    :return: a uint8 array with a bit for every number from 0 to the last one
+    """
+    bits = np.zeros(int(numbers[-1]) + 1, dtype=bool)
+    bits[numbers] = True
+    return np.packbits(bits)
+
+
+def decode_bitmap(encoded):
+    """Decodes a bitmap written by encode_bitmap.
+
+    :param encoded: a uint8 array with the bitmap.
+    :return: an int64 array with the document numbers
+    """
+    return np.flatnonzero(np.unpackbits(encoded)).astype(np.int64)
+
+
+def encode_ids(ids):
+    """Encodes ascending document ids as a self-contained blob: the gaps between consecutive ids (the first one from
+    0) as varints, as stored in the fingerprint_postings table.
+
+    :param ids: the ascending distinct ids.
+    :return: the encoded bytes
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    return encode_varints(np.diff(ids, prepend=0)).tobytes()
+
+
+def decode_ids(blob):
+    """Decodes a blob written by encode_ids.
+
+    :param blob: the encoded bytes (bytes, or a memoryview as read from a bytea column).
+    :return: an int64 array with the ascending ids
+    """
+    return np.cumsum(decode_varints(np.frombuffer(bytes(blob), dtype=np.uint8)))
+
+
+class PostingStore:
+    """Compressed posting lists, mapping every fingerprint to the ascending numbers of the documents having it.
+    All the lists are kept in one byte buffer: a list is either delta encoded (varint gaps) or a bitmap, whichever
+    is smaller, so sparse lists cost one or two bytes per posting and very common fingerprints one bit per document.
+    Postings are added for increasing document numbers and kept uncompressed until the next compaction.
+    """
+
+    def __init__(self, fingerprints=HASH_MASK + 1):
+        """The constructor for the PostingStore.
+
+        :param fingerprints: the number of possible fingerprints (hashes are between 0 and this number - 1).
+        """
+        self.kinds = np.zeros(fingerprints, dtype=np.uint8)
+        self.offsets = np.zeros(fingerprints + 1, dtype=np.int64)
+        self.counts = np.zeros(fingerprints, dtype=np.int64)
+        self.lasts = np.full(fingerprints, -1, dtype=np.int64)
+        self.data = np.zeros(0, dtype=np.uint8)
+        self.pending_numbers = []
+        self.pending_hashes = []
+        self.pending = 0
+        self.last_number = -1
+
+    def __len__(self):
+        return int(self.counts.sum()) + self.pending
+
+    def add(self, number, hashes):
+        """Adds the postings of a document.
+
+        :param number: the number of the document, larger than the number of every document added before.
+        :param hashes: the distinct hashes of the document.
+        """
+        hashes = np.asarray(hashes, dtype=np.int64)
+        self.extend(np.full(len(hashes), number, dtype=np.int64), hashes)
+
+    def extend(self, numbers, hashes):
+        """Adds postings of several documents at once, compacting the store if there are enough new postings.
+
+        :param numbers: the document number of every posting, larger than the numbers added before.
+        :param hashes: the hash of every posting, without repetitions for a document.
+        """
+        numbers = np.asarray(numbers, dtype=np.int64)
+        if len(numbers) == 0:
+            return
+        if numbers.min() <= self.last_number:
+            raise ValueError('Postings have to be added for increasing document numbers')
+
+        self.pending_numbers.append(numbers)
+        self.pending_hashes.append(np.asarray(hashes, dtype=np.int64))
+        self.pending += len(numbers)
+        self.last_number = int(numbers.max())
+        if self.pending > max(compaction_threshold(), int(self.counts.sum()) // 8):
+            self.compact()
+
+    def pending_postings(self):
+        """Returns the postings added since the last compaction, as one array of hashes and one of numbers.
+
+        :return: a tuple with the hashes and the document numbers
+        """
+        if len(self.pending_hashes) > 1:
+            self.pending_hashes = [np.concatenate(self.pending_hashes)]
+            self.pending_numbers = [np.concatenate(self.pending_numbers)]
+        if not self.pending_hashes:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return self.pending_hashes[0], self.pending_numbers[0]
+
+    def decode(self, shingle_hash):
+        """Decodes the compressed postings of a single fingerprint.
+
+        :param shingle_hash: the hash of the fingerprint.
+        :return: an array with the ascending document numbers
+        """
+        encoded = self.data[self.offsets[shingle_hash]:self.offsets[shingle_hash + 1]]
+        if self.kinds[shingle_hash] == BITMAP:
+            return decode_bitmap(encoded)
+        return np.cumsum(decode_varints(encoded) + 1) - 1
+
+    def compact(self):
+        """Merges the uncompressed postings into the compressed buffer. The new gaps are appended to the delta
+        encoded lists, and the lists for which a bitmap is smaller (or which already are bitmaps) are encoded again.
+        """
+        hashes, numbers = self.pending_postings()
+        if len(hashes) == 0:
+            return
+        order = np.lexsort((numbers, hashes))
+        hashes, numbers = hashes[order], numbers[order]
+
+        touched, first, new_counts = np.unique(hashes, return_index=True, return_counts=True)
+        previous = np.empty(len(numbers), dtype=np.int64)
+        previous[1:] = numbers[:-1]
+        previous[first] = self.lasts[touched]
+        gaps = numbers - previous - 1
+        gap_sizes = varint_sizes(gaps)
+        new_bytes = np.add.reduceat(gap_sizes, first)
+
+        old_sizes = self.offsets[touched + 1] - self.offsets[touched]
+        lasts = numbers[first + new_counts - 1]
+        bitmap_sizes = lasts // 8 + 1
+        reencoded = (self.kinds[touched] == BITMAP) | (bitmap_sizes < old_sizes + new_bytes)
+
+        # Lists encoded again are decoded before the buffer changes
+        replacements = []
+        for index in np.flatnonzero(reencoded).tolist():
+            shingle_hash = int(touched[index])
+            postings = np.concatenate((self.decode(shingle_hash),
+                                       numbers[first[index]:first[index] + new_counts[index]]))
+            gaps_of_list = np.diff(postings, prepend=-1) - 1
+            bitmap = bitmap_sizes[index] < varint_sizes(gaps_of_list).sum()
+            self.kinds[shingle_hash] = BITMAP if bitmap else DELTA
+            replacements.append((shingle_hash, encode_bitmap(postings) if bitmap else encode_varints(gaps_of_list)))
+
+        # The new gaps of the other lists are inserted at the end of their old bytes, all at once
+        byte_lists = np.repeat(np.arange(len(touched)), new_bytes)
+        appended = ~reencoded[byte_lists]
+        sizes = np.diff(self.offsets)
+        sizes[touched[~reencoded]] += new_bytes[~reencoded]
+        data = np.insert(self.data, self.offsets[touched + 1][byte_lists[appended]],
+                         encode_varints(gaps)[appended])
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+
+        pieces = []
+        cursor = 0
+        for shingle_hash, encoded in replacements:
+            pieces.append(data[cursor:offsets[shingle_hash]])
+            pieces.append(encoded)
+            cursor = offsets[shingle_hash + 1]
+            sizes[shingle_hash] = len(encoded)
+        pieces.append(data[cursor:])
+
+        self.data = np.concatenate(pieces) if replacements else data
+        self.offsets[1:] = np.cumsum(sizes)
+        self.counts[touched] += new_counts
+        self.lasts[touched] = lasts
+        self.pending_numbers = []
+        self.pending_hashes = []
+        self.pending = 0
+
+    def postings(self, hashes, bitmaps=True):
+        """Finds the postings of the given fingerprints, compressed and pending.
+
+        :param hashes: the sorted distinct hashes of the query.
+        :param bitmaps: whether the lists stored as bitmaps are decoded as well.
+        :return: a tuple with the document number of every posting and the index (in hashes) of its fingerprint
+        """
+        hashes = np.asarray(hashes, dtype=np.int64)
+        counts = self.counts[hashes]
+        delta = np.flatnonzero((counts > 0) & (self.kinds[hashes] == DELTA))
+        bitmap = np.flatnonzero((counts > 0) & (self.kinds[hashes] == BITMAP)) if bitmaps else delta[:0]
+
+        # All the delta encoded lists are decoded at once, the gaps of a list add up to its document numbers
+        starts = self.offsets[hashes[delta]]
+        ends = self.offsets[hashes[delta] + 1]
+        gaps = decode_varints(np.concatenate([self.data[start:end] for start, end in zip(starts, ends)])
+                              if len(delta) else [])
+        lengths = counts[delta]
+        totals = np.cumsum(gaps + 1)
+        list_starts = segment_offsets(lengths)
+        bases = totals[list_starts] - gaps[list_starts] - 1 if len(gaps) else totals[:0]
+        numbers = [totals - np.repeat(bases, lengths) - 1]
+        owners = [np.repeat(delta, lengths)]
+
+        # The bitmaps as well, the set bits of a bitmap are as many as its postings
+        if len(bitmap):
+            starts = self.offsets[hashes[bitmap]]
+            ends = self.offsets[hashes[bitmap] + 1]
+            bits = np.unpackbits(np.concatenate([self.data[start:end] for start, end in zip(starts, ends)]))
+            bit_starts = 8 * segment_offsets(ends - starts)
+            numbers.append(np.flatnonzero(bits) - np.repeat(bit_starts, counts[bitmap]))
+            owners.append(np.repeat(bitmap, counts[bitmap]))
+
+        if self.pending:
+            pending_hashes, pending_numbers = self.pending_postings()
+            positions = np.searchsorted(hashes, pending_hashes)
+            positions[positions == len(hashes)] = 0
+            found = hashes[positions] == pending_hashes if len(hashes) else np.zeros(len(pending_hashes), bool)
+            numbers.append(pending_numbers[found])
+            owners.append(positions[found])
+
+        return np.concatenate(numbers), np.concatenate(owners)
+
+    def count(self, hashes, documents, levels=None, document_levels=None):
+        """Counts the given fingerprints every document has. The sparse lists are counted with np.bincount over
+        their postings, the bitmaps are added up as they are, without listing their postings.
+        With levels, a fingerprint is only counted for the documents whose level is at most its own level.
+
+        :param hashes: the sorted distinct hashes of the query.
+        :param documents: the number of documents.
+        :param levels: the level of every hash, if the documents are filtered by level.
+        :param document_levels: the level of every document, if the documents are filtered by level.
+        :return: an array with the number of fingerprints of every document
+        """
+        hashes = np.asarray(hashes, dtype=np.int64)
+        numbers, owners = self.postings(hashes, bitmaps=False)
+        if levels is not None:
+            numbers = numbers[levels[owners] >= document_levels[numbers]]
+        counts = np.bincount(numbers, minlength=documents)
+
+        bitmap = np.flatnonzero((self.counts[hashes] > 0) & (self.kinds[hashes] == BITMAP))
+        bitmap_levels = levels[bitmap] if levels is not None else np.zeros(len(bitmap), dtype=np.int64)
+        for level in np.unique(bitmap_levels).tolist():
+            dense = np.zeros(documents, dtype=np.int64)
+            for shingle_hash in hashes[bitmap[bitmap_levels == level]].tolist():
+                bits = np.unpackbits(self.data[self.offsets[shingle_hash]:self.offsets[shingle_hash + 1]])
+                dense[:len(bits)] += bits[:documents]
+            if levels is not None:
+                dense[document_levels > level] = 0
+            counts += dense
+        return counts
+
+    def memory_bytes(self):
+        """Returns the memory used by the store, for the benchmarks.
+
+        :return: the size of all the arrays of the store in bytes
+        """
+        arrays = [self.data, self.kinds, self.offsets, self.counts, self.lasts]
+        return sum(array.nbytes for array in arrays + self.pending_numbers + self.pending_hashes)
@@ -0,0 +1,128 @@
+import threading
+
+import numpy as np
+
+from .schemes import HASH_MASK
+
+
+def load_stored_fingerprints(conn, schema):
+    """Reads every fingerprint of the fingerprints table.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :return: an array with the hashes
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT fingerprint FROM {schema}.fingerprints")
+        return np.array([fingerprint for fingerprint, in cur.fetchall()], dtype=np.int64)
+    finally:
+        conn.commit()
+        cur.close()
+
+
+class FingerprintPresence:
+    """Bitmap with a bit for every possible fingerprint, set if a stored document has it: 2^20 bits, i.e. 128 KB,
+    instead of a set of boxed ints, and a whole query is looked up at once.
+    The bitmap is loaded from the fingerprints table on its first lookup, and kept current by setting the bits of
+    the fingerprints stored since (by this worker or, through the change feed, by the others). Bits are never
+    cleared when documents are deleted, so a fingerprint may be reported present when no document has it anymore,
+    which only costs the search a lookup that finds nothing.
+    Fingerprints of the wide scheme are beyond the bitmap: they are never reported present, see covers.
+    """
+
+    def __init__(self, load=None, fingerprints=HASH_MASK + 1):
+        """The constructor for the FingerprintPresence.
+
+        :param load: a function returning the stored fingerprints, called on the first lookup (None for an empty
+        bitmap).
+        :param fingerprints: the number of possible fingerprints (hashes are between 0 and this number - 1).
+        """
+        self.fingerprints = fingerprints
+        self.bits = np.zeros((fingerprints + 7) // 8, dtype=np.uint8)
+        self.loader = load
+        self.load = load
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        self.ensure_loaded()
+        return int(np.unpackbits(self.bits).sum())
+
+    def __contains__(self, shingle_hash):
+        return bool(self.contains([shingle_hash])[0])
+
+    def ensure_loaded(self):
+        """Loads the stored fingerprints, the first time the bitmap is used.
+        """
+        if self.load is None:
+            return
+        with self.lock:
+            if self.load is not None:
+                self.set_bits(self.load())
+                self.load = None
+
+    def covers(self, hashes):
+        """Returns whether the bitmap has a bit for every one of the given fingerprints, which is not the case for
+        fingerprints of the wide scheme.
+
+        :param hashes: an array of hashes.
+        :return: True if all the hashes are below the number of possible fingerprints
+        """
+        hashes = np.asarray(hashes, dtype=np.int64)
+        return not len(hashes) or int(hashes.max()) < self.fingerprints
+
+    def set_bits(self, hashes):
+        """Sets the bits of the given fingerprints, except of those beyond the bitmap.
+
+        :param hashes: the hashes.
+        """
+        hashes = np.asarray(hashes, dtype=np.int64)
+        hashes = hashes[hashes < self.fingerprints]
+        np.bitwise_or.at(self.bits, hashes >> 3, np.left_shift(1, hashes & 7).astype(np.uint8))
+
+    def contains(self, hashes):
+        """Looks fingerprints up.
+
+        :param hashes: an array of hashes.
+        :return: a boolean array, True for the hashes some stored document has (False beyond the bitmap)
+        """
+        self.ensure_loaded()
+        hashes = np.asarray(hashes, dtype=np.int64)
+        inside = hashes < self.fingerprints
+        present = np.zeros(len(hashes), dtype=bool)
+        covered = hashes[inside]
+        present[inside] = (self.bits[covered >> 3] >> (covered & 7).astype(np.uint8) & 1).astype(bool)
+        return present
+
+    def missing(self, hashes):
+        """Selects the fingerprints which no stored document has.
+
+        :param hashes: an array of hashes.
+        :return: the array of the hashes whose bit is not set (all the hashes beyond the bitmap, which are inserted
+        and left to the ON CONFLICT clause)
+        """
+        hashes = np.asarray(hashes, dtype=np.int64)
+        return hashes[~self.contains(hashes)]
+
+    def update(self, hashes):
+        """Records newly stored fingerprints. The bitmap does not need to be loaded, the stored fingerprints are
+        added to these.
+
+        :param hashes: an iterable of hashes.
+        """
+        self.set_bits(hashes if hasattr(hashes, '__len__') else list(hashes))
+
+    def clear(self):
+        """Empties the bitmap, as after deleting all the stored fingerprints.
+        """
+        with self.lock:
+            self.load = None
+            self.bits[:] = 0
+
+    def reload(self):
+        """Empties the bitmap and loads the stored fingerprints again on the next lookup, after the fingerprints
+        table was changed other than by storing documents (e.g. emptied).
+        """
+        with self.lock:
+            self.load = self.loader
+            self.bits[:] = 0
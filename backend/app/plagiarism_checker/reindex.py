@@ -0,0 +1,563 @@
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2 import extras
+
+from .budget import fingerprint_budget, sample_long_articles
+from .change_feed import record_reindex
+from .config import get_setting
+from .crawling import crawl_url
+from .fingerprint_pool import batch_statistics, compute_fingerprint_sets_batch
+from .minhash import band_keys, lsh_configuration, minhash_signature
+from .schemes import default_scheme, validate_scheme
+from .storage import ARRAYS, fingerprint_storage
+
+# Tables derived from the fingerprints of the documents. They are rebuilt in the shadow schema while the live ones
+# keep serving, and swapped in at once. url_fingerprints references fingerprints, so the order matters.
+SHADOW_TABLES = ('fingerprints', 'url_fingerprints', 'url_minhash', 'lsh_bands', 'fingerprint_postings')
+
+# Number of documents fingerprinted and written in one transaction
+DEFAULT_BATCH_SIZE = 500
+
+# Number of articles crawled at once, for the documents whose text was not kept
+CRAWL_THREADS = 8
+
+# Reasons a document could not be fingerprinted again, recorded in reindex_failures
+NO_TEXT = 'no text'
+NO_FINGERPRINTS = 'no fingerprints'
+OVER_BUDGET = 'over budget'
+
+# Bookkeeping of a reindex, next to the shadow tables: its target scheme and the last document it wrote (so that it
+# can be resumed), the columns of urls derived from the new fingerprints, copied into urls at the cutover, and the
+# documents it could not fingerprint
+REINDEX_TABLES = """
+CREATE TABLE {shadow}.reindex_state (
+    id boolean PRIMARY KEY DEFAULT true CHECK (id),
+    scheme text NOT NULL,
+    last_url_id integer NOT NULL DEFAULT 0,
+    reindexed integer NOT NULL DEFAULT 0,
+    failed integer NOT NULL DEFAULT 0,
+    started_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE {shadow}.reindexed_urls (
+    url_id integer PRIMARY KEY REFERENCES {schema}.urls (id) ON DELETE CASCADE,
+    scheme text NOT NULL,
+    sampling_modulus integer NOT NULL,
+    fingerprint_count integer NOT NULL,
+    fingerprint_array integer[] NOT NULL
+);
+
+CREATE TABLE {shadow}.reindex_failures (
+    url_id integer PRIMARY KEY REFERENCES {schema}.urls (id) ON DELETE CASCADE,
+    reason text NOT NULL
+);
+"""
+
+
+def article_texts_enabled():
+    """Returns whether the text of every stored article is kept in the article_texts table, set by ARTICLE_TEXTS.
+    Without it, the documents have to be crawled again when the fingerprinting changes.
+
+    :return: True if the texts are stored with the documents
+    """
+    return get_setting('ARTICLE_TEXTS', True)
+
+
+def shadow_schema(schema):
+    """Returns the name of the schema the fingerprint tables are rebuilt in.
+
+    :param schema: the schema containing the news tables.
+    :return: the name of the shadow schema
+    """
+    return f'{schema}_reindex'
+
+
+def retired_schema(schema):
+    """Returns the name of the schema the replaced fingerprint tables are moved to by the cutover, where they are
+    kept until the next reindex.
+
+    :param schema: the schema containing the news tables.
+    :return: the name of the retired schema
+    """
+    return f'{schema}_retired'
+
+
+def to_shadow(definition, schema, shadow):
+    """Rewrites the definition of an index or constraint of a live fingerprint table for the shadow tables: the
+    fingerprint tables it refers to are the ones of the shadow schema, urls stays the live one, and indexes are
+    only created if they do not exist yet.
+
+    :param definition: the definition, from pg_get_indexdef or pg_get_constraintdef.
+    :param schema: the schema containing the news tables.
+    :param shadow: the shadow schema.
+    :return: the rewritten definition
+    """
+    tables = '|'.join(SHADOW_TABLES)
+    definition = re.sub(rf'\b{re.escape(schema)}\.({tables})\b', rf'{shadow}.\1', definition)
+    return re.sub(r'^CREATE (UNIQUE )?INDEX (?!IF NOT EXISTS )', r'CREATE \1INDEX IF NOT EXISTS ', definition)
+
+
+def table_definitions(cur, schema, table):
+    """Reads the indexes and foreign keys of a live fingerprint table. The search path has to be empty, so that the
+    names of the definitions are qualified with their schema.
+
+    :param cur: the database cursor.
+    :param schema: the schema containing the news tables.
+    :param table: the name of the table.
+    :return: a tuple with the list of (index name, definition, constraint name, constraint type) tuples (without
+    constraint for plain indexes) and the list of (constraint name, definition) tuples of the foreign keys
+    """
+    cur.execute(
+        """
+        SELECT i.relname, pg_get_indexdef(i.oid), c.conname, c.contype
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        LEFT JOIN pg_constraint c ON c.conindid = x.indexrelid AND c.conrelid = x.indrelid AND c.contype IN ('p', 'u')
+        WHERE x.indrelid = %s::regclass
+        ORDER BY i.relname
+        """, (f'{schema}.{table}',)
+    )
+    indexes = cur.fetchall()
+    cur.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+        ORDER BY conname
+        """, (f'{schema}.{table}',)
+    )
+    return indexes, cur.fetchall()
+
+
+def reindex_state(conn, schema):
+    """Reads the state of the reindex in progress.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :return: a dictionary with the 'scheme', 'last_url_id', 'reindexed', 'failed' and 'started_at' of the reindex,
+    None if no reindex is in progress
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT to_regclass(%s)", (f'{shadow_schema(schema)}.reindex_state',))
+        if cur.fetchone()[0] is None:
+            return None
+        cur.execute(f"SELECT scheme, last_url_id, reindexed, failed, started_at "
+                    f"FROM {shadow_schema(schema)}.reindex_state")
+        row = cur.fetchone()
+        return dict(zip(('scheme', 'last_url_id', 'reindexed', 'failed', 'started_at'), row)) if row else None
+    finally:
+        conn.commit()
+        cur.close()
+
+
+def create_shadow(conn, schema, scheme):
+    """Creates the shadow schema with empty copies of the fingerprint tables: same columns, defaults, primary keys
+    and foreign keys (to urls and between the shadow tables), so that documents deleted meanwhile are deleted from
+    the shadow tables as well. The other indexes are created by build_shadow_indexes, once the tables are filled.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :param scheme: the scheme the documents are fingerprinted with.
+    """
+    shadow = shadow_schema(schema)
+    cur = conn.cursor()
+    try:
+        cur.execute("SET LOCAL search_path TO pg_catalog")
+        cur.execute(f"DROP SCHEMA IF EXISTS {shadow} CASCADE")
+        cur.execute(f"CREATE SCHEMA {shadow}")
+        definitions = {}
+        for table in SHADOW_TABLES:
+            definitions[table] = table_definitions(cur, schema, table)
+            cur.execute(f"CREATE TABLE {shadow}.{table} "
+                        f"(LIKE {schema}.{table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)")
+        for table, (indexes, _) in definitions.items():
+            for index, definition, constraint, constraint_type in indexes:
+                if constraint is not None:
+                    cur.execute(to_shadow(definition, schema, shadow))
+                    kind = 'PRIMARY KEY' if constraint_type == 'p' else 'UNIQUE'
+                    cur.execute(f"ALTER TABLE {shadow}.{table} ADD CONSTRAINT {constraint} {kind} USING INDEX {index}")
+        for table, (_, foreign_keys) in definitions.items():
+            for constraint, definition in foreign_keys:
+                cur.execute(f"ALTER TABLE {shadow}.{table} ADD CONSTRAINT {constraint} "
+                            f"{to_shadow(definition, schema, shadow)}")
+        cur.execute(REINDEX_TABLES.format(schema=schema, shadow=shadow))
+        cur.execute(f"INSERT INTO {shadow}.reindex_state (scheme) VALUES (%s)", (scheme,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def build_shadow_indexes(conn, schema):
+    """Creates the indexes of the live fingerprint tables which the shadow tables do not have yet, and updates the
+    statistics of the shadow tables.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    """
+    shadow = shadow_schema(schema)
+    cur = conn.cursor()
+    try:
+        cur.execute("SET LOCAL search_path TO pg_catalog")
+        for table in SHADOW_TABLES:
+            indexes, _ = table_definitions(cur, schema, table)
+            for _, definition, constraint, _ in indexes:
+                if constraint is None:
+                    cur.execute(to_shadow(definition, schema, shadow))
+        conn.commit()
+        for table in SHADOW_TABLES + ('reindexed_urls',):
+            cur.execute(f"ANALYZE {shadow}.{table}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def discard_reindex(conn, schema):
+    """Drops the shadow schema, i.e. the reindex in progress and everything it wrote.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DROP SCHEMA IF EXISTS {shadow_schema(schema)} CASCADE")
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def remaining_documents(conn, schema, after_id):
+    """Counts the documents which were not reindexed yet.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :param after_id: the id of the last reindexed document.
+    :return: the number of documents with a larger id
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT count(*) FROM {schema}.urls WHERE id > %s", (after_id,))
+        return cur.fetchone()[0]
+    finally:
+        conn.commit()
+        cur.close()
+
+
+def crawl_texts(urls, crawl=crawl_url, threads=CRAWL_THREADS):
+    """Crawls articles again, a few at a time.
+
+    :param urls: the URLs of the articles.
+    :param crawl: the function crawling an article, returning its text and publishing date.
+    :param threads: the number of articles crawled at once.
+    :return: the list of the texts, None for the articles that could not be crawled
+    """
+    def crawl_text(url):
+        try:
+            return crawl(url)[0] or None
+        except Exception as e:
+            logging.warning(f'Could not crawl {url} again: {e}')
+            return None
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(crawl_text, urls))
+
+
+def reindex_documents(cur, schema, scheme, after_id, limit, crawl=False):
+    """Fingerprints the next documents again from their kept text, in the worker processes of the fingerprinting
+    pool, and writes them to the shadow tables. Documents are rejected as when they are stored: without any
+    fingerprint, or with more than FINGERPRINT_BUDGET of them when long articles are not sampled. The documents read
+    cannot be deleted until the transaction ends.
+
+    :param cur: the database cursor, whose transaction is not committed.
+    :param schema: the schema containing the news tables.
+    :param scheme: the scheme the documents are fingerprinted with.
+    :param after_id: the id of the last reindexed document.
+    :param limit: the maximum number of documents.
+    :param crawl: whether the articles whose text was not kept are crawled again (and their text kept).
+    :return: a tuple with the id of the last document read (after_id if there was none), and the numbers of
+    reindexed documents, of failed documents and of fingerprinted characters
+    """
+    shadow = shadow_schema(schema)
+    cur.execute(
+        f"""
+        SELECT u.id, u.url, t.text
+        FROM {schema}.urls u
+        LEFT JOIN {schema}.article_texts t ON t.url_id = u.id
+        WHERE u.id > %s
+        ORDER BY u.id
+        LIMIT %s
+        FOR KEY SHARE OF u
+        """, (after_id, limit)
+    )
+    documents = cur.fetchall()
+    if not documents:
+        return after_id, 0, 0, 0
+
+    texts = [text for _, _, text in documents]
+    missing = [index for index, text in enumerate(texts) if text is None]
+    if crawl and missing:
+        crawled = crawl_texts([documents[index][1] for index in missing])
+        for index, text in zip(missing, crawled):
+            texts[index] = text
+        if article_texts_enabled():
+            extras.execute_values(cur, f"INSERT INTO {schema}.article_texts (url_id, text) VALUES %s "
+                                       f"ON CONFLICT (url_id) DO NOTHING",
+                                  [(documents[index][0], texts[index]) for index in missing
+                                   if texts[index] is not None])
+
+    budget = fingerprint_budget()
+    sample = sample_long_articles()
+    present = [index for index, text in enumerate(texts) if text is not None]
+    fingerprint_sets = compute_fingerprint_sets_batch([texts[index] for index in present], scheme, budget, sample)
+
+    failures = [(doc_id, NO_TEXT) for (doc_id, _, _), text in zip(documents, texts) if text is None]
+    reindexed = []
+    for index, fingerprints in zip(present, fingerprint_sets):
+        doc_id = documents[index][0]
+        if fingerprints.count == 0:
+            failures.append((doc_id, NO_FINGERPRINTS))
+        elif fingerprints.count > budget:
+            failures.append((doc_id, OVER_BUDGET))
+        else:
+            reindexed.append((doc_id, fingerprints))
+
+    write_documents(cur, schema, scheme, reindexed)
+    if failures:
+        extras.execute_values(cur, f"INSERT INTO {shadow}.reindex_failures (url_id, reason) VALUES %s "
+                                   f"ON CONFLICT (url_id) DO UPDATE SET reason = EXCLUDED.reason", failures)
+    last_id = documents[-1][0]
+    cur.execute(f"UPDATE {shadow}.reindex_state SET last_url_id = %s, reindexed = reindexed + %s, "
+                f"failed = failed + %s", (last_id, len(reindexed), len(failures)))
+    return last_id, len(reindexed), len(failures), sum(len(texts[index]) for index in present)
+
+
+def write_documents(cur, schema, scheme, documents):
+    """Writes fingerprinted documents to the shadow tables, as models.NewsDocument.save writes them to the live ones.
+    Their postings are not written: fingerprint_postings is swapped in empty, and filled by `build_postings`.
+
+    :param cur: the database cursor.
+    :param schema: the schema containing the news tables.
+    :param scheme: the scheme the documents were fingerprinted with.
+    :param documents: a list of (url id, FingerprintSet) tuples.
+    """
+    if not documents:
+        return
+    shadow = shadow_schema(schema)
+    extras.execute_values(
+        cur,
+        f"""INSERT INTO {shadow}.reindexed_urls (url_id, scheme, sampling_modulus, fingerprint_count, fingerprint_array)
+        VALUES %s ON CONFLICT (url_id) DO NOTHING""",
+        [(doc_id, scheme, fingerprints.modulus, len(fingerprints), fingerprints.tolist())
+         for doc_id, fingerprints in documents],
+        template="(%s, %s, %s, %s, %s::integer[])"
+    )
+
+    counts = {}
+    for _, fingerprints in documents:
+        for fingerprint in fingerprints.tolist():
+            counts[fingerprint] = counts.get(fingerprint, 0) + 1
+    extras.execute_values(
+        cur,
+        f"""INSERT INTO {shadow}.fingerprints (fingerprint, document_count) VALUES %s
+        ON CONFLICT (fingerprint) DO UPDATE
+        SET document_count = {shadow}.fingerprints.document_count + EXCLUDED.document_count""",
+        sorted(counts.items()), page_size=10000
+    )
+    extras.execute_values(cur, f"INSERT INTO {shadow}.url_fingerprints (url_id, fingerprint_id) VALUES %s "
+                               f"ON CONFLICT DO NOTHING",
+                          [(doc_id, fingerprint) for doc_id, fingerprints in documents
+                           for fingerprint in fingerprints.tolist()], page_size=10000)
+
+    bands, rows = lsh_configuration()
+    signatures = [(doc_id, minhash_signature(fingerprints, bands * rows)) for doc_id, fingerprints in documents]
+    extras.execute_values(cur, f"INSERT INTO {shadow}.url_minhash (url_id, signature) VALUES %s "
+                               f"ON CONFLICT (url_id) DO UPDATE SET signature = EXCLUDED.signature",
+                          [(doc_id, signature.tolist()) for doc_id, signature in signatures])
+    extras.execute_values(cur, f"INSERT INTO {shadow}.lsh_bands (band_key, url_id) VALUES %s ON CONFLICT DO NOTHING",
+                          [(key, doc_id) for doc_id, signature in signatures
+                           for key in band_keys(signature, bands, rows)], page_size=10000)
+
+
+def cut_over(conn, schema, crawl=False):
+    """Switches the search to the shadow tables in a single transaction. New documents are blocked while it runs
+    (searches are not): the documents stored since the last batch are reindexed first, then the fingerprint columns
+    of urls are updated from reindexed_urls (documents which could not be reindexed are left without fingerprints),
+    and the shadow tables take the place of the live ones, which are moved to the retired schema. The cutover is
+    recorded in the change feed, on which the workers load their index and stored fingerprints again. The postings
+    of every document have to be appended again, see `build_postings`.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :param crawl: whether the articles whose text was not kept are crawled again.
+    :return: a tuple with the numbers of reindexed and failed documents
+    """
+    shadow = shadow_schema(schema)
+    retired = retired_schema(schema)
+    cur = conn.cursor()
+    try:
+        # Writers insert into urls first, so locking it first cannot deadlock with them
+        cur.execute(f"LOCK TABLE {schema}.urls IN SHARE ROW EXCLUSIVE MODE")
+        cur.execute(f"SELECT scheme, last_url_id FROM {shadow}.reindex_state FOR UPDATE")
+        scheme, last_id = cur.fetchone()
+        while True:
+            last_id, reindexed, failed, _ = reindex_documents(cur, schema, scheme, last_id, DEFAULT_BATCH_SIZE, crawl)
+            if reindexed + failed == 0:
+                break
+
+        # The fingerprint arrays are only kept with the "arrays" storage, see `build_fingerprint_arrays`
+        arrays = fingerprint_storage() == ARRAYS
+        reindexed_array, empty_array = ("r.fingerprint_array", "'{}'") if arrays else ("NULL", "NULL")
+        cur.execute(
+            f"""
+            UPDATE {schema}.urls u
+            SET scheme = r.scheme, sampling_modulus = r.sampling_modulus, fingerprint_count = r.fingerprint_count,
+                fingerprint_array = {reindexed_array}, postings_appended = false
+            FROM {shadow}.reindexed_urls r
+            WHERE u.id = r.url_id
+            """
+        )
+        cur.execute(
+            f"""
+            UPDATE {schema}.urls u
+            SET fingerprint_count = 0, fingerprint_array = {empty_array}, postings_appended = false
+            WHERE NOT EXISTS (SELECT 1 FROM {shadow}.reindexed_urls r WHERE r.url_id = u.id)
+            """
+        )
+
+        cur.execute(f"DROP SCHEMA IF EXISTS {retired} CASCADE")
+        cur.execute(f"CREATE SCHEMA {retired}")
+        for table in SHADOW_TABLES:
+            cur.execute(f"ALTER TABLE {schema}.{table} SET SCHEMA {retired}")
+            cur.execute(f"ALTER TABLE {shadow}.{table} SET SCHEMA {schema}")
+        cur.execute(f"ALTER TABLE {shadow}.reindex_failures SET SCHEMA {retired}")
+        record_reindex(cur, schema)
+        cur.execute(f"SELECT reindexed, failed FROM {shadow}.reindex_state")
+        reindexed, failed = cur.fetchone()
+        cur.execute(f"DROP SCHEMA {shadow} CASCADE")
+        conn.commit()
+        return reindexed, failed
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+class ReindexProgress:
+    """Reports the progress of a reindex: the share of the documents done, the throughput of the run, end to end
+    and of the fingerprinting alone (see fingerprint_pool.batch_statistics), and the estimated time left.
+    """
+
+    def __init__(self, total, log=None):
+        """The constructor for the ReindexProgress.
+
+        :param total: the number of documents the run has to reindex.
+        :param log: a function called with the progress messages, logging.info if not given.
+        """
+        self.total = total
+        self.log = log or logging.info
+        self.documents = 0
+        self.failed = 0
+        self.characters = 0
+        self.start_time = time.perf_counter()
+        self.fingerprinting_start = (batch_statistics.texts, batch_statistics.seconds)
+
+    def record(self, reindexed, failed, characters):
+        """Records a written batch and reports the progress.
+
+        :param reindexed: the number of reindexed documents of the batch.
+        :param failed: the number of documents of the batch which could not be reindexed.
+        :param characters: the number of fingerprinted characters of the batch.
+        """
+        self.documents += reindexed + failed
+        self.failed += failed
+        self.characters += characters
+        self.log(self.report())
+
+    def documents_per_second(self):
+        """Returns the number of documents reindexed per second since the start of the run.
+
+        :return: the throughput in documents per second
+        """
+        seconds = time.perf_counter() - self.start_time
+        return self.documents / seconds if seconds > 0 else 0.0
+
+    def report(self):
+        """Describes the progress of the run.
+
+        :return: the progress message
+        """
+        seconds = time.perf_counter() - self.start_time
+        rate = self.documents_per_second()
+        texts = batch_statistics.texts - self.fingerprinting_start[0]
+        fingerprinting = batch_statistics.seconds - self.fingerprinting_start[1]
+        remaining = max(self.total - self.documents, 0)
+        eta = f'{remaining / rate:.0f} s left' if rate > 0 else 'time left unknown'
+        return (f'Reindexed {self.documents}/{self.total} document(s) ({self.failed} failed) in {seconds:.0f} s: '
+                f'{rate:.1f} documents/s, {self.characters / seconds / 1e6 if seconds > 0 else 0:.2f} MB/s '
+                f'end to end, {texts / fingerprinting if fingerprinting > 0 else 0:.1f} documents/s fingerprinting, '
+                f'{eta}')
+
+
+def reindex(conn, schema, scheme=None, batch_size=DEFAULT_BATCH_SIZE, crawl=False, cutover=True, log=None):
+    """Fingerprints every stored document again into the shadow tables, a batch per transaction, then switches the
+    search to them. The live tables keep serving meanwhile. Running it again resumes the reindex in progress from
+    its last written batch.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :param scheme: the scheme the documents are fingerprinted with, FINGERPRINT_SCHEME from the settings if not
+    given. A reindex in progress can only be resumed with its own scheme.
+    :param batch_size: the number of documents written in one transaction.
+    :param crawl: whether the articles whose text was not kept are crawled again.
+    :param cutover: whether the shadow tables are swapped in once they are filled.
+    :param log: a function called with progress messages, logging.info if not given.
+    :return: a dictionary with the 'scheme', the numbers of 'reindexed' and 'failed' documents, and whether the
+    tables were 'swapped'
+    """
+    log = log or logging.info
+    scheme = validate_scheme(scheme or default_scheme())
+    state = reindex_state(conn, schema)
+    if state is None:
+        create_shadow(conn, schema, scheme)
+        state = reindex_state(conn, schema)
+    elif state['scheme'] != scheme:
+        raise ValueError(f'A reindex to "{state["scheme"]}" is in progress, discard it before reindexing to '
+                         f'"{scheme}"')
+    else:
+        log(f'Resuming the reindex started at {state["started_at"]} after document {state["last_url_id"]}')
+
+    last_id = state['last_url_id']
+    progress = ReindexProgress(remaining_documents(conn, schema, last_id), log)
+    while True:
+        cur = conn.cursor()
+        try:
+            last_id, reindexed, failed, characters = reindex_documents(cur, schema, scheme, last_id, batch_size,
+                                                                       crawl)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+        if reindexed + failed == 0:
+            break
+        progress.record(reindexed, failed, characters)
+
+    build_shadow_indexes(conn, schema)
+    state = reindex_state(conn, schema)
+    if not cutover:
+        return {'scheme': scheme, 'reindexed': state['reindexed'], 'failed': state['failed'], 'swapped': False}
+
+    reindexed, failed = cut_over(conn, schema, crawl)
+    log(f'Switched to the fingerprints of {reindexed} document(s) ({failed} failed) computed with "{scheme}"')
+    return {'scheme': scheme, 'reindexed': reindexed, 'failed': failed, 'swapped': True}
@@ -0,0 +1,130 @@
+from collections import deque
+
+import numpy as np
+from fnv_hash_fast import fnv1a_32
+
+from .config import get_setting
+from .normalization import sanitize_table
+
+# Every stored document is tagged with the scheme its fingerprints were computed with, since fingerprints of
+# different schemes cannot be compared. Bump the version whenever k, the window size or the hash changes.
+SHA1_SCHEME = 'sha1-v1'
+RABIN_KARP_SCHEME = 'rabin-karp-v1'
+SHA1_WIDE_SCHEME = 'sha1-31-v1'
+
+SCHEMES = (SHA1_SCHEME, RABIN_KARP_SCHEME, SHA1_WIDE_SCHEME)
+
+# Parameters of the Rabin-Karp polynomial hash: a Mersenne prime modulus and the 32-bit FNV prime as base
+RABIN_KARP_MODULUS = 2 ** 31 - 1
+RABIN_KARP_BASE = 16777619
+
+# Fingerprints are 20-bit values, so that the in-memory structures (the inverted index, the presence bitmap) can
+# have an entry for every one of them
+HASH_MASK = 0xFFFFF
+
+# Fingerprints of the wide scheme keep 31 bits of the hash instead: every fingerprint is shared by far fewer
+# unrelated documents, and the values still fit the integer (int4) columns and arrays of the news tables
+WIDE_HASH_MASK = 0x7FFFFFFF
+
+
+def default_scheme():
+    """Returns the scheme new fingerprints are computed with, as configured by FINGERPRINT_SCHEME in the settings.
+
+    :return: the tag of the default fingerprint scheme
+    """
+    return get_setting('FINGERPRINT_SCHEME', SHA1_SCHEME)
+
+
+def validate_scheme(scheme):
+    """Checks that the given fingerprint scheme is known.
+
+    :param scheme: the tag of the fingerprint scheme.
+    :return: the tag of the scheme, or raises a ValueError if the scheme is unknown
+    """
+    if scheme not in SCHEMES:
+        raise ValueError(f'Unknown fingerprint scheme: {scheme}')
+    return scheme
+
+
+def hash_mask(scheme):
+    """Returns the mask of the fingerprints of a scheme, i.e. their largest possible value.
+
+    :param scheme: the tag of the fingerprint scheme.
+    :return: WIDE_HASH_MASK for the wide scheme, HASH_MASK for the others
+    """
+    return WIDE_HASH_MASK if scheme == SHA1_WIDE_SCHEME else HASH_MASK
+
+
+def character_value(character):
+    """Maps a sanitized character to the value the Rabin-Karp hash is computed on (FNV-1a of its UTF-8 bytes).
+
+    :param character: the sanitized (lower-cased) character.
+    :return: the value of the character, smaller than the modulus
+    """
+    return fnv1a_32(character.encode('utf-8')) % RABIN_KARP_MODULUS
+
+
+def character_values(characters):
+    """Maps the code points of the kept characters to their Rabin-Karp values. Each distinct character
+    is hashed only once.
+
+    :param characters: an array with the (original) code points of the kept characters.
+    :return: an array of uint64 values
+    """
+    unique_characters, inverse = np.unique(characters, return_inverse=True)
+    table = np.array([character_value(sanitize_table[code]) for code in unique_characters.tolist()], dtype=np.uint64)
+    return table[inverse]
+
+
+def rabin_karp_kgrams(values, k):
+    """Computes the Rabin-Karp hash of all k-grams of the given character values with Horner's rule, which gives
+    the same values as rolling a RollingHash over the characters. If there are fewer than k characters, the whole
+    text is hashed as a single k-gram.
+
+    :param values: the Rabin-Karp values of the characters.
+    :param k: n-gram length.
+    :return: an array with the 20-bit hashes of all k-grams, in order
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    count = max(len(values) - k + 1, 1)
+    length = min(k, len(values))
+
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(length):
+        hashes = (hashes * np.uint64(RABIN_KARP_BASE) + values[offset:offset + count]) % np.uint64(RABIN_KARP_MODULUS)
+
+    return (hashes & np.uint64(HASH_MASK)).astype(np.uint32)
+
+
+class RollingHash:
+    """Rabin-Karp hash over the last k characters, which is updated in O(1) for every new character.
+    """
+
+    def __init__(self, k):
+        """The constructor for the RollingHash.
+
+        :param k: n-gram length.
+        """
+        self.k = k
+        self.value = 0
+        self.window = deque()
+        self.leading_power = pow(RABIN_KARP_BASE, k - 1, RABIN_KARP_MODULUS)
+
+    def roll(self, value):
+        """Adds a character value to the window, dropping the oldest one if the window is full.
+
+        :param value: the Rabin-Karp value of the new character.
+        :return: the full-precision hash of the current window
+        """
+        if len(self.window) == self.k:
+            self.value = (self.value - self.window.popleft() * self.leading_power) % RABIN_KARP_MODULUS
+        self.window.append(value)
+        self.value = (self.value * RABIN_KARP_BASE + value) % RABIN_KARP_MODULUS
+        return self.value
+
+    def digest(self):
+        """Returns the 20-bit fingerprint of the current window.
+
+        :return: the hash of the window, reduced to 20 bits
+        """
+        return self.value & HASH_MASK
@@ -0,0 +1,64 @@
+import numpy as np
+
+from .normalization import kept_positions
+from .schemes import SHA1_SCHEME
+from .winnowing_engine import winnow_selections
+
+
+def segment_bounds(positions, segments, k=8, window=6):
+    """Splits a text into overlapping segments that can be winnowed independently. The windows of the text are
+    divided evenly between the segments, and every segment also contains the characters the k-grams of its last
+    window need, i.e. consecutive segments overlap by k + window - 2 kept characters. Characters dropped by the
+    sanitize step do not count, so the overlap in the original text is at least as large.
+
+    :param positions: the positions of the characters kept by the sanitize step.
+    :param segments: the number of segments.
+    :param k: n-gram length.
+    :param window: the number of consecutive k-gram hashes in a window.
+    :return: a list with the (start, end) character range of every segment, or None if the text is too short to be
+    split in that many segments
+    """
+    windows = len(positions) - k - window + 2
+    if segments <= 1 or windows < segments:
+        return None
+
+    cuts = np.linspace(0, windows, segments + 1).astype(np.int64).tolist()
+    return [(int(positions[first]), int(positions[last + k + window - 3]) + 1)
+            for first, last in zip(cuts[:-1], cuts[1:])]
+
+
+def winnow_segment(segment, offset, k=8, window=6, scheme=SHA1_SCHEME):
+    """Winnows a segment of a text. This is what the worker processes run.
+
+    :param segment: the text of the segment.
+    :param offset: the position of the segment in the whole text.
+    :param k: n-gram length.
+    :param window: the number of consecutive k-gram hashes in a window.
+    :param scheme: the fingerprint scheme used for hashing the k-grams.
+    :return: a list with the (position, hash) pair selected in every window of the segment, in order
+    """
+    return [(position + offset, shingle_hash)
+            for position, shingle_hash in winnow_selections(segment, k, window, scheme)]
+
+
+def segmented_winnow(text, segments, map_function=map, k=8, window=6, scheme=SHA1_SCHEME):
+    """Winnows a text as independent overlapping segments, e.g. in parallel with the map of a process pool.
+    Every window of the text belongs to exactly one segment, so the result is exactly the one of vectorized_winnow,
+    including the iteration order.
+
+    :param text: The text from which the shingles are computed.
+    :param segments: the number of segments.
+    :param map_function: the map used for winnowing the segments, such as the map of an executor.
+    :param k: n-gram length.
+    :param window: the number of consecutive k-gram hashes in a window.
+    :param scheme: the fingerprint scheme used for hashing the k-grams.
+    :return: The set of shingles.
+    """
+    bounds = segment_bounds(kept_positions(text), segments, k, window)
+    if bounds is None:
+        return set(winnow_selections(text, k, window, scheme))
+
+    count = len(bounds)
+    results = map_function(winnow_segment, [text[start:end] for start, end in bounds],
+                           [start for start, _ in bounds], [k] * count, [window] * count, [scheme] * count)
+    return set(selection for result in results for selection in result)
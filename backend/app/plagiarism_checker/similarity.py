@@ -1,6 +1,12 @@
+import numpy as np
+
+from .fingerprint_set import as_fingerprint_set
+from .schemes import HASH_MASK
+
+
 def extract_hashes(shingle):
-    """Helper method for extracting the hashes (shingle_hash) out of a list of dictionaries. This will be used by the
-    compute_similarity method.
+    """Helper method for extracting the hashes (shingle_hash) out of a list of dictionaries, as returned by
+    compute_fingerprint.
 
     :param shingle: a list of dictionaries containing a shingle_hash and a shingle_position
     :return: a list of integers denoting all the shingle_hashes in shingle
@@ -10,20 +16,118 @@ def extract_hashes(shingle):
         hashes.append(element["shingle_hash"])
     return hashes
 
+
 def compute_similarity(shingle1, shingle2):
     """Method for computing the similarity between two lists of shingles. The method uses the Jaccard similarity
     function to compute the similarity coefficient (between 0 and 1).
 
-    :param shingle1: a list of dictionaries containing a shingle_hash and a shingle_position
-    :param shingle2: a list of dictionaries containing a shingle_hash and a shingle_position
+    :param shingle1: a FingerprintSet, or a list of dictionaries containing a shingle_hash and a shingle_position
+    :param shingle2: a FingerprintSet, or a list of dictionaries containing a shingle_hash and a shingle_position
     :return: the similarity coefficient of shingle1 and shingle2
     """
-    hash1 = set(extract_hashes(shingle1))
-    hash2 = set(extract_hashes(shingle2))
+    return as_fingerprint_set(shingle1).jaccard(as_fingerprint_set(shingle2))
+
+
+def pack_fingerprint_sets(fingerprint_sets):
+    """Concatenates the sorted uint32 arrays of several fingerprint sets, so that they can be processed at once.
+
+    :param fingerprint_sets: a list of FingerprintSets (or of anything as_fingerprint_set accepts).
+    :return: a tuple with the concatenated hashes and the size of every set
+    """
+    arrays = [as_fingerprint_set(fingerprints).hashes for fingerprints in fingerprint_sets]
+    sizes = np.fromiter((len(hashes) for hashes in arrays), dtype=np.int64, count=len(arrays))
+    if not arrays:
+        return np.zeros(0, dtype=np.uint32), sizes
+    return np.concatenate(arrays), sizes
 
-    intersection = hash1.intersection(hash2)
-    union = hash1.union(hash2)
 
-    jaccard_similarity = len(intersection) / len(union)
+def contained_in(hashes, query):
+    """Tells which hashes are fingerprints of the query. Hashes of the usual 20-bit schemes are looked up in a table
+    with an entry for every possible hash, which is faster than a binary search.
+
+    :param hashes: an array of hashes.
+    :param query: the sorted hashes of the query.
+    :return: a boolean array, True for the hashes of the query
+    """
+    if len(query) == 0 or len(hashes) == 0:
+        return np.zeros(len(hashes), dtype=bool)
+    if hashes.max() <= HASH_MASK and query[-1] <= HASH_MASK:
+        table = np.zeros(HASH_MASK + 1, dtype=bool)
+        table[query] = True
+        return table[hashes]
+    positions = np.minimum(np.searchsorted(query, hashes), len(query) - 1)
+    return query[positions] == hashes
+
+
+def jaccard_from_sizes(intersections, first_sizes, second_sizes):
+    """Computes Jaccard similarities out of the sizes of the sets and of their intersections.
+
+    :param intersections: the sizes of the intersections.
+    :param first_sizes: the sizes of the first sets.
+    :param second_sizes: the sizes of the second sets.
+    :return: an array with the Jaccard similarities, -1 where both sets are empty
+    """
+    intersections = np.asarray(intersections, dtype=np.float64)
+    unions = np.asarray(first_sizes, dtype=np.float64) + np.asarray(second_sizes, dtype=np.float64) - intersections
+    similarities = np.full(np.broadcast(intersections, unions).shape, -1.0)
+    np.divide(intersections, unions, out=similarities, where=unions != 0)
+    return similarities
+
 
-    return jaccard_similarity
+def overlap_many(query, candidates):
+    """Counts the fingerprints of the query every candidate has, in one vectorized pass over all the candidates.
+
+    :param query: the FingerprintSet of the query.
+    :param candidates: a list of FingerprintSets.
+    :return: an array with the size of the intersection of the query with every candidate
+    """
+    query = as_fingerprint_set(query).hashes
+    hashes, sizes = pack_fingerprint_sets(candidates)
+    found = contained_in(hashes, query)
+    owners = np.repeat(np.arange(len(sizes)), sizes)
+    return np.bincount(owners[found], minlength=len(sizes))
+
+
+def jaccard_many(query, candidates):
+    """Computes the Jaccard similarity of the query with every candidate at once.
+
+    :param query: the FingerprintSet of the query.
+    :param candidates: a list of FingerprintSets.
+    :return: an array with the similarities, -1 where both the query and the candidate are empty
+    """
+    query = as_fingerprint_set(query)
+    candidates = [as_fingerprint_set(candidate) for candidate in candidates]
+    sizes = np.fromiter((len(candidate) for candidate in candidates), dtype=np.int64, count=len(candidates))
+    return jaccard_from_sizes(overlap_many(query, candidates), len(query), sizes)
+
+
+def containment_many(query, candidates):
+    """Computes the containment of the query in every candidate at once: the fraction of the fingerprints of the
+    query the candidate has, which tells whether the query was copied from the candidate even if it is much shorter.
+
+    :param query: the FingerprintSet of the query.
+    :param candidates: a list of FingerprintSets.
+    :return: an array with the containments, 0 for an empty query
+    """
+    query = as_fingerprint_set(query)
+    return overlap_many(query, candidates) / max(len(query), 1)
+
+
+def jaccard_pairs(firsts, seconds):
+    """Computes the Jaccard similarity of many pairs of fingerprint sets at once: the hashes of every pair are tagged
+    with the number of the pair and sorted together, so a hash both sets have appears twice in a row.
+
+    :param firsts: the list of the first FingerprintSets of the pairs.
+    :param seconds: the list of the second FingerprintSets of the pairs, as long as firsts.
+    :return: an array with the similarity of every pair, -1 where both sets are empty
+    """
+    if len(firsts) != len(seconds):
+        raise ValueError('Both lists of fingerprint sets must have the same length')
+    first_hashes, first_sizes = pack_fingerprint_sets(firsts)
+    second_hashes, second_sizes = pack_fingerprint_sets(seconds)
+    pairs = np.arange(len(first_sizes), dtype=np.int64)
+    keys = np.sort(np.concatenate(((np.repeat(pairs, first_sizes) << 32) | first_hashes,
+                                   (np.repeat(pairs, second_sizes) << 32) | second_hashes)))
+    repeated = keys[1:][keys[1:] == keys[:-1]]
+    intersections = np.bincount(repeated >> 32, minlength=len(pairs))
+    return jaccard_from_sizes(intersections, first_sizes, second_sizes)
@@ -0,0 +1,25 @@
+from .config import get_setting
+
+# Layouts the fingerprints of the stored documents are read from by the search:
+# - ROWS: one url_fingerprints row per (document, fingerprint) pair
+# - ARRAYS: the sorted fingerprint_array column of every document in urls, with a GIN index (see fingerprint_arrays.py)
+# - POSTINGS: the compressed document ids of every fingerprint in fingerprint_postings (see posting_table.py), and
+#   url_fingerprints for the documents which were not appended yet
+ROWS = 'rows'
+ARRAYS = 'arrays'
+POSTINGS = 'postings'
+STORAGES = (ROWS, ARRAYS, POSTINGS)
+
+
+def fingerprint_storage():
+    """Returns the layout the search reads the fingerprints of the stored documents from, set by
+    FINGERPRINT_STORAGE. Documents are always stored as rows; their arrays are only stored with the "arrays"
+    storage, and filled for the documents stored before by fingerprint_arrays.fill_fingerprint_arrays. The postings
+    of documents are appended in batches, see posting_table.append_postings.
+
+    :return: one of STORAGES
+    """
+    storage = get_setting('FINGERPRINT_STORAGE', ROWS)
+    if storage not in STORAGES:
+        raise ValueError(f'Unknown fingerprint storage "{storage}", expected one of {", ".join(STORAGES)}')
+    return storage
@@ -0,0 +1,143 @@
+import codecs
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .schemes import SHA1_SCHEME, validate_scheme
+from .winnowing_engine import sanitize_text, hash_sanitized
+
+
+class StreamingWinnower:
+    """Winnows a text that arrives in chunks, e.g. from the crawler or a request body stream.
+    Only the last k - 1 sanitized characters and the last window - 1 hashes are kept between chunks, so the memory
+    does not depend on the size of the text. The fingerprints are the same as the ones of vectorized_winnow.
+    """
+
+    def __init__(self, k=8, window=6, scheme=SHA1_SCHEME):
+        """The constructor for the StreamingWinnower.
+
+        :param k: n-gram length.
+        :param window: the number of consecutive k-gram hashes in a window.
+        :param scheme: the fingerprint scheme used for hashing the k-grams.
+        """
+        self.k = k
+        self.window = window
+        self.scheme = validate_scheme(scheme)
+
+        # Number of characters of the original text seen so far
+        self.length = 0
+
+        # The last (at most k - 1) kept characters, as they appear in the original text, and their positions
+        self.tail_text = ''
+        self.tail_positions = np.zeros(0, dtype=np.int64)
+
+        # The last (at most window - 1) k-gram hashes and the positions of their k-grams
+        self.tail_hashes = np.zeros(0, dtype=np.uint32)
+        self.tail_kgram_positions = np.zeros(0, dtype=np.int64)
+
+        # Total number of k-gram hashes, and the index of the last selected k-gram (to skip repeated selections)
+        self.hash_count = 0
+        self.last_selected = -1
+
+    def feed(self, chunk):
+        """Winnows the next chunk of the text.
+
+        :param chunk: the next part of the text.
+        :return: a list with the new (position, hash) fingerprints
+        """
+        # The kept characters of the tail are sanitized again together with the chunk, so k-grams can span both
+        combined = self.tail_text + chunk
+        sanitized, kept, offsets, characters = sanitize_text(combined)
+
+        # Positions of the tail characters are remembered, the ones of the chunk are shifted by the text seen so far
+        tail_length = len(self.tail_text)
+        positions = kept - tail_length + self.length
+        in_tail = kept < tail_length
+        positions[in_tail] = self.tail_positions[kept[in_tail]]
+        self.length += len(chunk)
+
+        fingerprints = []
+        if len(positions) >= self.k:
+            hashes = hash_sanitized(sanitized, offsets, characters, self.k, self.scheme)
+            fingerprints = self.select(hashes, positions[:len(positions) - self.k + 1])
+
+        tail = kept[len(kept) - self.k + 1:] if len(kept) >= self.k else kept
+        self.tail_text = ''.join(combined[index] for index in tail.tolist())
+        self.tail_positions = positions[len(positions) - len(tail):]
+        return fingerprints
+
+    def select(self, hashes, kgram_positions):
+        """Adds new k-gram hashes and selects the minimum of every window that is complete now.
+
+        :param hashes: the hashes of the new k-grams.
+        :param kgram_positions: the positions of the new k-grams.
+        :return: a list with the new (position, hash) fingerprints
+        """
+        first_index = self.hash_count - len(self.tail_hashes)
+        hashes = np.concatenate([self.tail_hashes, hashes])
+        kgram_positions = np.concatenate([self.tail_kgram_positions, kgram_positions])
+        self.hash_count += len(hashes) - len(self.tail_hashes)
+
+        fingerprints = []
+        if len(hashes) >= self.window:
+            windows = sliding_window_view(hashes, self.window)
+            selected = windows.argmin(axis=1) + np.arange(len(windows))
+            for index in np.unique(selected).tolist():
+                if first_index + index > self.last_selected:
+                    fingerprints.append((int(kgram_positions[index]), int(hashes[index])))
+            self.last_selected = max(self.last_selected, first_index + int(selected[-1]))
+
+        self.tail_hashes = hashes[len(hashes) - self.window + 1:] if len(hashes) >= self.window else hashes
+        self.tail_kgram_positions = kgram_positions[len(hashes) - len(self.tail_hashes):]
+        return fingerprints
+
+    def finish(self):
+        """Ends the text. Texts with fewer than k characters or fewer than window k-grams are winnowed
+        as a single k-gram or a single window, just like vectorized_winnow does.
+
+        :return: a list with the last (position, hash) fingerprints
+        """
+        if self.hash_count == 0:
+            sanitized, _, offsets, characters = sanitize_text(self.tail_text, positions=False)
+            hashes = hash_sanitized(sanitized, offsets, characters, self.k, self.scheme)
+            position = int(self.tail_positions[0]) if len(self.tail_positions) else -1
+            return [(position, int(hashes[0]))]
+
+        if self.hash_count < self.window:
+            index = int(np.argmin(self.tail_hashes))
+            return [(int(self.tail_kgram_positions[index]), int(self.tail_hashes[index]))]
+
+        return []
+
+
+def stream_winnow(chunks, k=8, window=6, scheme=SHA1_SCHEME):
+    """Winnows a text given as an iterator of chunks, yielding the fingerprints as soon as they are known.
+    Every fingerprint is yielded once, and together they form the same set as vectorized_winnow of the whole text.
+
+    :param chunks: an iterator over the parts of the text.
+    :param k: n-gram length.
+    :param window: the number of consecutive k-gram hashes in a window.
+    :param scheme: the fingerprint scheme used for hashing the k-grams.
+    :return: a generator of (position, hash) fingerprints
+    """
+    winnower = StreamingWinnower(k, window, scheme)
+    for chunk in chunks:
+        yield from winnower.feed(chunk)
+    yield from winnower.finish()
+
+
+def decode_chunks(byte_chunks, encoding='utf-8'):
+    """Decodes a stream of bytes (e.g. a request body) into text chunks, without splitting multi-byte characters.
+
+    :param byte_chunks: an iterator over the parts of the encoded text.
+    :param encoding: the encoding of the text.
+    :return: a generator of text chunks
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for byte_chunk in byte_chunks:
+        chunk = decoder.decode(byte_chunk)
+        if chunk:
+            yield chunk
+    chunk = decoder.decode(b'', final=True)
+    if chunk:
+        yield chunk
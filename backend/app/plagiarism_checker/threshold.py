@@ -0,0 +1,127 @@
+import math
+
+import numpy as np
+
+from .config import get_setting
+
+# Tolerance of the bounds below, so that a similarity of exactly the threshold is never pruned by a rounding error
+EPSILON = 1e-9
+
+# The former fixed cutoff of 100 common fingerprints amounts to this similarity for a query of the maximum size
+# (FINGERPRINT_BUDGET = 2000 fingerprints), while shorter queries get a proportionally lower cutoff
+DEFAULT_MINIMUM_SIMILARITY = 0.05
+
+
+def similarity_threshold():
+    """Returns the minimum Jaccard similarity of the documents found by the threshold search, set by
+    SIMILARITY_THRESHOLD.
+
+    :return: the threshold, or None if the search ranks all the documents with enough common fingerprints
+    """
+    threshold = get_setting('SIMILARITY_THRESHOLD', None)
+    if threshold is not None and not 0 < threshold <= 1:
+        raise ValueError(f'SIMILARITY_THRESHOLD must be in (0, 1], got {threshold}')
+    return threshold
+
+
+def minimum_similarity():
+    """Returns the lowest Jaccard similarity the search is meant to find, set by MINIMUM_SIMILARITY. The minimum
+    number of fingerprints a document must have in common with a query is derived from it (see minimum_overlaps).
+
+    :return: the minimum similarity
+    """
+    similarity = get_setting('MINIMUM_SIMILARITY', DEFAULT_MINIMUM_SIMILARITY)
+    if not 0 < similarity <= 1:
+        raise ValueError(f'MINIMUM_SIMILARITY must be in (0, 1], got {similarity}')
+    return similarity
+
+
+def minimum_overlaps(query_sizes, similarity):
+    """Derives the minimum number of common fingerprints of a document from the size of the query: a document with
+    fewer than similarity * |A| fingerprints in common with the query A cannot reach the similarity, whatever its
+    size. The cutoff is given for every sampling level, since a sampled document is compared on fewer fingerprints.
+
+    :param query_sizes: the number of fingerprints of the query kept at every level (see inverted_index.sampled_sizes).
+    :param similarity: the minimum Jaccard similarity.
+    :return: an array with the minimum overlap at every level, at least 1
+    """
+    overlaps = np.ceil(similarity * np.asarray(query_sizes, dtype=np.float64) - EPSILON).astype(np.int64)
+    return np.maximum(overlaps, 1)
+
+
+def size_bounds(query_size, threshold):
+    """Returns the sizes a document can have to reach the threshold: the Jaccard similarity of two sets is at most
+    the ratio of their sizes, so a document B can only be similar enough to the query A if
+    threshold * |A| <= |B| <= |A| / threshold.
+
+    :param query_size: the number of fingerprints of the query.
+    :param threshold: the minimum Jaccard similarity.
+    :return: a tuple with the smallest and the largest possible document size
+    """
+    return math.ceil(threshold * query_size - EPSILON), math.floor(query_size / threshold + EPSILON)
+
+
+def required_overlap(query_size, document_size, threshold):
+    """Returns the number of common fingerprints a document needs to reach the threshold:
+    |A ∩ B| / (|A| + |B| - |A ∩ B|) >= t is equivalent to |A ∩ B| >= t / (1 + t) * (|A| + |B|).
+
+    :param query_size: the number of fingerprints of the query.
+    :param document_size: the number of fingerprints of the document (a number or an array).
+    :param threshold: the minimum Jaccard similarity.
+    :return: the minimum intersection size (an int, or an array of them)
+    """
+    overlap = np.ceil(threshold / (1 + threshold) * (query_size + np.asarray(document_size)) - EPSILON)
+    return overlap.astype(np.int64) if np.ndim(overlap) else int(overlap)
+
+
+def prefix_length(query_size, threshold):
+    """Returns the length of the prefix of the query used for prefix filtering. A document of a possible size (see
+    size_bounds) needs at least ceil(threshold * |A|) common fingerprints with the query, so it has one of any
+    |A| - ceil(threshold * |A|) + 1 fingerprints of the query.
+
+    :param query_size: the number of fingerprints of the query.
+    :param threshold: the minimum Jaccard similarity.
+    :return: the number of query fingerprints a similar document must share at least one of
+    """
+    return min(query_size, max(query_size - math.ceil(threshold * query_size - EPSILON) + 1, 0))
+
+
+def rarest_prefix(hashes, frequencies, threshold):
+    """Selects the prefix of the query made of its rarest fingerprints, which have the shortest posting lists.
+    Any order gives the same results, so stale frequencies only make the candidate generation slower.
+
+    :param hashes: the distinct hashes of the query.
+    :param frequencies: the number of documents having each of the hashes.
+    :param threshold: the minimum Jaccard similarity.
+    :return: the sorted array of the hashes of the prefix
+    """
+    hashes = np.asarray(hashes, dtype=np.int64)
+    order = np.lexsort((hashes, np.asarray(frequencies, dtype=np.int64)))
+    return np.sort(hashes[order[:prefix_length(len(hashes), threshold)]])
+
+
+def sampled_prefixes(hashes, levels, frequencies, threshold, query_level=0):
+    """Selects the rarest prefix of the query for every level of sampling it can be compared at: a document stored
+    sampled at a higher level than the query is only compared on the query fingerprints kept at its level, whose
+    prefix is selected separately.
+
+    :param hashes: the distinct hashes of the query.
+    :param levels: the highest sampling level keeping each of the hashes (see inverted_index.fingerprint_levels).
+    :param frequencies: the number of documents having each of the hashes.
+    :param threshold: the minimum Jaccard similarity.
+    :param query_level: the sampling level of the query.
+    :return: a tuple with the arrays of the hashes and of the levels of the (hash, level) pairs of the prefixes
+    """
+    hashes = np.asarray(hashes, dtype=np.int64)
+    frequencies = np.asarray(frequencies, dtype=np.int64)
+    levels = np.asarray(levels)
+    prefix_hashes = []
+    prefix_levels = []
+    for level in range(query_level, int(levels.max(initial=-1)) + 1):
+        kept = levels >= level
+        prefix = rarest_prefix(hashes[kept], frequencies[kept], threshold)
+        prefix_hashes.append(prefix)
+        prefix_levels.append(np.full(len(prefix), level, dtype=np.int64))
+    if not prefix_hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(prefix_hashes), np.concatenate(prefix_levels)
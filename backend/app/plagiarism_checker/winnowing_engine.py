@@ -0,0 +1,186 @@
+import hashlib
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .normalization import sanitize_text
+from .schemes import HASH_MASK, SHA1_SCHEME, RABIN_KARP_SCHEME, validate_scheme, character_values, hash_mask, \
+    rabin_karp_kgrams
+
+# Initial SHA-1 state and round constants, see FIPS 180-4
+SHA1_INITIAL_STATE = (0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0)
+SHA1_ROUND_CONSTANTS = (0x5A827999, 0x6ED9EBA1, 0x8F1BBCDC, 0xCA62C1D6)
+
+# A k-gram fits in a single SHA-1 block if it has at most 55 bytes (1 padding byte + 8 length bytes)
+SHA1_MAX_SINGLE_BLOCK = 55
+
+# Number of k-grams hashed at once, so that the intermediate arrays stay small for very large texts
+SHA1_BATCH_SIZE = 65536
+
+
+def rotate_left(words, bits):
+    """Rotates every 32-bit word of the array to the left.
+
+    :param words: an array of uint32 values.
+    :param bits: the number of bits to rotate with.
+    :return: the rotated array
+    """
+    return (words << np.uint32(bits)) | (words >> np.uint32(32 - bits))
+
+
+def sha1_low_bits(blocks):
+    """Runs the SHA-1 compression function over many single-block messages at once.
+    Only the last word of the digest is returned, since the 20-bit (or 31-bit) hash is taken from the end of the digest.
+
+    :param blocks: an (n, 16) array of uint32 words holding the padded messages.
+    :return: an array with the last 32 bits of the SHA-1 digest of every message
+    """
+    schedule = [blocks[:, i].copy() for i in range(16)]
+    a, b, c, d, e = (np.full(len(blocks), value, dtype=np.uint32) for value in SHA1_INITIAL_STATE)
+
+    for step in range(80):
+        if step >= 16:
+            word = schedule[(step - 3) % 16] ^ schedule[(step - 8) % 16] ^ schedule[(step - 14) % 16]
+            schedule[step % 16] = rotate_left(word ^ schedule[step % 16], 1)
+
+        if step < 20:
+            mixed = (b & c) | (~b & d)
+        elif step < 40 or step >= 60:
+            mixed = b ^ c ^ d
+        else:
+            mixed = (b & c) | (b & d) | (c & d)
+
+        constant = np.uint32(SHA1_ROUND_CONSTANTS[step // 20])
+        temp = rotate_left(a, 5) + mixed + e + constant + schedule[step % 16]
+        a, b, c, d, e = temp, a, rotate_left(b, 30), c, d
+
+    return e + np.uint32(SHA1_INITIAL_STATE[4])
+
+
+def pad_blocks(data, starts, lengths):
+    """Builds the padded SHA-1 blocks for byte ranges of the same buffer.
+
+    :param data: the buffer as an array of uint8 values.
+    :param starts: the start offset of every message.
+    :param lengths: the length in bytes of every message (at most 55).
+    :return: an (n, 16) array of big-endian uint32 words
+    """
+    width = int(lengths.max()) if len(lengths) else 0
+    columns = np.arange(width)
+    padded = np.concatenate([data, np.zeros(width, dtype=np.uint8)])
+
+    blocks = np.zeros((len(starts), 64), dtype=np.uint8)
+    blocks[:, :width] = sliding_window_view(padded, width)[starts]
+    blocks[:, :width][columns >= lengths[:, None]] = 0
+    blocks[np.arange(len(starts)), lengths] = 0x80
+    bit_lengths = lengths * 8
+    blocks[:, 62] = bit_lengths >> 8
+    blocks[:, 63] = bit_lengths & 0xFF
+
+    return blocks.view(">u4").astype(np.uint32)
+
+
+def hash_kgrams(sanitized, offsets, k, mask=HASH_MASK):
+    """Hashes every k-gram of the sanitized text with the SHA-1 hash of `modified_hash`, 20 bits by default.
+    The SHA-1 rounds are evaluated for all k-grams at once; k-grams that do not fit in a single block
+    (which does not happen for regular text) are hashed with hashlib instead.
+    If the text is shorter than k, the whole text is hashed as a single k-gram, as the `winnowing` package does.
+
+    :param sanitized: the sanitized text, encoded as UTF-8.
+    :param offsets: the byte offsets of every character of the sanitized text.
+    :param k: n-gram length.
+    :param mask: the mask the hashes are reduced with, HASH_MASK or WIDE_HASH_MASK.
+    :return: an array with the hashes of all k-grams, in order
+    """
+    count = len(offsets) - 1
+    if count < k:
+        starts, ends = offsets[:1], offsets[-1:]
+    else:
+        starts, ends = offsets[:count - k + 1], offsets[k:]
+    lengths = ends - starts
+
+    data = np.frombuffer(sanitized, dtype=np.uint8)
+    hashes = np.empty(len(starts), dtype=np.uint32)
+    for batch in range(0, len(starts), SHA1_BATCH_SIZE):
+        batch_starts = starts[batch:batch + SHA1_BATCH_SIZE]
+        batch_lengths = np.minimum(lengths[batch:batch + SHA1_BATCH_SIZE], SHA1_MAX_SINGLE_BLOCK)
+        hashes[batch:batch + SHA1_BATCH_SIZE] = sha1_low_bits(pad_blocks(data, batch_starts, batch_lengths))
+
+    for index in np.flatnonzero(lengths > SHA1_MAX_SINGLE_BLOCK).tolist():
+        digest = hashlib.sha1(sanitized[starts[index]:ends[index]]).digest()
+        hashes[index] = int.from_bytes(digest[-4:], "big")
+
+    # The last five hex digits of the digest are its lowest 20 bits
+    return hashes & np.uint32(mask)
+
+
+def hash_sanitized(sanitized, offsets, characters, k, scheme):
+    """Hashes every k-gram of the sanitized text with the hash function of the given fingerprint scheme.
+
+    :param sanitized: the sanitized text, encoded as UTF-8.
+    :param offsets: the byte offsets of every character of the sanitized text.
+    :param characters: the code points of the characters of the sanitized text.
+    :param k: n-gram length.
+    :param scheme: the fingerprint scheme.
+    :return: an array with the hashes of all k-grams, in order
+    """
+    if scheme == RABIN_KARP_SCHEME:
+        return rabin_karp_kgrams(character_values(characters), k)
+    return hash_kgrams(sanitized, offsets, k, hash_mask(scheme))
+
+
+def select_minima(hashes, window):
+    """Selects the minimum hash of every window of consecutive hashes. Ties are resolved to the leftmost hash,
+    just like `winnowing.select_min` does. If there are fewer hashes than the window size, one window is used.
+
+    :param hashes: the array of k-gram hashes.
+    :param window: the number of consecutive hashes in a window.
+    :return: the indices of the selected hashes, one for every window
+    """
+    if len(hashes) < window:
+        return np.array([np.argmin(hashes)])
+
+    windows = sliding_window_view(hashes, window)
+    return windows.argmin(axis=1) + np.arange(len(windows))
+
+
+def vectorized_winnow(text, k=8, window=6, scheme=SHA1_SCHEME):
+    """Vectorized implementation of `modified_winnow`. For the SHA-1 scheme it returns exactly the same set of
+    (position, hash) pairs, but sanitizes the text, hashes the k-grams and selects the window minima using
+    array operations. The Rabin-Karp scheme uses the same sanitizing and winnowing with a cheaper hash.
+
+    :param text: The text from which the shingles are computed.
+    :param k: n-gram length.
+    :param window: the number of consecutive k-gram hashes in a window.
+    :param scheme: the fingerprint scheme used for hashing the k-grams.
+    :return: The set of shingles.
+    """
+    return set(winnow_selections(text, k, window, scheme))
+
+
+def winnow_selections(text, k=8, window=6, scheme=SHA1_SCHEME):
+    """Computes the (position, hash) pair selected in every window, in the order of the windows. Building a set out
+    of them gives the result of vectorized_winnow, with the same iteration order.
+
+    :param text: The text from which the shingles are computed.
+    :param k: n-gram length.
+    :param window: the number of consecutive k-gram hashes in a window.
+    :param scheme: the fingerprint scheme used for hashing the k-grams.
+    :return: a list with the shingle selected in every window
+    """
+    validate_scheme(scheme)
+    sanitized, positions, offsets, characters = sanitize_text(text)
+
+    hashes = hash_sanitized(sanitized, offsets, characters, k, scheme)
+
+    # Every k-gram is identified by the position of its first character, or -1 if there are no characters at all
+    if len(positions) >= k:
+        kgram_positions = positions[:len(positions) - k + 1]
+    elif len(positions) > 0:
+        kgram_positions = positions[:1]
+    else:
+        kgram_positions = np.array([-1])
+
+    selected = select_minima(hashes, window)
+
+    return list(zip(kgram_positions[selected].tolist(), hashes[selected].tolist()))
@@ -146,6 +146,87 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Scheme used for computing the fingerprints of new documents and queries, see app/plagiarism_checker/schemes.py
+# Every stored document records its scheme, so only documents fingerprinted with the same scheme are compared
+# 'sha1-31-v1' keeps 31 bits of the SHA-1 hash instead of 20, so that far fewer unrelated documents share a fingerprint
+# in a large corpus; its documents are searched in the database, not in the in-memory index
+FINGERPRINT_SCHEME = 'sha1-v1'
+
+# Number of worker processes used for fingerprinting batches and large texts (None means one per core)
+FINGERPRINT_POOL_WORKERS = None
+
+# Texts of at least this many characters are fingerprinted in the worker processes, instead of the web thread
+FINGERPRINT_OFFLOAD_THRESHOLD = 10000
+
+# Texts of at least this many characters are split into overlapping segments, winnowed by all the workers at once
+FINGERPRINT_PARALLEL_THRESHOLD = 100000
+
+# Size limits of the LRU cache of computed fingerprints, in texts and in fingerprints of all texts together
+# Setting FINGERPRINT_CACHE_MAX_ENTRIES to 0 disables the cache
+FINGERPRINT_CACHE_MAX_ENTRIES = 1024
+FINGERPRINT_CACHE_MAX_FINGERPRINTS = 1000000
+
+# Maximum number of fingerprints of a document or query; fingerprinting stops as soon as a text exceeds it
+FINGERPRINT_BUDGET = 2000
+
+# Whether articles over FINGERPRINT_BUDGET are kept searchable by storing only the fingerprints divisible by
+# a power of two (mod-p sampling), instead of being rejected
+FINGERPRINT_SAMPLE_LONG_ARTICLES = False
+
+# Layout the search reads the stored fingerprints from: 'rows' (one url_fingerprints row per fingerprint), 'arrays'
+# (the sorted fingerprint_array of every document, with a GIN index) or 'postings' (the compressed document ids of
+# every fingerprint in fingerprint_postings). Documents are always stored as rows; run `build_fingerprint_arrays`
+# when switching to 'arrays' (see docs/scripts.md), and `build_postings` when switching to 'postings'
+FINGERPRINT_STORAGE = 'rows'
+
+# With the 'postings' storage, stored documents are appended to fingerprint_postings once this many are waiting
+POSTINGS_APPEND_BATCH = 100
+
+# Whether every worker loads all the stored documents into an in-memory inverted index at start, so that the
+# similarity search ranks them without querying the database
+FINGERPRINT_INDEX_IN_MEMORY = True
+
+# Index file written by `python3 manage.py build_index_file`, which workers map read-only at start instead of loading
+# the in-memory index from the database (only the documents stored after it was written are loaded), or None
+FINGERPRINT_INDEX_FILE = None
+
+# Whether every worker applies the documents stored or deleted by the other workers to its index, from the
+# index_changes table: as soon as they are notified, or every INDEX_CHANGES_POLL_INTERVAL seconds. Every
+# INDEX_COMPACTION_INTERVAL seconds, the index is compacted and a rebuilt FINGERPRINT_INDEX_FILE mapped again.
+# Changes are kept for INDEX_CHANGES_RETENTION_DAYS, the index file has to be rebuilt more often.
+INDEX_CHANGE_FEED = True
+INDEX_CHANGES_POLL_INTERVAL = 5
+INDEX_COMPACTION_INTERVAL = 300
+INDEX_CHANGES_RETENTION_DAYS = 7
+
+# Whether the text of every stored article is kept in article_texts, so that `python3 manage.py reindex_fingerprints`
+# can fingerprint all the documents again after the fingerprinting changes, without crawling them
+ARTICLE_TEXTS = True
+
+# The posting lists of the in-memory index are compressed again when more than this many postings were added since
+# the last compaction (or more than an eighth of the compressed ones)
+POSTINGS_COMPACTION_THRESHOLD = 100000
+
+# MinHash signatures of MINHASH_BANDS * MINHASH_ROWS values are stored for every document, cut into MINHASH_BANDS
+# bands of MINHASH_ROWS values; documents with Jaccard similarity s share a band with probability
+# 1 - (1 - s^MINHASH_ROWS)^MINHASH_BANDS. Run `python3 manage.py build_lsh_index` after changing them.
+MINHASH_BANDS = 64
+MINHASH_ROWS = 4
+
+# Whether similar documents are searched among the documents sharing an LSH band with the query (faster, may miss
+# some documents of low similarity) instead of among all the documents sharing a fingerprint with it
+MINHASH_CANDIDATES = False
+
+# Lowest Jaccard similarity the search is meant to find: documents need at least MINIMUM_SIMILARITY times the number
+# of fingerprints of the query in common with it to be ranked (100 for a query of 2000 fingerprints)
+MINIMUM_SIMILARITY = 0.05
+
+# Minimum Jaccard similarity of the documents returned by the search, or None to rank all the documents with enough
+# fingerprints in common with the query (see MINIMUM_SIMILARITY). With a threshold, only the documents whose size is
+# within its bounds and which share one of the rarest fingerprints of the query are compared (see
+# plagiarism_checker/threshold.py)
+SIMILARITY_THRESHOLD = None
+
 # Colourful tests, for more readabilty when reading stacktraces :D
 TEST_RUNNER = "redgreenunittest.django.runner.RedGreenDiscoverRunner"
 
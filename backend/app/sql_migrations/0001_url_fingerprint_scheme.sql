@@ -0,0 +1,5 @@
+-- Tags every stored document with the scheme its fingerprints were computed with.
+-- All documents stored before the tag existed were fingerprinted with the SHA-1 scheme.
+ALTER TABLE {schema}.urls ADD COLUMN IF NOT EXISTS scheme text NOT NULL DEFAULT 'sha1-v1';
+
+CREATE INDEX IF NOT EXISTS urls_scheme_idx ON {schema}.urls (scheme);
@@ -0,0 +1,3 @@
+-- Documents over the fingerprint budget can be stored sampled: only their fingerprints divisible by
+-- sampling_modulus (a power of two) are kept. All documents stored before were stored completely.
+ALTER TABLE {schema}.urls ADD COLUMN IF NOT EXISTS sampling_modulus integer NOT NULL DEFAULT 1;
@@ -0,0 +1,13 @@
+-- MinHash signature of every document and its LSH band keys (see app/plagiarism_checker/minhash.py).
+-- Documents sharing a band key are candidates of each other; run `python3 manage.py build_lsh_index` to fill
+-- both tables for the documents stored before, or after changing MINHASH_BANDS or MINHASH_ROWS.
+CREATE TABLE IF NOT EXISTS {schema}.url_minhash (
+    url_id integer PRIMARY KEY REFERENCES {schema}.urls (id) ON DELETE CASCADE,
+    signature integer[] NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS {schema}.lsh_bands (
+    band_key bigint NOT NULL,
+    url_id integer NOT NULL REFERENCES {schema}.urls (id) ON DELETE CASCADE,
+    PRIMARY KEY (band_key, url_id)
+);
@@ -0,0 +1,4 @@
+-- Number of distinct fingerprints stored for every document, written once when the document is saved so that the
+-- search does not count them again for every candidate. It is NULL for the documents stored before, until
+-- `python3 manage.py backfill_fingerprint_counts` is run.
+ALTER TABLE {schema}.urls ADD COLUMN IF NOT EXISTS fingerprint_count integer;
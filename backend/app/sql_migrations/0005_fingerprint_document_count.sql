@@ -0,0 +1,4 @@
+-- Number of documents having every fingerprint, used by the threshold search (SIMILARITY_THRESHOLD) to generate
+-- candidates from the rarest fingerprints of the query. The counts only make the search faster, not more precise:
+-- run `python3 manage.py count_fingerprint_documents` to compute them for the documents stored before.
+ALTER TABLE {schema}.fingerprints ADD COLUMN IF NOT EXISTS document_count integer NOT NULL DEFAULT 0;
@@ -0,0 +1,5 @@
+-- Fingerprints of every document as one sorted, distinct int4[] (FINGERPRINT_STORAGE = 'arrays'), so that fetching
+-- the fingerprints of a document reads a single row, and the overlap of the stored documents with a query is found
+-- through a GIN index instead of joining url_fingerprints. The column stays NULL until the arrays layout is used:
+-- `build_fingerprint_arrays` fills it for the stored documents and creates the index (see fingerprint_arrays.py).
+ALTER TABLE {schema}.urls ADD COLUMN IF NOT EXISTS fingerprint_array integer[];
@@ -0,0 +1,15 @@
+-- Inverted postings of the stored documents (FINGERPRINT_STORAGE = 'postings'): the ids of the documents having a
+-- fingerprint, as varint-encoded gaps (see postings.encode_ids). Documents are appended in batches, every batch
+-- adding one segment per fingerprint, and the segments of a fingerprint are merged into segment 0 by compaction.
+-- Run `python3 manage.py build_postings` to append the documents stored before.
+CREATE TABLE IF NOT EXISTS {schema}.fingerprint_postings (
+    fingerprint integer NOT NULL,
+    segment integer NOT NULL,
+    document_count integer NOT NULL,
+    postings bytea NOT NULL,
+    PRIMARY KEY (fingerprint, segment)
+);
+
+ALTER TABLE {schema}.urls ADD COLUMN IF NOT EXISTS postings_appended boolean NOT NULL DEFAULT false;
+
+CREATE INDEX IF NOT EXISTS urls_postings_pending_idx ON {schema}.urls (id) WHERE NOT postings_appended;
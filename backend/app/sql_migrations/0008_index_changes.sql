@@ -0,0 +1,28 @@
+-- Append-only feed of the documents added to or removed from urls, which every worker applies to its in-memory
+-- index (see plagiarism_checker/change_feed.py). The rows are written by a trigger, so documents deleted by hand
+-- are removed from the indexes as well, and every change is announced on the index_changes channel.
+CREATE TABLE IF NOT EXISTS {schema}.index_changes (
+    id bigserial PRIMARY KEY,
+    url_id integer NOT NULL,
+    url text NOT NULL,
+    operation text NOT NULL CHECK (operation IN ('add', 'remove')),
+    changed_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS index_changes_changed_at_idx ON {schema}.index_changes (changed_at);
+
+CREATE OR REPLACE FUNCTION {schema}.record_index_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO {schema}.index_changes (url_id, url, operation) VALUES (NEW.id, NEW.url, 'add');
+    ELSE
+        INSERT INTO {schema}.index_changes (url_id, url, operation) VALUES (OLD.id, OLD.url, 'remove');
+    END IF;
+    PERFORM pg_notify('index_changes', '{schema}');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS urls_index_changes ON {schema}.urls;
+CREATE TRIGGER urls_index_changes AFTER INSERT OR DELETE ON {schema}.urls
+    FOR EACH ROW EXECUTE FUNCTION {schema}.record_index_change();
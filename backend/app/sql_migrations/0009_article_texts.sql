@@ -0,0 +1,7 @@
+-- Text of every stored article, as it was crawled, so that the fingerprints of all the documents can be derived
+-- again after the fingerprinting changes (see plagiarism_checker/reindex.py) instead of crawling every article.
+-- Documents stored before are crawled again by `python3 manage.py reindex_fingerprints --crawl-missing`.
+CREATE TABLE IF NOT EXISTS {schema}.article_texts (
+    url_id integer PRIMARY KEY REFERENCES {schema}.urls (id) ON DELETE CASCADE,
+    text text NOT NULL
+);
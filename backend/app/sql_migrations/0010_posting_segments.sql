@@ -0,0 +1,4 @@
+-- Numbers of the segments appended to fingerprint_postings, one value per appended batch (see
+-- posting_table.append_postings), so that a document appended again never collides with a segment of an earlier
+-- batch. Segment 0 is the one compaction merges the segments of a fingerprint into.
+CREATE SEQUENCE IF NOT EXISTS {schema}.fingerprint_postings_segments AS integer MINVALUE 1;
@@ -0,0 +1,6 @@
+-- A reindex records a 'reindex' change when it switches to the rebuilt fingerprint tables (see reindex.cut_over), on
+-- which every worker loads its index and its bitmap of the stored fingerprints again, instead of keeping those of
+-- the retired tables.
+ALTER TABLE {schema}.index_changes DROP CONSTRAINT IF EXISTS index_changes_operation_check;
+ALTER TABLE {schema}.index_changes ADD CONSTRAINT index_changes_operation_check
+    CHECK (operation IN ('add', 'remove', 'reindex'));
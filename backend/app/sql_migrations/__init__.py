@@ -0,0 +1,50 @@
+import os
+
+# The SQL files of this package are applied in the order of their names, e.g. `0001_url_fingerprint_scheme.sql`
+MIGRATIONS_PATH = os.path.dirname(os.path.realpath(__file__))
+
+
+def list_migrations():
+    """Lists the SQL migrations of the news tables, in the order in which they have to be applied.
+
+    :return: a list with the names of the migration files
+    """
+    return sorted(name for name in os.listdir(MIGRATIONS_PATH) if name.endswith('.sql'))
+
+
+def read_migration(name, schema):
+    """Reads a SQL migration and fills in the schema it has to be applied on.
+
+    :param name: the name of the migration file.
+    :param schema: the schema containing the news tables.
+    :return: the SQL statements of the migration
+    """
+    with open(os.path.join(MIGRATIONS_PATH, name)) as f:
+        return f.read().replace('{schema}', schema)
+
+
+def apply_migrations(conn, schema):
+    """Applies all the SQL migrations that were not applied yet on the given schema. The applied migrations are
+    recorded in the "sql_migrations" table, so the function can be called any number of times.
+
+    :param conn: the connection to the database.
+    :param schema: the schema containing the news tables.
+    :return: the list of migrations applied now
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {schema}.sql_migrations (name text PRIMARY KEY)")
+        cur.execute(f"SELECT name FROM {schema}.sql_migrations")
+        applied = set(row[0] for row in cur.fetchall())
+
+        pending = [name for name in list_migrations() if name not in applied]
+        for name in pending:
+            cur.execute(read_migration(name, schema))
+            cur.execute(f"INSERT INTO {schema}.sql_migrations (name) VALUES (%s)", (name,))
+        conn.commit()
+        return pending
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
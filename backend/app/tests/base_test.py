@@ -1,9 +1,13 @@
 # base_test.py
 from django.test import TestCase
 from utils import conn, schema, existing_fps
+from app.sql_migrations import apply_migrations
 
 class BaseTest(TestCase):
     def reset_database(self):
+        # Make sure the test schema has all the columns and tables the application expects
+        apply_migrations(conn, schema)
+
         # Set up database connection
         self.cursor = conn.cursor()
 
@@ -14,6 +18,8 @@ class BaseTest(TestCase):
 
         conn.commit()  # commit the changes
 
-        existing_fps.clear()
+        # The fingerprint presence bitmap is loaded again from the emptied fingerprints table on its next lookup
+        existing_fps.reload()
+        self.assertEqual(0, len(existing_fps))
 
         self.cursor.close()
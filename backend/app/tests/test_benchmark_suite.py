@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+
+from django.test import TestCase
+
+from app.benchmarks.suite import run_suite, compare_with_baseline, save_results, load_results, cache_disabled, \
+    BASELINE_PATH, BENCHMARKS
+from app.plagiarism_checker.fingerprint_cache import fingerprint_cache
+
+
+def result(fingerprints_per_s, peak_memory_kb):
+    return {'fingerprints_per_s': fingerprints_per_s, 'peak_memory_kb': peak_memory_kb}
+
+
+class BenchmarkSuiteTest(TestCase):
+    def test_run_suite(self):
+        results = run_suite(repetitions=1, benchmarks=('compute_fingerprint', 'compute_similarity'))
+        self.assertEqual(6, len(results['results']))
+        maximum = results['results']['compute_fingerprint/maximum']
+        self.assertTrue(1500 < maximum['fingerprints'] <= 2000)
+        self.assertGreater(maximum['mb_per_s'], 0)
+        self.assertGreater(maximum['fingerprints_per_s'], 0)
+        self.assertGreater(maximum['peak_memory_kb'], 0)
+
+    def test_cache_disabled(self):
+        max_entries = fingerprint_cache.max_entries
+        with cache_disabled():
+            self.assertEqual(0, fingerprint_cache.entries_limit())
+        self.assertEqual(max_entries, fingerprint_cache.max_entries)
+
+    def test_no_regression(self):
+        baseline = {'results': {'a/short': result(1000, 100)}}
+        results = {'results': {'a/short': result(800, 120), 'b/short': result(1, 1)}}
+        self.assertEqual([], compare_with_baseline(results, baseline, tolerance=0.3))
+
+    def test_throughput_regression(self):
+        baseline = {'results': {'a/short': result(1000, 100)}}
+        results = {'results': {'a/short': result(500, 100)}}
+        self.assertEqual(1, len(compare_with_baseline(results, baseline, tolerance=0.3)))
+
+    def test_memory_regression(self):
+        baseline = {'results': {'a/short': result(1000, 100)}}
+        results = {'results': {'a/short': result(1000, 200)}}
+        self.assertEqual(1, len(compare_with_baseline(results, baseline, tolerance=0.3)))
+
+    def test_save_and_load(self):
+        results = {'results': {'a/short': result(1000, 100)}}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            save_results(results, path)
+            self.assertEqual(results, load_results(path))
+            self.assertIsNone(load_results(os.path.join(directory, 'missing.json')))
+
+    def test_baseline_covers_all_benchmarks(self):
+        with open(BASELINE_PATH) as file:
+            baseline = json.load(file)
+        for name in BENCHMARKS:
+            self.assertIn(f'{name}/typical', baseline['results'])
@@ -0,0 +1,127 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from app.benchmarks.corpus import article_of_size
+from app.plagiarism_checker.budget import apply_budget, winnow_within_budget, fingerprint_budget, \
+    sample_long_articles
+from app.plagiarism_checker.fingerprint_cache import fingerprint_cache
+from app.plagiarism_checker.fingerprint_pool import compute_fingerprint_sets_batch, compute_fingerprint_set_offloaded
+from app.plagiarism_checker.fingerprint_set import FingerprintSet
+from app.plagiarism_checker.fingerprinting import compute_fingerprint, compute_fingerprint_set, compute_shingle_hashes
+from app.plagiarism_checker.schemes import SHA1_SCHEME, RABIN_KARP_SCHEME
+from app.plagiarism_checker.streaming import StreamingWinnower
+
+
+class BudgetTest(TestCase):
+    def setUp(self):
+        fingerprint_cache.clear()
+
+    def tearDown(self):
+        fingerprint_cache.clear()
+
+    def test_within_budget_same_as_unbounded(self):
+        text = article_of_size(5000)
+        fingerprints = compute_fingerprint_set(text, budget=2000)
+        fingerprint_cache.clear()
+        expected = compute_fingerprint_set(text)
+        self.assertEqual(expected, fingerprints)
+        self.assertEqual(expected.count, fingerprints.count)
+        self.assertEqual(1, fingerprints.modulus)
+
+    def test_over_budget(self):
+        fingerprints = compute_fingerprint_set(article_of_size(20000), budget=2000)
+        self.assertEqual(2001, fingerprints.count)
+        self.assertEqual(1, fingerprints.modulus)
+
+    def test_over_budget_dictionaries(self):
+        self.assertEqual(2001, len(compute_fingerprint(article_of_size(20000), budget=2000)))
+
+    def test_over_budget_stops_early(self):
+        original_feed = StreamingWinnower.feed
+        with patch.object(StreamingWinnower, 'feed', autospec=True, side_effect=original_feed) as feed:
+            _, count, _ = winnow_within_budget(article_of_size(1000000), 2000, SHA1_SCHEME)
+        self.assertEqual(2001, count)
+        self.assertLess(feed.call_count, 5)
+
+    def test_over_budget_from_cache(self):
+        text = article_of_size(20000)
+        compute_fingerprint_set(text)
+        self.assertEqual(2001, compute_fingerprint_set(text, budget=2000).count)
+
+    def test_sampling(self):
+        text = article_of_size(30000)
+        full = compute_fingerprint_set(text)
+        fingerprint_cache.clear()
+        sampled = compute_fingerprint_set(text, budget=2000, sample=True)
+
+        self.assertGreater(sampled.modulus, 1)
+        self.assertEqual(0, sampled.modulus & (sampled.modulus - 1))
+        self.assertLessEqual(sampled.count, 2000)
+        self.assertEqual(full.sample(sampled.modulus), sampled)
+        # The modulus is the smallest power of two for which the fingerprints (counted with repetitions) fit
+        hashes = compute_shingle_hashes(text, SHA1_SCHEME)
+        self.assertGreater(int((hashes % (sampled.modulus // 2) == 0).sum()), 2000)
+
+    def test_sampling_is_deterministic(self):
+        text = article_of_size(30000)
+        first = compute_fingerprint_set(text, budget=1000, sample=True)
+        fingerprint_cache.clear()
+        second = compute_fingerprint_set(text, budget=1000, sample=True, scheme=SHA1_SCHEME)
+        self.assertEqual(first, second)
+        self.assertEqual(first.modulus, second.modulus)
+
+    def test_sampling_rabin_karp(self):
+        text = article_of_size(30000)
+        full = compute_fingerprint_set(text, RABIN_KARP_SCHEME)
+        fingerprint_cache.clear()
+        sampled = compute_fingerprint_set(text, RABIN_KARP_SCHEME, budget=2000, sample=True)
+        self.assertEqual(full.sample(sampled.modulus), sampled)
+
+    def test_apply_budget_same_as_streaming(self):
+        text = article_of_size(30000)
+        hashes, count, modulus = apply_budget(compute_shingle_hashes(text, SHA1_SCHEME), 500, sample=True)
+        streamed, streamed_count, streamed_modulus = winnow_within_budget(text, 500, SHA1_SCHEME, sample=True)
+        self.assertEqual(FingerprintSet(streamed), FingerprintSet(hashes))
+        self.assertEqual(streamed_modulus, modulus)
+
+    def test_apply_budget_cut(self):
+        self.assertEqual(([1, 2, 3], 3, 1), apply_budget([1, 2, 3, 4, 5], 2))
+
+    def test_none_text(self):
+        self.assertEqual(0, compute_fingerprint_set(None, budget=2000).count)
+
+    @override_settings(FINGERPRINT_BUDGET=100, FINGERPRINT_SAMPLE_LONG_ARTICLES=True)
+    def test_settings(self):
+        self.assertEqual(100, fingerprint_budget())
+        self.assertTrue(sample_long_articles())
+
+
+@override_settings(FINGERPRINT_POOL_WORKERS=2, FINGERPRINT_OFFLOAD_THRESHOLD=1000)
+class BudgetPoolTest(TestCase):
+    def setUp(self):
+        fingerprint_cache.clear()
+
+    def tearDown(self):
+        fingerprint_cache.clear()
+
+    def test_batch(self):
+        texts = [article_of_size(3000), article_of_size(20000), None, article_of_size(30000)]
+        expected = [compute_fingerprint_set(text, budget=2000, sample=True) for text in texts]
+        fingerprint_cache.clear()
+        fingerprints = compute_fingerprint_sets_batch(texts, budget=2000, sample=True)
+        self.assertEqual(expected, fingerprints)
+        self.assertEqual([fingerprint.modulus for fingerprint in expected],
+                         [fingerprint.modulus for fingerprint in fingerprints])
+
+    def test_batch_over_budget(self):
+        fingerprints = compute_fingerprint_sets_batch([article_of_size(3000), article_of_size(20000)], budget=2000)
+        self.assertLessEqual(fingerprints[0].count, 2000)
+        self.assertEqual(2001, fingerprints[1].count)
+
+    def test_offloaded(self):
+        text = article_of_size(30000)
+        fingerprints = compute_fingerprint_set_offloaded(text, budget=2000, sample=True)
+        fingerprint_cache.clear()
+        self.assertEqual(compute_fingerprint_set(text, budget=2000, sample=True), fingerprints)
+        self.assertEqual(2001, compute_fingerprint_set_offloaded(text, budget=2000).count)
@@ -0,0 +1,130 @@
+import os
+import tempfile
+from functools import partial
+
+from django.test import TestCase
+
+from app.benchmarks.search_benchmark import BENCHMARK_URL, create_schema, drop_schema, seed_documents
+from app.plagiarism_checker.change_feed import ADDED, REMOVED, ChangeFeed, apply_change, latest_change, \
+    prune_changes, read_changes, record_reindex, unseen_changes
+from app.plagiarism_checker.fingerprint_set import FingerprintSet
+from app.plagiarism_checker.index_file import MappedIndex, write_index_file
+from app.plagiarism_checker.inverted_index import InvertedIndex
+from app.plagiarism_checker.presence import FingerprintPresence, load_stored_fingerprints
+from app.plagiarism_checker.schemes import SHA1_SCHEME
+from utils import conn, connect
+
+CHANGES_SCHEMA = 'test_index_changes'
+
+
+class ApplyChangeTest(TestCase):
+    def test_inverted_index(self):
+        index = InvertedIndex()
+        query = FingerprintSet(range(0, 300, 2))
+        self.assertTrue(apply_change(index, ADDED, 'https://news.example/1', SHA1_SCHEME, 1, query.tolist()))
+        self.assertFalse(apply_change(index, ADDED, 'https://news.example/1', SHA1_SCHEME, 1, query.tolist()))
+        # An added document deleted since the change was made
+        self.assertFalse(apply_change(index, ADDED, 'https://news.example/2', None, None, None))
+        self.assertEqual(1, len(index.search(query, SHA1_SCHEME)))
+
+        self.assertTrue(apply_change(index, REMOVED, 'https://news.example/1', None, None, None))
+        self.assertFalse(apply_change(index, REMOVED, 'https://news.example/1', None, None, None))
+        self.assertEqual(0, len(index))
+        self.assertEqual([], index.search(query, SHA1_SCHEME, minimum_overlap=0))
+
+        self.assertTrue(apply_change(index, ADDED, 'https://news.example/1', SHA1_SCHEME, 1, query.tolist()))
+        self.assertEqual([('https://news.example/1', len(query), len(query), len(query))],
+                         index.search(query, SHA1_SCHEME))
+
+    def test_mapped_index(self):
+        index = InvertedIndex()
+        query = FingerprintSet(range(0, 300, 2))
+        index.add('https://news.example/1', query, SHA1_SCHEME)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'fingerprints.idx')
+            write_index_file(index, path, 1)
+            mapped = MappedIndex(path)
+            self.assertFalse(apply_change(mapped, ADDED, 'https://news.example/1', SHA1_SCHEME, 1, query.tolist()))
+            self.assertTrue(apply_change(mapped, ADDED, 'https://news.example/2', SHA1_SCHEME, 1, query.tolist()))
+            self.assertTrue(apply_change(mapped, REMOVED, 'https://news.example/1', None, None, None))
+            self.assertEqual(['https://news.example/2'], [result[0] for result in mapped.search(query, SHA1_SCHEME)])
+
+
+class ChangeFeedTest(TestCase):
+    def setUp(self):
+        drop_schema(conn, CHANGES_SCHEMA)
+        create_schema(conn, CHANGES_SCHEMA)
+        self.corpus = seed_documents(conn, CHANGES_SCHEMA, 20, 200)
+        self.feed = ChangeFeed(InvertedIndex(), connect, CHANGES_SCHEMA)
+        self.feed.listen()
+
+    def tearDown(self):
+        self.feed.close()
+        drop_schema(conn, CHANGES_SCHEMA)
+
+    def delete(self, url):
+        cur = conn.cursor()
+        cur.execute(f"DELETE FROM {CHANGES_SCHEMA}.urls WHERE url = %s", (url,))
+        conn.commit()
+        cur.close()
+
+    def test_changes_are_recorded(self):
+        self.assertEqual(20, latest_change(conn, CHANGES_SCHEMA))
+        self.delete(BENCHMARK_URL.format(3))
+        change_ids = unseen_changes(conn, CHANGES_SCHEMA, 19)
+        self.assertEqual([20, 21], change_ids)
+        changes = read_changes(conn, CHANGES_SCHEMA, change_ids)
+        self.assertEqual((ADDED, BENCHMARK_URL.format(19), SHA1_SCHEME, 1), changes[0][1:5])
+        self.assertEqual(sorted(self.corpus[19].tolist()), sorted(changes[0][5]))
+        self.assertEqual((REMOVED, BENCHMARK_URL.format(3), None, None, None), changes[1][1:])
+
+    def test_missing_changes_table(self):
+        drop_schema(conn, CHANGES_SCHEMA)
+        self.assertIsNone(latest_change(conn, CHANGES_SCHEMA))
+        # The connection is still usable
+        create_schema(conn, CHANGES_SCHEMA)
+        self.assertEqual(0, latest_change(conn, CHANGES_SCHEMA))
+
+    def test_poll(self):
+        self.assertEqual(20, self.feed.poll())
+        self.assertEqual(20, len(self.feed.index))
+        self.assertEqual(0, self.feed.poll())
+
+        query = self.corpus[3]
+        self.assertIn(BENCHMARK_URL.format(3), [result[0] for result in self.feed.index.search(query, SHA1_SCHEME)])
+        self.delete(BENCHMARK_URL.format(3))
+        self.assertEqual(1, self.feed.poll())
+        self.assertEqual(19, len(self.feed.index))
+        self.assertNotIn(BENCHMARK_URL.format(3), [result[0] for result in self.feed.index.search(query, SHA1_SCHEME)])
+
+    def test_prune(self):
+        self.assertEqual(0, prune_changes(conn, CHANGES_SCHEMA, 1))
+        self.assertEqual(20, prune_changes(conn, CHANGES_SCHEMA, 0))
+        self.assertEqual([], unseen_changes(conn, CHANGES_SCHEMA, 0))
+
+    def test_reindex(self):
+        self.assertEqual(20, self.feed.poll())
+        stale = 2 ** 31 - 1
+        presence = FingerprintPresence(partial(load_stored_fingerprints, conn, CHANGES_SCHEMA))
+        presence.update([stale])
+        replaced = []
+        self.feed.fingerprints = presence
+        self.feed.replace = replaced.append
+        former = self.feed.index
+
+        # A document the reindex could not fingerprint, and one deleted after the cutover
+        cur = conn.cursor()
+        cur.execute(f"DELETE FROM {CHANGES_SCHEMA}.url_fingerprints WHERE url_id = "
+                    f"(SELECT id FROM {CHANGES_SCHEMA}.urls WHERE url = %s)", (BENCHMARK_URL.format(3),))
+        record_reindex(cur, CHANGES_SCHEMA)
+        conn.commit()
+        cur.close()
+        self.delete(BENCHMARK_URL.format(5))
+
+        self.assertEqual(2, self.feed.poll())
+        self.assertEqual([self.feed.index], replaced)
+        self.assertIsNot(former, self.feed.index)
+        self.assertEqual(18, len(self.feed.index))
+        self.assertNotIn(BENCHMARK_URL.format(3), self.feed.index)
+        self.assertEqual([False, True], presence.contains([stale, self.corpus[0].tolist()[0]]).tolist())
+        self.assertEqual(0, self.feed.poll())
@@ -97,6 +97,20 @@ class TestProcessUrls(unittest.TestCase):
                     self.assertEqual(articles[0], urls[0])
                     self.assertEqual(articles[1], urls[1])
 
+    def test_process_urls_pool_failure(self):
+        # The articles of a batch the process pool could not fingerprint are fingerprinted one by one
+        urls = ['https://www.example.com/article1', 'https://www.example.com/article2']
+        from_url_patch_path = 'app.persist_docs.filter_english_news_articles.NewsPlease.from_url'
+        crawl_url_patch_path = 'app.persist_docs.filter_english_news_articles.crawl_url'
+        batch_patch_path = 'app.persist_docs.filter_english_news_articles.compute_fingerprint_sets_batch'
+        with patch(from_url_patch_path, return_value=MagicMock(language='en')):
+            with patch(crawl_url_patch_path, return_value=('A do run run run, a do run run', '2022-05-12')):
+                with patch(batch_patch_path, side_effect=RuntimeError('A process in the pool was terminated')):
+                    with patch('app.models.NewsDocument.save', return_value=None):
+                        urls_seen, articles = process_urls(urls)
+                        self.assertEqual(urls_seen, 2)
+                        self.assertEqual(articles, urls)
+
 
 class TestMain(unittest.TestCase):
     read_urls_patch_path = 'app.persist_docs.filter_english_news_articles.read_urls_from_file'
@@ -0,0 +1,66 @@
+import numpy as np
+from django.test import TestCase
+
+from app.benchmarks.search_benchmark import BENCHMARK_URL, create_schema, drop_schema, near_duplicate, \
+    seed_documents
+from app.plagiarism_checker.fingerprint_arrays import ARRAY_INDEX, fill_fingerprint_arrays
+from app.views import get_ranked_documents, get_ranked_documents_from_arrays, query_overlap_cutoffs
+from utils import conn
+
+ARRAYS_SCHEMA = 'test_fingerprint_arrays'
+
+
+class FingerprintArraysTest(TestCase):
+    def setUp(self):
+        drop_schema(conn, ARRAYS_SCHEMA)
+        create_schema(conn, ARRAYS_SCHEMA)
+        # Seeding the documents stores their arrays and creates the index
+        self.corpus = seed_documents(conn, ARRAYS_SCHEMA, 30, 200)
+
+    def tearDown(self):
+        drop_schema(conn, ARRAYS_SCHEMA)
+
+    def query(self, sql, parameters=()):
+        cur = conn.cursor()
+        cur.execute(sql, parameters)
+        rows = cur.fetchall()
+        conn.commit()
+        cur.close()
+        return rows
+
+    def rank(self, function, query):
+        cur = conn.cursor()
+        try:
+            ranked = function(cur, query, minimum_overlap=query_overlap_cutoffs(query), db_schema=ARRAYS_SCHEMA)
+            conn.commit()
+        finally:
+            cur.close()
+        return ranked
+
+    def test_fill(self):
+        cur = conn.cursor()
+        cur.execute(f"UPDATE {ARRAYS_SCHEMA}.urls SET fingerprint_array = NULL WHERE id % 2 = 0")
+        cur.execute(f"INSERT INTO {ARRAYS_SCHEMA}.urls (url) VALUES ('https://news.example/empty')")
+        conn.commit()
+        cur.close()
+
+        self.assertEqual(10, fill_fingerprint_arrays(conn, ARRAYS_SCHEMA, batch_size=10))
+        self.assertEqual(6, fill_fingerprint_arrays(conn, ARRAYS_SCHEMA))
+        self.assertEqual(0, fill_fingerprint_arrays(conn, ARRAYS_SCHEMA))
+        for number, document in enumerate(self.corpus):
+            self.assertEqual([(document.tolist(),)],
+                             self.query(f"SELECT fingerprint_array FROM {ARRAYS_SCHEMA}.urls WHERE url = %s",
+                                        (BENCHMARK_URL.format(number),)))
+        self.assertEqual([([],)], self.query(f"SELECT fingerprint_array FROM {ARRAYS_SCHEMA}.urls "
+                                             f"WHERE url = 'https://news.example/empty'"))
+        self.assertEqual(1, len(self.query("SELECT 1 FROM pg_indexes WHERE schemaname = %s AND indexname = %s",
+                                           (ARRAYS_SCHEMA, ARRAY_INDEX))))
+
+    def test_ranked_documents(self):
+        rng = np.random.RandomState(1)
+        for number in (3, 17):
+            query = near_duplicate(rng, self.corpus[number])
+            ranked = self.rank(get_ranked_documents_from_arrays, query)
+            self.assertEqual(BENCHMARK_URL.format(number), ranked[0][1])
+            self.assertAlmostEqual(query.jaccard(self.corpus[number]), ranked[0][2])
+            self.assertEqual(ranked, self.rank(get_ranked_documents, query))
@@ -0,0 +1,83 @@
+from django.test import TestCase, override_settings
+
+from app.plagiarism_checker.fingerprint_cache import FingerprintCache, cache_key, fingerprint_cache
+from app.plagiarism_checker.fingerprinting import compute_fingerprint
+from app.plagiarism_checker.schemes import SHA1_SCHEME, RABIN_KARP_SCHEME
+
+
+class FingerprintCacheTest(TestCase):
+    def test_key_depends_on_text_and_scheme(self):
+        self.assertEqual(cache_key('run run', SHA1_SCHEME), cache_key('run run', SHA1_SCHEME))
+        self.assertNotEqual(cache_key('run run', SHA1_SCHEME), cache_key('run run', RABIN_KARP_SCHEME))
+        self.assertNotEqual(cache_key('run run', SHA1_SCHEME), cache_key('run ran', SHA1_SCHEME))
+
+    def test_hit_and_miss(self):
+        cache = FingerprintCache(max_entries=10, max_fingerprints=100)
+        self.assertIsNone(cache.get('run run', SHA1_SCHEME))
+        cache.put('run run', SHA1_SCHEME, (945012,))
+        self.assertEqual((945012,), cache.get('run run', SHA1_SCHEME))
+        self.assertIsNone(cache.get('run run', RABIN_KARP_SCHEME))
+
+        statistics = cache.statistics()
+        self.assertEqual(1, statistics['hits'])
+        self.assertEqual(2, statistics['misses'])
+        self.assertEqual(1 / 3, statistics['hit_ratio'])
+        self.assertEqual(1, statistics['entries'])
+        self.assertEqual(1, statistics['fingerprints'])
+
+    def test_evicts_least_recently_used(self):
+        cache = FingerprintCache(max_entries=2, max_fingerprints=100)
+        cache.put('a', SHA1_SCHEME, (1,))
+        cache.put('b', SHA1_SCHEME, (2,))
+        cache.get('a', SHA1_SCHEME)
+        cache.put('c', SHA1_SCHEME, (3,))
+
+        self.assertEqual((1,), cache.get('a', SHA1_SCHEME))
+        self.assertIsNone(cache.get('b', SHA1_SCHEME))
+        self.assertEqual((3,), cache.get('c', SHA1_SCHEME))
+
+    def test_fingerprint_limit(self):
+        cache = FingerprintCache(max_entries=10, max_fingerprints=5)
+        cache.put('a', SHA1_SCHEME, (1, 2, 3))
+        cache.put('b', SHA1_SCHEME, (4, 5, 6))
+        cache.put('c', SHA1_SCHEME, tuple(range(6)))
+
+        self.assertIsNone(cache.get('a', SHA1_SCHEME))
+        self.assertEqual((4, 5, 6), cache.get('b', SHA1_SCHEME))
+        self.assertIsNone(cache.get('c', SHA1_SCHEME))
+        self.assertEqual(3, cache.statistics()['fingerprints'])
+
+    def test_replace_entry(self):
+        cache = FingerprintCache(max_entries=10, max_fingerprints=100)
+        cache.put('a', SHA1_SCHEME, (1, 2, 3))
+        cache.put('a', SHA1_SCHEME, (1, 2))
+        self.assertEqual(1, cache.statistics()['entries'])
+        self.assertEqual(2, cache.statistics()['fingerprints'])
+
+    def test_clear(self):
+        cache = FingerprintCache(max_entries=10, max_fingerprints=100)
+        cache.put('a', SHA1_SCHEME, (1,))
+        cache.get('a', SHA1_SCHEME)
+        cache.clear()
+        self.assertEqual({'hits': 0, 'misses': 0, 'hit_ratio': 0.0, 'entries': 0, 'fingerprints': 0},
+                         cache.statistics())
+
+    def test_compute_fingerprint_uses_cache(self):
+        fingerprint_cache.clear()
+        text = 'A do run run run, a do run run'
+        first = compute_fingerprint(text)
+        second = compute_fingerprint(text)
+
+        self.assertEqual(first, second)
+        self.assertEqual(1, fingerprint_cache.hits)
+        self.assertEqual(1, fingerprint_cache.misses)
+        fingerprint_cache.clear()
+
+    @override_settings(FINGERPRINT_CACHE_MAX_ENTRIES=0)
+    def test_disabled_cache(self):
+        fingerprint_cache.clear()
+        compute_fingerprint('A do run run run, a do run run')
+        compute_fingerprint('A do run run run, a do run run')
+        self.assertEqual(0, fingerprint_cache.hits)
+        self.assertEqual(0, fingerprint_cache.statistics()['entries'])
+        fingerprint_cache.clear()
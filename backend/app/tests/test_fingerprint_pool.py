@@ -0,0 +1,110 @@
+from django.test import TestCase, override_settings
+
+from app.benchmarks.corpus import article_of_size
+from app.plagiarism_checker.fingerprint_pool import compute_fingerprints_batch, compute_fingerprint_offloaded, \
+    batch_statistics, offload_statistics, ThroughputStatistics, warm_up, compute_fingerprint_sets_batch, \
+    compute_fingerprint_set_offloaded
+from app.plagiarism_checker.fingerprint_cache import fingerprint_cache
+from app.plagiarism_checker.fingerprinting import compute_fingerprint, compute_fingerprint_set
+from app.plagiarism_checker.schemes import RABIN_KARP_SCHEME, default_scheme
+
+
+@override_settings(FINGERPRINT_POOL_WORKERS=2, FINGERPRINT_OFFLOAD_THRESHOLD=1000)
+class FingerprintPoolTest(TestCase):
+    def setUp(self):
+        fingerprint_cache.clear()
+
+    def tearDown(self):
+        fingerprint_cache.clear()
+
+    def test_batch_same_as_single(self):
+        texts = ['A do run run run, a do run run', 'run run', article_of_size(3000), None]
+        fingerprints = compute_fingerprints_batch(texts)
+        fingerprint_cache.clear()
+        self.assertEqual([compute_fingerprint(text) for text in texts], fingerprints)
+
+    def test_batch_scheme(self):
+        texts = ['A do run run run, a do run run', article_of_size(3000)]
+        expected = [compute_fingerprint(text, RABIN_KARP_SCHEME) for text in texts]
+        self.assertEqual(expected, compute_fingerprints_batch(texts, RABIN_KARP_SCHEME))
+
+    def test_sets_batch_same_as_single(self):
+        texts = ['A do run run run, a do run run', article_of_size(3000), None]
+        expected = [compute_fingerprint_set(text) for text in texts]
+        fingerprint_cache.clear()
+        self.assertEqual(expected, compute_fingerprint_sets_batch(texts))
+
+    def test_set_offloaded_large_text(self):
+        text = article_of_size(5000)
+        fingerprints = compute_fingerprint_set_offloaded(text)
+        fingerprint_cache.clear()
+        self.assertEqual(compute_fingerprint_set(text), fingerprints)
+
+    @override_settings(FINGERPRINT_PARALLEL_THRESHOLD=4000)
+    def test_set_offloaded_sampled_segments(self):
+        text = article_of_size(20000)
+        fingerprints = compute_fingerprint_set_offloaded(text, budget=200, sample=True)
+        # The whole text was winnowed in segments, and its fingerprints cached
+        self.assertIsNotNone(fingerprint_cache.get(text, default_scheme()))
+        fingerprint_cache.clear()
+        expected = compute_fingerprint_set(text, budget=200, sample=True)
+        self.assertEqual(expected, fingerprints)
+        self.assertEqual((len(expected), expected.modulus), (len(fingerprints), fingerprints.modulus))
+        self.assertGreater(fingerprints.modulus, 1)
+
+    def test_batch_empty(self):
+        self.assertEqual([], compute_fingerprints_batch([]))
+
+    def test_batch_statistics(self):
+        texts_before = batch_statistics.texts
+        compute_fingerprints_batch(['A do run run run, a do run run', 'run run'])
+        self.assertEqual(texts_before + 2, batch_statistics.texts)
+
+    def test_offloaded_large_text(self):
+        text = article_of_size(5000)
+        texts_before = offload_statistics.texts
+        fingerprints = compute_fingerprint_offloaded(text)
+        self.assertEqual(texts_before + 1, offload_statistics.texts)
+        fingerprint_cache.clear()
+        self.assertEqual(compute_fingerprint(text), fingerprints)
+
+    def test_offloaded_cached_text(self):
+        text = article_of_size(5000)
+        compute_fingerprint(text)
+        texts_before = offload_statistics.texts
+        self.assertEqual(compute_fingerprint(text), compute_fingerprint_offloaded(text))
+        self.assertEqual(texts_before, offload_statistics.texts)
+
+    def test_batch_uses_cache(self):
+        texts = ['A do run run run, a do run run', article_of_size(3000)]
+        compute_fingerprints_batch(texts)
+        hits_before = fingerprint_cache.hits
+        compute_fingerprints_batch(texts)
+        self.assertEqual(hits_before + 2, fingerprint_cache.hits)
+
+    def test_offloaded_small_text(self):
+        text = 'A do run run run, a do run run'
+        texts_before = offload_statistics.texts
+        self.assertEqual(compute_fingerprint(text), compute_fingerprint_offloaded(text))
+        self.assertEqual(texts_before, offload_statistics.texts)
+
+    def test_offloaded_none(self):
+        self.assertEqual({}, compute_fingerprint_offloaded(None))
+
+    def test_warm_up(self):
+        warm_up()
+        self.assertEqual(compute_fingerprint('run run'), compute_fingerprint_offloaded('run run'))
+
+
+class ThroughputStatisticsTest(TestCase):
+    def test_empty_statistics(self):
+        statistics = ThroughputStatistics()
+        self.assertEqual(0, statistics.texts_per_second())
+        self.assertEqual(0, statistics.megabytes_per_second())
+
+    def test_record(self):
+        statistics = ThroughputStatistics()
+        statistics.record(10, 2000000, 2.0)
+        statistics.record(10, 2000000, 2.0)
+        self.assertEqual(5, statistics.texts_per_second())
+        self.assertEqual(1, statistics.megabytes_per_second())
@@ -0,0 +1,75 @@
+import pickle
+
+from django.test import TestCase
+
+from app.plagiarism_checker.fingerprint_set import FingerprintSet, as_fingerprint_set
+
+
+class FingerprintSetTest(TestCase):
+    def test_sorted_distinct_hashes(self):
+        fingerprints = FingerprintSet([142575, 156058, 142575, 221067])
+        self.assertEqual([142575, 156058, 221067], fingerprints.tolist())
+        self.assertEqual(3, len(fingerprints))
+        self.assertEqual(4, fingerprints.count)
+
+    def test_empty(self):
+        fingerprints = FingerprintSet()
+        self.assertEqual(0, len(fingerprints))
+        self.assertEqual(0, fingerprints.count)
+        self.assertEqual([], list(fingerprints))
+
+    def test_iteration_yields_integers(self):
+        self.assertEqual([type(1)], [type(shingle_hash) for shingle_hash in FingerprintSet([5])])
+
+    def test_contains(self):
+        fingerprints = FingerprintSet([4, 1, 9])
+        self.assertIn(4, fingerprints)
+        self.assertNotIn(5, fingerprints)
+        self.assertNotIn(10, fingerprints)
+
+    def test_equality(self):
+        self.assertEqual(FingerprintSet([1, 4]), FingerprintSet([4, 1, 1]))
+        self.assertEqual(FingerprintSet([1, 4]), {1, 4})
+        self.assertNotEqual(FingerprintSet([1, 4]), FingerprintSet([1, 5]))
+
+    def test_set_operations(self):
+        first = FingerprintSet([1, 4, 7])
+        second = FingerprintSet([4, 5, 7, 8])
+        self.assertEqual({4, 7}, first & second)
+        self.assertEqual({1, 4, 5, 7, 8}, first | second)
+        self.assertEqual(2, first.intersection_size(second))
+        self.assertEqual(5, first.union_size(second))
+        self.assertEqual(2 / 5, first.jaccard(second))
+
+    def test_intersection_size_with_empty(self):
+        self.assertEqual(0, FingerprintSet().intersection_size(FingerprintSet([1, 2])))
+
+    def test_jaccard_same_as_python_sets(self):
+        first = list(range(0, 3000, 3))
+        second = list(range(0, 3000, 5))
+        expected = len(set(first) & set(second)) / len(set(first) | set(second))
+        self.assertEqual(expected, FingerprintSet(first).jaccard(FingerprintSet(second)))
+
+    def test_dicts_round_trip(self):
+        shingles = [{"shingle_hash": 4}, {"shingle_hash": 1}, {"shingle_hash": 4}]
+        fingerprints = FingerprintSet.from_dicts(shingles)
+        self.assertEqual([{"shingle_hash": 1}, {"shingle_hash": 4}], fingerprints.to_dicts())
+
+    def test_as_fingerprint_set(self):
+        fingerprints = FingerprintSet([1, 4])
+        self.assertIs(fingerprints, as_fingerprint_set(fingerprints))
+        self.assertEqual(fingerprints, as_fingerprint_set([{"shingle_hash": 1}, {"shingle_hash": 4}]))
+        self.assertEqual(fingerprints, as_fingerprint_set([4, 1]))
+        self.assertEqual(FingerprintSet(), as_fingerprint_set({}))
+
+    def test_pickle(self):
+        fingerprints = FingerprintSet([1, 4, 4])
+        restored = pickle.loads(pickle.dumps(fingerprints))
+        self.assertEqual(fingerprints, restored)
+        self.assertEqual(3, restored.count)
+
+    def test_sample(self):
+        sampled = FingerprintSet([1, 2, 4, 6, 8, 9]).sample(4)
+        self.assertEqual({4, 8}, sampled)
+        self.assertEqual(4, sampled.modulus)
+        self.assertEqual(2, FingerprintSet([1, 2, 4, 6, 8, 9]).sampled_size(4))
@@ -1,6 +1,7 @@
 from django.test import TestCase
 
-from app.plagiarism_checker.fingerprinting import compute_fingerprint
+from app.plagiarism_checker.fingerprinting import compute_fingerprint, compute_fingerprint_set
+from app.plagiarism_checker.fingerprint_set import FingerprintSet
 
 
 # Create your tests here.
@@ -28,3 +29,13 @@ class FingerprintingTest(TestCase):
         text = None
         shingle = {}
         self.assertEqual(shingle, compute_fingerprint(text))
+
+    def test_fingerprint_set(self):
+        text = 'A do run run run, a do run run'
+        fingerprints = compute_fingerprint_set(text)
+
+        self.assertEqual(FingerprintSet([142575, 156058, 221067]), fingerprints)
+        self.assertEqual(4, fingerprints.count)
+
+    def test_fingerprint_set_empty(self):
+        self.assertEqual(0, len(compute_fingerprint_set(None)))
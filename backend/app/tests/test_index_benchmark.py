@@ -0,0 +1,20 @@
+from django.test import TestCase
+
+from app.benchmarks.index_benchmark import build_store, query_overlaps, run_benchmark
+from app.plagiarism_checker.schemes import HASH_MASK
+
+
+class IndexBenchmarkTest(TestCase):
+    def test_run_benchmark(self):
+        results = run_benchmark(document_counts=(2000,), fingerprints=50, query_fingerprints=100, queries=2)
+        self.assertEqual(1, len(results))
+        self.assertEqual(2000, results[0]['documents'])
+        self.assertGreater(results[0]['postings'], 0)
+        self.assertGreater(results[0]['bytes_per_posting'], 0)
+        self.assertGreater(results[0]['query_ms'], 0)
+
+    def test_query_overlaps(self):
+        store, _ = build_store(500, 20)
+        counts = query_overlaps(store, 500, list(range(HASH_MASK + 1)))
+        self.assertEqual(500, len(counts))
+        self.assertEqual(len(store), counts.sum())
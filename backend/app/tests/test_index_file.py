@@ -0,0 +1,140 @@
+import os
+import struct
+import tempfile
+
+import numpy as np
+from django.test import TestCase, override_settings
+
+from app.plagiarism_checker.fingerprint_set import FingerprintSet
+from app.plagiarism_checker.index_file import HEADER, MAGIC, VERSION, MappedIndex, index_file_path, \
+    write_index_file
+from app.plagiarism_checker.inverted_index import InvertedIndex, LEVELS
+from app.plagiarism_checker.schemes import RABIN_KARP_SCHEME, SHA1_SCHEME
+from app.tests.test_inverted_index import random_documents
+
+
+class IndexFileTest(TestCase):
+    def setUp(self):
+        self.documents = random_documents()
+        self.index = InvertedIndex()
+        for number, (url, fingerprints) in enumerate(self.documents.items()):
+            modulus = 2 ** (number % 3)
+            scheme = RABIN_KARP_SCHEME if number % 10 == 9 else SHA1_SCHEME
+            self.index.add(url, fingerprints.sample(modulus), scheme, modulus)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'fingerprints.idx')
+        write_index_file(self.index, self.path, 1234, 56)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        mapped = MappedIndex(self.path)
+        self.assertEqual(len(self.index), len(mapped))
+        self.assertEqual(1234, mapped.last_url_id)
+        self.assertEqual(56, mapped.last_change)
+        self.assertEqual(self.index.urls, [mapped.file.url(number) for number in range(len(mapped))])
+        self.assertEqual(self.index.sizes[:len(mapped)].tolist(), mapped.file.sizes.tolist())
+        self.assertFalse(os.path.exists(f'{self.path}.tmp'))
+
+    def test_search_as_inverted_index(self):
+        mapped = MappedIndex(self.path)
+        urls = list(self.documents)
+        for query_modulus in [1, 4]:
+            query = self.documents[urls[4]].sample(query_modulus)
+            self.assertEqual(self.index.overlaps(query).tolist(), mapped.file.overlaps(query).tolist())
+            self.assertTrue(self.index.search(query, SHA1_SCHEME, urls[4], 20))
+            for scheme in [SHA1_SCHEME, RABIN_KARP_SCHEME]:
+                self.assertEqual(sorted(self.index.search(query, scheme, urls[4], 20)),
+                                 sorted(mapped.search(query, scheme, urls[4], 20)))
+            cutoffs = np.full(LEVELS, 60)
+            self.assertEqual(sorted(self.index.search(query, SHA1_SCHEME, minimum_overlap=cutoffs)),
+                             sorted(mapped.search(query, SHA1_SCHEME, minimum_overlap=cutoffs)))
+            self.assertEqual(sorted(self.index.search(query, SHA1_SCHEME, threshold=0.3)),
+                             sorted(mapped.search(query, SHA1_SCHEME, threshold=0.3)))
+
+    def test_added_documents(self):
+        mapped = MappedIndex(self.path)
+        query = next(iter(self.documents.values()))
+        self.assertTrue(mapped.add('https://news.example/new', query, SHA1_SCHEME))
+        self.assertIn('https://news.example/new', mapped)
+        self.assertIn(next(iter(self.documents)), mapped)
+        self.assertNotIn('https://news.example/missing', mapped)
+        self.assertEqual(len(self.documents) + 1, len(mapped))
+        results = mapped.search(query, SHA1_SCHEME)
+        self.assertIn(('https://news.example/new', len(query), len(query), len(query)), results)
+        self.assertEqual(len(results), len(set(result[0] for result in results)))
+
+    def test_lookup(self):
+        mapped = MappedIndex(self.path)
+        for number, url in enumerate(self.documents):
+            self.assertEqual(number, mapped.file.number(url))
+        self.assertIsNone(mapped.file.number('https://news.example/missing'))
+
+    def test_removed_documents(self):
+        urls = list(self.documents)
+        query = self.documents[urls[4]]
+        mapped = MappedIndex(self.path)
+        mapped.add('https://news.example/new', query, SHA1_SCHEME)
+        self.assertTrue(mapped.remove(urls[4]))
+        self.assertTrue(mapped.remove('https://news.example/new'))
+        self.assertFalse(mapped.remove(urls[4]))
+        self.assertFalse(mapped.remove('https://news.example/missing'))
+        self.assertNotIn(urls[4], mapped)
+        self.assertEqual(len(self.documents) - 1, len(mapped))
+        found = [result[0] for result in mapped.search(query, SHA1_SCHEME, minimum_overlap=0)]
+        self.assertNotIn(urls[4], found)
+        self.assertNotIn('https://news.example/new', found)
+
+        # A removed document can be stored again
+        self.assertTrue(mapped.add(urls[4], query, SHA1_SCHEME))
+        self.assertFalse(mapped.add(urls[5], query, SHA1_SCHEME))
+        self.assertIn(urls[4], [result[0] for result in mapped.search(query, SHA1_SCHEME)])
+
+    def test_removed_documents_are_not_written(self):
+        urls = list(self.documents)
+        self.index.remove(urls[2])
+        write_index_file(self.index, self.path, 1234)
+        mapped = MappedIndex(self.path)
+        self.assertEqual(len(self.documents) - 1, len(mapped))
+        self.assertNotIn(urls[2], mapped)
+        self.assertNotIn(urls[2], [result[0] for result in mapped.search(self.documents[urls[2]], SHA1_SCHEME)])
+
+    def test_swap(self):
+        mapped = MappedIndex(self.path)
+        self.assertFalse(mapped.replaced())
+        self.index.add('https://news.example/new', FingerprintSet([1, 2, 3]), SHA1_SCHEME)
+        write_index_file(self.index, self.path, 1300, 70)
+        self.assertTrue(mapped.replaced())
+        mapped.swap(MappedIndex(self.path))
+        self.assertFalse(mapped.replaced())
+        self.assertEqual(70, mapped.last_change)
+        self.assertIn('https://news.example/new', mapped)
+
+    def test_empty_index(self):
+        write_index_file(InvertedIndex(), self.path, 0)
+        mapped = MappedIndex(self.path)
+        self.assertEqual(0, len(mapped))
+        self.assertEqual([], mapped.search(FingerprintSet([1, 2, 3]), SHA1_SCHEME, minimum_overlap=0))
+
+    def test_other_version(self):
+        with open(self.path, 'r+b') as file:
+            file.write(struct.pack('<4sI', MAGIC, VERSION + 1))
+        with self.assertRaises(ValueError):
+            MappedIndex(self.path)
+
+    def test_not_an_index_file(self):
+        with open(self.path, 'wb') as file:
+            file.write(b'x' * HEADER.size)
+        with self.assertRaises(ValueError):
+            MappedIndex(self.path)
+
+    def test_truncated(self):
+        with open(self.path, 'r+b') as file:
+            file.truncate(os.path.getsize(self.path) - 1)
+        with self.assertRaises(ValueError):
+            MappedIndex(self.path)
+
+    @override_settings(FINGERPRINT_INDEX_FILE='/var/lib/news-cop/fingerprints.idx')
+    def test_path_from_settings(self):
+        self.assertEqual('/var/lib/news-cop/fingerprints.idx', index_file_path())
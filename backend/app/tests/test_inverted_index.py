@@ -0,0 +1,154 @@
+import numpy as np
+from django.test import TestCase, override_settings
+
+from app.plagiarism_checker.fingerprint_set import FingerprintSet
+from app.plagiarism_checker.inverted_index import InvertedIndex, LEVELS, fingerprint_index_enabled, \
+    fingerprint_levels, indexed_scheme, modulus_level, sampled_sizes
+from app.plagiarism_checker.postings import BITMAP
+from app.plagiarism_checker.schemes import RABIN_KARP_SCHEME, SHA1_SCHEME, SHA1_WIDE_SCHEME
+
+
+def random_documents(count=60, size=400, seed=3):
+    """Builds documents sharing a growing part of the fingerprints of a common pool, so that many of them have
+    more than 100 fingerprints in common.
+    """
+    rng = np.random.RandomState(seed)
+    pool = rng.choice(2 ** 20, 600, replace=False)
+    documents = {}
+    for number in range(count):
+        shared = pool[:rng.randint(0, 600)]
+        own = rng.randint(0, 2 ** 20, size)
+        documents[f'https://news.example/{number}'] = FingerprintSet(np.concatenate([shared, own]))
+    return documents
+
+
+class InvertedIndexTest(TestCase):
+    def setUp(self):
+        self.documents = random_documents()
+        self.index = InvertedIndex()
+        for url, fingerprints in self.documents.items():
+            self.index.add(url, fingerprints, SHA1_SCHEME)
+
+    def test_levels(self):
+        self.assertEqual(0, modulus_level(1))
+        self.assertEqual(5, modulus_level(32))
+        self.assertEqual([0, 1, 0, 2, 3, LEVELS - 1], fingerprint_levels([1, 2, 3, 4, 24, 0]).tolist())
+
+    def test_sampled_sizes(self):
+        fingerprints = FingerprintSet(np.arange(0, 5000, 3))
+        sizes = sampled_sizes(fingerprints.hashes)
+        self.assertEqual(LEVELS, len(sizes))
+        for level in range(LEVELS):
+            self.assertEqual(fingerprints.sampled_size(2 ** level), sizes[level])
+
+    def test_add(self):
+        self.assertEqual(len(self.documents), len(self.index))
+        url = next(iter(self.documents))
+        self.assertIn(url, self.index)
+        self.assertFalse(self.index.add(url, [1, 2, 3], SHA1_SCHEME))
+        self.assertEqual(len(self.documents), len(self.index))
+
+    def test_overlaps_as_exact_intersections(self):
+        query = next(iter(self.documents.values()))
+        expected = [len(query.intersection(fingerprints)) for fingerprints in self.documents.values()]
+        self.assertEqual(expected, self.index.overlaps(query).tolist())
+
+    def test_search_as_exact_search(self):
+        urls = list(self.documents)
+        query_url = urls[7]
+        query = self.documents[query_url]
+        expected = sorted((url, query.intersection_size(fingerprints), len(query), len(fingerprints))
+                          for url, fingerprints in self.documents.items()
+                          if url != query_url and query.intersection_size(fingerprints) >= 100)
+        self.assertTrue(expected)
+        self.assertEqual(expected, sorted(self.index.search(query, SHA1_SCHEME, query_url)))
+        self.assertIn(query_url, [result[0] for result in self.index.search(query, SHA1_SCHEME)])
+
+    def test_search_other_scheme(self):
+        query = next(iter(self.documents.values()))
+        self.assertEqual([], self.index.search(query, RABIN_KARP_SCHEME))
+        self.index.add('https://news.example/rabin-karp', query, RABIN_KARP_SCHEME)
+        self.assertEqual([('https://news.example/rabin-karp', len(query), len(query), len(query))],
+                         self.index.search(query, RABIN_KARP_SCHEME))
+
+    def test_wide_scheme_not_indexed(self):
+        self.assertTrue(indexed_scheme(SHA1_SCHEME))
+        self.assertFalse(indexed_scheme(SHA1_WIDE_SCHEME))
+        self.assertFalse(self.index.add('https://news.example/wide', [3, 2 ** 30], SHA1_WIDE_SCHEME))
+        self.assertNotIn('https://news.example/wide', self.index)
+        self.assertEqual(len(self.documents), len(self.index))
+
+    def test_search_sampled(self):
+        urls = list(self.documents)
+        index = InvertedIndex()
+        for number, url in enumerate(urls):
+            modulus = 2 ** (number % 3)
+            index.add(url, self.documents[url].sample(modulus), SHA1_SCHEME, modulus)
+
+        for query_modulus in [1, 2, 8]:
+            query = self.documents[urls[11]].sample(query_modulus)
+            expected = []
+            for number, url in enumerate(urls):
+                modulus = max(2 ** (number % 3), query_modulus)
+                document = self.documents[url].sample(modulus)
+                sampled_query = query.sample(modulus)
+                inters = sampled_query.intersection_size(document)
+                if inters >= 100:
+                    expected.append((url, inters, len(sampled_query), len(document)))
+            self.assertEqual(sorted(expected), sorted(index.search(query, SHA1_SCHEME)))
+
+    def test_search_compacted(self):
+        urls = list(self.documents)
+        index = InvertedIndex()
+        for number, url in enumerate(urls):
+            modulus = 2 ** (number % 3)
+            index.add(url, self.documents[url].sample(modulus), SHA1_SCHEME, modulus)
+            if number % 20 == 0:
+                index.compact()
+
+        for query_modulus in [1, 4]:
+            query = self.documents[urls[5]].sample(query_modulus)
+            before = sorted(index.search(query, SHA1_SCHEME))
+            index.compact()
+            self.assertEqual(0, index.postings.pending)
+            self.assertEqual(before, sorted(index.search(query, SHA1_SCHEME)))
+        # The fingerprints of the common pool are in most documents
+        self.assertIn(BITMAP, index.postings.kinds.tolist())
+
+    def test_minimum_overlap(self):
+        query = next(iter(self.documents.values()))
+        self.assertEqual(len(self.documents), len(self.index.search(query, SHA1_SCHEME, minimum_overlap=0)))
+
+    def test_search_threshold(self):
+        urls = list(self.documents)
+        query = self.documents[urls[9]]
+        for threshold in [0.2, 0.4, 0.6]:
+            expected = sorted((url, query.intersection_size(fingerprints), len(query), len(fingerprints))
+                              for url, fingerprints in self.documents.items()
+                              if query.jaccard(fingerprints) >= threshold)
+            self.assertTrue(expected)
+            self.assertEqual(expected, sorted(self.index.search(query, SHA1_SCHEME, threshold=threshold)))
+
+    def test_minimum_overlap_per_level(self):
+        urls = list(self.documents)
+        index = InvertedIndex()
+        for number, url in enumerate(urls):
+            modulus = 2 ** (number % 2)
+            index.add(url, self.documents[url].sample(modulus), SHA1_SCHEME, modulus)
+
+        query = self.documents[urls[3]]
+        cutoffs = np.full(LEVELS, 10 ** 6)
+        cutoffs[:2] = [50, 25]
+        expected = [result for result in index.search(query, SHA1_SCHEME, minimum_overlap=0)
+                    if result[1] >= cutoffs[urls.index(result[0]) % 2]]
+        self.assertTrue(expected)
+        self.assertEqual(sorted(expected), sorted(index.search(query, SHA1_SCHEME, minimum_overlap=cutoffs)))
+
+    def test_empty(self):
+        index = InvertedIndex()
+        self.assertEqual([], index.search(FingerprintSet([1, 2, 3]), SHA1_SCHEME, minimum_overlap=0))
+        self.assertEqual([], self.index.search(FingerprintSet(), SHA1_SCHEME))
+
+    @override_settings(FINGERPRINT_INDEX_IN_MEMORY=False)
+    def test_enabled_from_settings(self):
+        self.assertFalse(fingerprint_index_enabled())
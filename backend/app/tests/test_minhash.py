@@ -0,0 +1,124 @@
+import random
+
+import numpy as np
+from django.test import TestCase, override_settings
+
+from app.benchmarks.corpus import PARAGRAPHS
+from app.plagiarism_checker.fingerprint_set import FingerprintSet
+from app.plagiarism_checker.fingerprinting import compute_fingerprint_set
+from app.plagiarism_checker.minhash import LSHIndex, MINHASH_PRIME, band_keys, candidate_probability, \
+    estimate_jaccard, lsh_configuration, minhash_signature
+
+
+def near_duplicate_corpus(bases=10, rates=(0.02, 0.05, 0.1, 0.2, 0.3), words=300, seed=7):
+    """Builds documents out of random words of the benchmark corpus, together with copies of every document
+    with a growing fraction of their words replaced, so that their similarities cover the whole range.
+
+    :return: a dictionary with the FingerprintSet of every document, by (base, copy) pairs
+    """
+    vocabulary = ' '.join(PARAGRAPHS).split()
+    rng = random.Random(seed)
+    documents = {}
+    for base in range(bases):
+        original = [rng.choice(vocabulary) for _ in range(words)]
+        documents[(base, 0)] = original
+        for copy, rate in enumerate(rates, start=1):
+            documents[(base, copy)] = [word if rng.random() > rate else rng.choice(vocabulary) for word in original]
+    return {key: compute_fingerprint_set(' '.join(text)) for key, text in documents.items()}
+
+
+class MinHashTest(TestCase):
+    def test_signature_is_deterministic(self):
+        fingerprints = FingerprintSet([3, 17, 1000, 1048575])
+        signature = minhash_signature(fingerprints, 128)
+        self.assertEqual(np.uint32, signature.dtype)
+        self.assertEqual(128, len(signature))
+        self.assertTrue(np.array_equal(signature, minhash_signature([1048575, 1000, 17, 3], 128)))
+        # The first values do not depend on the length of the signature
+        self.assertTrue(np.array_equal(signature[:64], minhash_signature(fingerprints, 64)))
+
+    def test_empty_signature(self):
+        self.assertTrue(np.all(minhash_signature(FingerprintSet(), 16) == MINHASH_PRIME))
+
+    def test_default_configuration(self):
+        bands, rows = lsh_configuration()
+        self.assertEqual(bands * rows, len(minhash_signature([1, 2, 3])))
+        self.assertEqual(bands, len(band_keys(minhash_signature([1, 2, 3]))))
+
+    @override_settings(MINHASH_BANDS=8, MINHASH_ROWS=2)
+    def test_configuration_from_settings(self):
+        self.assertEqual((8, 2), lsh_configuration())
+        self.assertEqual(16, len(minhash_signature([1, 2, 3])))
+        self.assertEqual(8, len(band_keys(minhash_signature([1, 2, 3]))))
+
+    def test_band_keys(self):
+        signature = minhash_signature(range(0, 2000, 3), 16)
+        keys = band_keys(signature, 4, 4)
+        self.assertEqual(keys, band_keys(signature.copy(), 4, 4))
+        self.assertTrue(all(-2 ** 63 <= key < 2 ** 63 for key in keys))
+        # Equal rows in different bands do not give equal keys
+        self.assertEqual(4, len(set(band_keys(np.zeros(16, dtype=np.uint32), 4, 4))))
+
+        changed = signature.copy()
+        changed[5] += 1
+        changed_keys = band_keys(changed, 4, 4)
+        self.assertNotEqual(keys[1], changed_keys[1])
+        self.assertEqual(keys[:1] + keys[2:], changed_keys[:1] + changed_keys[2:])
+
+    def test_estimate_jaccard(self):
+        documents = near_duplicate_corpus(bases=2)
+        for first in documents.values():
+            for second in documents.values():
+                estimate = estimate_jaccard(minhash_signature(first, 256), minhash_signature(second, 256))
+                self.assertAlmostEqual(first.jaccard(second), estimate, delta=0.15)
+
+    def test_candidate_probability(self):
+        self.assertAlmostEqual(0.0, candidate_probability(0.0, 64, 4))
+        self.assertAlmostEqual(1.0, candidate_probability(1.0, 64, 4))
+        self.assertGreater(candidate_probability(0.5, 64, 4), 0.98)
+        self.assertLess(candidate_probability(0.2, 64, 4), 0.1)
+
+
+class LSHRecallTest(TestCase):
+    """Compares the candidates of the LSH index with the exact search, which computes the Jaccard similarity of
+    the query with every document.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.documents = near_duplicate_corpus()
+        cls.index = LSHIndex(64, 4)
+        for key, fingerprints in cls.documents.items():
+            cls.index.add(key, fingerprints)
+
+    def exact_matches(self, query, threshold):
+        return set(key for key, fingerprints in self.documents.items()
+                   if key != query and self.documents[query].jaccard(fingerprints) >= threshold)
+
+    def test_recall_of_similar_documents(self):
+        found = 0
+        expected = 0
+        for query, fingerprints in self.documents.items():
+            matches = self.exact_matches(query, 0.5)
+            expected += len(matches)
+            found += len(matches & self.index.candidates(fingerprints))
+        self.assertGreater(expected, 100)
+        self.assertGreaterEqual(found / expected, 0.95)
+
+    def test_unrelated_documents_are_not_candidates(self):
+        for (base, copy), fingerprints in self.documents.items():
+            candidates = self.index.candidates(fingerprints)
+            self.assertIn((base, copy), candidates)
+            self.assertEqual({base}, set(other for other, _ in candidates))
+
+    def test_fewer_bands_lower_recall(self):
+        index = LSHIndex(4, 8)
+        for key, fingerprints in self.documents.items():
+            index.add(key, fingerprints)
+        recall = []
+        for lsh in (index, self.index):
+            found = sum(len(self.exact_matches(query, 0.3) & lsh.candidates(fingerprints))
+                        for query, fingerprints in self.documents.items())
+            recall.append(found)
+        self.assertLess(recall[0], recall[1])
@@ -1,6 +1,13 @@
-from django.test import TestCase
+from unittest.mock import patch
+
+import psycopg2
+from django.test import TestCase, override_settings
 
 from app.models import NewsDocument
+from app.plagiarism_checker.fingerprint_set import FingerprintSet
+from app.plagiarism_checker.schemes import SHA1_SCHEME, RABIN_KARP_SCHEME
+from app.tests.base_test import BaseTest
+from utils import conn, existing_fps, schema
 
 # Create your tests here.
 class NewsDocumentTest(TestCase):
@@ -30,3 +37,89 @@ class NewsDocumentTest(TestCase):
         self.assertEqual(news_doc.url, url)
         self.assertIsInstance(news_doc.fingerprints, list)
         self.assertEqual(news_doc.fingerprints, fp_list)
+
+    def test_newsDocument_default_scheme(self):
+        news_doc = NewsDocument(url="www.google.com", fingerprints=[17])
+        self.assertEqual(news_doc.scheme, SHA1_SCHEME)
+
+    def test_newsDocument_scheme(self):
+        news_doc = NewsDocument(url="www.google.com", fingerprints=[17], scheme=RABIN_KARP_SCHEME)
+        self.assertEqual(news_doc.scheme, RABIN_KARP_SCHEME)
+
+    def test_newsDocument_unknown_scheme(self):
+        with self.assertRaises(ValueError):
+            NewsDocument(url="www.google.com", fingerprints=[17], scheme="md5-v1")
+
+    def test_newsDocument_sampling_modulus(self):
+        self.assertEqual(1, NewsDocument(url="www.google.com", fingerprints=[17]).sampling_modulus)
+        news_doc = NewsDocument(url="www.google.com", fingerprints=[16], sampling_modulus=8)
+        self.assertEqual(8, news_doc.sampling_modulus)
+
+    def test_newsDocument_fingerprint_count(self):
+        self.assertEqual(2, NewsDocument(url="www.google.com", fingerprints=[17, 32, 17]).fingerprint_count())
+        self.assertEqual(0, NewsDocument(url="www.google.com", fingerprints=[]).fingerprint_count())
+        news_doc = NewsDocument(url="www.google.com", fingerprints=FingerprintSet([1, 2, 3]))
+        self.assertEqual(3, news_doc.fingerprint_count())
+
+
+class NewsDocumentSaveTest(BaseTest):
+    def setUp(self):
+        self.reset_database()
+
+    def tearDown(self):
+        self.reset_database()
+
+    def stored_fingerprints(self):
+        cur = conn.cursor()
+        cur.execute(f"SELECT fingerprint FROM {schema}.fingerprints ORDER BY fingerprint")
+        rows = cur.fetchall()
+        conn.commit()
+        cur.close()
+        return [fingerprint for fingerprint, in rows]
+
+    def test_save(self):
+        NewsDocument('https://news.example/1', FingerprintSet([3, 5])).save()
+        self.assertEqual([3, 5], self.stored_fingerprints())
+        self.assertEqual([True, True], existing_fps.contains([3, 5]).tolist())
+
+    def document_counts(self):
+        cur = conn.cursor()
+        cur.execute(f"SELECT document_count FROM {schema}.fingerprints ORDER BY fingerprint")
+        rows = cur.fetchall()
+        conn.commit()
+        cur.close()
+        return [document_count for document_count, in rows]
+
+    def test_document_counts(self):
+        # The counts are only kept for the threshold search
+        NewsDocument('https://news.example/1', FingerprintSet([3, 5])).save()
+        self.assertEqual([0, 0], self.document_counts())
+        with override_settings(SIMILARITY_THRESHOLD=0.5):
+            NewsDocument('https://news.example/2', FingerprintSet([5, 7])).save()
+        self.assertEqual([0, 1, 1], self.document_counts())
+
+    def minhash_documents(self):
+        cur = conn.cursor()
+        cur.execute(f"SELECT count(*) FROM {schema}.url_minhash")
+        documents = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+        return documents
+
+    def test_minhash(self):
+        # The signatures are only stored for the LSH candidate search
+        NewsDocument('https://news.example/1', FingerprintSet([3, 5])).save()
+        self.assertEqual(0, self.minhash_documents())
+        with override_settings(MINHASH_CANDIDATES=True):
+            NewsDocument('https://news.example/2', FingerprintSet([5, 7])).save()
+        self.assertEqual(1, self.minhash_documents())
+
+    def test_rolled_back_save(self):
+        # The fingerprints are not marked as stored when the document is rolled back
+        with patch.object(NewsDocument, 'insert_url_fingerprints', side_effect=psycopg2.Error('failed')):
+            NewsDocument('https://news.example/1', FingerprintSet([3, 5])).save()
+        self.assertEqual([], self.stored_fingerprints())
+        self.assertEqual([False, False], existing_fps.contains([3, 5]).tolist())
+
+        NewsDocument('https://news.example/1', FingerprintSet([3, 5])).save()
+        self.assertEqual([3, 5], self.stored_fingerprints())
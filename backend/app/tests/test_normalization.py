@@ -0,0 +1,58 @@
+import sys
+
+from django.test import TestCase
+from winnowing import sanitize
+
+from app.benchmarks.corpus import PARAGRAPHS, MULTILINGUAL_PARAGRAPHS, article_of_size
+from app.plagiarism_checker.normalization import normalize_text, sanitize_text, sanitize_table
+
+
+def reference_sanitize(text):
+    return list(sanitize(enumerate(text)))
+
+
+class NormalizationTest(TestCase):
+    def assertSameAsReference(self, text):
+        reference = reference_sanitize(text)
+        sanitized, positions, offsets, characters = sanitize_text(text)
+
+        self.assertEqual(''.join(character for _, character in reference), normalize_text(text))
+        self.assertEqual(''.join(character for _, character in reference).encode('utf-8'), sanitized)
+        self.assertEqual([position for position, _ in reference], positions.tolist())
+        self.assertEqual([ord(text[position]) for position, _ in reference], characters.tolist())
+        self.assertEqual([len(sanitized[offsets[i]:offsets[i + 1]].decode('utf-8')) for i in range(len(reference))],
+                         [len(character) for _, character in reference])
+
+    def test_articles(self):
+        for text in PARAGRAPHS + [article_of_size(1500), article_of_size(8500)]:
+            self.assertSameAsReference(text)
+
+    def test_multilingual_articles(self):
+        for text in MULTILINGUAL_PARAGRAPHS:
+            self.assertSameAsReference(text)
+
+    def test_short_and_empty_texts(self):
+        for text in ['', ' ', '!?', '_', 'a', 'A b, Ç!']:
+            self.assertSameAsReference(text)
+
+    def test_every_character(self):
+        characters = [chr(code) for code in range(sys.maxunicode + 1) if not 0xD800 <= code <= 0xDFFF]
+        self.assertSameAsReference(''.join(characters))
+
+    def test_multi_character_lower_case(self):
+        sanitized, positions, offsets, _ = sanitize_text('İz')
+        self.assertEqual('i̇z'.encode('utf-8'), sanitized)
+        self.assertEqual([0, 1], positions.tolist())
+        self.assertEqual([0, 3, 4], offsets.tolist())
+
+    def test_positions_only_when_requested(self):
+        sanitized, positions, offsets, characters = sanitize_text('A b, Ç!', positions=False)
+        self.assertIsNone(positions)
+        self.assertEqual('abç'.encode('utf-8'), sanitized)
+        self.assertEqual([0, 1, 2, 4], offsets.tolist())
+        self.assertEqual([ord('A'), ord('b'), ord('Ç')], characters.tolist())
+
+    def test_table_is_filled_lazily(self):
+        normalize_text('Ω')
+        self.assertEqual('ω', sanitize_table[ord('Ω')])
+        self.assertIsNone(sanitize_table[ord('!')])
@@ -0,0 +1,67 @@
+import numpy as np
+from django.test import TestCase
+
+from app.benchmarks.search_benchmark import create_schema, drop_schema, seed_documents
+from app.plagiarism_checker.posting_table import append_postings, compact_postings, group_postings, read_postings
+from app.plagiarism_checker.postings import decode_ids
+from utils import conn
+
+POSTINGS_SCHEMA = 'test_fingerprint_postings'
+
+
+class GroupPostingsTest(TestCase):
+    def test_group_postings(self):
+        fingerprints, counts, blobs = group_postings([7, 3, 7, 9, 3], [20, 20, 5, 20, 6])
+        self.assertEqual([5, 6, 20], fingerprints.tolist())
+        self.assertEqual([1, 1, 3], counts.tolist())
+        self.assertEqual([[7], [3], [3, 7, 9]], [decode_ids(blob).tolist() for blob in blobs])
+
+    def test_group_no_postings(self):
+        fingerprints, counts, blobs = group_postings([], [])
+        self.assertEqual(([], [], []), (fingerprints.tolist(), counts.tolist(), blobs))
+
+
+class PostingTableTest(TestCase):
+    def setUp(self):
+        drop_schema(conn, POSTINGS_SCHEMA)
+        create_schema(conn, POSTINGS_SCHEMA)
+        # Seeding the documents appends them all and compacts the table
+        self.corpus = seed_documents(conn, POSTINGS_SCHEMA, 30, 200)
+
+    def tearDown(self):
+        drop_schema(conn, POSTINGS_SCHEMA)
+
+    def read(self, hashes):
+        cur = conn.cursor()
+        try:
+            ids, owners = read_postings(cur, POSTINGS_SCHEMA, hashes)
+            cur.execute(f"SELECT count(*), count(DISTINCT fingerprint) FROM {POSTINGS_SCHEMA}.fingerprint_postings")
+            rows, fingerprints = cur.fetchone()
+            conn.commit()
+        finally:
+            cur.close()
+        return ids, owners, rows, fingerprints
+
+    def test_append_and_compact(self):
+        query = self.corpus[4]
+        ids, owners, rows, fingerprints = self.read(query.hashes)
+        self.assertEqual(rows, fingerprints)
+        self.assertEqual(len(query), len(set(owners.tolist())))
+        expected = sum(len(np.intersect1d(query.hashes, document.hashes)) for document in self.corpus)
+        self.assertEqual(expected, len(ids))
+
+        cur = conn.cursor()
+        cur.execute(f"UPDATE {POSTINGS_SCHEMA}.urls SET postings_appended = false WHERE id % 2 = 0")
+        conn.commit()
+        cur.close()
+        self.assertEqual(0, append_postings(conn, POSTINGS_SCHEMA, minimum=100))
+        self.assertEqual(15, append_postings(conn, POSTINGS_SCHEMA))
+        _, _, rows, fingerprints = self.read(query.hashes)
+        self.assertGreater(rows, fingerprints)
+
+        self.assertGreater(compact_postings(conn, POSTINGS_SCHEMA), 0)
+        ids_after, owners_after, rows, fingerprints = self.read(query.hashes)
+        self.assertEqual(rows, fingerprints)
+        # The documents appended twice are only counted once after the compaction
+        self.assertEqual(sorted(zip(owners.tolist(), ids.tolist())),
+                         sorted(zip(owners_after.tolist(), ids_after.tolist())))
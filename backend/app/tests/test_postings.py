@@ -0,0 +1,124 @@
+import numpy as np
+from django.test import TestCase, override_settings
+
+from app.plagiarism_checker.postings import BITMAP, DELTA, PostingStore, decode_bitmap, decode_ids, \
+    decode_varints, encode_bitmap, encode_ids, encode_varints, varint_sizes
+
+
+def reference_postings(store_hashes, documents, seed=0):
+    """Adds random documents (with a few very common fingerprints) to a PostingStore, keeping the posting lists
+    as plain Python lists as well.
+    """
+    rng = np.random.RandomState(seed)
+    store = PostingStore(store_hashes)
+    lists = [[] for _ in range(store_hashes)]
+    number = 0
+    for _ in range(documents):
+        hashes = np.union1d(rng.randint(0, store_hashes, rng.randint(0, 200)), np.flatnonzero(rng.rand(10) < 0.7))
+        store.add(number, hashes)
+        for shingle_hash in hashes.tolist():
+            lists[shingle_hash].append(number)
+        number += rng.randint(1, 5)
+    return store, lists
+
+
+class VarintTest(TestCase):
+    def test_round_trip(self):
+        values = np.array([0, 1, 127, 128, 16383, 16384, 2 ** 35, 2 ** 62])
+        self.assertEqual([1, 1, 1, 2, 2, 3, 6, 9], varint_sizes(values).tolist())
+        encoded = encode_varints(values)
+        self.assertEqual(varint_sizes(values).sum(), len(encoded))
+        self.assertEqual(values.tolist(), decode_varints(encoded).tolist())
+
+    def test_encoding(self):
+        self.assertEqual([0x96, 0x01], encode_varints([150]).tolist())
+        self.assertEqual([], encode_varints([]).tolist())
+        self.assertEqual([], decode_varints(np.zeros(0, dtype=np.uint8)).tolist())
+
+    def test_bitmap(self):
+        numbers = np.array([0, 3, 8, 9, 100])
+        self.assertEqual(13, len(encode_bitmap(numbers)))
+        self.assertEqual(numbers.tolist(), decode_bitmap(encode_bitmap(numbers)).tolist())
+
+    def test_ids(self):
+        ids = np.array([3, 4, 200, 70000, 70001])
+        self.assertEqual(bytes([3, 1, 196, 1, 0xA8, 0xA1, 0x04, 1]), encode_ids(ids))
+        self.assertEqual(ids.tolist(), decode_ids(encode_ids(ids)).tolist())
+        self.assertEqual(ids.tolist(), decode_ids(memoryview(encode_ids(ids))).tolist())
+        self.assertEqual(b'', encode_ids([]))
+        self.assertEqual([], decode_ids(b'').tolist())
+
+
+@override_settings(POSTINGS_COMPACTION_THRESHOLD=500)
+class PostingStoreTest(TestCase):
+    def test_same_as_lists(self):
+        store, lists = reference_postings(4096, 400)
+        self.assertEqual(sum(len(postings) for postings in lists), len(store))
+        store.compact()
+        self.assertEqual(0, store.pending)
+        for shingle_hash, postings in enumerate(lists):
+            self.assertEqual(postings, store.decode(shingle_hash).tolist())
+
+    def test_encoding_by_density(self):
+        store, lists = reference_postings(4096, 400)
+        store.compact()
+        # The fingerprints most documents have are bitmaps, the others are delta encoded
+        self.assertEqual([BITMAP] * 10, store.kinds[:10].tolist())
+        self.assertTrue(np.all(store.kinds[10:] == DELTA))
+        self.assertLess(store.data.nbytes, 2 * len(store))
+
+    def test_postings_of_query(self):
+        store, lists = reference_postings(4096, 300)
+        rng = np.random.RandomState(1)
+        for _ in range(5):
+            query = np.union1d(rng.randint(0, 4096, 300), np.arange(12))
+            numbers, owners = store.postings(query)
+            expected = sorted((shingle_hash, number) for shingle_hash in query.tolist()
+                              for number in lists[shingle_hash])
+            self.assertEqual(expected, sorted(zip(query[owners].tolist(), numbers.tolist())))
+
+    def test_count(self):
+        store, lists = reference_postings(4096, 300)
+        store.compact()
+        store.add(2000, [0, 1, 2, 4000])
+        query = np.union1d(np.random.RandomState(2).randint(0, 4096, 300), np.arange(12))
+        expected = np.zeros(2001, dtype=np.int64)
+        for shingle_hash in query.tolist():
+            expected[lists[shingle_hash] + ([2000] if shingle_hash in [0, 1, 2, 4000] else [])] += 1
+        self.assertEqual(expected.tolist(), store.count(query, 2001).tolist())
+
+    def test_count_with_levels(self):
+        store, lists = reference_postings(4096, 300)
+        store.compact()
+        documents = store.last_number + 1
+        query = np.union1d(np.random.RandomState(3).randint(0, 4096, 300), np.arange(12))
+        levels = np.arange(len(query)) % 3
+        document_levels = np.arange(documents) % 4
+        expected = np.zeros(documents, dtype=np.int64)
+        for index, shingle_hash in enumerate(query.tolist()):
+            for number in lists[shingle_hash]:
+                expected[number] += levels[index] >= document_levels[number]
+        self.assertEqual(expected.tolist(), store.count(query, documents, levels, document_levels).tolist())
+
+    def test_pending_postings_are_found(self):
+        store = PostingStore(64)
+        store.add(0, [1, 2, 3])
+        store.compact()
+        store.add(4, [3, 5])
+        self.assertEqual(2, store.pending)
+        numbers, owners = store.postings(np.array([3, 5, 7]))
+        self.assertEqual([(0, 0), (0, 4), (1, 4)], sorted(zip(owners.tolist(), numbers.tolist())))
+
+    def test_increasing_numbers(self):
+        store = PostingStore(64)
+        store.add(5, [1, 2])
+        with self.assertRaises(ValueError):
+            store.add(5, [3])
+
+    def test_empty(self):
+        store = PostingStore(64)
+        numbers, owners = store.postings(np.array([1, 2]))
+        self.assertEqual([], numbers.tolist())
+        self.assertEqual([], owners.tolist())
+        store.compact()
+        self.assertEqual(0, len(store))
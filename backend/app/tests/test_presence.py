@@ -0,0 +1,71 @@
+import numpy as np
+from django.test import TestCase
+
+from app.plagiarism_checker.presence import FingerprintPresence
+from app.plagiarism_checker.schemes import HASH_MASK
+
+
+class FingerprintPresenceTest(TestCase):
+    def test_size(self):
+        self.assertEqual(128 * 1024, FingerprintPresence().bits.nbytes)
+
+    def test_contains(self):
+        presence = FingerprintPresence()
+        stored = np.array([0, 7, 8, 1000, HASH_MASK])
+        presence.update(stored)
+        query = np.array([0, 1, 7, 8, 9, 999, 1000, HASH_MASK - 1, HASH_MASK])
+        self.assertEqual([True, False, True, True, False, False, True, False, True],
+                         presence.contains(query).tolist())
+        self.assertEqual([1, 9, 999, HASH_MASK - 1], presence.missing(query).tolist())
+        self.assertIn(1000, presence)
+        self.assertNotIn(1001, presence)
+        self.assertEqual(5, len(presence))
+
+    def test_same_as_set(self):
+        rng = np.random.RandomState(0)
+        stored = rng.randint(0, HASH_MASK + 1, 50000)
+        presence = FingerprintPresence()
+        presence.update(fingerprint for fingerprint in stored.tolist())
+        query = rng.randint(0, HASH_MASK + 1, 20000)
+        expected = set(stored.tolist())
+        self.assertEqual([fingerprint in expected for fingerprint in query.tolist()], presence.contains(query).tolist())
+
+    def test_beyond_bitmap(self):
+        presence = FingerprintPresence()
+        presence.update([5, HASH_MASK + 1, 2 ** 30])
+        self.assertTrue(presence.covers([0, 5, HASH_MASK]))
+        self.assertTrue(presence.covers([]))
+        self.assertFalse(presence.covers([5, HASH_MASK + 1]))
+        self.assertEqual([True, False, False], presence.contains([5, HASH_MASK + 1, 2 ** 30]).tolist())
+        self.assertEqual([HASH_MASK + 1, 2 ** 30], presence.missing([5, HASH_MASK + 1, 2 ** 30]).tolist())
+        self.assertEqual(1, len(presence))
+
+    def test_lazy_load(self):
+        loads = []
+
+        def load():
+            loads.append(1)
+            return np.array([3, 5])
+
+        presence = FingerprintPresence(load)
+        presence.update([9])
+        self.assertEqual([], loads)
+        self.assertEqual([True, True, False, True], presence.contains([3, 5, 6, 9]).tolist())
+        presence.contains([3])
+        self.assertEqual([1], loads)
+
+    def test_clear(self):
+        presence = FingerprintPresence(lambda: np.array([3]))
+        presence.clear()
+        self.assertEqual(0, len(presence))
+        presence.update([4])
+        self.assertEqual([False, True], presence.contains([3, 4]).tolist())
+
+    def test_reload(self):
+        stored = [np.array([3])]
+        presence = FingerprintPresence(lambda: stored[0])
+        presence.update([4])
+        self.assertEqual([True, True], presence.contains([3, 4]).tolist())
+        stored[0] = np.array([7])
+        presence.reload()
+        self.assertEqual([False, False, True], presence.contains([3, 4, 7]).tolist())
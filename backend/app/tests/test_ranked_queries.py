@@ -0,0 +1,91 @@
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase
+
+from app.benchmarks.search_benchmark import BENCHMARK_URL, create_schema, drop_schema, near_duplicate, \
+    seed_documents
+from app.tests.base_test import BaseTest
+from app.views import get_document, get_ranked_documents, get_ranked_documents_from_postings, query_overlap_cutoffs
+from utils import conn, schema
+
+RANKED_SCHEMA = 'test_ranked_queries'
+
+
+def execute(sql, parameters=None):
+    cur = conn.cursor()
+    cur.execute(sql, parameters)
+    rows = cur.fetchall() if cur.description else None
+    conn.commit()
+    cur.close()
+    return rows
+
+
+class RankedQueriesTest(TestCase):
+    def setUp(self):
+        drop_schema(conn, RANKED_SCHEMA)
+        create_schema(conn, RANKED_SCHEMA)
+        # Seeding the documents appends them all to fingerprint_postings and compacts it
+        self.corpus = seed_documents(conn, RANKED_SCHEMA, 30, 200)
+
+    def tearDown(self):
+        drop_schema(conn, RANKED_SCHEMA)
+
+    def rank(self, function, query):
+        cur = conn.cursor()
+        try:
+            ranked = function(cur, query, minimum_overlap=query_overlap_cutoffs(query), db_schema=RANKED_SCHEMA)
+            conn.commit()
+        finally:
+            cur.close()
+        return ranked
+
+    def test_stored_counts(self):
+        urls = [BENCHMARK_URL.format(number) for number in (1, 2)]
+        execute(f"UPDATE {RANKED_SCHEMA}.urls SET fingerprint_count = NULL WHERE url = %s", (urls[1],))
+        cur = conn.cursor()
+        documents = sorted(get_document(cur, urls, db_schema=RANKED_SCHEMA))
+        sampled = sorted(get_document(cur, urls, modulus=2, db_schema=RANKED_SCHEMA))
+        conn.commit()
+        cur.close()
+        self.assertEqual([(urls[0], len(self.corpus[1]), 1), (urls[1], len(self.corpus[2]), 1)], documents)
+        # Sampled inputs count the fingerprints divisible by their modulus
+        self.assertEqual([(url, int((self.corpus[number].hashes % 2 == 0).sum()), 2)
+                          for url, number in zip(urls, (1, 2))], sampled)
+
+    def test_ranked_documents(self):
+        rng = np.random.RandomState(1)
+        for number in (3, 17):
+            query = near_duplicate(rng, self.corpus[number])
+            ranked = self.rank(get_ranked_documents, query)
+            self.assertEqual((BENCHMARK_URL.format(number), 1), (ranked[0][1], ranked[0][3]))
+            self.assertAlmostEqual(query.jaccard(self.corpus[number]), ranked[0][2])
+
+    def test_postings_ranked_documents(self):
+        query = near_duplicate(np.random.RandomState(2), self.corpus[5])
+        self.assertEqual(self.rank(get_ranked_documents, query), self.rank(get_ranked_documents_from_postings, query))
+
+        # Documents which were not appended yet are read from url_fingerprints
+        execute(f"DELETE FROM {RANKED_SCHEMA}.fingerprint_postings")
+        execute(f"UPDATE {RANKED_SCHEMA}.urls SET postings_appended = false")
+        ranked = self.rank(get_ranked_documents_from_postings, query)
+        self.assertEqual(BENCHMARK_URL.format(5), ranked[0][1])
+        self.assertAlmostEqual(query.jaccard(self.corpus[5]), ranked[0][2])
+
+
+class BackfillFingerprintCountsTest(BaseTest):
+    def setUp(self):
+        self.reset_database()
+        self.corpus = seed_documents(conn, schema, 10, 100)
+
+    def tearDown(self):
+        self.reset_database()
+
+    def test_backfill(self):
+        execute(f"UPDATE {schema}.urls SET fingerprint_count = NULL WHERE id % 3 <> 0")
+        output = StringIO()
+        call_command('backfill_fingerprint_counts', batch_size=4, stdout=output)
+        self.assertIn('Stored the fingerprint count of', output.getvalue())
+        self.assertEqual([(BENCHMARK_URL.format(number), len(document)) for number, document in enumerate(self.corpus)],
+                         execute(f"SELECT url, fingerprint_count FROM {schema}.urls ORDER BY id"))
@@ -0,0 +1,139 @@
+from django.test import TestCase, override_settings
+
+from app.benchmarks.corpus import PARAGRAPHS
+from app.benchmarks.search_benchmark import create_schema, drop_schema
+from app.plagiarism_checker.change_feed import REINDEXED
+from app.plagiarism_checker.fingerprinting import compute_fingerprint_set
+from app.plagiarism_checker.reindex import NO_TEXT, ReindexProgress, discard_reindex, reindex, reindex_state, \
+    retired_schema, shadow_schema, to_shadow
+from app.plagiarism_checker.schemes import SHA1_SCHEME, SHA1_WIDE_SCHEME
+from app.plagiarism_checker.storage import ARRAYS
+from utils import conn
+
+REINDEX_SCHEMA = 'test_reindex'
+
+
+class ToShadowTest(TestCase):
+    def test_index(self):
+        definition = 'CREATE UNIQUE INDEX fingerprints_pkey ON news_schema.fingerprints USING btree (fingerprint)'
+        self.assertEqual('CREATE UNIQUE INDEX IF NOT EXISTS fingerprints_pkey ON news_schema_reindex.fingerprints '
+                         'USING btree (fingerprint)', to_shadow(definition, 'news_schema', 'news_schema_reindex'))
+
+    def test_foreign_keys(self):
+        to_fingerprints = 'FOREIGN KEY (fingerprint_id) REFERENCES news_schema.fingerprints(fingerprint)'
+        self.assertEqual('FOREIGN KEY (fingerprint_id) REFERENCES news_schema_reindex.fingerprints(fingerprint)',
+                         to_shadow(to_fingerprints, 'news_schema', 'news_schema_reindex'))
+        to_urls = 'FOREIGN KEY (url_id) REFERENCES news_schema.urls(id) ON DELETE CASCADE'
+        self.assertEqual(to_urls, to_shadow(to_urls, 'news_schema', 'news_schema_reindex'))
+
+    def test_schemas(self):
+        self.assertEqual('news_schema_reindex', shadow_schema('news_schema'))
+        self.assertEqual('news_schema_retired', retired_schema('news_schema'))
+
+    def test_progress(self):
+        messages = []
+        progress = ReindexProgress(10, messages.append)
+        progress.record(4, 1, 5000)
+        self.assertEqual(5, progress.documents)
+        self.assertEqual(1, progress.failed)
+        self.assertEqual(1, len(messages))
+        self.assertIn('Reindexed 5/10 document(s) (1 failed)', messages[0])
+
+
+class ReindexTest(TestCase):
+    def setUp(self):
+        drop_schema(conn, REINDEX_SCHEMA)
+        drop_schema(conn, shadow_schema(REINDEX_SCHEMA))
+        drop_schema(conn, retired_schema(REINDEX_SCHEMA))
+        create_schema(conn, REINDEX_SCHEMA)
+        self.texts = {f'https://news.example/{number}': text for number, text in enumerate(PARAGRAPHS[:6])}
+        self.ids = {url: self.store(url, text) for url, text in self.texts.items()}
+        self.without_text = self.store('https://news.example/no-text', PARAGRAPHS[6], keep_text=False)
+
+    def tearDown(self):
+        for schema in (REINDEX_SCHEMA, shadow_schema(REINDEX_SCHEMA), retired_schema(REINDEX_SCHEMA)):
+            drop_schema(conn, schema)
+
+    def store(self, url, text, keep_text=True):
+        fingerprints = compute_fingerprint_set(text, SHA1_SCHEME)
+        cur = conn.cursor()
+        cur.execute(f"INSERT INTO {REINDEX_SCHEMA}.urls (url, scheme, fingerprint_count, fingerprint_array) "
+                    f"VALUES (%s, %s, %s, %s) RETURNING id", (url, SHA1_SCHEME, len(fingerprints),
+                                                              fingerprints.tolist()))
+        doc_id = cur.fetchone()[0]
+        for fingerprint in fingerprints.tolist():
+            cur.execute(f"INSERT INTO {REINDEX_SCHEMA}.fingerprints (fingerprint) VALUES (%s) ON CONFLICT DO NOTHING",
+                        (fingerprint,))
+            cur.execute(f"INSERT INTO {REINDEX_SCHEMA}.url_fingerprints (url_id, fingerprint_id) VALUES (%s, %s)",
+                        (doc_id, fingerprint))
+        if keep_text:
+            cur.execute(f"INSERT INTO {REINDEX_SCHEMA}.article_texts (url_id, text) VALUES (%s, %s)", (doc_id, text))
+        conn.commit()
+        cur.close()
+        return doc_id
+
+    def query(self, sql, parameters=()):
+        cur = conn.cursor()
+        cur.execute(sql, parameters)
+        rows = cur.fetchall()
+        conn.commit()
+        cur.close()
+        return rows
+
+    @override_settings(FINGERPRINT_STORAGE=ARRAYS)
+    def test_reindex(self):
+        result = reindex(conn, REINDEX_SCHEMA, SHA1_WIDE_SCHEME, batch_size=4, log=lambda message: None)
+        self.assertEqual({'scheme': SHA1_WIDE_SCHEME, 'reindexed': 6, 'failed': 1, 'swapped': True}, result)
+        self.assertIsNone(reindex_state(conn, REINDEX_SCHEMA))
+
+        for url, text in self.texts.items():
+            expected = compute_fingerprint_set(text, SHA1_WIDE_SCHEME)
+            rows = self.query(f"SELECT fingerprint_id FROM {REINDEX_SCHEMA}.url_fingerprints WHERE url_id = %s",
+                              (self.ids[url],))
+            self.assertEqual(sorted(expected.tolist()), sorted(row[0] for row in rows))
+            self.assertEqual([(SHA1_WIDE_SCHEME, len(expected), expected.tolist(), False)],
+                             self.query(f"SELECT scheme, fingerprint_count, fingerprint_array, postings_appended "
+                                        f"FROM {REINDEX_SCHEMA}.urls WHERE id = %s", (self.ids[url],)))
+        self.assertEqual(len(self.texts), self.query(f"SELECT count(*) FROM {REINDEX_SCHEMA}.url_minhash")[0][0])
+        self.assertEqual([(self.without_text, NO_TEXT)],
+                         self.query(f"SELECT url_id, reason FROM {retired_schema(REINDEX_SCHEMA)}.reindex_failures"))
+        self.assertEqual([(0, [])], self.query(f"SELECT fingerprint_count, fingerprint_array FROM "
+                                               f"{REINDEX_SCHEMA}.urls WHERE id = %s", (self.without_text,)))
+        # The replaced tables are kept with the former fingerprints
+        self.assertGreater(self.query(f"SELECT count(*) FROM {retired_schema(REINDEX_SCHEMA)}.url_fingerprints "
+                                      f"WHERE url_id = %s", (self.without_text,))[0][0], 0)
+        # The workers load their index again from the change feed
+        self.assertEqual([(REINDEXED,)], self.query(f"SELECT operation FROM {REINDEX_SCHEMA}.index_changes "
+                                                    f"WHERE operation = %s", (REINDEXED,)))
+
+    def test_resume(self):
+        result = reindex(conn, REINDEX_SCHEMA, SHA1_WIDE_SCHEME, batch_size=4, cutover=False,
+                         log=lambda message: None)
+        self.assertFalse(result['swapped'])
+        self.assertEqual(SHA1_SCHEME, self.query(f"SELECT scheme FROM {REINDEX_SCHEMA}.urls LIMIT 1")[0][0])
+
+        # Documents stored meanwhile are reindexed by the next run, or by the cutover
+        url = 'https://news.example/later'
+        self.ids[url] = self.store(url, PARAGRAPHS[7])
+        with self.assertRaises(ValueError):
+            reindex(conn, REINDEX_SCHEMA, SHA1_SCHEME, log=lambda message: None)
+        messages = []
+        result = reindex(conn, REINDEX_SCHEMA, SHA1_WIDE_SCHEME, log=messages.append)
+        self.assertTrue(messages[0].startswith('Resuming the reindex'))
+        self.assertEqual({'scheme': SHA1_WIDE_SCHEME, 'reindexed': 7, 'failed': 1, 'swapped': True}, result)
+        # The fingerprint arrays are only written with the "arrays" storage
+        self.assertEqual([(SHA1_WIDE_SCHEME, None)],
+                         self.query(f"SELECT scheme, fingerprint_array FROM {REINDEX_SCHEMA}.urls WHERE id = %s",
+                                    (self.ids[url],)))
+
+    def test_deleted_meanwhile(self):
+        reindex(conn, REINDEX_SCHEMA, SHA1_WIDE_SCHEME, cutover=False, log=lambda message: None)
+        deleted = self.ids['https://news.example/0']
+        cur = conn.cursor()
+        cur.execute(f"DELETE FROM {REINDEX_SCHEMA}.urls WHERE id = %s", (deleted,))
+        conn.commit()
+        cur.close()
+        self.assertEqual([], self.query(f"SELECT url_id FROM {shadow_schema(REINDEX_SCHEMA)}.url_fingerprints "
+                                        f"WHERE url_id = %s", (deleted,)))
+        discard_reindex(conn, REINDEX_SCHEMA)
+        self.assertIsNone(reindex_state(conn, REINDEX_SCHEMA))
@@ -0,0 +1,68 @@
+from django.test import TestCase, override_settings
+
+from app.benchmarks.corpus import article_of_size
+from app.plagiarism_checker.fingerprinting import compute_fingerprint, compute_fingerprint_set
+from app.plagiarism_checker.schemes import HASH_MASK, RollingHash, RABIN_KARP_SCHEME, SHA1_SCHEME, \
+    SHA1_WIDE_SCHEME, WIDE_HASH_MASK, character_value, default_scheme, hash_mask, rabin_karp_kgrams, validate_scheme
+from app.plagiarism_checker.winnowing_engine import vectorized_winnow
+
+
+class SchemesTest(TestCase):
+    def test_rolling_hash_matches_vectorized(self):
+        values = [character_value(c) for c in 'adorunrunrunadorunrun']
+        rolling = RollingHash(8)
+        expected = []
+        for index, value in enumerate(values):
+            rolling.roll(value)
+            if index >= 7:
+                expected.append(rolling.digest())
+
+        self.assertEqual(expected, rabin_karp_kgrams(values, 8).tolist())
+
+    def test_rolling_hash_short_text(self):
+        values = [character_value(c) for c in 'runrun']
+        rolling = RollingHash(8)
+        for value in values:
+            rolling.roll(value)
+
+        self.assertEqual([rolling.digest()], rabin_karp_kgrams(values, 8).tolist())
+
+    def test_rabin_karp_hashes_are_20_bits(self):
+        values = [character_value(c) for c in article_of_size(2000).lower() if c.isalnum()]
+        self.assertTrue(all(h < 2 ** 20 for h in rabin_karp_kgrams(values, 8).tolist()))
+
+    def test_rabin_karp_winnowing(self):
+        text = 'A do run run run, a do run run'
+        shingles = vectorized_winnow(text, scheme=RABIN_KARP_SCHEME)
+
+        self.assertEqual(shingles, vectorized_winnow(text.upper(), scheme=RABIN_KARP_SCHEME))
+        self.assertNotEqual(shingles, vectorized_winnow(text, scheme=SHA1_SCHEME))
+
+    def test_compute_fingerprint_scheme(self):
+        text = 'A do run run run, a do run run'
+        self.assertEqual(compute_fingerprint(text, SHA1_SCHEME), compute_fingerprint(text))
+        self.assertNotEqual(compute_fingerprint(text, RABIN_KARP_SCHEME), compute_fingerprint(text))
+
+    def test_wide_scheme(self):
+        self.assertEqual(HASH_MASK, hash_mask(SHA1_SCHEME))
+        self.assertEqual(HASH_MASK, hash_mask(RABIN_KARP_SCHEME))
+        self.assertEqual(WIDE_HASH_MASK, hash_mask(SHA1_WIDE_SCHEME))
+
+        text = article_of_size(2000)
+        wide = compute_fingerprint_set(text, SHA1_WIDE_SCHEME).hashes
+        self.assertLessEqual(int(wide.max()), WIDE_HASH_MASK)
+        self.assertGreater(int(wide.max()), HASH_MASK)
+        self.assertNotEqual(compute_fingerprint(text, SHA1_SCHEME), compute_fingerprint(text, SHA1_WIDE_SCHEME))
+
+    @override_settings(FINGERPRINT_SCHEME=RABIN_KARP_SCHEME)
+    def test_default_scheme_from_settings(self):
+        text = 'A do run run run, a do run run'
+        self.assertEqual(RABIN_KARP_SCHEME, default_scheme())
+        self.assertEqual(compute_fingerprint(text, RABIN_KARP_SCHEME), compute_fingerprint(text))
+
+    def test_unknown_scheme(self):
+        self.assertEqual(SHA1_SCHEME, validate_scheme(SHA1_SCHEME))
+        with self.assertRaises(ValueError):
+            validate_scheme('md5-v1')
+        with self.assertRaises(ValueError):
+            compute_fingerprint('A do run run run', 'md5-v1')
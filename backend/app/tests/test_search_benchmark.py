@@ -0,0 +1,47 @@
+import numpy as np
+from django.test import TestCase
+
+from app.benchmarks.search_benchmark import near_duplicate, run_benchmark, synthetic_document
+from app.plagiarism_checker.schemes import HASH_MASK, SHA1_WIDE_SCHEME, WIDE_HASH_MASK
+from utils import conn
+
+BENCHMARK_SCHEMA = 'test_search_benchmark'
+
+
+class SearchBenchmarkTest(TestCase):
+    def test_near_duplicate(self):
+        rng = np.random.RandomState(0)
+        document = synthetic_document(rng, 500)
+        query = near_duplicate(rng, document, noise=0.2)
+        self.assertGreater(document.jaccard(query), 0.5)
+        self.assertLess(document.jaccard(query), 1)
+
+    def test_wide_documents(self):
+        rng = np.random.RandomState(0)
+        document = synthetic_document(rng, 500, WIDE_HASH_MASK)
+        self.assertGreater(int(document.hashes.max()), HASH_MASK)
+        query = near_duplicate(rng, document, noise=0.2, mask=WIDE_HASH_MASK)
+        self.assertGreater(document.jaccard(query), 0.5)
+
+    def test_run_benchmark(self):
+        result = run_benchmark(conn, BENCHMARK_SCHEMA, documents=50, fingerprints=300, queries=3)
+        self.assertEqual(3, result['found'])
+        self.assertEqual(3, result['agreeing'])
+        self.assertGreater(result['single_query_ms'], 0)
+        self.assertGreater(result['three_queries_ms'], 0)
+        self.assertGreater(result['arrays_query_ms'], 0)
+        self.assertGreater(result['rows_megabytes'], 0)
+        self.assertGreater(result['arrays_megabytes'], 0)
+        self.assertGreater(result['postings_query_ms'], 0)
+        self.assertGreater(result['postings_megabytes'], 0)
+        self.assertEqual(1, result['postings']['p50'])
+        self.assertLessEqual(result['postings']['p99'], result['postings']['max'])
+        self.assertGreater(result['postings']['fingerprints'], 0)
+
+    def test_run_benchmark_wide_scheme(self):
+        result = run_benchmark(conn, BENCHMARK_SCHEMA, documents=50, fingerprints=300, queries=3,
+                               scheme=SHA1_WIDE_SCHEME)
+        self.assertEqual(SHA1_WIDE_SCHEME, result['scheme'])
+        self.assertEqual(3, result['found'])
+        self.assertEqual(3, result['agreeing'])
+        self.assertEqual(1, result['postings']['p99'])
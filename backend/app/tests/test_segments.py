@@ -0,0 +1,78 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.test import TestCase, override_settings
+
+from app.benchmarks.corpus import MULTILINGUAL_PARAGRAPHS, article_of_size
+from app.plagiarism_checker.fingerprint_cache import fingerprint_cache
+from app.plagiarism_checker.fingerprint_pool import compute_fingerprint_offloaded, compute_fingerprint_set_offloaded
+from app.plagiarism_checker.fingerprinting import compute_fingerprint, compute_fingerprint_set
+from app.plagiarism_checker.normalization import kept_positions
+from app.plagiarism_checker.schemes import RABIN_KARP_SCHEME
+from app.plagiarism_checker.segments import segment_bounds, segmented_winnow
+from app.plagiarism_checker.winnowing_engine import vectorized_winnow
+
+
+class SegmentsTest(TestCase):
+    def test_same_as_serial(self):
+        text = article_of_size(20000)
+        for segments in [2, 3, 7, 16]:
+            self.assertEqual(vectorized_winnow(text), segmented_winnow(text, segments))
+
+    def test_same_iteration_order_as_serial(self):
+        text = article_of_size(20000)
+        self.assertEqual(list(vectorized_winnow(text)), list(segmented_winnow(text, 4)))
+
+    def test_same_as_serial_rabin_karp(self):
+        text = article_of_size(20000)
+        self.assertEqual(vectorized_winnow(text, scheme=RABIN_KARP_SCHEME),
+                         segmented_winnow(text, 5, scheme=RABIN_KARP_SCHEME))
+
+    def test_separators_at_boundaries(self):
+        text = ' ,;. '.join(MULTILINGUAL_PARAGRAPHS) + '!!!' * 500 + article_of_size(3000) + '... ' * 500
+        for segments in [2, 5, 11]:
+            self.assertEqual(vectorized_winnow(text), segmented_winnow(text, segments))
+
+    def test_short_texts(self):
+        for text in ['', 'run run', 'A do run run run, a do run run', 'abcdefghijklm']:
+            self.assertEqual(vectorized_winnow(text), segmented_winnow(text, 4))
+
+    def test_segment_bounds_overlap(self):
+        text = article_of_size(5000)
+        positions = kept_positions(text)
+        bounds = segment_bounds(positions, 3)
+        self.assertEqual(3, len(bounds))
+        self.assertEqual(int(positions[-1]) + 1, bounds[-1][1])
+        for (_, end), (start, _) in zip(bounds[:-1], bounds[1:]):
+            overlap = ((positions >= start) & (positions < end)).sum()
+            self.assertEqual(8 + 6 - 2, overlap)
+
+    def test_segment_bounds_too_short(self):
+        self.assertIsNone(segment_bounds(kept_positions('A do run run run'), 4))
+        self.assertIsNone(segment_bounds(kept_positions(article_of_size(5000)), 1))
+
+    def test_process_pool(self):
+        text = article_of_size(30000)
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            self.assertEqual(vectorized_winnow(text), segmented_winnow(text, 4, executor.map))
+
+
+@override_settings(FINGERPRINT_POOL_WORKERS=2, FINGERPRINT_OFFLOAD_THRESHOLD=1000,
+                   FINGERPRINT_PARALLEL_THRESHOLD=10000)
+class ParallelOffloadTest(TestCase):
+    def setUp(self):
+        fingerprint_cache.clear()
+
+    def tearDown(self):
+        fingerprint_cache.clear()
+
+    def test_offloaded_large_text(self):
+        text = article_of_size(40000)
+        fingerprints = compute_fingerprint_offloaded(text)
+        fingerprint_cache.clear()
+        self.assertEqual(compute_fingerprint(text), fingerprints)
+
+    def test_offloaded_set_large_text(self):
+        text = article_of_size(40000)
+        fingerprints = compute_fingerprint_set_offloaded(text)
+        fingerprint_cache.clear()
+        self.assertEqual(compute_fingerprint_set(text), fingerprints)
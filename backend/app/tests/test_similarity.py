@@ -1,6 +1,8 @@
+import numpy as np
 from django.test import TestCase
 
 from app.plagiarism_checker.similarity import *
+from app.plagiarism_checker.fingerprint_set import FingerprintSet
 
 
 # Create your tests here.
@@ -79,3 +81,67 @@ class SimilarityTest(TestCase):
         expected = 1 / 3
 
         self.assertEqual(expected, compute_similarity(shingles1, shingles2))
+
+    def test_similarity_fingerprint_sets(self):
+        expected = 1 / 3
+
+        self.assertEqual(expected, compute_similarity(FingerprintSet([1, 4, 4]), FingerprintSet([2, 4, 4])))
+
+    def test_similarity_fingerprint_set_and_dictionaries(self):
+        shingles = [{"shingle_hash": 1, "shingle_position": 2}, {"shingle_hash": 4, "shingle_position": 5}]
+        expected = 1
+
+        self.assertEqual(expected, compute_similarity(FingerprintSet([4, 1]), shingles))
+
+
+class BatchedSimilarityTest(TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(4)
+        self.query = FingerprintSet(rng.randint(0, 3000, 800))
+        self.candidates = [FingerprintSet(rng.randint(0, 3000, rng.randint(0, 1500))) for _ in range(50)]
+        self.candidates.append(FingerprintSet())
+        self.candidates.append(self.query)
+
+    def test_pack_fingerprint_sets(self):
+        hashes, sizes = pack_fingerprint_sets([FingerprintSet([3, 1]), [], [{"shingle_hash": 7}]])
+        self.assertEqual([1, 3, 7], hashes.tolist())
+        self.assertEqual([2, 0, 1], sizes.tolist())
+        hashes, sizes = pack_fingerprint_sets([])
+        self.assertEqual([], hashes.tolist())
+        self.assertEqual([], sizes.tolist())
+
+    def test_jaccard_from_sizes(self):
+        self.assertEqual([0.5, -1, 0.0], jaccard_from_sizes([2, 0, 0], [3, 0, 1], [3, 0, 0]).tolist())
+
+    def test_overlap_many(self):
+        expected = [self.query.intersection_size(candidate) for candidate in self.candidates]
+        self.assertEqual(expected, overlap_many(self.query, self.candidates).tolist())
+        self.assertEqual([0, 0], overlap_many(FingerprintSet(), [self.query, FingerprintSet()]).tolist())
+        self.assertEqual([], overlap_many(self.query, []).tolist())
+
+    def test_jaccard_many(self):
+        expected = [self.query.jaccard(candidate) for candidate in self.candidates]
+        self.assertTrue(np.allclose(expected, jaccard_many(self.query, self.candidates)))
+        self.assertEqual([-1.0], jaccard_many(FingerprintSet(), [FingerprintSet()]).tolist())
+
+    def test_containment_many(self):
+        expected = [self.query.intersection_size(candidate) / len(self.query) for candidate in self.candidates]
+        self.assertTrue(np.allclose(expected, containment_many(self.query, self.candidates)))
+        self.assertEqual(1.0, containment_many(FingerprintSet([1, 2]), [FingerprintSet([1, 2, 3])])[0])
+        self.assertEqual([0.0], containment_many(FingerprintSet(), [self.query]).tolist())
+
+    def test_jaccard_pairs(self):
+        firsts = self.candidates
+        seconds = self.candidates[1:] + self.candidates[:1]
+        expected = [compute_similarity(first, second) if len(first) + len(second) else -1
+                    for first, second in zip(firsts, seconds)]
+        self.assertTrue(np.allclose(expected, jaccard_pairs(firsts, seconds)))
+        self.assertEqual([], jaccard_pairs([], []).tolist())
+        with self.assertRaises(ValueError):
+            jaccard_pairs([self.query], [])
+
+    def test_contained_in(self):
+        query = np.array([2, 5, 2 ** 40], dtype=np.int64)
+        self.assertEqual([False, True, True, False], contained_in(np.array([1, 5, 2 ** 40, 7]), query).tolist())
+        self.assertEqual([True, False], contained_in(np.array([2, 3]), np.array([2, 5])).tolist())
+        self.assertEqual([False], contained_in(np.array([2]), np.array([], dtype=np.int64)).tolist())
@@ -0,0 +1,24 @@
+from django.test import TestCase
+
+from app.sql_migrations import list_migrations, read_migration
+
+
+class SqlMigrationsTest(TestCase):
+    def test_migrations_are_ordered(self):
+        migrations = list_migrations()
+        self.assertEqual(sorted(migrations), migrations)
+        self.assertEqual('0001_url_fingerprint_scheme.sql', migrations[0])
+        self.assertIn('0002_url_sampling_modulus.sql', migrations)
+        self.assertIn('0003_minhash_lsh.sql', migrations)
+        self.assertIn('0004_url_fingerprint_count.sql', migrations)
+        self.assertIn('0005_fingerprint_document_count.sql', migrations)
+        self.assertIn('0006_url_fingerprint_arrays.sql', migrations)
+        self.assertIn('0007_fingerprint_postings.sql', migrations)
+        self.assertIn('0008_index_changes.sql', migrations)
+        self.assertIn('0009_article_texts.sql', migrations)
+        self.assertIn('0010_posting_segments.sql', migrations)
+
+    def test_read_migration_fills_in_schema(self):
+        sql = read_migration('0001_url_fingerprint_scheme.sql', 'test_schema')
+        self.assertIn('test_schema.urls', sql)
+        self.assertNotIn('{schema}', sql)
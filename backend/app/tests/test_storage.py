@@ -0,0 +1,20 @@
+from django.test import TestCase, override_settings
+
+from app.plagiarism_checker.storage import ARRAYS, POSTINGS, ROWS, fingerprint_storage
+
+
+class StorageTest(TestCase):
+    def test_default_storage(self):
+        self.assertEqual(ROWS, fingerprint_storage())
+
+    @override_settings(FINGERPRINT_STORAGE=ARRAYS)
+    def test_storage_from_settings(self):
+        self.assertEqual(ARRAYS, fingerprint_storage())
+
+    @override_settings(FINGERPRINT_STORAGE=POSTINGS)
+    def test_postings_storage(self):
+        self.assertEqual(POSTINGS, fingerprint_storage())
+
+    @override_settings(FINGERPRINT_STORAGE='columns')
+    def test_unknown_storage(self):
+        self.assertRaises(ValueError, fingerprint_storage)
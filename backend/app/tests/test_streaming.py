@@ -0,0 +1,58 @@
+from django.test import TestCase
+
+from app.benchmarks.corpus import article_of_size
+from app.plagiarism_checker.fingerprinting import compute_fingerprint, compute_fingerprint_from_chunks
+from app.plagiarism_checker.schemes import RABIN_KARP_SCHEME
+from app.plagiarism_checker.streaming import StreamingWinnower, stream_winnow, decode_chunks
+from app.plagiarism_checker.winnowing_engine import vectorized_winnow
+
+
+def split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class StreamingTest(TestCase):
+    def test_same_as_batch(self):
+        text = article_of_size(5000)
+        for size in [1, 7, 64, 1000, 5000]:
+            fingerprints = list(stream_winnow(iter(split(text, size))))
+            self.assertEqual(vectorized_winnow(text), set(fingerprints))
+            self.assertEqual(len(set(fingerprints)), len(fingerprints))
+
+    def test_same_as_batch_rabin_karp(self):
+        text = article_of_size(3000)
+        fingerprints = stream_winnow(iter(split(text, 100)), scheme=RABIN_KARP_SCHEME)
+        self.assertEqual(vectorized_winnow(text, scheme=RABIN_KARP_SCHEME), set(fingerprints))
+
+    def test_short_texts(self):
+        for text in ['', '!!', 'run run', 'A do run', 'A do run run']:
+            self.assertEqual(vectorized_winnow(text), set(stream_winnow(iter(split(text, 2)))))
+
+    def test_no_chunks(self):
+        self.assertEqual(vectorized_winnow(''), set(stream_winnow(iter([]))))
+
+    def test_chunk_boundaries_inside_separators(self):
+        chunks = ['A do', ' ', '', 'run run ', 'run, a do', ' run run']
+        self.assertEqual(vectorized_winnow(''.join(chunks)), set(stream_winnow(iter(chunks))))
+
+    def test_bounded_state(self):
+        winnower = StreamingWinnower()
+        for chunk in split(article_of_size(8500), 500):
+            winnower.feed(chunk)
+            self.assertLessEqual(len(winnower.tail_text), 7)
+            self.assertLessEqual(len(winnower.tail_hashes), 5)
+
+    def test_fingerprints_are_yielded_early(self):
+        winnower = StreamingWinnower()
+        self.assertNotEqual([], winnower.feed(article_of_size(1000)))
+
+    def test_decode_chunks(self):
+        encoded = 'São Paulo — “Zoë”'.encode('utf-8')
+        byte_chunks = [encoded[i:i + 1] for i in range(len(encoded))]
+        self.assertEqual('São Paulo — “Zoë”', ''.join(decode_chunks(iter(byte_chunks))))
+
+    def test_compute_fingerprint_from_chunks(self):
+        text = article_of_size(2000)
+        expected = sorted(fp['shingle_hash'] for fp in compute_fingerprint(text))
+        obtained = sorted(fp['shingle_hash'] for fp in compute_fingerprint_from_chunks(iter(split(text, 300))))
+        self.assertEqual(expected, obtained)
@@ -0,0 +1,92 @@
+import numpy as np
+from django.test import TestCase, override_settings
+
+from app.plagiarism_checker.fingerprint_set import FingerprintSet
+from app.plagiarism_checker.inverted_index import fingerprint_levels
+from app.plagiarism_checker.inverted_index import sampled_sizes
+from app.plagiarism_checker.threshold import minimum_overlaps, minimum_similarity, prefix_length, rarest_prefix, \
+    required_overlap, sampled_prefixes, similarity_threshold, size_bounds
+
+
+def random_pairs(count=300, seed=5):
+    """Builds pairs of sets of various sizes and similarities.
+    """
+    rng = np.random.RandomState(seed)
+    for _ in range(count):
+        common = rng.randint(0, 2 ** 20, rng.randint(0, 300))
+        first = FingerprintSet(np.concatenate([common, rng.randint(0, 2 ** 20, rng.randint(1, 200))]))
+        second = FingerprintSet(np.concatenate([common, rng.randint(0, 2 ** 20, rng.randint(1, 200))]))
+        yield first, second
+
+
+class ThresholdTest(TestCase):
+    def test_size_bounds(self):
+        self.assertEqual((50, 200), size_bounds(100, 0.5))
+        self.assertEqual((100, 100), size_bounds(100, 1))
+        self.assertEqual((30, 333), size_bounds(100, 0.3))
+
+    def test_required_overlap(self):
+        self.assertEqual(100, required_overlap(200, 100, 0.5))
+        self.assertEqual([100, 134], required_overlap(200, [100, 200], 0.5).tolist())
+
+    def test_prefix_length(self):
+        self.assertEqual(51, prefix_length(100, 0.5))
+        self.assertEqual(1, prefix_length(100, 1))
+        self.assertEqual(0, prefix_length(0, 0.5))
+        self.assertEqual(100, prefix_length(100, 0.001))
+
+    def test_filters_keep_similar_documents(self):
+        for threshold in [0.1, 0.3, 0.5, 0.8]:
+            for first, second in random_pairs():
+                similar = first.jaccard(second) >= threshold
+                lower, upper = size_bounds(len(first), threshold)
+                if similar:
+                    self.assertTrue(lower <= len(second) <= upper)
+                    self.assertGreaterEqual(first.intersection_size(second),
+                                            required_overlap(len(first), len(second), threshold))
+                    # Whatever the order of the fingerprints, the prefix has one of the document
+                    frequencies = np.random.RandomState(len(first)).randint(0, 100, len(first))
+                    prefix = rarest_prefix(first.hashes, frequencies, threshold)
+                    self.assertTrue(np.isin(prefix, second.hashes).any())
+
+    def test_rarest_prefix(self):
+        hashes = [10, 20, 30, 40]
+        self.assertEqual([20, 40], rarest_prefix(hashes, [5, 1, 7, 2], 0.6).tolist())
+        self.assertEqual([10, 20], rarest_prefix(hashes, [0, 0, 0, 0], 0.6).tolist())
+
+    def test_sampled_prefixes(self):
+        hashes = np.arange(0, 64)
+        levels = fingerprint_levels(hashes)
+        prefix_hashes, prefix_levels = sampled_prefixes(hashes, levels, np.zeros(64), 0.5, query_level=1)
+        for level in range(1, levels.max() + 1):
+            kept = hashes[levels >= level]
+            self.assertEqual(kept[:prefix_length(len(kept), 0.5)].tolist(),
+                             prefix_hashes[prefix_levels == level].tolist())
+        self.assertNotIn(0, prefix_levels.tolist())
+        self.assertEqual(([], []), tuple(array.tolist() for array in sampled_prefixes([], [], [], 0.5)))
+
+    def test_minimum_overlaps(self):
+        self.assertEqual([100, 10, 1, 1], minimum_overlaps([2000, 200, 10, 0], 0.05).tolist())
+        sizes = sampled_sizes(FingerprintSet(np.arange(0, 4000, 2)).hashes)
+        cutoffs = minimum_overlaps(sizes, 0.05)
+        self.assertEqual(100, cutoffs[0])
+        self.assertEqual(50, cutoffs[2])
+
+    def test_minimum_overlaps_keep_similar_documents(self):
+        for first, second in random_pairs():
+            if first.jaccard(second) >= 0.2:
+                self.assertGreaterEqual(first.intersection_size(second), minimum_overlaps([len(first)], 0.2)[0])
+
+    def test_minimum_similarity_from_settings(self):
+        with override_settings(MINIMUM_SIMILARITY=0.1):
+            self.assertEqual(0.1, minimum_similarity())
+        with override_settings(MINIMUM_SIMILARITY=0):
+            self.assertRaises(ValueError, minimum_similarity)
+
+    def test_threshold_from_settings(self):
+        with override_settings(SIMILARITY_THRESHOLD=None):
+            self.assertIsNone(similarity_threshold())
+        with override_settings(SIMILARITY_THRESHOLD=0.4):
+            self.assertEqual(0.4, similarity_threshold())
+        with override_settings(SIMILARITY_THRESHOLD=1.5):
+            self.assertRaises(ValueError, similarity_threshold)
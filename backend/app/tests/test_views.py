@@ -4,7 +4,7 @@ from unittest import TestCase
 from unittest.mock import patch
 from unittest.mock import MagicMock
 
-from django.test import RequestFactory
+from django.test import RequestFactory, override_settings
 from django.http import HttpResponse, HttpResponseBadRequest
 import psycopg2
 from rest_framework import status
@@ -21,6 +21,9 @@ from app.views import text_similarity_checker
 from utils import schema, conn, existing_fps
 from app.views import update_users
 from app.views import retrieve_statistics
+from app.views import retrieve_fingerprint_statistics
+from app.plagiarism_checker.fingerprint_cache import fingerprint_cache
+from app.plagiarism_checker.storage import ARRAYS
 from app.response_statistics import ResponseStatistics, ResponseStatisticsEncoder
 from utils import statistics
 import sys
@@ -370,6 +373,43 @@ class TestUrlSimilarity(BaseTest):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.content.decode(), "The article provided has no text.")
 
+    @patch('app.handlers.sanitizing_url', return_value=True)
+    def test_stored_without_fingerprints(self, sanitizing_url):
+        # e.g. a document which a reindex could not fingerprint
+        url = 'https://news.example/unfingerprinted'
+        self.cursor = conn.cursor()
+        self.cursor.execute(f"INSERT INTO {schema}.urls (url) VALUES (%s)", (url,))
+        conn.commit()
+        self.cursor.close()
+
+        request = self.factory.post("/urlsimilarity/", data=json.dumps({'key': url}), content_type='application/json')
+        response = url_similarity_checker(request)
+
+        self.assertIsInstance(response, HttpResponseBadRequest)
+        self.assertEqual(response.content.decode(), "The article provided was stored without fingerprints.")
+
+    @override_settings(FINGERPRINT_STORAGE=ARRAYS)
+    @patch('app.views.find_similar_documents_by_fingerprints', return_value=HttpResponse(status=200))
+    def test_arrays_not_built(self, find_similar_documents):
+        # Documents stored before build_fingerprint_arrays have a NULL array
+        url = 'https://news.example/before-arrays'
+        self.cursor = conn.cursor()
+        self.cursor.execute(f"INSERT INTO {schema}.fingerprints (fingerprint) VALUES (3), (5)")
+        self.cursor.execute(f"INSERT INTO {schema}.urls (url) VALUES (%s) RETURNING id", (url,))
+        url_id = self.cursor.fetchone()[0]
+        self.cursor.execute(f"INSERT INTO {schema}.url_fingerprints (url_id, fingerprint_id) VALUES (%s, 3), (%s, 5)",
+                            (url_id, url_id))
+        conn.commit()
+        self.cursor.close()
+
+        request = self.factory.post("/urlsimilarity/", data=json.dumps({'key': url}), content_type='application/json')
+        response = url_similarity_checker(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        fingerprints, source_url, _ = find_similar_documents.call_args[0]
+        self.assertEqual([3, 5], sorted(fingerprints.tolist()))
+        self.assertEqual(url, source_url)
+
     def test_invalid_request(self):
         request = self.factory.get("/urlsimilairty/")
         response = url_similarity_checker(request)
@@ -494,6 +534,25 @@ class TestStatisticsUpdates(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.content.decode(), "Expected GET, but got POST instead")
 
+    def test_retrieve_fingerprint_statistics(self):
+        request = self.factory.get("/fingerprintStatistics/")
+        response = retrieve_fingerprint_statistics(request)
+        parsed_response = json.loads(response.content.decode())
+
+        self.assertIsInstance(response, HttpResponse)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(fingerprint_cache.statistics(), parsed_response["cache"])
+        self.assertIn("texts_per_second", parsed_response["batch"])
+        self.assertIn("texts_per_second", parsed_response["offloaded"])
+
+    def test_retrieve_fingerprint_statistics_invalid(self):
+        request = self.factory.post("/fingerprintStatistics/")
+        response = retrieve_fingerprint_statistics(request)
+
+        self.assertIsInstance(response, HttpResponseBadRequest)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.content.decode(), "Expected GET, but got POST instead")
+
     def test_statistics_update(self):
         data = {
             'key': 'https://www.formula1.com/en/latest/article.breaking-honda-to-make-full-scale-f1-return-in-2026-as'
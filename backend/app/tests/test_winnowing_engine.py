@@ -0,0 +1,61 @@
+from django.test import TestCase
+
+from app.benchmarks.corpus import PARAGRAPHS, article_of_size
+from app.plagiarism_checker.fingerprinting import modified_winnow, modified_hash
+from app.plagiarism_checker.schemes import SHA1_WIDE_SCHEME, WIDE_HASH_MASK
+from app.plagiarism_checker.winnowing_engine import vectorized_winnow, hash_kgrams, sanitize_text, select_minima
+
+import numpy as np
+
+
+class WinnowingEngineTest(TestCase):
+    def test_same_fingerprints_as_reference(self):
+        texts = ['A do run run run, a do run run', 'run run', 'The quick brown fox jumps over the lazy dog']
+        for text in texts:
+            self.assertEqual(modified_winnow(text), vectorized_winnow(text))
+
+    def test_same_fingerprints_for_articles(self):
+        for text in PARAGRAPHS + [article_of_size(1500), article_of_size(8500)]:
+            self.assertEqual(modified_winnow(text), vectorized_winnow(text))
+
+    def test_same_iteration_order_as_reference(self):
+        text = article_of_size(5000)
+        self.assertEqual(list(modified_winnow(text)), list(vectorized_winnow(text)))
+
+    def test_short_and_empty_texts(self):
+        for text in ['', ' ', '!?', 'a', 'abcdefg', 'abcdefgh', 'abcdefghijklm']:
+            self.assertEqual(modified_winnow(text), vectorized_winnow(text))
+
+    def test_unicode_texts(self):
+        texts = ['São Paulo — “Zoë” paid €240', 'İstanbul İzmir İİİİİİİİ', 'ΣΟΦΟΣ ΣΟΦΟΣ ΣΟΦΟΣ', '東京都の新しい橋が完成した']
+        for text in texts:
+            self.assertEqual(modified_winnow(text), vectorized_winnow(text))
+
+    def test_sanitize_text(self):
+        sanitized, positions, offsets, characters = sanitize_text('A b, Ç!')
+        self.assertEqual('abç'.encode('utf-8'), sanitized)
+        self.assertEqual([0, 2, 5], positions.tolist())
+        self.assertEqual([0, 1, 2, 4], offsets.tolist())
+
+    def test_hash_kgrams(self):
+        sanitized, _, offsets, _ = sanitize_text('abcdefghij')
+        expected = [modified_hash('abcdefgh'), modified_hash('bcdefghi'), modified_hash('cdefghij')]
+        self.assertEqual(expected, hash_kgrams(sanitized, offsets, 8).tolist())
+
+    def test_hash_kgrams_wide(self):
+        sanitized, _, offsets, _ = sanitize_text('abcdefghij')
+        expected = [modified_hash(kgram, WIDE_HASH_MASK) for kgram in ('abcdefgh', 'bcdefghi', 'cdefghij')]
+        self.assertEqual(expected, hash_kgrams(sanitized, offsets, 8, WIDE_HASH_MASK).tolist())
+
+    def test_wide_scheme_as_reference(self):
+        for text in PARAGRAPHS[:3]:
+            self.assertEqual(modified_winnow(text, mask=WIDE_HASH_MASK),
+                             vectorized_winnow(text, scheme=SHA1_WIDE_SCHEME))
+
+    def test_select_minima_leftmost(self):
+        hashes = np.array([5, 1, 3, 1, 4, 2, 7], dtype=np.uint32)
+        self.assertEqual([1, 1, 3, 3], select_minima(hashes, 4).tolist())
+
+    def test_select_minima_short(self):
+        hashes = np.array([5, 2, 2], dtype=np.uint32)
+        self.assertEqual([1], select_minima(hashes, 6).tolist())
@@ -31,5 +31,6 @@ urlpatterns = [
     path('checkText/', text_similarity_checker, name = "text_similarity_checker"),
     path('updateUsers/', update_users, name = "update_users"),
     path('retrieveStatistics/', retrieve_statistics, name = "retrieve_statistics"),
+    path('fingerprintStatistics/', retrieve_fingerprint_statistics, name = "retrieve_fingerprint_statistics"),
     path('silk/', include('silk.urls', namespace='silk')),  # `silk` 3rd-party profiler
 ]
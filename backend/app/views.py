@@ -4,15 +4,28 @@ from silk.profiling.profiler import silk_profile
 
 import concurrent.futures
 import heapq
+import logging
+import numpy as np
 from functools import partial
 
 from .models import *
 from django.http import HttpResponse, HttpResponseBadRequest
 import json
-from .plagiarism_checker.fingerprinting import compute_fingerprint
+from .plagiarism_checker.fingerprint_cache import fingerprint_cache
+from .plagiarism_checker.fingerprint_pool import compute_fingerprint_set_offloaded, batch_statistics, offload_statistics
+from .plagiarism_checker.fingerprint_set import FingerprintSet, as_fingerprint_set
+from .plagiarism_checker.budget import fingerprint_budget, sample_long_articles
+from .plagiarism_checker.inverted_index import LEVELS, MINIMUM_OVERLAP, fingerprint_levels, indexed_scheme, \
+    modulus_level, sampled_sizes
+from .plagiarism_checker.minhash import band_keys, lsh_candidates_enabled, minhash_signature
+from .plagiarism_checker.posting_table import read_postings
+from .plagiarism_checker.schemes import default_scheme
+from .plagiarism_checker.storage import ARRAYS, POSTINGS, fingerprint_storage
+from .plagiarism_checker.threshold import EPSILON, minimum_overlaps, minimum_similarity, sampled_prefixes, \
+    similarity_threshold, size_bounds
 from .plagiarism_checker.crawling import crawl_url, extract_data_from_url
 from .plagiarism_checker.sanitizing import sanitizing_url
-from .plagiarism_checker.similarity import compute_similarity
+from .plagiarism_checker.similarity import compute_similarity, jaccard_from_sizes
 from .response_entities import ResponseUrlEntity, ResponseUrlEncoder, ResponseTwoUrlsEntity, ResponseTwoUrlsEncoder
 from .response_statistics import ResponseStatisticsEncoder
 
@@ -25,7 +38,7 @@ from utils import statistics
 from collections import defaultdict
 
 import psycopg2.extras
-from utils import schema, conn
+from utils import schema, conn, existing_fps, get_fingerprint_index
 
 
 def try_view(request, url):
@@ -84,25 +97,23 @@ def process_document(length_first, length_second, inters):
     :param length_first: the fingerprint size of the input url
     :param string_list: the fingerprint size of the candidate url
     :param inters: the size of the intersection set between candidate URL and input ULR
-    :return: the jaccard similarity with the input url
+    :return: the jaccard similarity with the input url, -1 if both fingerprint sets are empty
     """
 
-    if ((length_second + length_first - inters) != 0):
-        comp = inters / (length_second + length_first - inters)
-        return comp
-    else:
-        return -1
+    return float(jaccard_from_sizes(inters, length_first, length_second))
 
 
 def url_similarity_checker(request):
     """The endpoint that will be used in the CheckURL page.
     There is only one query made in order to check whether the URL has already been persisted
-    If this is not the case, the URL gets persisted and the method is recursively called.
+    If this is not the case, the URL gets persisted and the query is made once more.
     Otherwise, we call the helper method
     in order to obtain all the similar documents to the current one.
-    In the given query, all 3 tables are joined by performing 2 join operations
+    In the given query, urls is left joined with url_fingerprints, so that a document stored without fingerprints
+    (e.g. one a reindex could not fingerprint) is still found and rejected, instead of being persisted again.
     GROUP BY used to obtain an array of all fingerprints of a document,
         instead of a 2 columns table: [(url, fp1), (url, fp2), ...]
+    With the "arrays" fingerprint storage, the array is read from the row of the document instead.
 
     :param request: the request body.
     :return: a HTTP response with status 200, and a pair of url and jaccard similarity,
@@ -114,13 +125,26 @@ def url_similarity_checker(request):
         source_url = json.loads(request.body)["key"]
         cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         query = f"""
-          SELECT array_agg(DISTINCT fingerprints.fingerprint)
+          SELECT array_agg(DISTINCT url_fingerprints.fingerprint_id)
+                     FILTER (WHERE url_fingerprints.fingerprint_id IS NOT NULL),
+                 urls.scheme, urls.sampling_modulus
             FROM {schema}.urls
-            INNER JOIN {schema}.url_fingerprints ON urls.id = url_fingerprints.url_id
-            INNER JOIN {schema}.fingerprints ON url_fingerprints.fingerprint_id = fingerprints.fingerprint
+            LEFT JOIN {schema}.url_fingerprints ON urls.id = url_fingerprints.url_id
             WHERE urls.url = %s
-            GROUP BY urls.url;
+            GROUP BY urls.url, urls.scheme, urls.sampling_modulus;
             """
+        if fingerprint_storage() == ARRAYS:
+            # The fingerprints of the document are a single column of its row. Documents stored before the arrays
+            # were built have a NULL array, so their fingerprints are read from url_fingerprints
+            query = f"""
+              SELECT COALESCE(urls.fingerprint_array,
+                              (SELECT array_agg(DISTINCT url_fingerprints.fingerprint_id)
+                                 FROM {schema}.url_fingerprints
+                                 WHERE url_fingerprints.url_id = urls.id)),
+                     urls.scheme, urls.sampling_modulus
+                FROM {schema}.urls
+                WHERE urls.url = %s;
+                """
         # Query the database for the url and its associated fingerprints;
         cur.execute(
             query, (source_url,))
@@ -133,12 +157,18 @@ def url_similarity_checker(request):
             response = persist_url_view(request)
             if response.status_code == 400:  # Cannot persist URL as either it is too long, or it does not have text.
                 return response
-            else:
-                return url_similarity_checker(request)
+            cur.execute(query, (source_url,))
+            document = cur.fetchone()
+            if document is None:  # The document was rolled back, as storing it failed
+                return HttpResponseBadRequest("The article provided could not be stored.")
 
-        # Get the fingerprints for the current URL
-        submitted_url_fingerprints = document[0]
-        return find_similar_documents_by_fingerprints(submitted_url_fingerprints, source_url)
+        # The document is stored, but without any fingerprints to compare
+        if not document[0]:
+            return HttpResponseBadRequest("The article provided was stored without fingerprints.")
+
+        # Get the fingerprints for the current URL, which are only comparable with documents of the same scheme
+        submitted_url_fingerprints = FingerprintSet(document[0], modulus=document[2])
+        return find_similar_documents_by_fingerprints(submitted_url_fingerprints, source_url, document[1])
 
     else:
         return HttpResponseBadRequest(f"Expected POST, but got {request.method} instead")
@@ -162,80 +192,46 @@ def text_similarity_checker(request):
             return HttpResponseBadRequest("The article provided has no text.")
 
         # Compute fingerprints of the text given
-        text_fingerprints = [fp['shingle_hash'] for fp in compute_fingerprint(text)]
+        scheme = default_scheme()
+        budget = fingerprint_budget()
+        text_fingerprints = compute_fingerprint_set_offloaded(text, scheme, budget, sample_long_articles())
 
         # verify if it has more than 2000 hashes
-        if len(text_fingerprints) > 2000:
+        if text_fingerprints.count > budget:
             return HttpResponseBadRequest("The article given has exceeded the maximum size supported.")
 
-        return find_similar_documents_by_fingerprints(text_fingerprints)
+        return find_similar_documents_by_fingerprints(text_fingerprints, scheme=scheme)
 
     else:
         return HttpResponseBadRequest(f"Expected POST, but got {request.method} instead")
 
 
-def get_fingerprint_candidates(cur, fingerprints):
-    """Retrieves the fingerprint candidates from the database based on the given fingerprints.
-
-    :param cur: The database cursor object.
-    :param fingerprints: A list of fingerprints.
-    :return: A list of fingerprint candidates.
-    """
-    cur.execute(
-        f"""
-        SELECT f.fingerprint 
-        FROM {schema}.fingerprints as f
-        JOIN {schema}.url_fingerprints as uf ON f.fingerprint = uf.fingerprint_id
-        WHERE f.fingerprint IN %(fingerprints)s
-        GROUP BY f.fingerprint;
-        """,
-        {'fingerprints': tuple(fingerprints)}
-    )
-    return [row[0] for row in cur.fetchall()]
-
-
-def get_url_candidates(cur, fingerprint_candidates, input):
-    """Retrieves the URL candidates and their occurrence counts from the database based on the fingerprint candidates
-    and input URL.
-
-    :param cur: The database cursor object.
-    :param fingerprint_candidates: A list of fingerprint candidates.
-    :param input: The URL provided by the user.
-    :return: A tuple containing the list of URL candidates and a dictionary with URL occurrence counts.
-    """
-    cur.execute(
-        f"""
-        SELECT u.url, count(*) as cnt
-        FROM {schema}.urls as u
-        JOIN {schema}.url_fingerprints as uf ON u.id = uf.url_id
-        WHERE uf.fingerprint_id IN %(candidates)s AND u.url <> %(source_url)s
-        GROUP BY u.url
-        HAVING COUNT(*) >= 100
-        """,
-        {'candidates': tuple(fingerprint_candidates), 'source_url': input}
-    )
-    document = cur.fetchall()
-    string_list = {doc[0]: doc[1] for doc in document}
-    url_candidates = [doc[0] for doc in document]
-    return url_candidates, string_list
-
-
-def get_document(cur, url_candidates):
+def get_document(cur, url_candidates, modulus=1, db_schema=None):
     """Retrieves the documents (URLs and fingerprint set sizes) from the database based on the URL candidates.
+    The size of a document only counts the fingerprints divisible by the larger of its sampling modulus and the
+    sampling modulus of the input. It is the fingerprint_count stored with the document, unless the input is sampled
+    with a larger modulus than the document (or the count was not backfilled yet), in which case it is counted.
 
     :param cur: The database cursor object.
     :param url_candidates: A list of URL candidates.
-    :return: A list of tuples containing URL and fingerprint set size.
+    :param modulus: The sampling modulus of the input.
+    :param db_schema: The schema containing the news tables, the one of the application if not given.
+    :return: A list of tuples containing URL, fingerprint set size and the sampling modulus the size was counted with.
     """
+    db_schema = db_schema or schema
     cur.execute(
         f"""
-        SELECT u.url, count(DISTINCT f.fingerprint)
-        FROM {schema}.urls u
-        INNER JOIN {schema}.url_fingerprints uf ON u.id = uf.url_id
-        INNER JOIN {schema}.fingerprints f ON uf.fingerprint_id = f.fingerprint
-        WHERE u.url IN %(candidates)s
-        GROUP BY u.url;
-        """, {'candidates': tuple(url_candidates)}
+        SELECT u.url, u.fingerprint_count, u.sampling_modulus
+        FROM {db_schema}.urls u
+        WHERE u.url IN %(candidates)s AND u.fingerprint_count IS NOT NULL AND u.sampling_modulus >= %(modulus)s
+        UNION ALL
+        SELECT u.url, count(DISTINCT uf.fingerprint_id), GREATEST(u.sampling_modulus, %(modulus)s)
+        FROM {db_schema}.urls u
+        INNER JOIN {db_schema}.url_fingerprints uf ON u.id = uf.url_id
+        WHERE u.url IN %(candidates)s AND (u.fingerprint_count IS NULL OR u.sampling_modulus < %(modulus)s)
+          AND uf.fingerprint_id %% GREATEST(u.sampling_modulus, %(modulus)s) = 0
+        GROUP BY u.url, u.sampling_modulus;
+        """, {'candidates': tuple(url_candidates), 'modulus': modulus}
     )
     return cur.fetchall()
 
@@ -283,53 +279,31 @@ def update_statistics(response):
     statistics.add_similarities_retrieved(similarities)
 
 
-def find_similar_documents_by_fingerprints(fingerprints, input=''):
-    """Helper method which is used by the two endpoints /checkText and /checkURL for doing query on the database
-    3 queries are computed throughout this method, check the code for in-line comments.
-    The entire block of logic was encapsulated in a try-catch block to rollback the transaction in case of failure.
+def find_similar_documents_by_fingerprints(fingerprints, input='', scheme=None):
+    """Helper method which is used by the two endpoints /checkText and /checkURL for finding the most similar
+    documents. The documents are ranked with the in-memory fingerprint index of the worker if it is loaded (and
+    holds the documents of the scheme), otherwise with a single query on the database.
 
     :fingerprints: the fingerprints computed for the text/url input given by the user
     :input: for /checkURL is the url provided by the user, so we do not consider it when computing the similarities
     for /checkText is the empty string as we do not have any URL to check it against
+    :scheme: the scheme the fingerprints were computed with, only documents with the same scheme are compared
     :return: HttpResponse with the five most similar articles in decreasing order of similarity magnitude
     """
-    cur = conn.cursor()
-
-    # Get the length of the fingerprints for later use when computing Jaccard Similarity
-    length_first = len(set(fingerprints))
-    string_list = defaultdict(int)
+    fingerprints = as_fingerprint_set(fingerprints)
+    scheme = scheme if scheme is not None else default_scheme()
 
     heap = []
     capacity = 10
 
-    try:
-        fingerprint_candidates = get_fingerprint_candidates(cur, fingerprints)
-
-        if fingerprint_candidates:
-            url_candidates, string_list = get_url_candidates(cur, fingerprint_candidates, input)
-
-            if url_candidates:
-                document = get_document(cur, url_candidates)
-
-                for (url, fp_list_size) in document:
-                    inters = string_list[url]
-                    result = process_document(length_first, fp_list_size, inters)
-                    if result != -1:
-                        article_url = url
-                        computed_similarity = result
-                        update_heap(heap, capacity, computed_similarity, article_url)
-
-    except Exception as e:
-        print(f"Could not query data: {e}")
-        # Rollback the current transaction if there's any error
-        conn.rollback()
-
-    finally:
-        # Close the cursor
-        cur.close()
+    index = get_fingerprint_index() if indexed_scheme(scheme) else None
+    if index is not None:
+        rank_documents_in_memory(index, heap, capacity, fingerprints, input, scheme)
+    else:
+        rank_documents_in_database(heap, capacity, fingerprints, input, scheme)
 
-        # construct the response entity
-        response = construct_response(heap)
+    # construct the response entity
+    response = construct_response(heap)
 
     if input != '':
         update_statistics(response)
@@ -345,6 +319,415 @@ def find_similar_documents_by_fingerprints(fingerprints, input=''):
                         content_type="application/json")
 
 
+def overlap_cutoffs(minimum_overlap):
+    """Expands a minimum number of common fingerprints to the list of the minimums at every sampling level, as the
+    search queries take them.
+
+    :param minimum_overlap: a single minimum, or the minimum at every level.
+    :return: a list with the minimum at every level
+    """
+    if np.ndim(minimum_overlap):
+        return [int(overlap) for overlap in minimum_overlap]
+    return [int(minimum_overlap)] * LEVELS
+
+
+def query_overlap_cutoffs(fingerprints):
+    """Derives the minimum number of fingerprints a document must have in common with the input from its number of
+    fingerprints and MINIMUM_SIMILARITY, so that short inputs still find matches and long ones do not pull in
+    thousands of weak candidates.
+
+    :param fingerprints: the FingerprintSet of the input.
+    :return: an array with the minimum at every sampling level
+    """
+    return minimum_overlaps(sampled_sizes(fingerprints.hashes), minimum_similarity())
+
+
+def log_candidates(fingerprints, cutoffs, candidates, threshold=None):
+    """Logs the number of candidate documents of a search, for tuning MINIMUM_SIMILARITY.
+
+    :param fingerprints: the FingerprintSet of the input.
+    :param cutoffs: the minimum number of common fingerprints at every sampling level.
+    :param candidates: the number of documents which passed the cutoff (or reached the threshold).
+    :param threshold: the minimum similarity of the threshold search, if it was used.
+    """
+    cutoff = f'threshold {threshold}' if threshold is not None else \
+        f'minimum overlap {cutoffs[modulus_level(fingerprints.modulus)]}'
+    logging.info(f'Similarity search: {len(fingerprints)} fingerprints (modulus {fingerprints.modulus}), {cutoff}, '
+                 f'{candidates} candidate(s)')
+
+
+def rank_candidates(heap, capacity, urls, intersections, lengths, sizes):
+    """Computes the Jaccard similarity of the input with all the candidate documents at once and keeps the most
+    similar ones in the heap.
+
+    :param heap: the heap (priority queue) the most similar documents are kept in.
+    :param capacity: the maximum capacity of the heap.
+    :param urls: the URLs of the candidates.
+    :param intersections: the number of fingerprints every candidate has in common with the input.
+    :param lengths: the fingerprint size of the input, for every candidate.
+    :param sizes: the fingerprint size of every candidate.
+    """
+    similarities = jaccard_from_sizes(intersections, lengths, sizes)
+    for url, computed_similarity in zip(urls, similarities.tolist()):
+        if computed_similarity != -1:
+            update_heap(heap, capacity, computed_similarity, url)
+
+
+def rank_documents_in_memory(index, heap, capacity, fingerprints, input, scheme):
+    """Ranks the documents by their Jaccard similarity with the input using the in-memory fingerprint index,
+    without any database round trip.
+
+    :param index: the InvertedIndex or MappedIndex of the stored documents.
+    :param heap: the heap (priority queue) the most similar documents are kept in.
+    :param capacity: the maximum capacity of the heap.
+    :param fingerprints: the FingerprintSet of the input.
+    :param input: the URL provided by the user, which is not a result, or the empty string.
+    :param scheme: the scheme the fingerprints were computed with.
+    """
+    threshold = similarity_threshold()
+    cutoffs = query_overlap_cutoffs(fingerprints)
+    results = index.search(fingerprints, scheme, input, cutoffs, threshold)
+    log_candidates(fingerprints, cutoffs, len(results), threshold)
+    if results:
+        urls, intersections, lengths, sizes = zip(*results)
+        rank_candidates(heap, capacity, urls, intersections, lengths, sizes)
+
+
+def get_ranked_documents(cur, fingerprints, input='', scheme=None, limit=10, minimum_overlap=MINIMUM_OVERLAP,
+                         band_keys=None, db_schema=None):
+    """Ranks the documents by their Jaccard similarity with the input in a single SQL statement: the overlaps are
+    counted by url_id, joined with the stored fingerprint counts of the documents, and only the top documents are
+    returned. As in the other queries, sampled documents are compared on the fingerprints divisible by the larger
+    sampling modulus, whose size is counted only when the stored count does not apply.
+
+    :param cur: The database cursor object.
+    :param fingerprints: The FingerprintSet of the input.
+    :param input: The URL provided by the user, which is not a result, or the empty string.
+    :param scheme: The fingerprint scheme of the input, FINGERPRINT_SCHEME from the settings if not given.
+    :param limit: The maximum number of returned documents.
+    :param minimum_overlap: The minimum number of fingerprints a document has in common with the input, or a list
+    with the minimum for every sampling level (see threshold.minimum_overlaps).
+    :param band_keys: The LSH band keys of the input, if only the documents sharing a band are candidates.
+    :param db_schema: The schema containing the news tables, the one of the application if not given.
+    :return: A list of (url_id, url, similarity, candidates) tuples, in decreasing order of similarity, where
+    candidates is the number of documents with enough common fingerprints, returned or not.
+    """
+    db_schema = db_schema or schema
+    lsh_filter = "" if band_keys is None else f"""
+          AND uf.url_id IN (SELECT lb.url_id FROM {db_schema}.lsh_bands lb
+                            WHERE lb.band_key = ANY(%(band_keys)s::bigint[]))"""
+    cur.execute(
+        f"""
+        WITH query AS (
+            SELECT unnest(%(fingerprints)s::integer[]) AS fingerprint_id
+        ), overlap_counts AS (
+            SELECT uf.url_id, count(*) AS intersection
+            FROM query q
+            JOIN {db_schema}.url_fingerprints uf ON uf.fingerprint_id = q.fingerprint_id
+            JOIN {db_schema}.urls u ON u.id = uf.url_id
+            WHERE u.scheme = %(scheme)s AND u.url <> %(source_url)s
+              AND uf.fingerprint_id %% GREATEST(u.sampling_modulus, %(modulus)s) = 0{lsh_filter}
+            GROUP BY uf.url_id, u.sampling_modulus
+            HAVING count(*) >= (%(minimum_overlaps)s::integer[])[
+                round(log(2, GREATEST(u.sampling_modulus, %(modulus)s)))::integer + 1]
+        ), sized AS (
+            SELECT o.url_id, u.url, o.intersection,
+                   (%(query_sizes)s::integer[])[round(log(2, GREATEST(u.sampling_modulus, %(modulus)s)))::integer + 1]
+                       AS query_size,
+                   CASE WHEN u.fingerprint_count IS NOT NULL AND u.sampling_modulus >= %(modulus)s
+                        THEN u.fingerprint_count
+                        ELSE (SELECT count(DISTINCT d.fingerprint_id) FROM {db_schema}.url_fingerprints d
+                              WHERE d.url_id = o.url_id
+                                AND d.fingerprint_id %% GREATEST(u.sampling_modulus, %(modulus)s) = 0)
+                   END AS size
+            FROM overlap_counts o
+            JOIN {db_schema}.urls u ON u.id = o.url_id
+        )
+        SELECT url_id, url, intersection::float / (query_size + size - intersection) AS similarity,
+               count(*) OVER () AS candidates
+        FROM sized
+        WHERE query_size + size - intersection > 0
+        ORDER BY similarity DESC, url DESC
+        LIMIT %(limit)s
+        """,
+        {'fingerprints': fingerprints.tolist(), 'query_sizes': sampled_sizes(fingerprints.hashes).tolist(),
+         'source_url': input, 'scheme': scheme if scheme is not None else default_scheme(),
+         'modulus': fingerprints.modulus, 'minimum_overlaps': overlap_cutoffs(minimum_overlap),
+         'limit': limit,
+         'band_keys': band_keys}
+    )
+    return cur.fetchall()
+
+
+def get_ranked_documents_from_arrays(cur, fingerprints, input='', scheme=None, limit=10,
+                                     minimum_overlap=MINIMUM_OVERLAP, db_schema=None):
+    """Ranks the documents like get_ranked_documents, but from the fingerprint_array column of the documents (the
+    "arrays" fingerprint storage): the documents sharing a fingerprint with the input are found with the GIN index
+    of the column, and their intersection with the input is computed from their own row, without any join. Only
+    core operators are used (&& and = ANY, hashed for the constant array of the input), so no extension is needed.
+
+    :param cur: The database cursor object.
+    :param fingerprints: The FingerprintSet of the input.
+    :param input: The URL provided by the user, which is not a result, or the empty string.
+    :param scheme: The fingerprint scheme of the input, FINGERPRINT_SCHEME from the settings if not given.
+    :param limit: The maximum number of returned documents.
+    :param minimum_overlap: The minimum number of fingerprints a document has in common with the input, or a list
+    with the minimum for every sampling level (see threshold.minimum_overlaps).
+    :param db_schema: The schema containing the news tables, the one of the application if not given.
+    :return: A list of (url_id, url, similarity, candidates) tuples, as get_ranked_documents returns.
+    """
+    db_schema = db_schema or schema
+    cur.execute(
+        f"""
+        WITH candidates AS (
+            SELECT u.id AS url_id, u.url, u.fingerprint_array, u.fingerprint_count, u.sampling_modulus,
+                   GREATEST(u.sampling_modulus, %(modulus)s) AS compared_modulus
+            FROM {db_schema}.urls u
+            WHERE u.fingerprint_array && %(fingerprints)s::integer[]
+              AND u.scheme = %(scheme)s AND u.url <> %(source_url)s
+        ), overlap_counts AS (
+            SELECT url_id, url, round(log(2, compared_modulus))::integer AS level,
+                   (SELECT count(*) FROM unnest(fingerprint_array) f
+                    WHERE f = ANY(%(fingerprints)s::integer[]) AND f %% compared_modulus = 0) AS intersection,
+                   CASE WHEN fingerprint_count IS NOT NULL AND sampling_modulus >= %(modulus)s
+                        THEN fingerprint_count
+                        ELSE (SELECT count(*) FROM unnest(fingerprint_array) f WHERE f %% compared_modulus = 0)
+                   END AS size
+            FROM candidates
+        ), sized AS (
+            SELECT url_id, url, intersection, size, (%(query_sizes)s::integer[])[level + 1] AS query_size
+            FROM overlap_counts
+            WHERE intersection >= (%(minimum_overlaps)s::integer[])[level + 1]
+        )
+        SELECT url_id, url, intersection::float / (query_size + size - intersection) AS similarity,
+               count(*) OVER () AS candidates
+        FROM sized
+        WHERE query_size + size - intersection > 0
+        ORDER BY similarity DESC, url DESC
+        LIMIT %(limit)s
+        """,
+        {'fingerprints': fingerprints.tolist(), 'query_sizes': sampled_sizes(fingerprints.hashes).tolist(),
+         'source_url': input, 'scheme': scheme if scheme is not None else default_scheme(),
+         'modulus': fingerprints.modulus, 'minimum_overlaps': overlap_cutoffs(minimum_overlap), 'limit': limit}
+    )
+    return cur.fetchall()
+
+
+def get_ranked_documents_from_postings(cur, fingerprints, input='', scheme=None, limit=10,
+                                       minimum_overlap=MINIMUM_OVERLAP, db_schema=None):
+    """Ranks the documents like get_ranked_documents, but from the fingerprint_postings table (the "postings"
+    fingerprint storage): the compressed postings of the fingerprints of the input are read, one row per fingerprint
+    once compacted, and the overlaps are counted from them. Documents which were not appended to the table yet are
+    read from url_fingerprints.
+
+    :param cur: The database cursor object.
+    :param fingerprints: The FingerprintSet of the input.
+    :param input: The URL provided by the user, which is not a result, or the empty string.
+    :param scheme: The fingerprint scheme of the input, FINGERPRINT_SCHEME from the settings if not given.
+    :param limit: The maximum number of returned documents.
+    :param minimum_overlap: The minimum number of fingerprints a document has in common with the input, or a list
+    with the minimum for every sampling level (see threshold.minimum_overlaps).
+    :param db_schema: The schema containing the news tables, the one of the application if not given.
+    :return: A list of (url_id, url, similarity, candidates) tuples, as get_ranked_documents returns.
+    """
+    db_schema = db_schema or schema
+    ids, owners = read_postings(cur, db_schema, fingerprints.hashes)
+    cur.execute(
+        f"""
+        SELECT uf.url_id, uf.fingerprint_id
+        FROM {db_schema}.url_fingerprints uf
+        WHERE uf.url_id IN (SELECT id FROM {db_schema}.urls WHERE NOT postings_appended)
+          AND uf.fingerprint_id = ANY(%(fingerprints)s)
+        """,
+        {'fingerprints': fingerprints.tolist()}
+    )
+    pending = np.array(cur.fetchall(), dtype=np.int64).reshape(-1, 2)
+    ids = np.concatenate([ids, pending[:, 0]])
+    owners = np.concatenate([owners, pending[:, 1]])
+
+    # The overlap of a document is at most its number of postings, whatever level it is compared at
+    query_level = modulus_level(fingerprints.modulus)
+    cutoffs = np.array(overlap_cutoffs(minimum_overlap))
+    candidate_ids, upper_bounds = np.unique(ids, return_counts=True)
+    candidate_ids = candidate_ids[upper_bounds >= cutoffs[query_level:].min()]
+    if not len(candidate_ids):
+        return []
+
+    cur.execute(
+        f"""
+        SELECT id, url, sampling_modulus
+        FROM {db_schema}.urls
+        WHERE id = ANY(%(ids)s) AND scheme = %(scheme)s AND url <> %(source_url)s
+        """,
+        {'ids': candidate_ids.tolist(), 'scheme': scheme if scheme is not None else default_scheme(),
+         'source_url': input}
+    )
+    documents = cur.fetchall()
+    if not documents:
+        return []
+
+    document_ids = np.array([doc_id for (doc_id, _, _) in documents], dtype=np.int64)
+    order = np.argsort(document_ids)
+    document_ids = document_ids[order]
+    document_levels = np.maximum([modulus_level(modulus) for (_, _, modulus) in documents], query_level)[order]
+    positions = np.searchsorted(document_ids, ids)
+    found = (positions < len(document_ids)) & (document_ids[np.minimum(positions, len(document_ids) - 1)] == ids)
+    # Sampled documents are compared on the fingerprints kept at the larger of both levels
+    compared = found.copy()
+    compared[found] = fingerprint_levels(owners[found]) >= document_levels[positions[found]]
+    intersections = np.bincount(positions[compared], minlength=len(document_ids))
+    kept = intersections >= cutoffs[document_levels]
+    if not kept.any():
+        return []
+
+    urls = [documents[index][1] for index in order[kept].tolist()]
+    sizes = {url: size for (url, size, _) in get_document(cur, urls, fingerprints.modulus, db_schema)}
+    query_sizes = sampled_sizes(fingerprints.hashes)[document_levels[kept]]
+    similarities = jaccard_from_sizes(intersections[kept], query_sizes, [sizes[url] for url in urls])
+    ranked = sorted(((similarity, url, doc_id) for similarity, url, doc_id
+                     in zip(similarities.tolist(), urls, document_ids[kept].tolist()) if similarity != -1),
+                    reverse=True)
+    return [(doc_id, url, similarity, len(ranked)) for (similarity, url, doc_id) in ranked[:limit]]
+
+
+def get_document_frequencies(cur, fingerprints, db_schema=None):
+    """Retrieves the number of documents having each fingerprint of the input, as counted in the "fingerprints"
+    table. Fingerprints which are not stored have no documents.
+
+    :param cur: The database cursor object.
+    :param fingerprints: The FingerprintSet of the input.
+    :param db_schema: The schema containing the news tables, the one of the application if not given.
+    :return: An array with the number of documents of every hash of the input, in the same order.
+    """
+    db_schema = db_schema or schema
+    cur.execute(
+        f"""
+        SELECT fingerprint, document_count
+        FROM {db_schema}.fingerprints
+        WHERE fingerprint = ANY(%(fingerprints)s)
+        """,
+        {'fingerprints': fingerprints.tolist()}
+    )
+    counts = dict(cur.fetchall())
+    return np.array([counts.get(fingerprint, 0) for fingerprint in fingerprints.tolist()], dtype=np.int64)
+
+
+def get_threshold_documents(cur, fingerprints, threshold, input='', scheme=None, limit=10, db_schema=None):
+    """Finds the documents whose Jaccard similarity with the input is at least the threshold, most similar first.
+    Candidates are only generated from the prefix of the rarest fingerprints of the input (see
+    threshold.sampled_prefixes), among the documents whose size is within the bounds of the threshold. The overlap
+    of every candidate is then counted exactly, from the url_fingerprints rows of that document only.
+
+    :param cur: The database cursor object.
+    :param fingerprints: The FingerprintSet of the input.
+    :param threshold: The minimum Jaccard similarity.
+    :param input: The URL provided by the user, which is not a result, or the empty string.
+    :param scheme: The fingerprint scheme of the input, FINGERPRINT_SCHEME from the settings if not given.
+    :param limit: The maximum number of returned documents.
+    :param db_schema: The schema containing the news tables, the one of the application if not given.
+    :return: A list of (url_id, url, similarity, candidates) tuples, in decreasing order of similarity, where
+    candidates is the number of documents reaching the threshold, returned or not.
+    """
+    db_schema = db_schema or schema
+    query_level = modulus_level(fingerprints.modulus)
+    prefix_hashes, prefix_levels = sampled_prefixes(fingerprints.hashes, fingerprint_levels(fingerprints.hashes),
+                                                    get_document_frequencies(cur, fingerprints, db_schema),
+                                                    threshold, query_level)
+    if not len(prefix_hashes):
+        return []
+
+    query_sizes = sampled_sizes(fingerprints.hashes)
+    bounds = [size_bounds(int(size), threshold) for size in query_sizes]
+    cur.execute(
+        f"""
+        WITH prefix AS (
+            SELECT unnest(%(prefix_hashes)s::integer[]) AS fingerprint_id, unnest(%(prefix_levels)s::integer[]) AS level
+        ), candidates AS (
+            SELECT DISTINCT u.id AS url_id, u.url, p.level,
+                   CASE WHEN u.fingerprint_count IS NOT NULL AND u.sampling_modulus >= %(modulus)s
+                        THEN u.fingerprint_count END AS size
+            FROM prefix p
+            JOIN {db_schema}.url_fingerprints uf ON uf.fingerprint_id = p.fingerprint_id
+            JOIN {db_schema}.urls u ON u.id = uf.url_id
+            WHERE u.scheme = %(scheme)s AND u.url <> %(source_url)s
+              AND p.level = GREATEST(round(log(2, u.sampling_modulus))::integer, %(query_level)s)
+              AND (u.fingerprint_count IS NULL OR u.sampling_modulus < %(modulus)s
+                   OR u.fingerprint_count BETWEEN (%(lower_bounds)s::integer[])[p.level + 1]
+                                              AND (%(upper_bounds)s::integer[])[p.level + 1])
+        ), verified AS (
+            SELECT c.url_id, c.url, (%(query_sizes)s::integer[])[c.level + 1] AS query_size,
+                   (SELECT count(*) FROM {db_schema}.url_fingerprints uf
+                    WHERE uf.url_id = c.url_id AND uf.fingerprint_id = ANY(%(fingerprints)s::integer[])
+                      AND uf.fingerprint_id %% (1 << c.level) = 0) AS intersection,
+                   COALESCE(c.size, (SELECT count(DISTINCT d.fingerprint_id) FROM {db_schema}.url_fingerprints d
+                                     WHERE d.url_id = c.url_id AND d.fingerprint_id %% (1 << c.level) = 0)) AS size
+            FROM candidates c
+        )
+        SELECT url_id, url, intersection::float / (query_size + size - intersection) AS similarity,
+               count(*) OVER () AS candidates
+        FROM verified
+        WHERE query_size + size - intersection > 0
+          AND intersection::float / (query_size + size - intersection) >= %(threshold)s
+        ORDER BY similarity DESC, url DESC
+        LIMIT %(limit)s
+        """,
+        {'prefix_hashes': prefix_hashes.tolist(), 'prefix_levels': prefix_levels.tolist(),
+         'fingerprints': fingerprints.tolist(), 'query_sizes': query_sizes.tolist(),
+         'lower_bounds': [lower for (lower, _) in bounds], 'upper_bounds': [upper for (_, upper) in bounds],
+         'source_url': input, 'scheme': scheme if scheme is not None else default_scheme(),
+         'modulus': fingerprints.modulus, 'query_level': query_level, 'threshold': threshold - EPSILON,
+         'limit': limit}
+    )
+    return cur.fetchall()
+
+
+def rank_documents_in_database(heap, capacity, fingerprints, input, scheme):
+    """Ranks the documents by their Jaccard similarity with the input with a single query, see get_ranked_documents,
+    or only the documents reaching SIMILARITY_THRESHOLD if it is set, see get_threshold_documents. With the
+    "arrays" and "postings" fingerprint storages, the documents are ranked from their fingerprint arrays or from
+    the fingerprint_postings table instead of url_fingerprints (except by the threshold search, which verifies the
+    overlaps of its candidates on url_fingerprints).
+    The query was encapsulated in a try-catch block to rollback the transaction in case of failure.
+
+    :param heap: the heap (priority queue) the most similar documents are kept in.
+    :param capacity: the maximum capacity of the heap.
+    :param fingerprints: the FingerprintSet of the input.
+    :param input: the URL provided by the user, which is not a result, or the empty string.
+    :param scheme: the scheme the fingerprints were computed with.
+    """
+    threshold = similarity_threshold()
+    cutoffs = query_overlap_cutoffs(fingerprints)
+    if existing_fps.covers(fingerprints.hashes) and not existing_fps.contains(fingerprints.hashes).any():
+        # No stored document has any fingerprint of the input, there is nothing to rank
+        log_candidates(fingerprints, cutoffs, 0, threshold)
+        return
+
+    cur = conn.cursor()
+    try:
+        if threshold is not None:
+            ranked = get_threshold_documents(cur, fingerprints, threshold, input, scheme, capacity)
+        elif fingerprint_storage() == ARRAYS:
+            ranked = get_ranked_documents_from_arrays(cur, fingerprints, input, scheme, capacity, cutoffs)
+        elif fingerprint_storage() == POSTINGS:
+            ranked = get_ranked_documents_from_postings(cur, fingerprints, input, scheme, capacity, cutoffs)
+        else:
+            # Candidates come from the LSH band table instead of every fingerprint of the input
+            input_band_keys = band_keys(minhash_signature(fingerprints)) if lsh_candidates_enabled() else None
+            ranked = get_ranked_documents(cur, fingerprints, input, scheme, capacity, cutoffs, input_band_keys)
+        log_candidates(fingerprints, cutoffs, ranked[0][3] if ranked else 0, threshold)
+        for (_, url, computed_similarity, _) in ranked:
+            update_heap(heap, capacity, computed_similarity, url)
+
+    except Exception as e:
+        print(f"Could not query data: {e}")
+        # Rollback the current transaction if there's any error
+        conn.rollback()
+
+    finally:
+        # Close the cursor
+        cur.close()
+
+
 def compare_texts_view(request):
     """The endpoint that can be consumed by posting on
     backend-news-cop-68d6c56b3a54.herokuapp.com/compareTexts/ 
@@ -365,8 +748,8 @@ def compare_texts_view(request):
         text2 = data["compare_text"]
 
         # compute the fingerprints of the two texts
-        fingerprint1 = compute_fingerprint(text1)
-        fingerprint2 = compute_fingerprint(text2)
+        fingerprint1 = compute_fingerprint_set_offloaded(text1)
+        fingerprint2 = compute_fingerprint_set_offloaded(text2)
 
         # compute and return the similarity between the two texts
         return HttpResponse(compute_similarity(fingerprint1, fingerprint2))
@@ -404,8 +787,8 @@ def compare_URLs(request):
         article_text_right, date_right = crawl_url(url_right)
 
         # compute fingerprints for both urls
-        fingerprint_left = compute_fingerprint(article_text_left)
-        fingerprint_right = compute_fingerprint(article_text_right)
+        fingerprint_left = compute_fingerprint_set_offloaded(article_text_left)
+        fingerprint_right = compute_fingerprint_set_offloaded(article_text_right)
         result_similarity = compute_similarity(fingerprint_left, fingerprint_right)
         if date_left is None or date_right is None:  # In this case we cannot compare dates => ownership = 0
             return construct_response_helper(result_similarity, 0, date_left, date_right)
@@ -470,3 +853,24 @@ def retrieve_statistics(request):
         return HttpResponse(ResponseStatisticsEncoder().encode(statistics), status=200, content_type="application/json")
     else:
         return HttpResponseBadRequest(f"Expected GET, but got {request.method} instead")
+
+
+def retrieve_fingerprint_statistics(request):
+    """Endpoint for retrieving the counters of the fingerprint cache and the throughput of the fingerprinting pool
+    of the worker that serves the request, used for sizing the cache and the pool.
+
+    :param request: the request
+    :return: a HttpResponse with status 200, if successful else HttpResponseBadRequest
+    """
+    if request.method == 'GET':
+        fingerprint_statistics = {
+            'cache': fingerprint_cache.statistics(),
+            'batch': {'texts': batch_statistics.texts, 'texts_per_second': batch_statistics.texts_per_second(),
+                      'mb_per_second': batch_statistics.megabytes_per_second()},
+            'offloaded': {'texts': offload_statistics.texts,
+                          'texts_per_second': offload_statistics.texts_per_second(),
+                          'mb_per_second': offload_statistics.megabytes_per_second()},
+        }
+        return HttpResponse(json.dumps(fingerprint_statistics), status=200, content_type="application/json")
+    else:
+        return HttpResponseBadRequest(f"Expected GET, but got {request.method} instead")
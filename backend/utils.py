@@ -1,9 +1,16 @@
 # Note that `pyscopg2` is used for establishing the connection
 # with postgres, but also for executing queries
+import logging
 import psycopg2
-import psycopg2.extras
 import os
+import threading
+from functools import partial
 from app.response_statistics import ResponseStatistics
+from app.plagiarism_checker.change_feed import ChangeFeed, change_feed_enabled, latest_change
+from app.plagiarism_checker.index_file import open_fingerprint_index
+from app.plagiarism_checker.inverted_index import fingerprint_index_enabled
+from app.plagiarism_checker.presence import FingerprintPresence, load_stored_fingerprints
+from app.plagiarism_checker.storage import ARRAYS, fingerprint_storage
 
 # Connection parameters
 host = "news-articles.ct9yvcb6c1se.eu-west-3.rds.amazonaws.com"   # The endpoint of our RDS instance
@@ -29,27 +36,107 @@ if os.environ.get('RUNNING_TESTS') == 'True':
     schema = 'test_schema'
 
 
+def connect():
+    """Opens a new connection to the PostgreSQL database.
+
+    :return: the connection
+    """
+    return psycopg2.connect(
+        dbname=dbname,
+        user=user,
+        host=host,
+        password=password,
+        port=port
+    )
+
+
 # Establish a connection to the PostgreSQL database
-conn = psycopg2.connect(
-    dbname=dbname,
-    user=user,
-    host=host,
-    password=password,
-    port=port
-)
+conn = connect()
+
+# Bitmap of the fingerprints some stored document has, loaded from the fingerprints table when it is first used
+existing_fps = FingerprintPresence(partial(load_stored_fingerprints, conn, schema))
+
+# In-memory inverted index of the stored documents, used by the similarity search instead of querying the database
+# It is loaded on the first search (see get_fingerprint_index), so that importing this module does not read the
+# tables of the SQL migrations, which management commands such as apply_sql_migrations may not have created yet
+# Documents stored by this worker are added to it when they are saved
+# With FINGERPRINT_INDEX_FILE, the index written by `build_index_file` is mapped and only the newer documents loaded
+fingerprint_index = None
+
+# Applies the documents stored or deleted by the other workers to fingerprint_index (and existing_fps)
+change_feed = None
+
+# Whether the change feed is started with the index, only in the server workers (see start_change_feed)
+feed_requested = False
+
+# Serialises the loading of fingerprint_index between the threads of a worker
+index_lock = threading.Lock()
+
+
+def replace_fingerprint_index(index):
+    """Replaces the in-memory fingerprint index with the one the change feed loaded after a reindex. Searches which
+    are running keep the former index.
+
+    :param index: the InvertedIndex or MappedIndex of the rebuilt tables.
+    """
+    global fingerprint_index
+    fingerprint_index = index
+
+
+def load_index():
+    """Loads the fingerprint index of the stored documents and, in the server workers, starts the change feed which
+    keeps it up to date.
+
+    :return: the InvertedIndex or MappedIndex, None if it could not be loaded
+    """
+    global change_feed
+    arrays = fingerprint_storage() == ARRAYS
+    try:
+        # The feed starts from the last change before the index is loaded, so that no change is missed meanwhile
+        last_change = latest_change(conn, schema) if feed_requested and change_feed_enabled() else None
+        index = open_fingerprint_index(conn, schema, arrays)
+    except psycopg2.Error as e:
+        conn.rollback()
+        logging.warning(f'Could not load the fingerprint index, searching the database instead: {e}')
+        return None
+    if feed_requested and change_feed_enabled() and last_change is None:
+        logging.warning('The index_changes table does not exist, the fingerprint index is not kept up to date with '
+                        'the other workers until migration 0008 is applied and the worker restarted')
+    if last_change is not None:
+        change_feed = ChangeFeed(index, connect, schema, arrays, last_change, existing_fps,
+                                 replace_fingerprint_index)
+        change_feed.start()
+    return index
+
+
+def get_fingerprint_index():
+    """Returns the in-memory fingerprint index, loading it on the first call. The index is disabled by
+    FINGERPRINT_INDEX_IN_MEMORY, and it is loaded again on the next call if the database could not be read.
+
+    :return: the InvertedIndex or MappedIndex, None if there is none
+    """
+    global fingerprint_index
+    if fingerprint_index is None and fingerprint_index_enabled():
+        with index_lock:
+            if fingerprint_index is None:
+                fingerprint_index = load_index()
+    return fingerprint_index
 
-# Create a cursor that returns a dictionary as a result
-cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
 
-# Execute the query
-# This is done for caching all the existing fingerprints
-cur.execute(f'SELECT fingerprint FROM {schema}.fingerprints')
+def loaded_fingerprint_index():
+    """Returns the in-memory fingerprint index if it was loaded already, without loading it: documents stored before
+    it is loaded are read with the others.
 
-# Fetch all rows as a list of dictionaries and create a set from the 'url' values
-existing_fps = set(row['fingerprint'] for row in cur.fetchall())
+    :return: the InvertedIndex or MappedIndex, None if it is not loaded
+    """
+    return fingerprint_index
 
-# This line is used for debugging, to see how many fingerprints there are
-print("DEBUG", len(existing_fps))
 
-# Close the cursor
-cur.close()
+def start_change_feed():
+    """Loads the fingerprint index of the worker and keeps it up to date with the documents stored or deleted by the
+    other workers. It is called by the server entrypoint (app/wsgi.py and app/asgi.py), so that management commands
+    and tests do not listen for changes.
+    """
+    global feed_requested
+    feed_requested = True
+    get_fingerprint_index()